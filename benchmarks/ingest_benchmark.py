@@ -0,0 +1,317 @@
+# benchmarks/ingest_benchmark.py
+"""
+Offline end-to-end benchmark for the ingest path:
+
+    iot-simulator -> Kinesis -> vitals-processor -> DynamoDB / SNS
+
+The real handlers run in-process against moto stand-ins for Kinesis, DynamoDB
+and SNS. For every (batch size, alert ratio) combination the processor is fed
+Kinesis-shaped batches and the report records records/sec, p50/p99 batch
+latency and AWS API calls per record. The process-wide peak RSS is reported
+once; --trace-memory adds the peak Python memory allocated during each case
+(tracemalloc, reset before every case). Tracing slows the handlers several
+times over, so throughput from a traced run is not comparable to a baseline.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/ingest_benchmark.py --records 2000 \\
+        --batch-sizes 10,100,500 --alert-ratios 0,0.1,0.5 \\
+        --output ingest.json --baseline ingest-baseline.json
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import local_aws  # noqa: E402
+
+NORMAL_VITALS = {
+    'heartRate': 75,
+    'systolicBP': 120,
+    'diastolicBP': 80,
+    'temperature': 98.6,
+    'oxygenSaturation': 98
+}
+
+# Past the panic limits, so every one of these readings pages on its own
+CRITICAL_VITALS = {
+    'heartRate': 160,
+    'systolicBP': 230,
+    'diastolicBP': 135,
+    'temperature': 105.5,
+    'oxygenSaturation': 80
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the vital signs ingest path locally')
+    parser.add_argument('--patients', type=int, default=100,
+                        help='Active patients seeded into PatientRecords')
+    parser.add_argument('--records', type=int, default=1000,
+                        help='Readings fed to the processor for each case')
+    parser.add_argument('--batch-sizes', default='10,100',
+                        help='Comma separated Kinesis batch sizes')
+    parser.add_argument('--alert-ratios', default='0,0.1',
+                        help='Comma separated fraction of readings that should alert')
+    parser.add_argument('--shards', type=int, default=2,
+                        help='Kinesis shard count')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed for reproducible alert placement')
+    parser.add_argument('--output', default='-',
+                        help="Report path, or '-' for stdout")
+    parser.add_argument('--baseline',
+                        help='Previous report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help='Allowed fractional regression before exiting non-zero')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Show handler log output')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Record per-case peak allocated memory (slows every case)')
+    return parser.parse_args(argv)
+
+
+def seed_patients(count):
+    """Seed active patients with a mix of conditions and rooms"""
+    table = boto3.resource('dynamodb').Table(os.environ['PATIENT_RECORDS_TABLE'])
+    conditions = ['Stable', 'Warning', 'Critical']
+    now = datetime.now().isoformat()
+
+    with table.batch_writer() as batch:
+        for index in range(count):
+            room_prefix = 'ICU' if index % 3 == 0 else 'WARD'
+            batch.put_item(Item=local_aws.with_roster_shard({
+                'PatientId': f'PATIENT-{index + 1:05d}',
+                'Name': f'Benchmark Patient {index + 1}',
+                'Age': Decimal(str(25 + index % 60)),
+                'Gender': 'Female' if index % 2 else 'Male',
+                'RoomNumber': f'{room_prefix}-{100 + index}',
+                'Status': 'Active',
+                'Condition': conditions[index % len(conditions)],
+                'AdmissionDate': now,
+                'UpdatedAt': now
+            }))
+
+
+def run_simulator(simulator, counter, target_records):
+    """Invoke the simulator until at least target_records readings reach Kinesis"""
+    counter.reset()
+    latencies = []
+    sent = 0
+    started = time.perf_counter()
+
+    while sent < target_records:
+        invoke_started = time.perf_counter()
+        response = simulator.lambda_handler({}, None)
+        latencies.append((time.perf_counter() - invoke_started) * 1000)
+
+        body = json.loads(response['body'])
+        if response['statusCode'] != 200 or not body.get('records_sent'):
+            raise RuntimeError(f"Simulator failed: {body}")
+        sent += body['records_sent']
+
+    elapsed = time.perf_counter() - started
+    return sent, {
+        'invocations': len(latencies),
+        'records': sent,
+        'recordsPerSec': round(sent / elapsed, 1) if elapsed else 0.0,
+        'invocationLatencyMs': local_aws.latency_summary(latencies),
+        'callsPerRecord': round(counter.total() / sent, 3) if sent else 0.0,
+        'callsByOperation': dict(counter.counts)
+    }
+
+
+def read_stream_payloads():
+    """Read every record currently in the Kinesis stream as decoded payloads"""
+    kinesis = boto3.client('kinesis')
+    payloads = []
+
+    shards = kinesis.list_shards(StreamName=local_aws.KINESIS_STREAM_NAME)['Shards']
+    for shard in shards:
+        iterator = kinesis.get_shard_iterator(
+            StreamName=local_aws.KINESIS_STREAM_NAME,
+            ShardId=shard['ShardId'],
+            ShardIteratorType='TRIM_HORIZON'
+        )['ShardIterator']
+
+        while iterator:
+            response = kinesis.get_records(ShardIterator=iterator, Limit=1000)
+            for record in response['Records']:
+                payloads.append(json.loads(record['Data']))
+            if not response['Records']:
+                break
+            iterator = response.get('NextShardIterator')
+
+    return payloads
+
+
+def build_case_records(payloads, record_count, alert_ratio, rng):
+    """
+    Re-stamp simulator payloads for one case and force the requested alert mix.
+    Every case gets fresh timestamps so readings are never duplicates of an
+    earlier case. Waveform segments are left out; only spot readings are
+    re-stamped. Returns (records, alerts expected).
+    """
+    payloads = [payload for payload in payloads if payload.get('recordType') != 'waveform']
+    base_time = datetime.utcnow()
+    arrival = time.time()
+    records = []
+    expected_alerts = 0
+
+    for index in range(record_count):
+        payload = dict(payloads[index % len(payloads)])
+        critical = rng.random() < alert_ratio
+        expected_alerts += critical
+        payload.update(CRITICAL_VITALS if critical else NORMAL_VITALS)
+        # A millisecond apart, like readings from real devices
+        payload['timestamp'] = (base_time + timedelta(milliseconds=index)).isoformat() + 'Z'
+
+        data = json.dumps(payload).encode('utf-8')
+        records.append({
+            'eventSource': 'aws:kinesis',
+            'eventName': 'aws:kinesis:record',
+            'kinesis': {
+                'partitionKey': payload['patientId'],
+                'sequenceNumber': f'{index:056d}',
+                'data': base64.b64encode(data).decode('ascii'),
+                'approximateArrivalTimestamp': arrival
+            }
+        })
+
+    return records, expected_alerts
+
+
+def run_processor_case(processor, counter, records, batch_size):
+    """Feed records to the processor in Kinesis-sized batches and time each batch"""
+    counter.reset()
+    latencies = []
+    processed = 0
+    alerts = 0
+    started = time.perf_counter()
+
+    for offset in range(0, len(records), batch_size):
+        event = {'Records': records[offset:offset + batch_size]}
+
+        batch_started = time.perf_counter()
+        response = processor.lambda_handler(event, None)
+        latencies.append((time.perf_counter() - batch_started) * 1000)
+
+        body = json.loads(response['body'])
+        processed += body.get('records_processed', 0)
+        alerts += body.get('alerts_generated', 0)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'batch_size': batch_size,
+        'records': len(records),
+        'recordsProcessed': processed,
+        'alertsGenerated': alerts,
+        'elapsedSec': round(elapsed, 3),
+        'recordsPerSec': round(processed / elapsed, 1) if elapsed else 0.0,
+        'batchLatencyMs': local_aws.latency_summary(latencies),
+        'callsPerRecord': round(counter.total() / len(records), 3) if records else 0.0,
+        'callsByOperation': dict(counter.counts)
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    batch_sizes = [int(value) for value in args.batch_sizes.split(',') if value]
+    alert_ratios = [float(value) for value in args.alert_ratios.split(',') if value]
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    local_aws.configure_environment()
+    mock = local_aws.start_moto()
+    log_sink = sys.stdout if args.verbose else open(os.devnull, 'w')
+
+    try:
+        local_aws.create_tables()
+        local_aws.create_stream_and_topic(args.shards)
+        seed_patients(args.patients)
+
+        counter = local_aws.ApiCallCounter()
+        with redirect_stdout(log_sink):
+            simulator = local_aws.load_handler('iot-simulator')
+            processor = local_aws.load_handler('vitals-processor')
+
+            _, simulator_stats = run_simulator(simulator, counter, min(args.records, args.patients * 5))
+            payloads = read_stream_payloads()
+
+        if not payloads:
+            sys.exit('No records reached the Kinesis stream')
+
+        results = []
+        alert_mismatches = 0
+        if args.trace_memory:
+            tracemalloc.start()
+        for batch_size in batch_sizes:
+            for alert_ratio in alert_ratios:
+                records, expected_alerts = build_case_records(payloads, args.records, alert_ratio, rng)
+                if args.trace_memory:
+                    tracemalloc.reset_peak()
+                    case_baseline = tracemalloc.get_traced_memory()[0]
+                with redirect_stdout(log_sink):
+                    result = run_processor_case(processor, counter, records, batch_size)
+                result['alert_ratio'] = alert_ratio
+                result['alertsExpected'] = expected_alerts
+                if result['alertsGenerated'] != expected_alerts:
+                    alert_mismatches += 1
+                    print(f"batch={batch_size} alerts={alert_ratio}: {result['alertsGenerated']} alerts "
+                          f"generated, {expected_alerts} expected", file=sys.stderr)
+                if args.trace_memory:
+                    # Peak above what was already allocated when the case started
+                    peak = tracemalloc.get_traced_memory()[1] - case_baseline
+                    result['peakAllocMb'] = round(peak / (1024 * 1024), 1)
+                results.append(result)
+
+                print(f"batch={batch_size:>4} alerts={alert_ratio:<4} "
+                      f"{result['recordsPerSec']:>9.1f} rec/s  "
+                      f"p50={result['batchLatencyMs']['p50']:.1f}ms "
+                      f"p99={result['batchLatencyMs']['p99']:.1f}ms  "
+                      f"calls/rec={result['callsPerRecord']}", file=sys.stderr)
+    finally:
+        tracemalloc.stop()
+        mock.stop()
+        if log_sink is not sys.stdout:
+            log_sink.close()
+
+    report = local_aws.report_header('ingest', vars(args))
+    report['simulator'] = simulator_stats
+    report['peakRssMb'] = local_aws.peak_rss_mb()
+    report['results'] = results
+    local_aws.write_report(report, args.output)
+
+    if alert_mismatches:
+        print(f"{alert_mismatches} cases generated an unexpected number of alerts", file=sys.stderr)
+        return 1
+
+    if args.baseline:
+        regressions = local_aws.compare_to_baseline(
+            results, args.baseline,
+            key_fields=['batch_size', 'alert_ratio'],
+            metrics={
+                'recordsPerSec': 'higher',
+                'batchLatencyMs.p99': 'lower',
+                'callsPerRecord': 'lower'
+            },
+            max_regression=args.max_regression
+        )
+        if regressions:
+            print(f"{len(regressions)} regressions against baseline", file=sys.stderr)
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
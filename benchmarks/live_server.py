@@ -0,0 +1,499 @@
+# benchmarks/live_server.py
+"""
+Local stand-in for the live updates push channel:
+
+    vitals-processor -> DynamoDB streams -> live-updates -> WebSocket
+
+The real live-updates handler runs in-process behind a small WebSocket server
+that plays both API Gateway roles. It turns socket events into $connect /
+subscribe / $disconnect route events, and it serves the management API
+(POST /@connections/{id}) that the handler pushes through. A pump thread polls
+the VitalSigns, PatientRecords and AlertHistory streams and invokes the
+handler with Lambda-shaped batches, as the event source mappings do.
+
+Usage, in-process moto with a synthetic ward fed through vitals-processor:
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/live_server.py --demo-patients 20 --interval 1
+
+Then connect a WebSocket client to ws://localhost:8765/?all=true, or set
+WEBSOCKET_URL in frontend/src/js/config.js to it. With --self-test the script
+connects its own client, reports ingest-to-push latency and exits.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import local_aws  # noqa: E402
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OPCODE_TEXT, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG = 0x1, 0x8, 0x9, 0xA
+
+# Tables whose streams feed live-updates (see infrastructure/lambda.yaml)
+STREAM_TABLES = ('VITAL_SIGNS_TABLE', 'VITAL_SIGNS_COMPACT_TABLE', 'PATIENT_RECORDS_TABLE',
+                 'ALERT_HISTORY_TABLE')
+ROUTES = ('subscribe',)
+
+# Set on shutdown so background threads stop before the moto mock goes away
+server_stopping = threading.Event()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the live updates push channel locally')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--endpoint-url',
+                        help='DynamoDB Local endpoint; omit to run against in-process moto')
+    parser.add_argument('--poll-interval', type=float, default=0.1,
+                        help='Seconds between stream polls (Lambda polls about 4 times a second)')
+    parser.add_argument('--demo-patients', type=int, default=0,
+                        help='Seed this many patients and feed them readings through vitals-processor')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='Seconds between demo reading rounds')
+    parser.add_argument('--self-test', type=float, metavar='SECONDS',
+                        help='Connect a client, measure ingest-to-push latency for SECONDS and exit')
+    parser.add_argument('--verbose', action='store_true', help='Show handler logs')
+    return parser.parse_args(argv)
+
+
+# WebSocket framing (RFC 6455), enough for JSON text messages
+
+def read_frame(stream):
+    """(opcode, payload) of the next frame, or (None, None) when the socket closes"""
+    header = stream.read(2)
+    if len(header) < 2:
+        return None, None
+
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', stream.read(2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', stream.read(8))[0]
+
+    mask = stream.read(4) if header[1] & 0x80 else None
+    payload = stream.read(length)
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return opcode, payload
+
+
+def encode_frame(payload, opcode=OPCODE_TEXT, mask=False):
+    """Single unfragmented frame; clients must mask, servers must not"""
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 65536:
+        header.append(mask_bit | 126)
+        header += struct.pack('>H', length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('>Q', length)
+
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = bytes(byte ^ key[index % 4] for index, byte in enumerate(payload))
+    return bytes(header) + payload
+
+
+def accept_key(client_key):
+    digest = hashlib.sha1((client_key + WEBSOCKET_GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+class SocketReader:
+    """Unbuffered exact reads, so select() on the socket stays accurate"""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def read(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+
+class LiveConnection:
+    """An open dashboard socket; writes come from the management API threads"""
+
+    def __init__(self, connection_id, stream):
+        self.connection_id = connection_id
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def send(self, payload, opcode=OPCODE_TEXT):
+        with self.lock:
+            self.stream.write(encode_frame(payload, opcode))
+            self.stream.flush()
+
+
+class LiveServer(ThreadingHTTPServer):
+    """WebSocket endpoint plus management API in front of the live-updates handler"""
+
+    daemon_threads = True
+
+    def __init__(self, port, handler_module, log_sink, verbose=False):
+        super().__init__(('127.0.0.1', port), LiveRequestHandler)
+        self.handler_module = handler_module
+        self.log_sink = log_sink
+        self.verbose = verbose
+        self.connections = {}
+        self.connections_lock = threading.Lock()
+        # One handler instance, as in a single warm Lambda container
+        self.invoke_lock = threading.Lock()
+        self.pushed_messages = 0
+
+    def invoke(self, event):
+        with self.invoke_lock:
+            return self.handler_module.lambda_handler(event, None)
+
+    def route_event(self, route_key, connection_id, body=None, query=None):
+        host, port = self.server_address[:2]
+        return {
+            'requestContext': {
+                'routeKey': route_key,
+                'connectionId': connection_id,
+                'domainName': f'{host}:{port}',
+                'stage': 'local'
+            },
+            'queryStringParameters': query or None,
+            'body': body
+        }
+
+
+class LiveRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.headers.get('Upgrade', '').lower() != 'websocket':
+            self.send_plain(404, b'WebSocket endpoint only\n')
+            return
+
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept_key(self.headers['Sec-WebSocket-Key']))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        self.serve_socket()
+
+    def serve_socket(self):
+        server = self.server
+        # Same shape as API Gateway connection IDs
+        connection_id = base64.b64encode(uuid.uuid4().bytes[:10]).decode('ascii')
+        query = {name: values[0] for name, values in parse_qs(urlsplit(self.path).query).items()}
+
+        response = server.invoke(server.route_event('$connect', connection_id, query=query))
+        if response.get('statusCode') != 200:
+            return
+
+        connection = LiveConnection(connection_id, self.wfile)
+        with server.connections_lock:
+            server.connections[connection_id] = connection
+        print(f"connected {connection_id}", file=sys.stderr)
+
+        try:
+            while True:
+                opcode, payload = read_frame(self.rfile)
+                if opcode is None or opcode == OPCODE_CLOSE:
+                    break
+                if opcode == OPCODE_PING:
+                    connection.send(payload, OPCODE_PONG)
+                    continue
+                if opcode != OPCODE_TEXT:
+                    continue
+
+                body = payload.decode('utf-8')
+                try:
+                    action = json.loads(body).get('action')
+                except (ValueError, AttributeError):
+                    action = None
+                route_key = action if action in ROUTES else '$default'
+                server.invoke(server.route_event(route_key, connection_id, body=body))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with server.connections_lock:
+                server.connections.pop(connection_id, None)
+            server.invoke(server.route_event('$disconnect', connection_id))
+            print(f"disconnected {connection_id}", file=sys.stderr)
+
+    def do_POST(self):
+        # apigatewaymanagementapi PostToConnection
+        connection = self.management_target()
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if connection is None:
+            return
+        try:
+            connection.send(body)
+        except (ConnectionError, OSError):
+            self.send_gone()
+            return
+        self.server.pushed_messages += 1
+        self.send_plain(200, b'')
+
+    def do_DELETE(self):
+        # apigatewaymanagementapi DeleteConnection
+        connection = self.management_target()
+        if connection is None:
+            return
+        try:
+            connection.send(b'', OPCODE_CLOSE)
+        except (ConnectionError, OSError):
+            pass
+        self.send_plain(204, b'')
+
+    def management_target(self):
+        if not self.path.startswith('/@connections/'):
+            self.send_plain(404, b'')
+            return None
+        connection_id = unquote(self.path[len('/@connections/'):])
+        with self.server.connections_lock:
+            connection = self.server.connections.get(connection_id)
+        if connection is None:
+            self.send_gone()
+        return connection
+
+    def send_gone(self):
+        body = b'{"message":"Connection is gone"}'
+        self.send_response(410)
+        self.send_header('x-amzn-ErrorType', 'GoneException')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_plain(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StreamPump(threading.Thread):
+    """Polls the table streams and invokes live-updates like an event source mapping"""
+
+    daemon = True
+
+    def __init__(self, server, interval):
+        super().__init__(name='stream-pump')
+        self.server = server
+        self.interval = interval
+        self.streams = boto3.client('dynamodbstreams')
+        self.iterators = {}
+        dynamodb = boto3.client('dynamodb')
+        for env_name in STREAM_TABLES:
+            stream_arn = dynamodb.describe_table(TableName=os.environ[env_name])['Table']['LatestStreamArn']
+            shards = self.streams.describe_stream(StreamArn=stream_arn)['StreamDescription']['Shards']
+            for shard in shards:
+                self.iterators[(stream_arn, shard['ShardId'])] = self.streams.get_shard_iterator(
+                    StreamArn=stream_arn, ShardId=shard['ShardId'],
+                    ShardIteratorType='LATEST')['ShardIterator']
+
+    def run(self):
+        while not server_stopping.is_set():
+            for key, iterator in list(self.iterators.items()):
+                if iterator is None:
+                    continue
+                response = self.streams.get_records(ShardIterator=iterator, Limit=100)
+                self.iterators[key] = response.get('NextShardIterator')
+                if response['Records']:
+                    self.server.invoke({'Records': [lambda_record(record, key[0])
+                                                    for record in response['Records']]})
+            time.sleep(self.interval)
+
+
+def lambda_record(record, stream_arn):
+    """GetRecords output -> the record shape Lambda delivers"""
+    record = dict(record, eventSourceARN=stream_arn)
+    stream_record = dict(record['dynamodb'])
+    created = stream_record.get('ApproximateCreationDateTime')
+    if isinstance(created, datetime):
+        stream_record['ApproximateCreationDateTime'] = created.timestamp()
+    record['dynamodb'] = stream_record
+    return record
+
+
+class DemoFeed(threading.Thread):
+    """Seeds a ward and feeds it readings through the real vitals-processor"""
+
+    daemon = True
+
+    def __init__(self, server, patient_count, interval, rng):
+        super().__init__(name='demo-feed')
+        self.server = server
+        self.interval = interval
+        self.rng = rng
+        self.patients = [f'LIVE-{index:04d}' for index in range(patient_count)]
+        # (patientId, timestamp) -> wall clock time the reading was ingested
+        self.ingested_at = {}
+        self.processor = local_aws.load_handler('vitals-processor')
+
+        table = boto3.resource('dynamodb').Table(os.environ['PATIENT_RECORDS_TABLE'])
+        with table.batch_writer() as batch:
+            for index, patient_id in enumerate(self.patients):
+                batch.put_item(Item=local_aws.with_roster_shard({
+                    'PatientId': patient_id,
+                    'Name': f'Demo Patient {index}',
+                    'RoomNumber': f"{'ICU' if index % 4 == 0 else 'WARD'}-{100 + index}",
+                    'Status': 'Active',
+                    'Condition': 'Stable',
+                    'UpdatedAt': datetime.now().isoformat()
+                }))
+
+    def reading(self, patient_id, timestamp):
+        critical = self.rng.random() < 0.05
+        return {
+            'patientId': patient_id,
+            'deviceId': f'DEV-{patient_id}',
+            'timestamp': timestamp,
+            'heartRate': self.rng.randint(125, 140) if critical else self.rng.randint(65, 90),
+            'systolicBP': self.rng.randint(110, 130),
+            'diastolicBP': self.rng.randint(70, 85),
+            'temperature': round(self.rng.uniform(97.8, 99.0), 1),
+            'oxygenSaturation': self.rng.randint(95, 99),
+            'roomNumber': 'WARD-100'
+        }
+
+    def run(self):
+        while not server_stopping.is_set():
+            timestamp = datetime.utcnow().isoformat(timespec='milliseconds') + 'Z'
+            records = [self.reading(patient_id, timestamp) for patient_id in self.patients]
+            now = time.time()
+            for record in records:
+                self.ingested_at[(record['patientId'], timestamp)] = now
+            self.processor.lambda_handler({'Records': records}, None)
+            time.sleep(self.interval)
+
+
+def run_self_test(port, duration, feed, report_stream):
+    """Subscribe to everything and report ingest-to-push latency of vitals updates"""
+    sock = socket.create_connection(('127.0.0.1', port))
+    key = base64.b64encode(os.urandom(16)).decode('ascii')
+    sock.sendall((f'GET /?all=true HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nUpgrade: websocket\r\n'
+                  f'Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n')
+                 .encode('ascii'))
+    handshake = b''
+    while not handshake.endswith(b'\r\n\r\n'):
+        chunk = sock.recv(1)
+        if not chunk:
+            return 1
+        handshake += chunk
+    stream = SocketReader(sock)
+    sock.sendall(encode_frame(b'{"action":"subscribe","all":true}', mask=True))
+
+    latencies = []
+    counts = {'vitals': 0, 'patient': 0, 'alert': 0, 'messages': 0, 'coalesced': 0}
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        if not select.select([sock], [], [], 0.5)[0]:
+            continue
+        opcode, payload = read_frame(stream)
+        if opcode is None:
+            break
+        received = time.time()
+        counts['messages'] += 1
+        for update in json.loads(payload)['updates']:
+            counts[update['k']] += 1
+            if update['k'] == 'vitals':
+                counts['coalesced'] += update.get('n', 1) - 1
+                ingested = feed.ingested_at.get((update['p'], update['t'])) if feed else None
+                if ingested:
+                    latencies.append((received - ingested) * 1000)
+    sock.close()
+
+    latencies.sort()
+    report = dict(counts)
+    if latencies:
+        report['ingestToPushMs'] = {
+            'p50': round(latencies[len(latencies) // 2], 1),
+            'p99': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1),
+            'max': round(latencies[-1], 1)
+        }
+    print(json.dumps(report, indent=2), file=report_stream)
+    return 0 if counts['messages'] else 1
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    local_aws.configure_environment()
+    os.environ['WEBSOCKET_MANAGEMENT_ENDPOINT'] = f'http://127.0.0.1:{args.port}'
+    os.environ.setdefault('SUBSCRIPTION_REFRESH_SECONDS', '1')
+    os.environ.setdefault('WARNING_DIGEST_WINDOW_SECONDS', '0')
+
+    mock = None
+    workers = []
+    if args.endpoint_url:
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB_STREAMS'] = args.endpoint_url
+    else:
+        mock = local_aws.start_moto()
+
+    # Handlers print every event; keep them off the terminal unless asked
+    report_stream = sys.stdout
+    log_sink = sys.stdout if args.verbose else open(os.devnull, 'w')
+    sys.stdout = log_sink
+    try:
+        local_aws.create_tables(endpoint_url=args.endpoint_url)
+        if mock:
+            local_aws.create_stream_and_topic(1)
+        else:
+            os.environ.setdefault('SNS_TOPIC_ARN', f'arn:aws:sns:{local_aws.REGION}:000000000000:{local_aws.SNS_TOPIC_NAME}')
+
+        handler_module = local_aws.load_handler('live-updates')
+        server = LiveServer(args.port, handler_module, log_sink, args.verbose)
+        threading.Thread(target=server.serve_forever, name='live-server', daemon=True).start()
+        workers = [StreamPump(server, args.poll_interval)]
+
+        feed = None
+        if args.demo_patients:
+            feed = DemoFeed(server, args.demo_patients, args.interval, random.Random(7))
+            workers.append(feed)
+        for worker in workers:
+            worker.start()
+
+        print(f"Live updates stand-in listening on ws://127.0.0.1:{args.port}/?all=true", file=sys.stderr)
+        if args.self_test:
+            return run_self_test(args.port, args.self_test, feed, report_stream)
+
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        server_stopping.set()
+        for worker in workers:
+            worker.join(timeout=10)
+        if mock:
+            mock.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,503 @@
+# benchmarks/local_aws.py
+"""
+Shared helpers for the offline benchmarks: local AWS stand-ins (moto),
+table definitions mirroring infrastructure/dynamodb.yaml, handler loading,
+API call counting and report output.
+"""
+import importlib.util
+import json
+import os
+import platform
+import resource
+import sys
+from datetime import datetime
+
+import boto3
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_ROOT = os.path.join(REPO_ROOT, 'lambda')
+# package-lambda.sh copies these modules into every function package
+SHARED_ROOT = os.path.join(LAMBDA_ROOT, 'shared')
+
+REGION = 'us-east-1'
+STACK_PREFIX = 'bench-dynamodb'
+KINESIS_STREAM_NAME = 'VitalSignsMonitoring-vital-signs-stream'
+SNS_TOPIC_NAME = 'VitalSignsMonitoring-critical-alerts'
+
+TABLE_ENV = {
+    'PATIENT_RECORDS_TABLE': f'{STACK_PREFIX}-patient-records',
+    'VITAL_SIGNS_TABLE': f'{STACK_PREFIX}-vital-signs',
+    'VITAL_SIGNS_COMPACT_TABLE': f'{STACK_PREFIX}-vital-signs-v2',
+    'ALERT_CONFIG_TABLE': f'{STACK_PREFIX}-alert-config',
+    'ALERT_HISTORY_TABLE': f'{STACK_PREFIX}-alert-history',
+    'VITAL_BLOCKS_TABLE': f'{STACK_PREFIX}-vital-signs-blocks',
+    'PATIENT_STATE_TABLE': f'{STACK_PREFIX}-patient-state',
+    'WAVEFORM_TABLE': f'{STACK_PREFIX}-waveform-segments',
+    'DEVICE_REGISTRY_TABLE': f'{STACK_PREFIX}-device-registry',
+    'LIVE_CONNECTIONS_TABLE': f'{STACK_PREFIX}-live-connections',
+    'EXPORT_JOBS_TABLE': f'{STACK_PREFIX}-export-jobs'
+}
+
+# Keep in sync with infrastructure/dynamodb.yaml
+TABLE_DEFINITIONS = {
+    'PATIENT_RECORDS_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'PatientId', 'AttributeType': 'S'},
+            {'AttributeName': 'RoomNumber', 'AttributeType': 'S'},
+            {'AttributeName': 'RosterShard', 'AttributeType': 'S'},
+            {'AttributeName': 'UpdatedAt', 'AttributeType': 'S'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'PatientId', 'KeyType': 'HASH'}
+        ],
+        'GlobalSecondaryIndexes': [
+            {
+                'IndexName': 'RoomIndex',
+                'KeySchema': [{'AttributeName': 'RoomNumber', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            {
+                'IndexName': 'RosterIndex',
+                'KeySchema': [
+                    {'AttributeName': 'RosterShard', 'KeyType': 'HASH'},
+                    {'AttributeName': 'UpdatedAt', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {
+                    'ProjectionType': 'INCLUDE',
+                    'NonKeyAttributes': ['Status', 'Age', 'Condition', 'RoomNumber']
+                }
+            }
+        ],
+        'StreamSpecification': {'StreamEnabled': True, 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+    },
+    'VITAL_SIGNS_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'PatientId', 'AttributeType': 'S'},
+            {'AttributeName': 'Timestamp', 'AttributeType': 'S'},
+            {'AttributeName': 'DeviceId', 'AttributeType': 'S'},
+            {'AttributeName': 'ChangedAt', 'AttributeType': 'N'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'PatientId', 'KeyType': 'HASH'},
+            {'AttributeName': 'Timestamp', 'KeyType': 'RANGE'}
+        ],
+        'GlobalSecondaryIndexes': [
+            {
+                'IndexName': 'DeviceIndex',
+                'KeySchema': [
+                    {'AttributeName': 'DeviceId', 'KeyType': 'HASH'},
+                    {'AttributeName': 'Timestamp', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            {
+                'IndexName': 'TimestampIndex',
+                'KeySchema': [{'AttributeName': 'Timestamp', 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            {
+                'IndexName': 'PatientChangeIndex',
+                'KeySchema': [
+                    {'AttributeName': 'PatientId', 'KeyType': 'HASH'},
+                    {'AttributeName': 'ChangedAt', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        'StreamSpecification': {'StreamEnabled': True, 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+    },
+    'VITAL_SIGNS_COMPACT_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'P', 'AttributeType': 'S'},
+            {'AttributeName': 'T', 'AttributeType': 'N'},
+            {'AttributeName': 'C', 'AttributeType': 'N'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'P', 'KeyType': 'HASH'},
+            {'AttributeName': 'T', 'KeyType': 'RANGE'}
+        ],
+        'GlobalSecondaryIndexes': [
+            {
+                'IndexName': 'PatientChangeIndex',
+                'KeySchema': [
+                    {'AttributeName': 'P', 'KeyType': 'HASH'},
+                    {'AttributeName': 'C', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        'StreamSpecification': {'StreamEnabled': True, 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+    },
+    'VITAL_BLOCKS_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'PatientId', 'AttributeType': 'S'},
+            {'AttributeName': 'HourStart', 'AttributeType': 'S'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'PatientId', 'KeyType': 'HASH'},
+            {'AttributeName': 'HourStart', 'KeyType': 'RANGE'}
+        ]
+    },
+    'WAVEFORM_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'StreamId', 'AttributeType': 'S'},
+            {'AttributeName': 'StartMs', 'AttributeType': 'N'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'StreamId', 'KeyType': 'HASH'},
+            {'AttributeName': 'StartMs', 'KeyType': 'RANGE'}
+        ]
+    },
+    'DEVICE_REGISTRY_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'DeviceId', 'AttributeType': 'S'},
+            {'AttributeName': 'Fleet', 'AttributeType': 'S'},
+            {'AttributeName': 'LastSeenMs', 'AttributeType': 'N'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'DeviceId', 'KeyType': 'HASH'}
+        ],
+        'GlobalSecondaryIndexes': [
+            {
+                'IndexName': 'FleetIndex',
+                'KeySchema': [
+                    {'AttributeName': 'Fleet', 'KeyType': 'HASH'},
+                    {'AttributeName': 'LastSeenMs', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ]
+    },
+    'PATIENT_STATE_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'PatientId', 'AttributeType': 'S'},
+            {'AttributeName': 'StateKey', 'AttributeType': 'S'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'PatientId', 'KeyType': 'HASH'},
+            {'AttributeName': 'StateKey', 'KeyType': 'RANGE'}
+        ]
+    },
+    'ALERT_CONFIG_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'PatientId', 'AttributeType': 'S'},
+            {'AttributeName': 'VitalType', 'AttributeType': 'S'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'PatientId', 'KeyType': 'HASH'},
+            {'AttributeName': 'VitalType', 'KeyType': 'RANGE'}
+        ],
+        'StreamSpecification': {'StreamEnabled': True, 'StreamViewType': 'NEW_IMAGE'}
+    },
+    'ALERT_HISTORY_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'AlertId', 'AttributeType': 'S'},
+            {'AttributeName': 'Timestamp', 'AttributeType': 'S'},
+            {'AttributeName': 'PatientId', 'AttributeType': 'S'},
+            {'AttributeName': 'ChangeBucket', 'AttributeType': 'S'},
+            {'AttributeName': 'ChangedAt', 'AttributeType': 'N'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'AlertId', 'KeyType': 'HASH'},
+            {'AttributeName': 'Timestamp', 'KeyType': 'RANGE'}
+        ],
+        'GlobalSecondaryIndexes': [
+            {
+                'IndexName': 'PatientAlertIndex',
+                'KeySchema': [
+                    {'AttributeName': 'PatientId', 'KeyType': 'HASH'},
+                    {'AttributeName': 'Timestamp', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            {
+                'IndexName': 'ChangeIndex',
+                'KeySchema': [
+                    {'AttributeName': 'ChangeBucket', 'KeyType': 'HASH'},
+                    {'AttributeName': 'ChangedAt', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        'StreamSpecification': {'StreamEnabled': True, 'StreamViewType': 'NEW_IMAGE'}
+    },
+    'LIVE_CONNECTIONS_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'ConnectionId', 'AttributeType': 'S'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'ConnectionId', 'KeyType': 'HASH'}
+        ]
+    },
+    'EXPORT_JOBS_TABLE': {
+        'AttributeDefinitions': [
+            {'AttributeName': 'JobId', 'AttributeType': 'S'}
+        ],
+        'KeySchema': [
+            {'AttributeName': 'JobId', 'KeyType': 'HASH'}
+        ]
+    }
+}
+
+
+def configure_environment():
+    """Set region, dummy credentials and table names for the handlers"""
+    os.environ.setdefault('AWS_DEFAULT_REGION', REGION)
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ.setdefault('AWS_SESSION_TOKEN', 'testing')
+    for env_name, table_name in TABLE_ENV.items():
+        os.environ[env_name] = table_name
+    boto3.setup_default_session(region_name=os.environ['AWS_DEFAULT_REGION'])
+
+
+def start_moto():
+    """Start moto's in-process AWS mock and return the active mock object"""
+    try:
+        from moto import mock_aws
+    except ImportError:
+        sys.exit("moto>=5 is required: pip install -r benchmarks/requirements.txt")
+
+    mock = mock_aws()
+    mock.start()
+    return mock
+
+
+def create_tables(table_keys=None, endpoint_url=None):
+    """Create the DynamoDB tables (all by default) and wait until they exist"""
+    client = boto3.client('dynamodb', endpoint_url=endpoint_url)
+    existing = set(client.list_tables().get('TableNames', []))
+
+    for key in table_keys or TABLE_DEFINITIONS:
+        table_name = TABLE_ENV[key]
+        if table_name in existing:
+            continue
+        client.create_table(
+            TableName=table_name,
+            BillingMode='PAY_PER_REQUEST',
+            **TABLE_DEFINITIONS[key]
+        )
+        client.get_waiter('table_exists').wait(TableName=table_name)
+
+
+def with_roster_shard(patient):
+    """A patient item with the RosterShard the functions write while it is Active"""
+    if SHARED_ROOT not in sys.path:
+        sys.path.insert(0, SHARED_ROOT)
+    import patient_roster
+    return patient_roster.set_roster_shard(patient)
+
+
+def create_stream_and_topic(shard_count=2):
+    """Create the Kinesis stream and SNS topic used by the ingest path"""
+    kinesis = boto3.client('kinesis')
+    kinesis.create_stream(StreamName=KINESIS_STREAM_NAME, ShardCount=shard_count)
+    kinesis.get_waiter('stream_exists').wait(StreamName=KINESIS_STREAM_NAME)
+
+    topic_arn = boto3.client('sns').create_topic(Name=SNS_TOPIC_NAME)['TopicArn']
+    os.environ['SNS_TOPIC_ARN'] = topic_arn
+    return topic_arn
+
+
+def load_handler(function_dir):
+    """Import lambda/<function_dir>/lambda_function.py under a unique module name"""
+    source_dir = os.path.join(LAMBDA_ROOT, function_dir)
+    module_name = 'bench_' + function_dir.replace('-', '_')
+
+    for path in (SHARED_ROOT, source_dir):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(source_dir, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class ApiCallCounter:
+    """Counts botocore API calls per service operation via the before-call hook"""
+
+    def __init__(self, session=None):
+        self.counts = {}
+        session = session or boto3.DEFAULT_SESSION
+        # Clients copy the session emitter when created, so register before
+        # any handler module is imported
+        session.events.register('before-call', self._on_call)
+
+    def _on_call(self, event_name=None, **kwargs):
+        # event_name looks like 'before-call.dynamodb.PutItem'
+        operation = event_name.split('.', 1)[1] if event_name else 'unknown'
+        self.counts[operation] = self.counts.get(operation, 0) + 1
+
+    def reset(self):
+        self.counts = {}
+
+    def total(self):
+        return sum(self.counts.values())
+
+
+class DynamoDBCapacityRecorder:
+    """
+    Requests ReturnConsumedCapacity=TOTAL on every DynamoDB call that supports
+    it and accumulates consumed capacity plus scanned/returned item counts.
+    """
+
+    READ_OPERATIONS = {'GetItem', 'BatchGetItem', 'Query', 'Scan', 'TransactGetItems'}
+
+    def __init__(self, session=None):
+        session = session or boto3.DEFAULT_SESSION
+        session.events.register('before-parameter-build.dynamodb', self._request_capacity)
+        session.events.register('after-call.dynamodb', self._record_capacity)
+        self.reset()
+
+    def reset(self):
+        self.read_units = 0.0
+        self.write_units = 0.0
+        self.items_scanned = 0
+        self.items_returned = 0
+        self.scans = 0
+
+    def _request_capacity(self, params, model, **kwargs):
+        if 'ReturnConsumedCapacity' in model.input_shape.members:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    def _record_capacity(self, parsed=None, model=None, **kwargs):
+        if not parsed or model is None:
+            return
+
+        consumed = parsed.get('ConsumedCapacity') or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        units = sum(float(entry.get('CapacityUnits', 0)) for entry in consumed)
+
+        if model.name in self.READ_OPERATIONS:
+            self.read_units += units
+        else:
+            self.write_units += units
+
+        if model.name == 'Scan':
+            self.scans += 1
+        if 'ScannedCount' in parsed:
+            self.items_scanned += parsed['ScannedCount']
+            self.items_returned += parsed.get('Count', 0)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies_ms):
+    """Summarise a list of latencies in milliseconds"""
+    return {
+        'p50': round(percentile(latencies_ms, 50), 3),
+        'p99': round(percentile(latencies_ms, 99), 3),
+        'max': round(max(latencies_ms), 3) if latencies_ms else 0.0,
+        'count': len(latencies_ms)
+    }
+
+
+def peak_rss_mb():
+    """Process high-water resident set size in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def report_header(benchmark, config):
+    """Common metadata for every benchmark report"""
+    return {
+        'benchmark': benchmark,
+        'generatedAt': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'gitRevision': git_revision(),
+        'config': config
+    }
+
+
+def git_revision():
+    """Current git commit of the repository, if available"""
+    head_path = os.path.join(REPO_ROOT, '.git', 'HEAD')
+    try:
+        with open(head_path) as head:
+            ref = head.read().strip()
+        if not ref.startswith('ref: '):
+            return ref
+        ref_path = os.path.join(REPO_ROOT, '.git', ref[5:])
+        if os.path.exists(ref_path):
+            with open(ref_path) as ref_file:
+                return ref_file.read().strip()
+        return ref[5:]
+    except OSError:
+        return 'unknown'
+
+
+def write_report(report, output_path):
+    """Write a report as JSON to a file, or stdout when output_path is '-'"""
+    payload = json.dumps(report, indent=2, sort_keys=True, default=str)
+    if output_path == '-':
+        print(payload)
+    else:
+        with open(output_path, 'w') as output:
+            output.write(payload + '\n')
+        print(f"Report written to {output_path}")
+
+
+def compare_to_baseline(results, baseline_path, key_fields, metrics, max_regression):
+    """
+    Compare result rows to a baseline report row by row.
+    metrics maps a metric path (dot separated) to 'higher' or 'lower' is better.
+    Returns the list of regressions beyond max_regression (a fraction).
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    baseline_rows = {
+        tuple(row.get(field) for field in key_fields): row
+        for row in baseline.get('results', [])
+    }
+
+    regressions = []
+    for row in results:
+        key = tuple(row.get(field) for field in key_fields)
+        base_row = baseline_rows.get(key)
+        if not base_row:
+            continue
+
+        for metric, better in metrics.items():
+            current = _lookup(row, metric)
+            previous = _lookup(base_row, metric)
+            if not current or not previous:
+                continue
+
+            change = (current - previous) / previous
+            regressed = change < -max_regression if better == 'higher' else change > max_regression
+            print(f"{dict(zip(key_fields, key))} {metric}: {previous} -> {current} ({change:+.1%})")
+            if regressed:
+                regressions.append({
+                    'key': dict(zip(key_fields, key)),
+                    'metric': metric,
+                    'baseline': previous,
+                    'current': current,
+                    'change': round(change, 4)
+                })
+
+    return regressions
+
+
+def _lookup(row, path):
+    value = row
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
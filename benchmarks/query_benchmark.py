@@ -0,0 +1,244 @@
+# benchmarks/query_benchmark.py
+"""
+Query-path benchmark for vitals-api and alert-management at production data
+volumes.
+
+Each endpoint is invoked through its real lambda_handler with API Gateway
+shaped events. The report records latency, consumed read/write capacity,
+items scanned vs returned and API calls per request, and flags endpoints
+that scan or read far more items than they return.
+
+Usage, in-process moto (small volumes, seeded on the fly):
+    python benchmarks/query_benchmark.py --vitals 20000 --alerts 2000
+
+Usage, DynamoDB Local seeded with benchmarks/seed_query_data.py:
+    python benchmarks/query_benchmark.py --endpoint-url http://localhost:8000 \\
+        --patients 1000 --output query.json --baseline query-baseline.json
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import local_aws  # noqa: E402
+import seed_query_data  # noqa: E402
+
+# Scanned/returned ratio above which an endpoint is flagged as a hot spot
+READ_AMPLIFICATION_LIMIT = 10
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the vitals and alert query paths')
+    seed_query_data.add_seed_arguments(parser)
+    parser.set_defaults(patients=50, vitals=20000, alerts=2000)
+    parser.add_argument('--endpoint-url',
+                        help='DynamoDB Local endpoint; omit to run against in-process moto')
+    parser.add_argument('--seed-data', action='store_true',
+                        help='Seed the DynamoDB Local endpoint before running')
+    parser.add_argument('--iterations', type=int, default=30,
+                        help='Timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=3,
+                        help='Untimed requests per endpoint')
+    parser.add_argument('--time-ranges', default='1h,24h,7d',
+                        help='timeRange values for the per-patient range endpoint')
+    parser.add_argument('--output', default='-',
+                        help="Report path, or '-' for stdout")
+    parser.add_argument('--baseline',
+                        help='Previous report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help='Allowed fractional regression before exiting non-zero')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Show handler log output')
+    return parser.parse_args(argv)
+
+
+def api_event(method, path, query_params=None):
+    return {
+        'httpMethod': method,
+        'path': path,
+        'queryStringParameters': query_params,
+        'body': None
+    }
+
+
+def sample_alert_ids(patients, count, rng):
+    """Pick unacknowledged alert IDs through the patient index for acknowledge calls"""
+    table = boto3.resource('dynamodb').Table(os.environ['ALERT_HISTORY_TABLE'])
+    alert_ids = []
+    attempts = 0
+
+    while len(alert_ids) < count and attempts < count * 10:
+        attempts += 1
+        patient_id = seed_query_data.patient_id_for(rng.randrange(patients))
+        response = table.query(
+            IndexName='PatientAlertIndex',
+            KeyConditionExpression=Key('PatientId').eq(patient_id),
+            Limit=20
+        )
+        for item in response.get('Items', []):
+            if item.get('Status') == 'SENT' and item['AlertId'] not in alert_ids:
+                alert_ids.append(item['AlertId'])
+                break
+
+    return alert_ids
+
+
+def build_endpoints(args, vitals_api, alert_management, rng):
+    """Return (name, handler, event factory) for every benchmarked endpoint"""
+
+    def random_patient():
+        return seed_query_data.patient_id_for(rng.randrange(args.patients))
+
+    endpoints = [
+        ('vitals.latest', vitals_api, lambda: api_event(
+            'GET', '/vitalsigns', {'patientId': random_patient(), 'latest': 'true'}))
+    ]
+
+    for time_range in [value for value in args.time_ranges.split(',') if value]:
+        endpoints.append((f'vitals.range.{time_range}', vitals_api, lambda tr=time_range: api_event(
+            'GET', '/vitalsigns', {'patientId': random_patient(), 'timeRange': tr})))
+
+    def random_patient_batch(size=20):
+        return ','.join(random_patient() for _ in range(min(size, args.patients)))
+
+    endpoints.append(('vitals.batchLatest', vitals_api, lambda: api_event(
+        'GET', '/vitalsigns', {'patientIds': random_patient_batch(), 'latest': 'true'})))
+
+    endpoints.extend([
+        ('vitals.allPatients', vitals_api, lambda: api_event(
+            'GET', '/vitalsigns', {'timeRange': '1h'})),
+        ('alerts.byPatient', alert_management, lambda: api_event(
+            'GET', '/alerts', {'patientId': random_patient(), 'hours': '24'})),
+        ('alerts.all', alert_management, lambda: api_event(
+            'GET', '/alerts', {'hours': '24'}))
+    ])
+
+    alert_ids = sample_alert_ids(args.patients, args.iterations + args.warmup, rng)
+    if alert_ids:
+        alert_id_iter = iter(alert_ids)
+        endpoints.append(('alerts.acknowledge', alert_management, lambda: api_event(
+            'PUT', f'/alerts/{next(alert_id_iter, alert_ids[-1])}/acknowledge')))
+
+    return endpoints
+
+
+def run_endpoint(name, handler, make_event, iterations, warmup, counter, capacity):
+    """Invoke one endpoint repeatedly and summarise latency and capacity"""
+    for _ in range(warmup):
+        handler.lambda_handler(make_event(), None)
+
+    counter.reset()
+    capacity.reset()
+    latencies = []
+    status_codes = {}
+    response_bytes = 0
+
+    for _ in range(iterations):
+        event = make_event()
+        started = time.perf_counter()
+        response = handler.lambda_handler(event, None)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        code = str(response.get('statusCode'))
+        status_codes[code] = status_codes.get(code, 0) + 1
+        response_bytes += len(response.get('body') or '')
+
+    hot_spots = []
+    if capacity.scans:
+        hot_spots.append('scan')
+    if capacity.items_scanned > READ_AMPLIFICATION_LIMIT * max(capacity.items_returned, 1):
+        hot_spots.append('readAmplification')
+
+    return {
+        'endpoint': name,
+        'iterations': iterations,
+        'latencyMs': local_aws.latency_summary(latencies),
+        'readUnitsPerRequest': round(capacity.read_units / iterations, 3),
+        'writeUnitsPerRequest': round(capacity.write_units / iterations, 3),
+        'itemsScannedPerRequest': round(capacity.items_scanned / iterations, 1),
+        'itemsReturnedPerRequest': round(capacity.items_returned / iterations, 1),
+        'callsPerRequest': round(counter.total() / iterations, 2),
+        'callsByOperation': dict(counter.counts),
+        'avgResponseBytes': int(response_bytes / iterations),
+        'statusCodes': status_codes,
+        'hotSpots': hot_spots
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    local_aws.configure_environment()
+    os.environ.setdefault('SNS_TOPIC_ARN', f'arn:aws:sns:{local_aws.REGION}:000000000000:{local_aws.SNS_TOPIC_NAME}')
+
+    mock = None
+    if args.endpoint_url:
+        # Handlers build their own clients, so point botocore at DynamoDB Local
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+    else:
+        mock = local_aws.start_moto()
+
+    log_sink = sys.stdout if args.verbose else open(os.devnull, 'w')
+    try:
+        seed_summary = None
+        if mock or args.seed_data:
+            seed_summary = seed_query_data.seed(args.patients, args.vitals, args.alerts, args.days,
+                                                args.workers, args.seed, args.endpoint_url)
+
+        counter = local_aws.ApiCallCounter()
+        capacity = local_aws.DynamoDBCapacityRecorder()
+
+        with redirect_stdout(log_sink):
+            vitals_api = local_aws.load_handler('vitals-api')
+            alert_management = local_aws.load_handler('alert-management')
+            endpoints = build_endpoints(args, vitals_api, alert_management, rng)
+
+        results = []
+        for name, handler, make_event in endpoints:
+            with redirect_stdout(log_sink):
+                result = run_endpoint(name, handler, make_event, args.iterations,
+                                      args.warmup, counter, capacity)
+            results.append(result)
+            print(f"{name:<22} p50={result['latencyMs']['p50']:>8.1f}ms "
+                  f"p99={result['latencyMs']['p99']:>8.1f}ms "
+                  f"RCU/req={result['readUnitsPerRequest']:>8} "
+                  f"scanned/req={result['itemsScannedPerRequest']:>9} "
+                  f"{','.join(result['hotSpots'])}", file=sys.stderr)
+    finally:
+        if mock:
+            mock.stop()
+        if log_sink is not sys.stdout:
+            log_sink.close()
+
+    report = local_aws.report_header('query', vars(args))
+    report['dataset'] = seed_summary
+    report['results'] = results
+    local_aws.write_report(report, args.output)
+
+    if args.baseline:
+        regressions = local_aws.compare_to_baseline(
+            results, args.baseline,
+            key_fields=['endpoint'],
+            metrics={
+                'latencyMs.p99': 'lower',
+                'readUnitsPerRequest': 'lower',
+                'itemsScannedPerRequest': 'lower'
+            },
+            max_regression=args.max_regression
+        )
+        if regressions:
+            print(f"{len(regressions)} regressions against baseline", file=sys.stderr)
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
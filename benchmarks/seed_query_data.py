@@ -0,0 +1,202 @@
+# benchmarks/seed_query_data.py
+"""
+Bulk-load production-sized data into a local DynamoDB stand-in for the
+query-path benchmark.
+
+Items have the same shape the vitals-processor writes, spread evenly over the
+last --days days. Writes go through parallel BatchWriteItem workers, one
+boto3 session per worker.
+
+Usage (DynamoDB Local):
+    docker run -d -p 8000:8000 amazon/dynamodb-local -jar DynamoDBLocal.jar -inMemory
+    python benchmarks/seed_query_data.py --endpoint-url http://localhost:8000 \\
+        --patients 1000 --vitals 2000000 --alerts 200000 --workers 16
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import local_aws  # noqa: E402
+
+DEVICE_TYPES = ['monitor-1', 'monitor-2', 'pulse-ox', 'bp-cuff', 'telemetry']
+CONDITIONS = ['Stable', 'Stable', 'Warning', 'Critical']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Seed local DynamoDB with query benchmark data')
+    add_seed_arguments(parser)
+    parser.add_argument('--endpoint-url', required=True,
+                        help='DynamoDB Local endpoint, e.g. http://localhost:8000')
+    return parser.parse_args(argv)
+
+
+def add_seed_arguments(parser):
+    """Seeding options shared with query_benchmark.py"""
+    parser.add_argument('--patients', type=int, default=1000,
+                        help='Patients to create')
+    parser.add_argument('--vitals', type=int, default=2000000,
+                        help='Total vital signs readings')
+    parser.add_argument('--alerts', type=int, default=200000,
+                        help='Total alert history items')
+    parser.add_argument('--days', type=int, default=7,
+                        help='Days of history the readings are spread over')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Parallel batch writers')
+    parser.add_argument('--seed', type=int, default=7,
+                        help='Random seed')
+
+
+def patient_id_for(index):
+    return f'PATIENT-{index + 1:06d}'
+
+
+def build_patient(index, rng):
+    now = datetime.now().isoformat()
+    room_prefix = 'ICU' if index % 4 == 0 else 'WARD'
+    return local_aws.with_roster_shard({
+        'PatientId': patient_id_for(index),
+        'Name': f'Seeded Patient {index + 1}',
+        'Age': Decimal(str(rng.randint(18, 95))),
+        'Gender': rng.choice(['Male', 'Female']),
+        'RoomNumber': f'{room_prefix}-{100 + index}',
+        'Status': 'Active',
+        'Condition': CONDITIONS[index % len(CONDITIONS)],
+        'AdmissionDate': now,
+        'CreatedAt': now,
+        'UpdatedAt': now
+    })
+
+
+def build_vital_signs(patient, timestamp, rng):
+    """Item shaped like vitals-processor's process_vital_signs_record output"""
+    abnormal = rng.random() < 0.1
+    return {
+        'PatientId': patient['PatientId'],
+        'Timestamp': timestamp.isoformat() + 'Z',
+        'DeviceId': f"{patient['PatientId']}-{rng.choice(DEVICE_TYPES)}",
+        'HeartRate': Decimal(str(rng.randint(110, 140) if abnormal else rng.randint(60, 100))),
+        'SystolicBP': Decimal(str(rng.randint(100, 140))),
+        'DiastolicBP': Decimal(str(rng.randint(65, 90))),
+        'Temperature': Decimal(str(round(rng.uniform(97.5, 99.5), 1))),
+        'OxygenSaturation': Decimal(str(rng.randint(86, 92) if abnormal else rng.randint(95, 100))),
+        'RoomNumber': patient['RoomNumber'],
+        'PatientCondition': patient['Condition'],
+        'ProcessedAt': timestamp.isoformat() + 'Z',
+        'TTL': int((timestamp + timedelta(days=30)).timestamp()),
+        'SensorBatteryLevel': Decimal(str(rng.randint(20, 100))),
+        'SignalStrength': Decimal(str(rng.randint(70, 100))),
+        'DataQuality': rng.choice(['Excellent', 'Good', 'Fair'])
+    }
+
+
+def build_alert(patient, timestamp, rng):
+    """Item shaped like vitals-processor's send_alert output"""
+    alert_type = 'CRITICAL' if rng.random() < 0.3 else 'WARNING'
+    return {
+        'AlertId': str(uuid.UUID(int=rng.getrandbits(128))),
+        'Timestamp': timestamp.isoformat() + 'Z',
+        'PatientId': patient['PatientId'],
+        'AlertType': alert_type,
+        'Message': f"{alert_type} ALERT - Patient {patient['PatientId']}",
+        'VitalSigns': {
+            'HeartRate': Decimal(str(rng.randint(50, 140))),
+            'SystolicBP': Decimal(str(rng.randint(90, 185))),
+            'DiastolicBP': Decimal(str(rng.randint(50, 120))),
+            'Temperature': Decimal(str(round(rng.uniform(95.0, 102.0), 1))),
+            'OxygenSaturation': Decimal(str(rng.randint(85, 99)))
+        },
+        'RoomNumber': patient['RoomNumber'],
+        'Status': 'ACKNOWLEDGED' if rng.random() < 0.6 else 'SENT',
+        'TTL': int((timestamp + timedelta(days=90)).timestamp())
+    }
+
+
+def seed_patient_chunk(patients, vitals_per_patient, alerts_per_patient, days, seed, endpoint_url):
+    """Write readings and alerts for a chunk of patients from one worker"""
+    session = boto3.session.Session()
+    dynamodb = session.resource('dynamodb', endpoint_url=endpoint_url)
+    vital_signs_table = dynamodb.Table(os.environ['VITAL_SIGNS_TABLE'])
+    alert_history_table = dynamodb.Table(os.environ['ALERT_HISTORY_TABLE'])
+
+    end_time = datetime.utcnow()
+    span_seconds = days * 86400
+    written = 0
+
+    for patient in patients:
+        rng = random.Random(f"{seed}-{patient['PatientId']}")
+
+        with vital_signs_table.batch_writer() as batch:
+            step = span_seconds / max(vitals_per_patient, 1)
+            for index in range(vitals_per_patient):
+                timestamp = end_time - timedelta(seconds=span_seconds - index * step)
+                batch.put_item(Item=build_vital_signs(patient, timestamp, rng))
+        written += vitals_per_patient
+
+        with alert_history_table.batch_writer() as batch:
+            for _ in range(alerts_per_patient):
+                timestamp = end_time - timedelta(seconds=rng.uniform(0, span_seconds))
+                batch.put_item(Item=build_alert(patient, timestamp, rng))
+        written += alerts_per_patient
+
+    return written
+
+
+def seed(patients, vitals, alerts, days, workers, seed, endpoint_url=None):
+    """Create tables and bulk-load patients, vitals and alerts; returns the summary"""
+    local_aws.create_tables(endpoint_url=endpoint_url)
+
+    rng = random.Random(seed)
+    patient_items = [build_patient(index, rng) for index in range(patients)]
+
+    dynamodb = boto3.resource('dynamodb', endpoint_url=endpoint_url)
+    with dynamodb.Table(os.environ['PATIENT_RECORDS_TABLE']).batch_writer() as batch:
+        for patient in patient_items:
+            batch.put_item(Item=patient)
+
+    vitals_per_patient = vitals // max(patients, 1)
+    alerts_per_patient = alerts // max(patients, 1)
+    chunk_size = max(1, len(patient_items) // (workers * 4))
+    chunks = [patient_items[i:i + chunk_size] for i in range(0, len(patient_items), chunk_size)]
+
+    started = time.perf_counter()
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(seed_patient_chunk, chunk, vitals_per_patient,
+                            alerts_per_patient, days, seed, endpoint_url)
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            written += future.result()
+            elapsed = time.perf_counter() - started
+            print(f"Seeded {written} items ({written / elapsed:.0f} items/s)", file=sys.stderr)
+
+    return {
+        'patients': len(patient_items),
+        'vitals': vitals_per_patient * len(patient_items),
+        'alerts': alerts_per_patient * len(patient_items),
+        'days': days,
+        'seedSeconds': round(time.perf_counter() - started, 1)
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    local_aws.configure_environment()
+    summary = seed(args.patients, args.vitals, args.alerts, args.days,
+                   args.workers, args.seed, args.endpoint_url)
+    print(summary)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -71,6 +71,7 @@ aws cloudformation deploy \
   --parameter-overrides \
     ProjectName=$PROJECT_NAME \
     DynamoDBStackName="${STACK_NAME_PREFIX}-dynamodb" \
+    S3StackName="${STACK_NAME_PREFIX}-s3" \
   --capabilities CAPABILITY_IAM CAPABILITY_NAMED_IAM \
   --region $REGION
 
@@ -10,7 +10,8 @@
         this.endpoints = {
             PATIENTS: '/patients',
             VITAL_SIGNS: '/vitalsigns',
-            ALERTS: '/alerts'
+            ALERTS: '/alerts',
+            EXPORTS: '/exports'
         };
         
         // Get config from window
@@ -113,6 +114,18 @@
         });
     };
 
+    // Bulk admission: accepts an array of patients or raw CSV text
+    HealthcareAPI.prototype.importPatients = function(patients) {
+        var isCsv = typeof patients === 'string';
+        return this.makeRequest(this.endpoints.PATIENTS + '/import', {
+            method: 'POST',
+            headers: {
+                'Content-Type': isCsv ? 'text/csv' : 'application/json'
+            },
+            body: isCsv ? patients : JSON.stringify(patients)
+        });
+    };
+
     HealthcareAPI.prototype.updatePatient = function(patientId, updateData) {
         return this.makeRequest(this.endpoints.PATIENTS + '/' + patientId, {
             method: 'PUT',
@@ -139,6 +152,19 @@
         return this.makeRequest(this.endpoints.VITAL_SIGNS + '?patientId=' + patientId + '&latest=true');
     };
 
+    // Latest readings (or a timeRange) for many patients in one request
+    HealthcareAPI.prototype.getVitalSignsForPatients = function(patientIds, timeRange) {
+        var queryParams = '?patientIds=' + encodeURIComponent(patientIds.join(','));
+        queryParams += timeRange ? '&timeRange=' + timeRange : '&latest=true';
+        return this.makeRequest(this.endpoints.VITAL_SIGNS + queryParams);
+    };
+
+    // Readings stored after a cursor returned by an earlier vital signs response
+    HealthcareAPI.prototype.getVitalSignsChanges = function(patientId, since) {
+        var queryParams = '?patientId=' + encodeURIComponent(patientId) + '&since=' + encodeURIComponent(since);
+        return this.makeRequest(this.endpoints.VITAL_SIGNS + queryParams);
+    };
+
     HealthcareAPI.prototype.getVitalSignsHistory = function(patientId, startTime, endTime) {
         var queryParams = '?patientId=' + patientId + '&startTime=' + startTime + '&endTime=' + endTime;
         return this.makeRequest(this.endpoints.VITAL_SIGNS + queryParams);
@@ -157,6 +183,24 @@
         return this.makeRequest(this.endpoints.ALERTS + '?hours=' + (hours || 24));
     };
 
+    // Alerts created or changed status after a cursor returned by an earlier alerts response
+    HealthcareAPI.prototype.getAlertChanges = function(since, limit) {
+        return this.makeRequest(this.endpoints.ALERTS + '?since=' + encodeURIComponent(since) + '&limit=' + (limit || 200));
+    };
+
+    // Start a bulk export job: { patientIds | all, startTime, endTime, datasets, format }
+    HealthcareAPI.prototype.createExport = function(exportRequest) {
+        return this.makeRequest(this.endpoints.EXPORTS || '/exports', {
+            method: 'POST',
+            body: JSON.stringify(exportRequest)
+        });
+    };
+
+    // Export job progress; completed jobs include download URLs
+    HealthcareAPI.prototype.getExport = function(jobId) {
+        return this.makeRequest((this.endpoints.EXPORTS || '/exports') + '?jobId=' + encodeURIComponent(jobId));
+    };
+
     HealthcareAPI.prototype.acknowledgeAlert = function(alertId) {
         if (!alertId) {
             return Promise.reject(new Error('Alert ID is required'));
@@ -193,38 +237,8 @@
                 var patients = patientsResponse.patients || [];
                 var alerts = alertsResponse.alerts || [];
 
-                // Calculate patient status distribution
-                var statusCounts = {
-                    total: patients.length,
-                    normal: 0,
-                    warning: 0,
-                    critical: 0,
-                    active: 0,
-                    inactive: 0
-                };
-
-                for (var i = 0; i < patients.length; i++) {
-                    var patient = patients[i];
-                    var condition = (patient.Condition || 'normal').toLowerCase();
-                    
-                    if (condition === 'stable' || condition === 'normal') {
-                        statusCounts.normal++;
-                    } else if (condition === 'warning') {
-                        statusCounts.warning++;
-                    } else if (condition === 'critical') {
-                        statusCounts.critical++;
-                    }
-
-                    var status = (patient.Status || 'active').toLowerCase();
-                    if (status === 'active') {
-                        statusCounts.active++;
-                    } else {
-                        statusCounts.inactive++;
-                    }
-                }
-
                 resolve({
-                    patients: statusCounts,
+                    patients: self.calculatePatientStats(patients),
                     recentAlerts: alerts.length,
                     systemStatus: 'operational'
                 });
@@ -236,6 +250,40 @@
         });
     };
 
+    // Patient status distribution for the dashboard counters
+    HealthcareAPI.prototype.calculatePatientStats = function(patients) {
+        var statusCounts = {
+            total: patients.length,
+            normal: 0,
+            warning: 0,
+            critical: 0,
+            active: 0,
+            inactive: 0
+        };
+
+        for (var i = 0; i < patients.length; i++) {
+            var patient = patients[i];
+            var condition = (patient.Condition || 'normal').toLowerCase();
+            
+            if (condition === 'stable' || condition === 'normal') {
+                statusCounts.normal++;
+            } else if (condition === 'warning') {
+                statusCounts.warning++;
+            } else if (condition === 'critical') {
+                statusCounts.critical++;
+            }
+
+            var status = (patient.Status || 'active').toLowerCase();
+            if (status === 'active') {
+                statusCounts.active++;
+            } else {
+                statusCounts.inactive++;
+            }
+        }
+
+        return statusCounts;
+    };
+
     // Health check for system status
     HealthcareAPI.prototype.healthCheck = function() {
         var self = this;
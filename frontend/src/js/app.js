@@ -16,6 +16,17 @@
         this.refreshInterval = null;
         this.patients = [];
         this.alerts = [];
+        this.vitalSignsData = [];
+        
+        // Delta polling cursors (null until a full load has returned one)
+        this.alertsCursor = null;
+        this.vitalSignsCursor = null;
+        this.refreshCount = 0;
+        
+        // Push channel; polling only runs while it is unavailable
+        var config = window.HEALTHCARE_CONFIG || {};
+        this.live = window.LiveUpdates && config.WEBSOCKET_URL ? new window.LiveUpdates(config.WEBSOCKET_URL) : null;
+        this.liveSentAt = null;
         
         // Bind methods to preserve 'this' context
         this.init = this.init.bind(this);
@@ -44,6 +55,7 @@
             // Load real data
             self.loadInitialData().then(function() {
                 self.setupEventListeners();
+                self.startLiveUpdates();
                 self.startAutoRefresh();
                 self.showSystemStatus('Healthcare system connected successfully', 'success');
             }).catch(function(error) {
@@ -93,6 +105,7 @@
                 console.log('Alerts response:', alertsResponse);
                 
                 self.alerts = alertsResponse.alerts || [];
+                self.alertsCursor = alertsResponse.cursor || null;
                 self.updateAlertsDisplay();
                 
                 console.log('Loaded', self.alerts.length, 'alerts from last 24 hours');
@@ -390,6 +403,7 @@
         var self = this;
         
         console.log('Loading vital signs for patient:', patientId);
+        self.vitalSignsCursor = null;
         self.showSystemStatus('Loading vital signs for patient ' + patientId + '...', 'info');
         
         // Try to get real data from API
@@ -397,6 +411,8 @@
             console.log('Vital signs response:', response);
             
             var vitalSignsData = response.vitalSigns || [];
+            self.vitalSignsData = vitalSignsData;
+            self.vitalSignsCursor = response.cursor || null;
             
             if (vitalSignsData.length === 0) {
                 self.showSystemStatus('No vital signs data found for this patient yet. Data generates every 5 minutes.', 'warning');
@@ -569,7 +585,8 @@
     HealthcareDashboard.prototype.startAutoRefresh = function() {
         var self = this;
         
-        // Refresh every 30 seconds to get new data
+        // Poll for changes every 30 seconds; the patient roster and stats are
+        // fully reloaded every FULL_REFRESH_EVERY polls
         this.refreshInterval = setInterval(function() {
             console.log('Auto-refreshing data...');
             self.refreshData();
@@ -578,11 +595,23 @@
         console.log('Auto-refresh started (30 second intervals)');
     };
     
+    var FULL_REFRESH_EVERY = 10;
+    
     // Refresh data from APIs
     HealthcareDashboard.prototype.refreshData = function() {
         var self = this;
         
         if (this.currentView === 'dashboard') {
+            // Everything shown on the dashboard is being pushed
+            if (this.live && this.live.isOpen()) return;
+            
+            this.refreshCount++;
+            
+            if (this.alertsCursor && this.refreshCount % FULL_REFRESH_EVERY !== 0) {
+                this.pollChanges();
+                return;
+            }
+            
             console.log('Refreshing dashboard data...');
             
             this.loadInitialData().then(function() {
@@ -597,6 +626,152 @@
         }
     };
     
+    var LIVE_GAP_MARGIN_MS = 60000;
+    
+    // Subscribe to pushed vitals, roster and alert updates
+    HealthcareDashboard.prototype.startLiveUpdates = function() {
+        var self = this;
+        
+        if (!this.live || !this.live.isAvailable()) {
+            console.log('Live updates not configured, polling instead');
+            return;
+        }
+        
+        this.live.on('message', function(message) {
+            self.liveSentAt = message.sentAt;
+        }).on('vitals', function(readings) {
+            var selected = readings.filter(function(reading) {
+                return reading.PatientId === self.selectedPatientId;
+            });
+            if (selected.length && self.vitalSignsCursor) {
+                self.mergeVitalSigns(selected);
+            }
+        }).on('patient', function(patients) {
+            self.mergePatients(patients);
+        }).on('alert', function(alerts) {
+            self.mergeAlerts(alerts);
+        }).on('open', function() {
+            if (self.liveSentAt === null) return;
+            
+            // Reconnected: catch up on what was pushed while the socket was down.
+            // The margin covers stream delay and clock skew; duplicates are merged away.
+            var cursor = String(self.liveSentAt - LIVE_GAP_MARGIN_MS);
+            if (self.alertsCursor && cursor > self.alertsCursor) self.alertsCursor = cursor;
+            if (self.vitalSignsCursor && cursor > self.vitalSignsCursor) self.vitalSignsCursor = cursor;
+            self.pollChanges();
+        });
+        
+        this.live.connect();
+    };
+    
+    // Apply pushed roster changes and recount the dashboard stats
+    HealthcareDashboard.prototype.mergePatients = function(changedPatients) {
+        for (var i = 0; i < changedPatients.length; i++) {
+            var changed = changedPatients[i];
+            var index = -1;
+            for (var j = 0; j < this.patients.length; j++) {
+                if (this.patients[j].PatientId === changed.PatientId) {
+                    index = j;
+                    break;
+                }
+            }
+            
+            if (changed.Removed) {
+                if (index >= 0) this.patients.splice(index, 1);
+            } else if (index >= 0) {
+                var patient = this.patients[index];
+                patient.Name = changed.Name;
+                patient.RoomNumber = changed.RoomNumber;
+                patient.Status = changed.Status;
+                patient.Condition = changed.Condition;
+            } else {
+                this.patients.push(changed);
+            }
+        }
+        
+        this.updatePatientsTable();
+        this.updateDashboardStats({ patients: this.api.calculatePatientStats(this.patients) });
+    };
+    
+    // Fetch only the alerts and readings that changed since the last poll
+    HealthcareDashboard.prototype.pollChanges = function() {
+        var self = this;
+        var patientId = this.selectedPatientId;
+        var polls = [this.api.getAlertChanges(this.alertsCursor)];
+        
+        if (patientId && this.vitalSignsCursor) {
+            polls.push(this.api.getVitalSignsChanges(patientId, this.vitalSignsCursor));
+        }
+        
+        Promise.all(polls).then(function(responses) {
+            var alertChanges = responses[0];
+            self.alertsCursor = alertChanges.cursor;
+            self.mergeAlerts(alertChanges.alerts || []);
+            
+            // Ignore the answer if another patient was selected meanwhile
+            if (responses.length > 1 && patientId === self.selectedPatientId) {
+                self.vitalSignsCursor = responses[1].cursor;
+                self.mergeVitalSigns(responses[1].vitalSigns || []);
+            }
+            
+            console.log('Polled changes:', alertChanges.count, 'alerts');
+            
+        }).catch(function(error) {
+            // Expired or rejected cursor - start over from a full load
+            console.error('Error polling changes, reloading:', error);
+            self.alertsCursor = null;
+            self.refreshData();
+        });
+    };
+    
+    // Apply new and re-statused alerts to the last 24 hours shown on the dashboard
+    HealthcareDashboard.prototype.mergeAlerts = function(changedAlerts) {
+        if (changedAlerts.length === 0) return;
+        
+        var alertsById = {};
+        var i;
+        for (i = 0; i < this.alerts.length; i++) {
+            alertsById[this.alerts[i].AlertId] = this.alerts[i];
+        }
+        for (i = 0; i < changedAlerts.length; i++) {
+            alertsById[changedAlerts[i].AlertId] = changedAlerts[i];
+        }
+        
+        var cutoff = new Date(Date.now() - 24 * 60 * 60 * 1000).toISOString();
+        this.alerts = Object.keys(alertsById).map(function(alertId) {
+            return alertsById[alertId];
+        }).filter(function(alert) {
+            return alert.Timestamp >= cutoff;
+        }).sort(function(a, b) {
+            return a.Timestamp < b.Timestamp ? 1 : -1;
+        });
+        
+        this.updateAlertsDisplay();
+    };
+    
+    // Add newly stored readings to the selected patient's last hour
+    HealthcareDashboard.prototype.mergeVitalSigns = function(newReadings) {
+        if (newReadings.length === 0) return;
+        
+        var readingsByTime = {};
+        var i;
+        for (i = 0; i < this.vitalSignsData.length; i++) {
+            readingsByTime[this.vitalSignsData[i].Timestamp] = this.vitalSignsData[i];
+        }
+        for (i = 0; i < newReadings.length; i++) {
+            readingsByTime[newReadings[i].Timestamp] = newReadings[i];
+        }
+        
+        var cutoff = new Date(Date.now() - 60 * 60 * 1000).toISOString();
+        this.vitalSignsData = Object.keys(readingsByTime).filter(function(timestamp) {
+            return timestamp >= cutoff;
+        }).sort().reverse().map(function(timestamp) {
+            return readingsByTime[timestamp];
+        });
+        
+        this.updateVitalSignsChart(this.vitalSignsData);
+    };
+    
     // View management
     HealthcareDashboard.prototype.showDashboard = function() {
         this.currentView = 'dashboard';
@@ -836,6 +1011,7 @@
                 // Refresh the recent alerts in dashboard
                 self.api.getRecentAlerts(24).then(function(alertsResponse) {
                     self.alerts = alertsResponse.alerts || [];
+                    self.alertsCursor = alertsResponse.cursor || null;
                     self.updateAlertsDisplay();
                 }).catch(function(error) {
                     console.error('Error refreshing alerts:', error);
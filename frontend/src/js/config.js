@@ -7,6 +7,7 @@
     // Configuration object
     var CONFIG = {
         API_BASE_URL: '', // Will be populated by deployment script
+        WEBSOCKET_URL: '', // Live updates push channel; polling is used when empty
         PROJECT_NAME: 'VitalSignsMonitoring',
         REGION: 'us-east-1',
         
@@ -14,7 +15,8 @@
         ENDPOINTS: {
             PATIENTS: '/patients',
             VITAL_SIGNS: '/vitalsigns',
-            ALERTS: '/alerts'
+            ALERTS: '/alerts',
+            EXPORTS: '/exports'
         },
         
         // Vital Signs Thresholds for Dashboard Visualization
@@ -0,0 +1,178 @@
+// Live updates push channel for Patient Vital Signs Monitoring System
+// WebSocket client for the live-updates function; expands compact updates to API item shapes
+
+(function() {
+    'use strict';
+
+    var MAX_RECONNECT_DELAY = 30000;
+
+    // Live Updates Constructor Function
+    function LiveUpdates(url) {
+        this.url = url;
+        this.socket = null;
+        this.handlers = {};
+        this.subscription = { all: true };
+        this.reconnectDelay = 1000;
+        this.closed = false;
+    }
+
+    LiveUpdates.prototype.isAvailable = function() {
+        return !!this.url && typeof window.WebSocket !== 'undefined';
+    };
+
+    LiveUpdates.prototype.isOpen = function() {
+        return !!this.socket && this.socket.readyState === window.WebSocket.OPEN;
+    };
+
+    // Register a handler for 'open', 'close', 'message', 'vitals', 'patient' or 'alert'
+    LiveUpdates.prototype.on = function(eventName, handler) {
+        (this.handlers[eventName] = this.handlers[eventName] || []).push(handler);
+        return this;
+    };
+
+    LiveUpdates.prototype.emit = function(eventName, payload) {
+        var handlers = this.handlers[eventName] || [];
+        for (var i = 0; i < handlers.length; i++) {
+            try {
+                handlers[i](payload);
+            } catch (error) {
+                console.error('Live update handler failed:', error);
+            }
+        }
+    };
+
+    LiveUpdates.prototype.connect = function() {
+        var self = this;
+        
+        if (!this.isAvailable()) return;
+        this.closed = false;
+        
+        var socket = new window.WebSocket(this.url);
+        this.socket = socket;
+        
+        socket.onopen = function() {
+            console.log('Live updates connected');
+            self.reconnectDelay = 1000;
+            self.sendSubscription();
+            self.emit('open');
+        };
+        
+        socket.onmessage = function(event) {
+            var message;
+            try {
+                message = JSON.parse(event.data);
+            } catch (error) {
+                console.error('Invalid live update message:', error);
+                return;
+            }
+            self.emit('message', message);
+            self.dispatch(message.updates || []);
+        };
+        
+        socket.onclose = function() {
+            if (self.socket !== socket) return;
+            self.socket = null;
+            self.emit('close');
+            
+            if (!self.closed) {
+                console.log('Live updates disconnected, retrying in', self.reconnectDelay, 'ms');
+                setTimeout(function() { self.connect(); }, self.reconnectDelay);
+                self.reconnectDelay = Math.min(self.reconnectDelay * 2, MAX_RECONNECT_DELAY);
+            }
+        };
+        
+        socket.onerror = function(error) {
+            console.error('Live updates error:', error);
+        };
+    };
+
+    LiveUpdates.prototype.disconnect = function() {
+        this.closed = true;
+        if (this.socket) {
+            this.socket.close();
+            this.socket = null;
+        }
+    };
+
+    // Follow every patient (patientIds omitted) or just the listed ones
+    LiveUpdates.prototype.subscribe = function(patientIds) {
+        this.subscription = patientIds ? { patientIds: patientIds } : { all: true };
+        this.sendSubscription();
+    };
+
+    LiveUpdates.prototype.sendSubscription = function() {
+        if (!this.isOpen()) return;
+        
+        var message = { action: 'subscribe' };
+        if (this.subscription.all) {
+            message.all = true;
+        } else {
+            message.patientIds = this.subscription.patientIds;
+        }
+        this.socket.send(JSON.stringify(message));
+    };
+
+    LiveUpdates.prototype.dispatch = function(updates) {
+        var vitals = [];
+        var patients = [];
+        var alerts = [];
+        
+        for (var i = 0; i < updates.length; i++) {
+            var update = updates[i];
+            if (update.k === 'vitals') {
+                vitals.push(this.expandVitalSigns(update));
+            } else if (update.k === 'patient') {
+                patients.push(this.expandPatient(update));
+            } else if (update.k === 'alert') {
+                alerts.push(this.expandAlert(update));
+            }
+        }
+        
+        if (vitals.length) this.emit('vitals', vitals);
+        if (patients.length) this.emit('patient', patients);
+        if (alerts.length) this.emit('alert', alerts);
+    };
+
+    LiveUpdates.prototype.expandVitalSigns = function(update) {
+        return {
+            PatientId: update.p,
+            Timestamp: update.t,
+            HeartRate: update.hr,
+            SystolicBP: update.sbp,
+            DiastolicBP: update.dbp,
+            Temperature: update.temp,
+            OxygenSaturation: update.spo2,
+            RoomNumber: update.room,
+            // Readings folded into this one by server-side coalescing
+            Coalesced: update.n || 1
+        };
+    };
+
+    LiveUpdates.prototype.expandPatient = function(update) {
+        return {
+            PatientId: update.p,
+            Name: update.name,
+            RoomNumber: update.room,
+            Status: update.status,
+            Condition: update.condition,
+            Removed: !!update.removed
+        };
+    };
+
+    LiveUpdates.prototype.expandAlert = function(update) {
+        return {
+            AlertId: update.id,
+            PatientId: update.p,
+            Timestamp: update.t,
+            AlertType: update.type,
+            Status: update.status,
+            Message: update.msg,
+            VitalSigns: update.vitals,
+            RoomNumber: update.room
+        };
+    };
+
+    // Make LiveUpdates available globally
+    window.LiveUpdates = LiveUpdates;
+
+})();
\ No newline at end of file
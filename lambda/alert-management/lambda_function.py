@@ -5,6 +5,12 @@ from decimal import Decimal
 from datetime import datetime, timedelta
 import os
 from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+
+from change_feed import change_stamp, current_cursor, now_ms, parse_cursor, query_bucketed_changes, CHANGE_FEED_SETTLE_MS
+from query_cache import QueryCache, bucket_end, cache_key
+import config_version
+from profiling import profiled
 
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
@@ -14,16 +20,29 @@ sns = boto3.client('sns')
 ALERT_HISTORY_TABLE = os.environ['ALERT_HISTORY_TABLE']
 ALERT_CONFIG_TABLE = os.environ['ALERT_CONFIG_TABLE']
 SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
+PATIENT_STATE_TABLE = os.environ.get('PATIENT_STATE_TABLE', '')
 
 # Get DynamoDB tables
 alert_history_table = dynamodb.Table(ALERT_HISTORY_TABLE)
 alert_config_table = dynamodb.Table(ALERT_CONFIG_TABLE)
+patient_state_table = dynamodb.Table(PATIENT_STATE_TABLE) if PATIENT_STATE_TABLE else None
+
+# Conditional writes of the config version item before the stream batch is retried
+CONFIG_VERSION_ATTEMPTS = 5
+
+# Alert list queries, shared by dashboard refreshes within a time bucket
+query_cache = QueryCache('alert-management')
 
+@profiled
 def lambda_handler(event, context):
     """
-    Handle alert management API requests
+    Handle alert management API requests, and AlertConfig stream batches
     """
     
+    if 'Records' in event:
+        # Raised errors make Lambda retry the stream batch
+        return publish_config_changes(event['Records'])
+    
     try:
         print(f"Received event: {json.dumps(event, default=str)}")
         
@@ -45,7 +64,9 @@ def lambda_handler(event, context):
         
         # Route based on HTTP method
         if http_method == 'GET':
-            return handle_get_alerts(query_params)
+            response = handle_get_alerts(query_params)
+            query_cache.emit_metrics()
+            return response
         elif http_method == 'PUT' and alert_id:
             if 'acknowledge' in path:
                 return acknowledge_alert(alert_id)
@@ -93,23 +114,29 @@ def acknowledge_alert(alert_id):
         
         # Update alert status to acknowledged using both keys
         current_time = datetime.utcnow().isoformat() + 'Z'
+        stamp = change_stamp()
         
         update_response = alert_history_table.update_item(
             Key={
                 'AlertId': alert_id,
                 'Timestamp': alert_item['Timestamp']
             },
-            UpdateExpression="SET #status = :status, AcknowledgedAt = :ack_time",
+            UpdateExpression="SET #status = :status, AcknowledgedAt = :ack_time, ChangedAt = :changed_at, ChangeBucket = :change_bucket",
             ExpressionAttributeNames={'#status': 'Status'},
             ExpressionAttributeValues={
                 ':status': 'ACKNOWLEDGED',
-                ':ack_time': current_time
+                ':ack_time': current_time,
+                ':changed_at': stamp['ChangedAt'],
+                ':change_bucket': stamp['ChangeBucket']
             },
             ReturnValues='ALL_NEW'
         )
         
         print(f"Update response: {json.dumps(update_response, default=str)}")
         
+        # This container's cached lists would show the alert unacknowledged until they expire
+        query_cache.clear()
+        
         return create_success_response({
             'message': f"Alert {alert_id} acknowledged successfully",
             'alertId': alert_id,
@@ -132,24 +159,40 @@ def handle_get_alerts(query_params):
     limit = int(query_params.get('limit', '50'))
     alert_type = query_params.get('type')
     status = query_params.get('status')
+    since = query_params.get('since')
     
     try:
+        if since:
+            return get_alert_changes(since, limit, patient_id, alert_type, status)
+        
+        # The snapped threshold is part of the key, so entries roll over with the bucket
+        time_threshold_str = (bucket_end() - timedelta(hours=hours)).isoformat() + 'Z'
         if patient_id:
-            return get_patient_alerts(patient_id, hours, limit, alert_type, status)
+            return query_cache.get_or_load(
+                cache_key('patient', patient_id, time_threshold_str, limit, alert_type, status),
+                lambda: get_patient_alerts(patient_id, hours, limit, alert_type, status, time_threshold_str)
+            )
         else:
-            return get_all_alerts(hours, limit, alert_type, status)
+            return query_cache.get_or_load(
+                cache_key('all', time_threshold_str, limit, alert_type, status),
+                lambda: get_all_alerts(hours, limit, alert_type, status, time_threshold_str)
+            )
             
     except Exception as e:
         print(f"Error in handle_get_alerts: {str(e)}")
         return create_error_response(500, f"Error retrieving alerts: {str(e)}")
 
-def get_all_alerts(hours, limit, alert_type=None, status=None):
+def get_all_alerts(hours, limit, alert_type=None, status=None, time_threshold_str=None):
     """Get all alerts within specified time range"""
     
     try:
+        # Taken before reading so nothing written during the scan is skipped by the next delta
+        cursor = current_cursor()
+        
         # Calculate time threshold
-        time_threshold = datetime.utcnow() - timedelta(hours=hours)
-        time_threshold_str = time_threshold.isoformat() + 'Z'
+        if time_threshold_str is None:
+            time_threshold = datetime.utcnow() - timedelta(hours=hours)
+            time_threshold_str = time_threshold.isoformat() + 'Z'
         
         # Build filter expression
         filter_expression = Attr('Timestamp').gte(time_threshold_str)
@@ -178,7 +221,8 @@ def get_all_alerts(hours, limit, alert_type=None, status=None):
             'alerts': convert_decimals(alerts),
             'statistics': stats,
             'timeRange': f"Last {hours} hours",
-            'count': len(alerts)
+            'count': len(alerts),
+            'cursor': cursor
         }
         
         return create_success_response(result)
@@ -187,13 +231,16 @@ def get_all_alerts(hours, limit, alert_type=None, status=None):
         print(f"Error getting all alerts: {str(e)}")
         return create_error_response(500, f"Error retrieving alerts: {str(e)}")
 
-def get_patient_alerts(patient_id, hours, limit, alert_type=None, status=None):
+def get_patient_alerts(patient_id, hours, limit, alert_type=None, status=None, time_threshold_str=None):
     """Get alerts for a specific patient"""
     
     try:
+        cursor = current_cursor()
+        
         # Calculate time threshold
-        time_threshold = datetime.utcnow() - timedelta(hours=hours)
-        time_threshold_str = time_threshold.isoformat() + 'Z'
+        if time_threshold_str is None:
+            time_threshold = datetime.utcnow() - timedelta(hours=hours)
+            time_threshold_str = time_threshold.isoformat() + 'Z'
         
         # Query using GSI on PatientId
         key_condition = Key('PatientId').eq(patient_id) & Key('Timestamp').gte(time_threshold_str)
@@ -222,7 +269,8 @@ def get_patient_alerts(patient_id, hours, limit, alert_type=None, status=None):
             'alerts': convert_decimals(alerts),
             'statistics': stats,
             'timeRange': f"Last {hours} hours",
-            'count': len(alerts)
+            'count': len(alerts),
+            'cursor': cursor
         }
         
         return create_success_response(result)
@@ -231,6 +279,43 @@ def get_patient_alerts(patient_id, hours, limit, alert_type=None, status=None):
         print(f"Error getting patient alerts: {str(e)}")
         return create_error_response(500, f"Error retrieving patient alerts: {str(e)}")
 
+def get_alert_changes(since_param, limit, patient_id=None, alert_type=None, status=None):
+    """
+    Delta poll (since=<cursor>): alerts created or changed status after the
+    cursor, oldest change first, read from ChangeIndex by hour bucket.
+    Filters apply to the changed alerts only, so they never widen the read.
+    """
+    
+    try:
+        since = parse_cursor(since_param)
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    
+    try:
+        until = now_ms() - CHANGE_FEED_SETTLE_MS
+        alerts, cursor, has_more = query_bucketed_changes(alert_history_table, 'ChangeIndex', since, until, limit)
+        
+        if patient_id:
+            alerts = [alert for alert in alerts if alert.get('PatientId') == patient_id]
+        if alert_type:
+            alerts = [alert for alert in alerts if alert.get('AlertType') == alert_type]
+        if status:
+            alerts = [alert for alert in alerts if alert.get('Status') == status]
+        
+        result = {
+            'alerts': convert_decimals(alerts),
+            'count': len(alerts),
+            'since': str(since),
+            'cursor': cursor,
+            'hasMore': has_more
+        }
+        
+        return create_success_response(result)
+        
+    except Exception as e:
+        print(f"Error getting alert changes: {str(e)}")
+        return create_error_response(500, f"Error retrieving alert changes: {str(e)}")
+
 def create_alert_config(config_data):
     """Create a new alert configuration"""
     
@@ -368,6 +453,44 @@ def delete_alert_config(config_id):
         print(f"Error deleting alert config: {str(e)}")
         return create_error_response(500, f"Error deleting alert configuration: {str(e)}")
 
+def publish_config_changes(records):
+    """
+    Record the patients changed in an AlertConfig stream batch on the config
+    version item, which vitals-processor containers poll instead of each
+    reading the stream
+    """
+    
+    patient_ids = {
+        record['dynamodb']['Keys']['PatientId']['S']
+        for record in records if 'dynamodb' in record
+    }
+    if not patient_ids or not patient_state_table:
+        return {'changed': 0}
+    
+    for attempt in range(CONFIG_VERSION_ATTEMPTS):
+        item = patient_state_table.get_item(
+            Key=config_version.CONFIG_VERSION_KEY, ConsistentRead=True
+        ).get('Item')
+        new_item = config_version.next_version_item(item, patient_ids)
+        
+        if item:
+            condition = {'ConditionExpression': 'Version = :version',
+                         'ExpressionAttributeValues': {':version': item['Version']}}
+        else:
+            condition = {'ConditionExpression': 'attribute_not_exists(Version)'}
+        
+        try:
+            patient_state_table.put_item(Item=new_item, **condition)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            continue
+        
+        print(f"Alert config version {new_item['Version']}: {len(patient_ids)} patients changed")
+        return {'changed': len(patient_ids), 'version': new_item['Version']}
+    
+    raise RuntimeError(f"Config version item still contended after {CONFIG_VERSION_ATTEMPTS} attempts")
+
 def calculate_alert_stats(alerts):
     """Calculate statistics for alerts"""
     
@@ -1,6 +1,7 @@
 # lambda/iot-simulator/lambda_function.py
 import json
 import boto3
+import math
 import random
 import time
 import uuid
@@ -8,6 +9,10 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 import os
 
+import waveforms
+import patient_roster
+from profiling import profiled
+
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
 kinesis_client = boto3.client('kinesis')
@@ -15,10 +20,33 @@ kinesis_client = boto3.client('kinesis')
 # Environment variables
 PATIENT_RECORDS_TABLE = os.environ['PATIENT_RECORDS_TABLE']
 KINESIS_STREAM_NAME = "VitalSignsMonitoring-vital-signs-stream"
+ROSTER_FULL_REFRESH_SECONDS = int(os.environ.get('ROSTER_FULL_REFRESH_SECONDS', '300'))
+# Patients in these conditions also stream waveform segments (empty disables waveforms)
+WAVEFORM_CONDITIONS = {value.strip() for value in os.environ.get('WAVEFORM_CONDITIONS', 'Critical').split(',') if value.strip()}
+WAVEFORM_SEGMENT_SECONDS = int(os.environ.get('WAVEFORM_SEGMENT_SECONDS', '10'))
+
+# Simulated channels: name -> (sample rate Hz, units per sample count, units)
+WAVEFORM_CHANNELS = {
+    'ECG-II': (250, 0.005, 'mV'),
+    'PLETH': (125, 0.001, 'au')
+}
+# Beat shape as (position in the cardiac cycle, amplitude in units, width) Gaussians
+ECG_BEAT = [(0.2, 0.15, 0.025), (0.37, -0.1, 0.01), (0.4, 1.2, 0.012), (0.43, -0.25, 0.01), (0.65, 0.3, 0.05)]
+PLETH_BEAT = [(0.25, 1.0, 0.08), (0.55, 0.35, 0.07)]
 
 # Get DynamoDB table
 patient_table = dynamodb.Table(PATIENT_RECORDS_TABLE)
 
+# Active patient roster cached across warm invocations (PatientId -> patient).
+# The roster index holds active patients only (see patient_roster), so a delta
+# refresh reads just the patients updated since the last watermark; patients
+# who left Active drop out at the next full reload.
+ROSTER_CLOCK_SKEW_SECONDS = 60
+_active_roster = {}
+_roster_watermark = None
+_roster_loaded_at = 0.0
+
+@profiled
 def lambda_handler(event, context):
     """
     Lambda function to simulate IoT sensor data for patient vital signs.
@@ -37,6 +65,7 @@ def lambda_handler(event, context):
         
         records_sent = 0
         alerts_generated = 0
+        waveform_segments_sent = 0
         
         # Generate and send vital signs for each patient
         for patient in patients:
@@ -56,6 +85,11 @@ def lambda_handler(event, context):
                 patient_status = determine_patient_status(vital_signs)
                 if patient_status in ['Critical', 'Warning']:
                     alerts_generated += 1
+                    
+                if patient.get('Condition', 'Stable') in WAVEFORM_CONDITIONS:
+                    for segment in generate_waveform_segments(patient, vital_signs):
+                        if send_to_kinesis(patient_id, segment):
+                            waveform_segments_sent += 1
             else:
                 print(f"❌ Failed to send vital signs for patient {patient_id}")
         
@@ -66,6 +100,7 @@ def lambda_handler(event, context):
                 'patients_processed': len(patients),
                 'records_sent': records_sent,
                 'alerts_generated': alerts_generated,
+                'waveform_segments_sent': waveform_segments_sent,
                 'method': 'direct_kinesis',
                 'timestamp': datetime.utcnow().isoformat() + 'Z'
             })
@@ -82,15 +117,45 @@ def lambda_handler(event, context):
         }
 
 def get_active_patients():
-    """Get list of active patients from DynamoDB"""
+    """Get list of active patients, refreshing the cached roster incrementally"""
+    global _roster_watermark, _roster_loaded_at
+    
     try:
-        response = patient_table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr('Status').eq('Active')
-        )
-        return response.get('Items', [])
+        refresh_started = datetime.now()
+        full_reload = (_roster_watermark is None or
+                       time.time() - _roster_loaded_at > ROSTER_FULL_REFRESH_SECONDS)
+        
+        if full_reload:
+            roster = {}
+            for patient in patient_roster.query_active_patients(patient_table):
+                if patient.get('Status') == patient_roster.ACTIVE_STATUS:
+                    roster[patient['PatientId']] = patient
+            
+            _active_roster.clear()
+            _active_roster.update(roster)
+            _roster_loaded_at = time.time()
+            print(f"Loaded active roster: {len(_active_roster)} patients")
+        else:
+            # Only pull rows whose UpdatedAt moved past the last watermark
+            since = (_roster_watermark - timedelta(seconds=ROSTER_CLOCK_SKEW_SECONDS)).isoformat()
+            changed = 0
+            
+            for patient in patient_roster.query_active_patients(patient_table, since):
+                if patient.get('Status') == patient_roster.ACTIVE_STATUS:
+                    _active_roster[patient['PatientId']] = patient
+                    changed += 1
+                elif _active_roster.pop(patient['PatientId'], None) is not None:
+                    # Status changed by a writer that left RosterShard in place
+                    changed += 1
+            
+            print(f"Refreshed active roster: {changed} changes, {len(_active_roster)} patients")
+        
+        _roster_watermark = refresh_started
+        return list(_active_roster.values())
+        
     except Exception as e:
         print(f"Error getting active patients: {str(e)}")
-        return []
+        return list(_active_roster.values())
 
 def create_sample_patients():
     """Create sample patients for demonstration"""
@@ -104,6 +169,7 @@ def create_sample_patients():
             'Status': 'Active',
             'Condition': 'Stable',
             'AdmissionDate': datetime.now().isoformat(),
+            'UpdatedAt': datetime.now().isoformat(),
             'EmergencyContact': '+1-555-0123'
         },
         {
@@ -115,6 +181,7 @@ def create_sample_patients():
             'Status': 'Active',
             'Condition': 'Critical',
             'AdmissionDate': datetime.now().isoformat(),
+            'UpdatedAt': datetime.now().isoformat(),
             'EmergencyContact': '+1-555-0124'
         },
         {
@@ -126,6 +193,7 @@ def create_sample_patients():
             'Status': 'Active',
             'Condition': 'Stable',
             'AdmissionDate': datetime.now().isoformat(),
+            'UpdatedAt': datetime.now().isoformat(),
             'EmergencyContact': '+1-555-0125'
         },
         {
@@ -137,6 +205,7 @@ def create_sample_patients():
             'Status': 'Active',
             'Condition': 'Warning',
             'AdmissionDate': datetime.now().isoformat(),
+            'UpdatedAt': datetime.now().isoformat(),
             'EmergencyContact': '+1-555-0126'
         },
         {
@@ -148,13 +217,14 @@ def create_sample_patients():
             'Status': 'Active',
             'Condition': 'Critical',
             'AdmissionDate': datetime.now().isoformat(),
+            'UpdatedAt': datetime.now().isoformat(),
             'EmergencyContact': '+1-555-0127'
         }
     ]
     
     for patient in sample_patients:
         try:
-            patient_table.put_item(Item=patient)
+            patient_table.put_item(Item=patient_roster.set_roster_shard(patient))
             print(f"Created sample patient: {patient['PatientId']}")
         except Exception as e:
             print(f"Error creating patient {patient['PatientId']}: {str(e)}")
@@ -221,6 +291,39 @@ def generate_vital_signs(patient):
         'dataQuality': random.choice(['Excellent', 'Good', 'Fair'])
     }
 
+def generate_waveform_segments(patient, vital_signs):
+    """One segment per simulated channel covering the WAVEFORM_SEGMENT_SECONDS before the reading"""
+    
+    end = datetime.utcnow()
+    start = end - timedelta(seconds=WAVEFORM_SEGMENT_SECONDS)
+    start_seconds = (start - datetime(1970, 1, 1)).total_seconds()
+    beat_seconds = 60.0 / max(vital_signs['heartRate'], 1)
+    
+    segments = []
+    for channel, (sample_rate, scale, units) in WAVEFORM_CHANNELS.items():
+        beat = ECG_BEAT if channel.startswith('ECG') else PLETH_BEAT
+        samples = []
+        for index in range(WAVEFORM_SEGMENT_SECONDS * sample_rate):
+            # Phase from absolute time, so consecutive segments join up
+            phase = ((start_seconds + index / sample_rate) % beat_seconds) / beat_seconds
+            value = sum(amplitude * math.exp(-((phase - center) ** 2) / (2 * width ** 2))
+                        for center, amplitude, width in beat)
+            samples.append(round((value + random.gauss(0, 0.01)) / scale))
+            
+        segments.append({
+            'recordType': waveforms.RECORD_TYPE,
+            'patientId': patient['PatientId'],
+            'deviceId': f"{patient['PatientId']}-{'telemetry' if channel.startswith('ECG') else 'pulse-ox'}",
+            'channel': channel,
+            'startTime': start.isoformat() + 'Z',
+            'sampleRate': sample_rate,
+            'scale': scale,
+            'units': units,
+            'samples': waveforms.pack_samples(samples)
+        })
+        
+    return segments
+
 def send_to_kinesis(patient_id, vital_signs):
     """Send vital signs data directly to Kinesis"""
     
@@ -0,0 +1,373 @@
+# lambda/live-updates/lambda_function.py
+"""
+Push channel for live dashboards.
+
+One function serves both sides of the channel:
+- WebSocket routes ($connect, subscribe, $disconnect) keep one item per open
+  dashboard in the live connections table, with the patients it follows.
+- DynamoDB stream batches from VitalSigns, PatientRecords and AlertHistory are
+  coalesced to one compact update per patient (per alert for AlertHistory).
+  Each subscribed connection then gets a single message per batch through the
+  API Gateway management API.
+"""
+import json
+import boto3
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from emf import emit_metrics
+import vital_schema
+from profiling import profiled
+
+# Environment variables
+LIVE_CONNECTIONS_TABLE = os.environ['LIVE_CONNECTIONS_TABLE']
+VITAL_SIGNS_TABLE = os.environ.get('VITAL_SIGNS_TABLE', '')
+VITAL_SIGNS_COMPACT_TABLE = os.environ.get('VITAL_SIGNS_COMPACT_TABLE', '')
+PATIENT_RECORDS_TABLE = os.environ.get('PATIENT_RECORDS_TABLE', '')
+ALERT_HISTORY_TABLE = os.environ.get('ALERT_HISTORY_TABLE', '')
+PUSH_WORKERS = int(os.environ.get('PUSH_WORKERS', '16'))
+# Subscriptions are cached per container; a new subscription starts receiving
+# updates within this many seconds
+SUBSCRIPTION_REFRESH_SECONDS = int(os.environ.get('SUBSCRIPTION_REFRESH_SECONDS', '5'))
+# API Gateway closes WebSockets after 2 hours; leftovers expire after this
+CONNECTION_TTL_HOURS = int(os.environ.get('CONNECTION_TTL_HOURS', '3'))
+# Overrides the endpoint recorded at $connect (e.g. a local stand-in server)
+WEBSOCKET_MANAGEMENT_ENDPOINT = os.environ.get('WEBSOCKET_MANAGEMENT_ENDPOINT', '')
+
+# Stream sources holding raw readings (v1 and compact schema)
+VITAL_SIGNS_TABLES = {name for name in (VITAL_SIGNS_TABLE, VITAL_SIGNS_COMPACT_TABLE) if name}
+
+MAX_SUBSCRIBED_PATIENTS = 500
+# API Gateway WebSocket frames are limited to 32 KB
+MAX_MESSAGE_BYTES = 32000
+
+# Initialize AWS clients
+dynamodb = boto3.resource('dynamodb')
+connections_table = dynamodb.Table(LIVE_CONNECTIONS_TABLE)
+management_config = Config(max_pool_connections=max(PUSH_WORKERS, 10), retries={'max_attempts': 2})
+
+deserializer = TypeDeserializer()
+
+# Warm-container state: subscriptions snapshot and one management client per endpoint
+_subscriptions = []
+_subscriptions_loaded_at = 0.0
+_management_clients = {}
+_client_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=PUSH_WORKERS)
+
+@profiled
+def lambda_handler(event, context):
+    """
+    Handle WebSocket route events from API Gateway and DynamoDB stream batches
+    """
+    
+    try:
+        route_key = (event.get('requestContext') or {}).get('routeKey')
+        if route_key:
+            return handle_route(route_key, event)
+            
+        if 'Records' in event:
+            return handle_stream_batch(event['Records'])
+            
+        print(f"Unrecognised event: {json.dumps(event, default=str)}")
+        return {'statusCode': 400}
+        
+    except Exception as e:
+        # Live updates are superseded within seconds, so a failed stream batch is not retried
+        print(f"Error handling live update event: {str(e)}")
+        return {'statusCode': 500}
+
+def handle_route(route_key, event):
+    """$connect / subscribe / $disconnect"""
+    
+    request_context = event['requestContext']
+    connection_id = request_context['connectionId']
+    
+    if route_key == '$connect':
+        query_params = event.get('queryStringParameters') or {}
+        endpoint = f"https://{request_context['domainName']}/{request_context['stage']}"
+        register_connection(connection_id, endpoint)
+        if query_params.get('patientIds') or query_params.get('all'):
+            update_subscription(connection_id, split_patient_ids(query_params.get('patientIds')),
+                                query_params.get('all', '').lower() == 'true')
+        return {'statusCode': 200}
+        
+    if route_key == '$disconnect':
+        connections_table.delete_item(Key={'ConnectionId': connection_id})
+        print(f"Connection {connection_id} closed")
+        return {'statusCode': 200}
+        
+    if route_key == 'subscribe':
+        try:
+            body = json.loads(event.get('body') or '{}')
+        except ValueError:
+            return {'statusCode': 400, 'body': 'Message body must be JSON'}
+            
+        patient_ids = body.get('patientIds') or []
+        if isinstance(patient_ids, str):
+            patient_ids = split_patient_ids(patient_ids)
+        if len(patient_ids) > MAX_SUBSCRIBED_PATIENTS:
+            return {'statusCode': 400, 'body': f'At most {MAX_SUBSCRIBED_PATIENTS} patients per connection'}
+            
+        update_subscription(connection_id, patient_ids, bool(body.get('all')))
+        return {'statusCode': 200}
+        
+    return {'statusCode': 400, 'body': 'Unknown action; send {"action": "subscribe", ...}'}
+
+def split_patient_ids(value):
+    return [pid.strip() for pid in (value or '').split(',') if pid.strip()]
+
+def register_connection(connection_id, endpoint):
+    """Record a new dashboard connection (subscribed to nothing yet)"""
+    
+    now = datetime.utcnow()
+    connections_table.put_item(Item={
+        'ConnectionId': connection_id,
+        'Endpoint': endpoint,
+        'AllPatients': False,
+        'ConnectedAt': now.isoformat() + 'Z',
+        'TTL': int((now + timedelta(hours=CONNECTION_TTL_HOURS)).timestamp())
+    })
+    print(f"Connection {connection_id} opened via {endpoint}")
+
+def update_subscription(connection_id, patient_ids, all_patients):
+    """Replace the patients a connection follows"""
+    
+    update_expression = 'SET AllPatients = :all'
+    values = {':all': all_patients}
+    if patient_ids:
+        update_expression += ', PatientIds = :patients'
+        values[':patients'] = list(dict.fromkeys(patient_ids))
+    else:
+        update_expression += ' REMOVE PatientIds'
+        
+    connections_table.update_item(
+        Key={'ConnectionId': connection_id},
+        UpdateExpression=update_expression,
+        ConditionExpression='attribute_exists(ConnectionId)',
+        ExpressionAttributeValues=values
+    )
+    print(f"Connection {connection_id} subscribed to {'all patients' if all_patients else f'{len(patient_ids)} patients'}")
+
+def handle_stream_batch(records):
+    """Coalesce one stream batch and push it to subscribed dashboards"""
+    
+    started = time.time()
+    updates, lags = coalesce_stream_records(records)
+    if not updates:
+        return {'pushed': 0}
+        
+    deliveries = {}
+    for connection in get_subscriptions():
+        if connection['all']:
+            matched = list(updates.values())
+        else:
+            matched = [update for update in updates.values() if update['p'] in connection['patients']]
+        if matched:
+            deliveries[connection['id']] = (connection['endpoint'], matched)
+            
+    results = list(_executor.map(lambda item: push_updates(item[0], *item[1]), deliveries.items()))
+    pushed = sum(1 for result in results if result)
+    
+    emit_metrics({
+        'LiveUpdateLag': (lags, 'Milliseconds'),
+        'LiveUpdatesCoalesced': (len(records) - len(updates), 'Count'),
+        'LiveMessagesPushed': (pushed, 'Count'),
+        'LiveMessagesFailed': (len(results) - pushed, 'Count'),
+        'LiveFanOutTime': ((time.time() - started) * 1000, 'Milliseconds')
+    })
+    print(f"Pushed {len(updates)} updates from {len(records)} stream records to {pushed} connections")
+    return {'pushed': pushed}
+
+def coalesce_stream_records(records):
+    """
+    Latest compact update per patient (per alert for AlertHistory), in stream
+    order. Also returns each record's ingest-to-now lag in milliseconds.
+    """
+    
+    updates = {}
+    lags = []
+    now = time.time()
+    
+    for record in records:
+        table_name = stream_table_name(record.get('eventSourceARN', ''))
+        stream_record = record.get('dynamodb') or {}
+        
+        created = stream_record.get('ApproximateCreationDateTime')
+        if created is not None:
+            lags.append(max(now - float(created), 0) * 1000)
+            
+        if table_name in VITAL_SIGNS_TABLES:
+            if record.get('eventName') == 'REMOVE':
+                continue  # TTL expiry or compaction, not news
+            # Both item schemas are followed while the v1 table is being retired
+            update = compact_vital_signs(vital_schema.expand_item(deserialize(stream_record.get('NewImage'))))
+            key = ('vitals', update['p'])
+            previous = updates.get(key)
+            if previous:
+                # Keep the newest reading; count how many this one stands for
+                update['n'] = previous.get('n', 1) + 1
+                if previous['t'] > update['t']:
+                    previous['n'] = update['n']
+                    continue
+        elif table_name == PATIENT_RECORDS_TABLE:
+            if record.get('eventName') == 'REMOVE':
+                keys = deserialize(stream_record.get('Keys'))
+                update = {'k': 'patient', 'p': keys['PatientId'], 'removed': True}
+            else:
+                update = compact_patient(deserialize(stream_record.get('NewImage')))
+            key = ('patient', update['p'])
+        elif table_name == ALERT_HISTORY_TABLE:
+            if record.get('eventName') == 'REMOVE':
+                continue
+            update = compact_alert(deserialize(stream_record.get('NewImage')))
+            key = ('alert', update['id'])
+        else:
+            print(f"Skipping record from unexpected source {record.get('eventSourceARN')}")
+            continue
+            
+        # Re-insert so the update sits at its latest stream position
+        updates.pop(key, None)
+        updates[key] = update
+        
+    return updates, lags
+
+def stream_table_name(event_source_arn):
+    # arn:aws:dynamodb:<region>:<account>:table/<name>/stream/<label>
+    if ':table/' not in event_source_arn:
+        return ''
+    return event_source_arn.split(':table/', 1)[1].split('/', 1)[0]
+
+def deserialize(image):
+    return {name: deserializer.deserialize(value) for name, value in (image or {}).items()}
+
+def compact_vital_signs(item):
+    """Short keys for the fields a dashboard shows"""
+    
+    return {
+        'k': 'vitals',
+        'p': item['PatientId'],
+        't': item['Timestamp'],
+        'hr': to_number(item.get('HeartRate')),
+        'sbp': to_number(item.get('SystolicBP')),
+        'dbp': to_number(item.get('DiastolicBP')),
+        'temp': to_number(item.get('Temperature')),
+        'spo2': to_number(item.get('OxygenSaturation')),
+        'room': item.get('RoomNumber')
+    }
+
+def compact_patient(item):
+    return {
+        'k': 'patient',
+        'p': item['PatientId'],
+        'name': item.get('Name'),
+        'room': item.get('RoomNumber'),
+        'status': item.get('Status'),
+        'condition': item.get('Condition')
+    }
+
+def compact_alert(item):
+    return {
+        'k': 'alert',
+        'id': item['AlertId'],
+        'p': item.get('PatientId'),
+        't': item.get('Timestamp'),
+        'type': item.get('AlertType'),
+        'status': item.get('Status'),
+        'msg': item.get('Message'),
+        'vitals': {name: to_number(value) for name, value in (item.get('VitalSigns') or {}).items()},
+        'room': item.get('RoomNumber')
+    }
+
+def to_number(value):
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    return value
+
+def get_subscriptions():
+    """Open connections and what they follow, refreshed every SUBSCRIPTION_REFRESH_SECONDS"""
+    
+    global _subscriptions, _subscriptions_loaded_at
+    
+    if time.time() - _subscriptions_loaded_at < SUBSCRIPTION_REFRESH_SECONDS:
+        return _subscriptions
+        
+    # One item per open dashboard, so the table stays small
+    scan_kwargs = {
+        'ProjectionExpression': 'ConnectionId, Endpoint, AllPatients, PatientIds'
+    }
+    subscriptions = []
+    while True:
+        response = connections_table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            subscriptions.append({
+                'id': item['ConnectionId'],
+                'endpoint': item.get('Endpoint'),
+                'all': bool(item.get('AllPatients')),
+                'patients': set(item.get('PatientIds') or [])
+            })
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        
+    _subscriptions = subscriptions
+    _subscriptions_loaded_at = time.time()
+    return subscriptions
+
+def get_management_client(endpoint):
+    endpoint = WEBSOCKET_MANAGEMENT_ENDPOINT or endpoint
+    with _client_lock:
+        client = _management_clients.get(endpoint)
+        if client is None:
+            client = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint, config=management_config)
+            _management_clients[endpoint] = client
+        return client
+
+def push_updates(connection_id, endpoint, updates):
+    """Post updates to one connection; drops the connection if it has gone away"""
+    
+    client = get_management_client(endpoint)
+    try:
+        for message in build_messages(updates):
+            client.post_to_connection(ConnectionId=connection_id, Data=message)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'GoneException':
+            print(f"Connection {connection_id} is gone, removing it")
+            connections_table.delete_item(Key={'ConnectionId': connection_id})
+            remove_cached_connection(connection_id)
+        else:
+            print(f"Error pushing to connection {connection_id}: {str(e)}")
+        return False
+
+def remove_cached_connection(connection_id):
+    global _subscriptions
+    _subscriptions = [connection for connection in _subscriptions if connection['id'] != connection_id]
+
+def build_messages(updates):
+    """Encode updates as few messages as the frame size allows"""
+    
+    sent_at = int(time.time() * 1000)
+    messages = []
+    batch = []
+    size = 0
+    for update in updates:
+        encoded = json.dumps(update, separators=(',', ':'), default=str)
+        if batch and size + len(encoded) > MAX_MESSAGE_BYTES:
+            messages.append(encode_message(batch, sent_at))
+            batch, size = [], 0
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        messages.append(encode_message(batch, sent_at))
+    return messages
+
+def encode_message(encoded_updates, sent_at):
+    return ('{"sentAt":%d,"updates":[%s]}' % (sent_at, ','.join(encoded_updates))).encode('utf-8')
\ No newline at end of file
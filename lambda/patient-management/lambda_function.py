@@ -1,9 +1,17 @@
 # lambda/patient-management/lambda_function.py
 import json
 import boto3
-from decimal import Decimal
+import base64
+import csv
+import io
+import itertools
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
 import os
+from botocore.exceptions import ClientError
+
+import patient_roster
+from profiling import profiled
 
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
@@ -16,6 +24,14 @@ ALERT_CONFIG_TABLE = os.environ['ALERT_CONFIG_TABLE']
 patient_table = dynamodb.Table(PATIENT_RECORDS_TABLE)
 alert_config_table = dynamodb.Table(ALERT_CONFIG_TABLE)
 
+# Bulk import limits
+MAX_IMPORT_ROWS = 1000
+IMPORT_CHUNK_SIZE = 100  # BatchGetItem key limit
+REQUIRED_PATIENT_FIELDS = ['PatientId', 'Name', 'Age', 'Gender', 'RoomNumber']
+STRING_PATIENT_FIELDS = ['PatientId', 'Name', 'Gender', 'RoomNumber', 'Status', 'Condition', 'AdmissionDate',
+                         'EmergencyContact', 'MedicalHistory', 'Allergies']
+
+@profiled
 def lambda_handler(event, context):
     """
     Handle patient management API requests
@@ -41,6 +57,8 @@ def lambda_handler(event, context):
                 return get_all_patients(event.get('queryStringParameters', {}))
                 
         elif http_method == 'POST':
+            if path.rstrip('/').endswith('/patients/import'):
+                return import_patients(event)
             return create_patient(json.loads(event['body']))
             
         elif http_method == 'PUT':
@@ -121,39 +139,22 @@ def create_patient(patient_data):
     
     try:
         # Validate required fields
-        required_fields = ['PatientId', 'Name', 'Age', 'Gender', 'RoomNumber']
-        for field in required_fields:
+        for field in REQUIRED_PATIENT_FIELDS:
             if field not in patient_data:
                 return create_error_response(400, f"Missing required field: {field}")
         
-        # Check if patient already exists
-        existing_patient = patient_table.get_item(
-            Key={'PatientId': patient_data['PatientId']}
-        )
-        
-        if 'Item' in existing_patient:
-            return create_error_response(409, f"Patient {patient_data['PatientId']} already exists")
-        
-        # Prepare patient item
-        patient_item = {
-            'PatientId': patient_data['PatientId'],
-            'Name': patient_data['Name'],
-            'Age': Decimal(str(patient_data['Age'])),
-            'Gender': patient_data['Gender'],
-            'RoomNumber': patient_data['RoomNumber'],
-            'Status': patient_data.get('Status', 'Active'),
-            'Condition': patient_data.get('Condition', 'Stable'),
-            'AdmissionDate': patient_data.get('AdmissionDate', datetime.now().isoformat()),
-            'EmergencyContact': patient_data.get('EmergencyContact', ''),
-            'MedicalHistory': patient_data.get('MedicalHistory', ''),
-            'Allergies': patient_data.get('Allergies', ''),
-            'CurrentMedications': patient_data.get('CurrentMedications', []),
-            'CreatedAt': datetime.now().isoformat(),
-            'UpdatedAt': datetime.now().isoformat()
-        }
+        patient_item = build_patient_item(patient_data)
         
-        # Store patient
-        patient_table.put_item(Item=patient_item)
+        # Store patient, failing if it already exists (saves a separate get_item)
+        try:
+            patient_table.put_item(
+                Item=patient_item,
+                ConditionExpression='attribute_not_exists(PatientId)'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return create_error_response(409, f"Patient {patient_data['PatientId']} already exists")
+            raise
         
         # Create default alert configurations
         create_default_alert_configs(patient_data['PatientId'])
@@ -167,6 +168,205 @@ def create_patient(patient_data):
         print(f"Error creating patient: {str(e)}")
         return create_error_response(500, f"Error creating patient: {str(e)}")
 
+def build_patient_item(patient_data):
+    """Build the DynamoDB item for a new patient from validated input"""
+    
+    now = datetime.now().isoformat()
+    return patient_roster.set_roster_shard({
+        'PatientId': patient_data['PatientId'],
+        'Name': patient_data['Name'],
+        'Age': Decimal(str(patient_data['Age'])),
+        'Gender': patient_data['Gender'],
+        'RoomNumber': patient_data['RoomNumber'],
+        'Status': patient_data.get('Status') or 'Active',
+        'Condition': patient_data.get('Condition') or 'Stable',
+        'AdmissionDate': patient_data.get('AdmissionDate') or now,
+        'EmergencyContact': patient_data.get('EmergencyContact', ''),
+        'MedicalHistory': patient_data.get('MedicalHistory', ''),
+        'Allergies': patient_data.get('Allergies', ''),
+        'CurrentMedications': patient_data.get('CurrentMedications', []),
+        'CreatedAt': now,
+        'UpdatedAt': now
+    })
+
+def import_patients(event):
+    """Bulk-admit patients from a JSON array or CSV body, returning a per-row report"""
+    
+    try:
+        # Read at most one row past the limit, so an oversized import is refused before any write
+        rows = list(itertools.islice(parse_import_body(event), MAX_IMPORT_ROWS + 1))
+    except (ValueError, csv.Error) as e:
+        return create_error_response(400, f"Invalid import body: {str(e)}")
+    
+    if len(rows) > MAX_IMPORT_ROWS:
+        return create_error_response(413, f"Import is limited to {MAX_IMPORT_ROWS} rows")
+    
+    # A field of the wrong type fails the whole import before anything is written
+    for row_number, row in enumerate(rows, start=1):
+        type_error = import_row_type_error(row)
+        if type_error:
+            return create_error_response(400, f"Invalid import row {row_number}: {type_error}")
+    
+    results = []
+    seen_ids = set()
+    valid_rows = []
+    
+    for row_number, row in enumerate(rows, start=1):
+        patient_data, error = validate_import_row(row)
+        if error:
+            results.append(import_result(row_number, row, 'invalid', error))
+            continue
+        
+        if patient_data['PatientId'] in seen_ids:
+            results.append(import_result(row_number, row, 'duplicate', 'PatientId repeated in import'))
+            continue
+        seen_ids.add(patient_data['PatientId'])
+        valid_rows.append((row_number, patient_data))
+    
+    try:
+        # Write in BatchGetItem-sized chunks
+        for start in range(0, len(valid_rows), IMPORT_CHUNK_SIZE):
+            results.extend(import_patient_chunk(valid_rows[start:start + IMPORT_CHUNK_SIZE]))
+        
+    except Exception as e:
+        print(f"Error importing patients: {str(e)}")
+        return create_error_response(500, f"Error importing patients: {str(e)}")
+    
+    results.sort(key=lambda result: result['row'])
+    summary = {'total': len(results)}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    
+    return create_success_response({
+        'message': f"Imported {summary.get('created', 0)} of {len(results)} patients",
+        'summary': summary,
+        'results': results
+    })
+
+def parse_import_body(event):
+    """Return an iterator of row dicts from a JSON array or CSV request body"""
+    
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    content_type = headers.get('content-type', '')
+    stripped = body.lstrip()
+    
+    if not stripped:
+        raise ValueError("empty body")
+    
+    if 'csv' in content_type or not stripped.startswith(('[', '{')):
+        return csv.DictReader(io.StringIO(body))
+    
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get('patients', [])
+    if not isinstance(data, list):
+        raise ValueError("expected a JSON array of patients")
+    return iter(data)
+
+def import_row_type_error(row):
+    """Describe a field of the wrong type in an import row, or None"""
+    
+    if not isinstance(row, dict):
+        return None  # reported as an invalid row
+    
+    for field in STRING_PATIENT_FIELDS:
+        if row.get(field) is not None and not isinstance(row[field], str):
+            return f"{field} must be a string"
+    
+    age = row.get('Age')
+    if age is not None and (isinstance(age, bool) or not isinstance(age, (int, float, str))):
+        return "Age must be a number"
+    
+    medications = row.get('CurrentMedications')
+    if medications is not None and not (isinstance(medications, str) or
+                                        (isinstance(medications, list) and all(isinstance(m, str) for m in medications))):
+        return "CurrentMedications must be a list of strings"
+    return None
+
+def validate_import_row(row):
+    """Validate and normalise one import row; returns (patient_data, error)"""
+    
+    if not isinstance(row, dict):
+        return None, "Row is not an object"
+    
+    patient_data = {key.strip(): value.strip() if isinstance(value, str) else value
+                    for key, value in row.items() if key and value not in (None, '')}
+    
+    for field in REQUIRED_PATIENT_FIELDS:
+        if field not in patient_data:
+            return None, f"Missing required field: {field}"
+    
+    try:
+        age = Decimal(str(patient_data['Age']))
+    except InvalidOperation:
+        return None, f"Invalid Age: {patient_data['Age']}"
+    if not age.is_finite() or age < 0 or age > 150:
+        return None, f"Invalid Age: {patient_data['Age']}"
+    
+    # CSV rows carry medications as a semicolon separated list
+    medications = patient_data.get('CurrentMedications')
+    if isinstance(medications, str):
+        patient_data['CurrentMedications'] = [m.strip() for m in medications.split(';') if m.strip()]
+    
+    return patient_data, None
+
+def import_patient_chunk(chunk):
+    """Skip patients that already exist, then batch-write the rest with their configs"""
+    
+    existing_ids = get_existing_patient_ids([data['PatientId'] for _, data in chunk])
+    results = []
+    
+    with patient_table.batch_writer() as patient_batch, alert_config_table.batch_writer() as config_batch:
+        for row_number, patient_data in chunk:
+            patient_id = patient_data['PatientId']
+            
+            if patient_id in existing_ids:
+                results.append(import_result(row_number, patient_data, 'exists', f"Patient {patient_id} already exists"))
+                continue
+            
+            patient_batch.put_item(Item=build_patient_item(patient_data))
+            for config in build_default_alert_configs(patient_id):
+                config_batch.put_item(Item=config)
+            
+            results.append(import_result(row_number, patient_data, 'created'))
+    
+    return results
+
+def get_existing_patient_ids(patient_ids):
+    """Return the subset of patient IDs already present, using BatchGetItem"""
+    
+    request = {
+        PATIENT_RECORDS_TABLE: {
+            'Keys': [{'PatientId': patient_id} for patient_id in patient_ids],
+            'ProjectionExpression': 'PatientId'
+        }
+    }
+    existing = set()
+    
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(PATIENT_RECORDS_TABLE, []):
+            existing.add(item['PatientId'])
+        request = response.get('UnprocessedKeys') or None
+    
+    return existing
+
+def import_result(row_number, row, status, error=None):
+    """Build one entry of the import report"""
+    
+    result = {
+        'row': row_number,
+        'patientId': row.get('PatientId') if isinstance(row, dict) else None,
+        'status': status
+    }
+    if error:
+        result['error'] = error
+    return result
+
 def update_patient(patient_id, update_data):
     """Update an existing patient record"""
     
@@ -189,10 +389,13 @@ def update_patient(patient_id, update_data):
         updateable_fields = ['Name', 'Age', 'Gender', 'RoomNumber', 'Status', 'Condition', 
                            'EmergencyContact', 'MedicalHistory', 'Allergies', 'CurrentMedications']
         
+        # Name and Status are reserved words, so every field goes through a name placeholder
+        expression_names = {}
         for field in updateable_fields:
             if field in update_data:
                 field_key = f":{field.lower()}"
-                update_expression += f", {field} = {field_key}"
+                expression_names[f"#{field.lower()}"] = field
+                update_expression += f", #{field.lower()} = {field_key}"
                 
                 # Handle numeric fields
                 if field == 'Age' and isinstance(update_data[field], (int, float)):
@@ -200,12 +403,21 @@ def update_patient(patient_id, update_data):
                 else:
                     expression_values[field_key] = update_data[field]
         
+        # Keep the patient in the roster index only while active
+        if update_data.get('Status', existing_patient['Item'].get('Status')) == patient_roster.ACTIVE_STATUS:
+            update_expression += ", RosterShard = :roster_shard"
+            expression_values[':roster_shard'] = patient_roster.roster_shard(patient_id)
+        else:
+            update_expression += " REMOVE RosterShard"
+        
         # Update patient
+        update_kwargs = {'ExpressionAttributeNames': expression_names} if expression_names else {}
         response = patient_table.update_item(
             Key={'PatientId': patient_id},
             UpdateExpression=update_expression,
             ExpressionAttributeValues=expression_values,
-            ReturnValues='ALL_NEW'
+            ReturnValues='ALL_NEW',
+            **update_kwargs
         )
         
         updated_patient = convert_decimals(response['Attributes'])
@@ -234,7 +446,7 @@ def delete_patient(patient_id):
         # Instead of actually deleting, mark as inactive
         patient_table.update_item(
             Key={'PatientId': patient_id},
-            UpdateExpression="SET #status = :status, UpdatedAt = :updated_at",
+            UpdateExpression="SET #status = :status, UpdatedAt = :updated_at REMOVE RosterShard",
             ExpressionAttributeNames={'#status': 'Status'},
             ExpressionAttributeValues={
                 ':status': 'Inactive',
@@ -268,54 +480,36 @@ def get_patient_alert_configs(patient_id):
 def create_default_alert_configs(patient_id):
     """Create default alert configurations for a new patient"""
     
-    default_configs = [
-        {
-            'PatientId': patient_id,
-            'VitalType': 'heart_rate',
-            'ThresholdMin': Decimal('50'),
-            'ThresholdMax': Decimal('120'),
-            'AlertEnabled': True,
-            'CreatedAt': datetime.now().isoformat()
-        },
-        {
-            'PatientId': patient_id,
-            'VitalType': 'systolic_bp',
-            'ThresholdMin': Decimal('90'),
-            'ThresholdMax': Decimal('180'),
-            'AlertEnabled': True,
-            'CreatedAt': datetime.now().isoformat()
-        },
-        {
-            'PatientId': patient_id,
-            'VitalType': 'diastolic_bp',
-            'ThresholdMin': Decimal('50'),
-            'ThresholdMax': Decimal('120'),
-            'AlertEnabled': True,
-            'CreatedAt': datetime.now().isoformat()
-        },
-        {
-            'PatientId': patient_id,
-            'VitalType': 'temperature',
-            'ThresholdMin': Decimal('95.0'),
-            'ThresholdMax': Decimal('101.5'),
-            'AlertEnabled': True,
-            'CreatedAt': datetime.now().isoformat()
-        },
+    try:
+        with alert_config_table.batch_writer() as batch:
+            for config in build_default_alert_configs(patient_id):
+                batch.put_item(Item=config)
+    except Exception as e:
+        print(f"Error creating default alert configs: {str(e)}")
+
+def build_default_alert_configs(patient_id):
+    """Build the default alert configuration items for a patient"""
+    
+    created_at = datetime.now().isoformat()
+    default_thresholds = [
+        ('heart_rate', '50', '120'),
+        ('systolic_bp', '90', '180'),
+        ('diastolic_bp', '50', '120'),
+        ('temperature', '95.0', '101.5'),
+        ('oxygen_saturation', '90', '100')
+    ]
+    
+    return [
         {
             'PatientId': patient_id,
-            'VitalType': 'oxygen_saturation',
-            'ThresholdMin': Decimal('90'),
-            'ThresholdMax': Decimal('100'),
+            'VitalType': vital_type,
+            'ThresholdMin': Decimal(threshold_min),
+            'ThresholdMax': Decimal(threshold_max),
             'AlertEnabled': True,
-            'CreatedAt': datetime.now().isoformat()
+            'CreatedAt': created_at
         }
+        for vital_type, threshold_min, threshold_max in default_thresholds
     ]
-    
-    for config in default_configs:
-        try:
-            alert_config_table.put_item(Item=config)
-        except Exception as e:
-            print(f"Error creating default alert config: {str(e)}")
 
 def convert_decimals(obj):
     """Convert DynamoDB Decimal objects to float for JSON serialization"""
@@ -0,0 +1,87 @@
+# lambda/shared/alert_thresholds.py
+"""
+Per-patient alert thresholds compiled from AlertConfig items.
+
+A patient's configuration (ThresholdMin / ThresholdMax / AlertEnabled per
+VitalType) is flattened into parallel lists indexed by vital, so classifying
+a reading is a single pass over five numbers with no dictionary lookups or
+table reads. Vitals without a config item use the defaults that
+patient-management writes for new patients.
+
+Crossing a threshold sets the reading's status; it does not page on its own
+(vitals-processor pages on sustained window rules). Only a reading beyond
+the panic limits pages immediately.
+"""
+
+# AlertConfig VitalType -> field in the incoming reading, in evaluation order
+VITAL_TYPES = ['heart_rate', 'systolic_bp', 'diastolic_bp', 'temperature', 'oxygen_saturation']
+READING_FIELDS = ['heartRate', 'systolicBP', 'diastolicBP', 'temperature', 'oxygenSaturation']
+VITAL_INDEX = {vital_type: index for index, vital_type in enumerate(VITAL_TYPES)}
+
+# Critical conditions (require immediate attention) - overridable per patient
+DEFAULT_MIN = [50.0, 90.0, 50.0, 95.0, 90.0]
+DEFAULT_MAX = [120.0, 180.0, 120.0, 101.5, 100.0]
+
+# Warning conditions (require monitoring) - fixed bands
+WARNING_MIN = [60.0, 100.0, 60.0, 97.0, 95.0]
+WARNING_MAX = [100.0, 140.0, 90.0, 99.5, float('inf')]
+
+# Panic limits - a single reading beyond these pages at once. Never tighter
+# than a patient's own critical thresholds.
+PANIC_MIN = [40.0, 70.0, 40.0, 93.0, 85.0]
+PANIC_MAX = [150.0, 220.0, 130.0, 105.0, float('inf')]
+
+class PatientThresholds:
+    """Flat threshold arrays for one patient"""
+    
+    __slots__ = ('mins', 'maxs', 'enabled')
+    
+    def __init__(self):
+        self.mins = list(DEFAULT_MIN)
+        self.maxs = list(DEFAULT_MAX)
+        self.enabled = [True] * len(VITAL_TYPES)
+        
+    def apply_config(self, item):
+        """Fold one AlertConfig item into the arrays"""
+        
+        index = VITAL_INDEX.get(item.get('VitalType'))
+        if index is None:
+            return
+            
+        self.mins[index] = float(item['ThresholdMin']) if item.get('ThresholdMin') is not None else DEFAULT_MIN[index]
+        self.maxs[index] = float(item['ThresholdMax']) if item.get('ThresholdMax') is not None else DEFAULT_MAX[index]
+        self.enabled[index] = bool(item.get('AlertEnabled', True))
+        
+    def classify(self, values):
+        """'Critical', 'Warning' or 'Normal' for readings ordered like READING_FIELDS"""
+        
+        warning = False
+        for index, value in enumerate(values):
+            if not self.enabled[index]:
+                continue
+            if value < self.mins[index] or value > self.maxs[index]:
+                return 'Critical'
+            if value < WARNING_MIN[index] or value > WARNING_MAX[index]:
+                warning = True
+                
+        return 'Warning' if warning else 'Normal'
+        
+    def panic(self, values):
+        """Whether any enabled vital is beyond its panic limit"""
+        
+        for index, value in enumerate(values):
+            if not self.enabled[index]:
+                continue
+            if value < min(PANIC_MIN[index], self.mins[index]) or value > max(PANIC_MAX[index], self.maxs[index]):
+                return True
+        return False
+
+def compile_thresholds(items):
+    """Build a patient's thresholds from their AlertConfig items"""
+    
+    thresholds = PatientThresholds()
+    for item in items:
+        thresholds.apply_config(item)
+    return thresholds
+
+DEFAULT_THRESHOLDS = PatientThresholds()
\ No newline at end of file
@@ -0,0 +1,147 @@
+# lambda/shared/change_feed.py
+"""
+Change cursors for delta polling.
+
+Every write the dashboard cares about (a stored reading, a new alert, an alert
+status change) stamps the item with ChangedAt, the write time in epoch
+milliseconds. GSIs with ChangedAt as their sort key let the APIs answer
+"what changed since cursor X" with key-condition queries, so a poll reads only
+the items that actually changed.
+
+A cursor is the upper bound of the previous answer. That bound trails the
+clock by CHANGE_FEED_SETTLE_MS because GSIs are eventually consistent: an item
+written just before the query may not be visible in the index yet, and it must
+still be after the cursor handed to the client.
+"""
+import os
+import time
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
+
+CHANGE_FEED_SETTLE_MS = int(os.environ.get('CHANGE_FEED_SETTLE_MS', '2000'))
+# Cursors older than this are refused; the client reloads instead of replaying
+CHANGE_FEED_MAX_HOURS = int(os.environ.get('CHANGE_FEED_MAX_HOURS', '24'))
+
+HOUR_MS = 3600 * 1000
+
+def now_ms():
+    return int(time.time() * 1000)
+
+def change_stamp():
+    """Attributes to set on an item written now (ChangeBucket is used by hour-partitioned feeds)"""
+    
+    changed_at = now_ms()
+    return {'ChangedAt': changed_at, 'ChangeBucket': change_bucket(changed_at)}
+
+def change_bucket(changed_at):
+    return datetime.utcfromtimestamp(changed_at / 1000).strftime('%Y-%m-%dT%H')
+
+def change_buckets(since, until):
+    """(bucket, start ms) for each hour bucket covering (since, until]"""
+    
+    start = (since + 1) // HOUR_MS
+    end = until // HOUR_MS
+    return [(change_bucket(hour * HOUR_MS), hour * HOUR_MS) for hour in range(start, end + 1)]
+
+def current_cursor():
+    """Cursor for a full (non-delta) response: everything up to it has been read"""
+    
+    return str(now_ms() - CHANGE_FEED_SETTLE_MS)
+
+def parse_cursor(value):
+    """Validate a since= value; raises ValueError for malformed or expired cursors"""
+    
+    try:
+        since = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid since cursor: {value}")
+        
+    if since < 0:
+        raise ValueError(f"Invalid since cursor: {value}")
+    if since < now_ms() - CHANGE_FEED_MAX_HOURS * HOUR_MS:
+        raise ValueError(f"since cursor is older than {CHANGE_FEED_MAX_HOURS} hours; reload instead")
+    return since
+
+def query_changes(table, index_name, key_condition, since, until, limit, changed_attribute='ChangedAt'):
+    """
+    Items of one index partition with since < ChangedAt <= until, oldest first.
+    Returns (items, cursor, has_more). changed_attribute names the index sort
+    key on tables that abbreviate it.
+    """
+    
+    if since >= until:
+        return [], str(since), False
+        
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition(since + 1, until),
+        'ScanIndexForward': True
+    }
+    
+    items = []
+    while True:
+        response = table.query(Limit=limit + 1 - len(items), **query_kwargs)
+        items.extend(response.get('Items', []))
+        if len(items) > limit or 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        
+    if len(items) <= limit:
+        return items, str(until), False
+        
+    last_changed = int(items[limit - 1][changed_attribute])
+    if last_changed == since + 1 and int(items[limit][changed_attribute]) == last_changed:
+        # More than limit items share the first millisecond after since; a
+        # cursor cannot split a millisecond, so all of them are returned
+        query_kwargs['KeyConditionExpression'] = key_condition(last_changed, last_changed)
+        query_kwargs.pop('ExclusiveStartKey', None)
+        items = []
+        while True:
+            response = table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return items, str(last_changed), last_changed < until
+        
+    return truncate_changes(items, since, limit, changed_attribute)
+
+def query_bucketed_changes(table, index_name, since, until, limit):
+    """
+    query_changes over an index partitioned by hour (ChangeBucket). Buckets
+    are read oldest first, so the combined list is already in ChangedAt order
+    and a steady-state poll touches only the current hour.
+    """
+    
+    items = []
+    for bucket, bucket_start in change_buckets(since, until):
+        if len(items) >= limit:
+            # Everything before this hour has been returned
+            return items, str(bucket_start - 1), True
+            
+        def key_condition(lower, upper, bucket=bucket):
+            return Key('ChangeBucket').eq(bucket) & Key('ChangedAt').between(lower, upper)
+            
+        bucket_items, cursor, has_more = query_changes(table, index_name, key_condition, since, until, limit - len(items))
+        items.extend(bucket_items)
+        if has_more:
+            return items, cursor, True
+            
+    return items, str(max(since, until)), False
+
+def truncate_changes(items, since, limit, changed_attribute='ChangedAt'):
+    """
+    Cut an oldest-first list of more than limit changes down to limit.
+    If the cut falls between items written in the same millisecond, the
+    cursor stops one millisecond earlier so those items are returned again
+    next poll rather than skipped; clients de-duplicate on the item key.
+    query_changes handles a cut inside the first millisecond after since,
+    where stopping earlier would leave the cursor at since.
+    """
+    
+    last_changed = int(items[limit - 1][changed_attribute])
+    if int(items[limit][changed_attribute]) != last_changed:
+        return items[:limit], str(last_changed), True
+        
+    cursor = last_changed - 1
+    return [item for item in items[:limit] if int(item[changed_attribute]) <= cursor], str(cursor), True
\ No newline at end of file
@@ -0,0 +1,45 @@
+# lambda/shared/config_version.py
+"""
+Fan-out of AlertConfig changes to vitals-processor containers.
+
+alert-management is the AlertConfig stream's only reader. For each batch of
+stream records it bumps one version item in the PatientState table, noting
+which patients changed at that version; the last CONFIG_VERSION_HISTORY
+versions are kept. A processor container reads the item at most once per
+CONFIG_SYNC_INTERVAL_SECONDS and drops the cached thresholds of patients
+changed since the version it last saw, or all of them if it has fallen
+further behind than the history reaches.
+"""
+import os
+
+CONFIG_VERSION_KEY = {'PatientId': 'CONFIG', 'StateKey': 'ALERT_CONFIG'}
+CONFIG_VERSION_HISTORY = int(os.environ.get('CONFIG_VERSION_HISTORY', '50'))
+
+def next_version_item(item, patient_ids):
+    """Version item recording patient_ids as changed at the next version"""
+    
+    version = int(item.get('Version', 0)) + 1 if item else 1
+    changes = list(item.get('Changes', [])) if item else []
+    changes.append({'Version': version, 'PatientIds': sorted(patient_ids)})
+    
+    new_item = dict(CONFIG_VERSION_KEY)
+    new_item.update({'Version': version, 'Changes': changes[-CONFIG_VERSION_HISTORY:]})
+    return new_item
+
+def changed_since(item, version):
+    """
+    Patient ids changed after version, or None when the kept history no longer
+    reaches back that far
+    """
+    
+    if int(item.get('Version', 0)) <= version:
+        return set()
+        
+    changes = item.get('Changes', [])
+    if not changes or int(changes[0]['Version']) > version + 1:
+        return None
+    return {
+        patient_id
+        for change in changes if int(change['Version']) > version
+        for patient_id in change['PatientIds']
+    }
\ No newline at end of file
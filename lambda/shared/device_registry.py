@@ -0,0 +1,140 @@
+# lambda/shared/device_registry.py
+"""
+Device fleet health registry: one DeviceRegistry item per sensor.
+
+vitals-processor folds each batch's readings into the entry of every device
+that sent them (last seen, EWMA battery and signal strength, an EWMA share
+of each dataQuality level) and writes each entry once per batch. Writes are
+conditional on the Version read, and readings no newer than LastSeenMs are
+ignored, so redelivered batches and concurrent writers never double count.
+
+Every item carries Fleet = FLEET, the hash key of FleetIndex, so vitals-api
+reads the whole fleet with one query instead of walking device histories.
+"""
+import os
+from decimal import Decimal
+
+DEVICE_EWMA_ALPHA = float(os.environ.get('DEVICE_EWMA_ALPHA', '0.2'))
+DEVICE_LOW_BATTERY_PERCENT = float(os.environ.get('DEVICE_LOW_BATTERY_PERCENT', '25'))
+DEVICE_WEAK_SIGNAL_PERCENT = float(os.environ.get('DEVICE_WEAK_SIGNAL_PERCENT', '75'))
+# Share of recent readings at a degraded quality level that flags a device
+DEVICE_POOR_QUALITY_SHARE = float(os.environ.get('DEVICE_POOR_QUALITY_SHARE', '0.5'))
+# Devices silent for longer than this are reported offline
+DEVICE_OFFLINE_MINUTES = int(os.environ.get('DEVICE_OFFLINE_MINUTES', '15'))
+DEVICE_RETENTION_DAYS = int(os.environ.get('DEVICE_RETENTION_DAYS', '30'))
+
+FLEET = 'fleet'
+FLEET_INDEX = 'FleetIndex'
+DEGRADED_QUALITY_LEVELS = {'Fair', 'Poor'}
+
+class DeviceHealth:
+    """Rolling health of one device"""
+    
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.version = 0
+        self.last_seen_ms = 0
+        self.reading_count = 0
+        self.battery = None
+        self.signal = None
+        self.quality = {}
+        self.last_reading = {}
+        
+    def add_readings(self, readings):
+        """
+        Fold in (epoch ms, reading) pairs newer than the last one seen, oldest
+        first. Returns how many were applied.
+        """
+        
+        applied = 0
+        for reading_ms, data in sorted(readings, key=lambda reading: reading[0]):
+            if reading_ms <= self.last_seen_ms:
+                continue
+                
+            # Plain running average for the first readings, so a new device is not biased to its first value
+            alpha = max(DEVICE_EWMA_ALPHA, 1.0 / (self.reading_count + 1))
+            battery = data.get('sensorBatteryLevel')
+            if battery is not None:
+                self.battery = float(battery) if self.battery is None else self.battery + alpha * (float(battery) - self.battery)
+            signal = data.get('signalStrength')
+            if signal is not None:
+                self.signal = float(signal) if self.signal is None else self.signal + alpha * (float(signal) - self.signal)
+            quality = data.get('dataQuality')
+            if quality:
+                self.quality = {level: share * (1 - alpha) for level, share in self.quality.items()}
+                self.quality[quality] = self.quality.get(quality, 0.0) + alpha
+                
+            self.last_seen_ms = reading_ms
+            self.last_reading = data
+            self.reading_count += 1
+            applied += 1
+            
+        return applied
+        
+    def issues(self, now_ms=None):
+        """Reasons the device needs attention; OFFLINE only when now_ms is given"""
+        
+        issues = []
+        if self.battery is not None and self.battery < DEVICE_LOW_BATTERY_PERCENT:
+            issues.append('LOW_BATTERY')
+        if self.signal is not None and self.signal < DEVICE_WEAK_SIGNAL_PERCENT:
+            issues.append('WEAK_SIGNAL')
+        if sum(self.quality.get(level, 0.0) for level in DEGRADED_QUALITY_LEVELS) >= DEVICE_POOR_QUALITY_SHARE:
+            issues.append('POOR_QUALITY')
+        if now_ms is not None and now_ms - self.last_seen_ms > DEVICE_OFFLINE_MINUTES * 60 * 1000:
+            issues.append('OFFLINE')
+        return issues
+        
+    def to_item(self, updated_ms):
+        issues = self.issues()
+        item = {
+            'DeviceId': self.device_id,
+            'Fleet': FLEET,
+            'Version': self.version + 1,
+            'LastSeenMs': self.last_seen_ms,
+            'LastSeen': self.last_reading.get('timestamp'),
+            'ReadingCount': self.reading_count,
+            'Quality': {level: _decimal(share, 4) for level, share in self.quality.items()},
+            'Issues': issues,
+            'HealthStatus': 'ATTENTION' if issues else 'OK',
+            'UpdatedAt': updated_ms,
+            'TTL': updated_ms // 1000 + DEVICE_RETENTION_DAYS * 86400
+        }
+        if self.battery is not None:
+            item['Battery'] = _decimal(self.battery, 2)
+        if self.signal is not None:
+            item['Signal'] = _decimal(self.signal, 2)
+            
+        # Latest raw values and where the device was, for the fleet view
+        for attribute, field in (('PatientId', 'patientId'), ('RoomNumber', 'roomNumber'),
+                                 ('LastBattery', 'sensorBatteryLevel'), ('LastSignal', 'signalStrength'),
+                                 ('LastQuality', 'dataQuality')):
+            value = self.last_reading.get(field)
+            if value is not None:
+                item[attribute] = Decimal(str(value)) if isinstance(value, (int, float)) else value
+                
+        return {key: value for key, value in item.items() if value is not None}
+        
+    @classmethod
+    def from_item(cls, device_id, item):
+        device = cls(device_id)
+        if not item:
+            return device
+            
+        device.version = int(item.get('Version', 0))
+        device.last_seen_ms = int(item.get('LastSeenMs', 0))
+        device.reading_count = int(item.get('ReadingCount', 0))
+        device.battery = float(item['Battery']) if 'Battery' in item else None
+        device.signal = float(item['Signal']) if 'Signal' in item else None
+        device.quality = {level: float(share) for level, share in item.get('Quality', {}).items()}
+        device.last_reading = {
+            field: item[attribute]
+            for attribute, field in (('LastSeen', 'timestamp'), ('PatientId', 'patientId'),
+                                     ('RoomNumber', 'roomNumber'), ('LastBattery', 'sensorBatteryLevel'),
+                                     ('LastSignal', 'signalStrength'), ('LastQuality', 'dataQuality'))
+            if attribute in item
+        }
+        return device
+
+def _decimal(value, places):
+    return Decimal(str(round(value, places)))
\ No newline at end of file
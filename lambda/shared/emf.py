@@ -0,0 +1,68 @@
+# lambda/shared/emf.py
+"""
+CloudWatch Embedded Metric Format (EMF) helpers.
+
+Metrics are written as structured log lines that CloudWatch Logs turns into
+metrics asynchronously, so handlers never make PutMetricData calls.
+"""
+import json
+import os
+import time
+
+DEFAULT_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'VitalSignsMonitoring/Pipeline')
+
+# EMF accepts at most 100 values per metric per log line
+MAX_VALUES_PER_METRIC = 100
+
+def emit_metrics(metrics, dimensions=None, namespace=None, properties=None):
+    """
+    Print EMF log lines for a set of metrics.
+    metrics maps name -> (value or list of values, unit). Lists become
+    multiple samples of the same metric, so percentiles stay exact.
+    """
+    
+    dimensions = dict(dimensions or {})
+    if 'FunctionName' not in dimensions and os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+        dimensions['FunctionName'] = os.environ['AWS_LAMBDA_FUNCTION_NAME']
+        
+    series = {}
+    units = {}
+    for name, (values, unit) in metrics.items():
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        values = [round(float(value), 3) for value in values if value is not None]
+        if values:
+            series[name] = values
+            units[name] = unit
+            
+    if not series:
+        return
+        
+    # Split into as many lines as needed to respect the per-line value limit
+    chunk = 0
+    while True:
+        line_metrics = {}
+        for name, values in series.items():
+            part = values[chunk * MAX_VALUES_PER_METRIC:(chunk + 1) * MAX_VALUES_PER_METRIC]
+            if part:
+                line_metrics[name] = part if len(part) > 1 else part[0]
+                
+        if not line_metrics:
+            return
+            
+        log_line = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace or DEFAULT_NAMESPACE,
+                    'Dimensions': [list(dimensions.keys())],
+                    'Metrics': [{'Name': name, 'Unit': units[name]} for name in line_metrics]
+                }]
+            }
+        }
+        log_line.update(dimensions)
+        log_line.update(properties or {})
+        log_line.update(line_metrics)
+        
+        print(json.dumps(log_line, separators=(',', ':'), default=str))
+        chunk += 1
\ No newline at end of file
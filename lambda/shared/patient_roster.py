@@ -0,0 +1,61 @@
+# lambda/shared/patient_roster.py
+"""
+Sparse, sharded index of active patients.
+
+Only a patient whose Status is Active carries RosterShard, so RosterIndex
+(RosterShard + UpdatedAt) holds active patients and nothing else. The shard
+is derived from the PatientId and spreads the roster over ROSTER_SHARDS
+index partitions instead of one hot 'Active' key. Every writer of a patient
+item sets or removes RosterShard together with Status; ROSTER_SHARDS must be
+the same for every function.
+
+A patient who leaves Active drops out of the index, so a delta read (changed
+since a watermark) sees admissions and updates but not departures; those are
+caught by the next full read.
+"""
+import os
+import zlib
+
+from boto3.dynamodb.conditions import Key
+
+ROSTER_INDEX = 'RosterIndex'
+ROSTER_SHARDS = int(os.environ.get('ROSTER_SHARDS', '8'))
+ACTIVE_STATUS = 'Active'
+
+def roster_shard(patient_id):
+    return f"ACTIVE#{zlib.crc32(str(patient_id).encode('utf-8')) % ROSTER_SHARDS}"
+
+def set_roster_shard(item):
+    """Add or drop RosterShard on a whole patient item to match its Status"""
+    
+    if item.get('Status') == ACTIVE_STATUS:
+        item['RosterShard'] = roster_shard(item['PatientId'])
+    else:
+        item.pop('RosterShard', None)
+    return item
+
+def query_active_patients(table, updated_since=None):
+    """
+    Active patients from every roster shard, or only those updated after
+    updated_since (an UpdatedAt value), following pagination
+    """
+    
+    patients = []
+    for shard in range(ROSTER_SHARDS):
+        key_condition = Key('RosterShard').eq(f"ACTIVE#{shard}")
+        if updated_since:
+            key_condition = key_condition & Key('UpdatedAt').gt(updated_since)
+        query_kwargs = {
+            'IndexName': ROSTER_INDEX,
+            'KeyConditionExpression': key_condition
+        }
+        
+        while True:
+            response = table.query(**query_kwargs)
+            patients.extend(response.get('Items', []))
+            
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            
+    return patients
\ No newline at end of file
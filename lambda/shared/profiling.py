@@ -0,0 +1,230 @@
+# lambda/shared/profiling.py
+"""
+Opt-in per-invocation profiling for Lambda handlers.
+
+Wrap a handler with @profiled. HANDLER_PROFILING turns it on, as a comma
+separated list of modes (or 'all'):
+
+    cpu     cProfile of the handler thread (worker threads are not seen)
+    memory  tracemalloc peak and top allocation sites
+    aws     count and wall time of every AWS API call, from botocore hooks
+
+PROFILING_SAMPLE_RATE (0-1) picks the invocations to profile, and
+PROFILING_OUTPUT says where reports go: a /tmp directory, or
+s3://bucket/prefix. Each report is a JSON summary plus, for cpu, a .prof
+file for pstats or snakeviz.
+
+The variables are read once, when the module is imported. When
+HANDLER_PROFILING is unset, profiled() returns the handler unchanged and
+no hooks are registered, so a disabled profiler costs nothing. Changing
+the variables on a deployed function starts fresh containers that use
+the new settings, so no rebuild is needed.
+"""
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+HANDLER_PROFILING = os.environ.get('HANDLER_PROFILING', '').strip().lower()
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_OUTPUT = os.environ.get('PROFILING_OUTPUT', '/tmp/profiles')
+# Entries kept in the summary's function and allocation tables
+PROFILING_TOP = int(os.environ.get('PROFILING_TOP', '30'))
+
+PROFILING_MODES = ('cpu', 'memory', 'aws')
+
+def enabled_modes(setting=None):
+    setting = HANDLER_PROFILING if setting is None else setting
+    if setting in ('', 'off', 'false', '0', 'none'):
+        return ()
+    if setting in ('all', 'on', 'true', '1'):
+        return PROFILING_MODES
+    modes = tuple(mode.strip() for mode in setting.split(',') if mode.strip())
+    unknown = [mode for mode in modes if mode not in PROFILING_MODES]
+    if unknown:
+        print(f"Error in HANDLER_PROFILING: unknown modes {unknown}, expected {list(PROFILING_MODES)}")
+    return tuple(mode for mode in modes if mode in PROFILING_MODES)
+
+MODES = enabled_modes()
+
+# AWS calls made while an invocation is being profiled: operation -> [count, total_ms, max_ms, errors]
+_aws_calls = {}
+_aws_calls_lock = threading.Lock()
+_aws_recording = False
+
+def profiled(handler):
+    """Decorator for lambda_handler; a no-op unless HANDLER_PROFILING is set"""
+    
+    if not MODES:
+        return handler
+        
+    @wraps(handler)
+    def wrapper(event, context):
+        if random.random() >= PROFILING_SAMPLE_RATE:
+            return handler(event, context)
+        return run_profiled(handler, event, context)
+        
+    return wrapper
+
+def run_profiled(handler, event, context):
+    global _aws_recording
+    
+    profiler = None
+    if 'cpu' in MODES:
+        import cProfile
+        profiler = cProfile.Profile()
+    if 'memory' in MODES:
+        import tracemalloc
+        tracemalloc.start()
+    if 'aws' in MODES:
+        with _aws_calls_lock:
+            _aws_calls.clear()
+        _aws_recording = True
+        
+    started_at = datetime.utcnow()
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        if profiler is not None:
+            return profiler.runcall(handler, event, context)
+        return handler(event, context)
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        _aws_recording = False
+        report = {
+            'function': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local'),
+            'requestId': getattr(context, 'aws_request_id', None),
+            'startedAt': started_at.isoformat() + 'Z',
+            'durationMs': round(duration_ms, 3),
+            'status': status,
+            'modes': list(MODES)
+        }
+        try:
+            if 'memory' in MODES:
+                report['memory'] = memory_summary()
+            if 'aws' in MODES:
+                report['awsCalls'] = aws_call_summary()
+            if profiler is not None:
+                report['cpu'] = cpu_summary(profiler)
+            write_report(report, profiler)
+        except Exception as e:
+            print(f"Error writing profile report: {str(e)}")
+
+def memory_summary():
+    import tracemalloc
+    
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    
+    top = snapshot.statistics('lineno')[:PROFILING_TOP]
+    return {
+        'peakBytes': peak,
+        'topAllocations': [
+            {'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             'sizeBytes': stat.size, 'count': stat.count}
+            for stat in top
+        ]
+    }
+
+def cpu_summary(profiler):
+    """Top functions by cumulative time, as pstats prints them"""
+    
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(PROFILING_TOP)
+    return {
+        'totalCalls': stats.total_calls,
+        'topCumulative': output.getvalue()
+    }
+
+def aws_call_summary():
+    with _aws_calls_lock:
+        calls = [
+            {'operation': operation, 'count': count, 'totalMs': round(total_ms, 3),
+             'maxMs': round(max_ms, 3), 'errors': errors}
+            for operation, (count, total_ms, max_ms, errors) in _aws_calls.items()
+        ]
+    calls.sort(key=lambda call: call['totalMs'], reverse=True)
+    return calls
+
+def register_aws_hooks():
+    """
+    Time AWS calls through botocore's before-call/after-call events. Clients
+    copy the session's event hooks when they are created, so this runs when
+    the module is imported, before handlers create their clients.
+    """
+    
+    import boto3
+    
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    events = boto3.DEFAULT_SESSION.events
+    events.register('before-call', _before_aws_call, unique_id='profiling-before-call')
+    events.register('after-call', _after_aws_call, unique_id='profiling-after-call')
+    events.register('after-call-error', _after_aws_call_error, unique_id='profiling-after-call-error')
+
+def _before_aws_call(context=None, **kwargs):
+    if _aws_recording and context is not None:
+        context['profiling_started'] = time.perf_counter()
+
+def _after_aws_call(event_name=None, context=None, **kwargs):
+    _record_aws_call(event_name, context, False)
+
+def _after_aws_call_error(event_name=None, context=None, **kwargs):
+    _record_aws_call(event_name, context, True)
+
+def _record_aws_call(event_name, context, failed):
+    started = (context or {}).pop('profiling_started', None)
+    if started is None or not _aws_recording:
+        return
+        
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # event_name looks like 'after-call.dynamodb.Query'
+    operation = event_name.split('.', 1)[1] if event_name else 'unknown'
+    with _aws_calls_lock:
+        entry = _aws_calls.setdefault(operation, [0, 0.0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        entry[2] = max(entry[2], elapsed_ms)
+        entry[3] += 1 if failed else 0
+
+def write_report(report, profiler):
+    """Write the JSON summary (and .prof file) to PROFILING_OUTPUT"""
+    
+    name = f"{report['function']}/{report['startedAt'].replace(':', '')}-{report['requestId'] or 'local'}"
+    body = json.dumps(report, indent=2, default=str).encode('utf-8')
+    
+    if PROFILING_OUTPUT.startswith('s3://'):
+        import boto3
+        import marshal
+        
+        bucket, _, prefix = PROFILING_OUTPUT[len('s3://'):].partition('/')
+        key = f"{prefix.rstrip('/')}/{name}" if prefix else name
+        s3 = boto3.client('s3')
+        s3.put_object(Bucket=bucket, Key=key + '.json', Body=body, ContentType='application/json')
+        if profiler is not None:
+            profiler.create_stats()
+            s3.put_object(Bucket=bucket, Key=key + '.prof', Body=marshal.dumps(profiler.stats))
+        location = f"s3://{bucket}/{key}"
+    else:
+        path = os.path.join(PROFILING_OUTPUT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.json', 'wb') as report_file:
+            report_file.write(body)
+        if profiler is not None:
+            profiler.dump_stats(path + '.prof')
+        location = path
+        
+    print(f"Profile for {report['function']} ({report['durationMs']:.1f} ms) written to {location}.json")
+
+if 'aws' in MODES:
+    register_aws_hooks()
\ No newline at end of file
@@ -0,0 +1,231 @@
+# lambda/shared/query_cache.py
+"""
+Warm-container cache for read-only API query results.
+
+Dashboards refresh the same views every few seconds, and at shift change
+many of them refresh at once. Responses are kept per container in a bounded
+LRU keyed on the normalized query, with a short TTL. Relative time ranges
+are snapped to QUERY_CACHE_BUCKET_SECONDS (see bucket_end), so refreshes in
+the same bucket share one entry.
+
+When QUERY_CACHE_ENDPOINT names a memcached node (for example ElastiCache in
+the Lambda VPC), local misses are looked up there before the table is
+queried, so containers share results too. The shared tier is best effort:
+any error skips it for SHARED_RETRY_SECONDS and requests fall through to
+DynamoDB.
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from emf import emit_metrics
+
+QUERY_CACHE_TTL_SECONDS = float(os.environ.get('QUERY_CACHE_TTL_SECONDS', '10'))
+QUERY_CACHE_BUCKET_SECONDS = int(os.environ.get('QUERY_CACHE_BUCKET_SECONDS', '0')) or max(int(QUERY_CACHE_TTL_SECONDS), 1)
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', '512'))
+QUERY_CACHE_MAX_BYTES = int(os.environ.get('QUERY_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# host:port of a memcached node shared by all containers; empty for local only
+QUERY_CACHE_ENDPOINT = os.environ.get('QUERY_CACHE_ENDPOINT', '')
+QUERY_CACHE_TIMEOUT_SECONDS = float(os.environ.get('QUERY_CACHE_TIMEOUT_SECONDS', '0.05'))
+
+SHARED_RETRY_SECONDS = 30
+# memcached's default item size limit
+SHARED_MAX_VALUE_BYTES = 1024 * 1024
+
+def bucket_end(bucket_seconds=None):
+    """
+    End of the current time bucket as a naive UTC datetime. Using it as "now"
+    for relative ranges makes every request in the bucket ask for the same
+    range; rounding up rather than down keeps the newest readings included.
+    """
+    
+    bucket_seconds = bucket_seconds or QUERY_CACHE_BUCKET_SECONDS
+    now = time.time()
+    return datetime.utcfromtimestamp((int(now // bucket_seconds) + 1) * bucket_seconds)
+
+def cache_key(*parts):
+    """Normalized key: parts in order, None and '' treated alike"""
+    return json.dumps(['' if part is None else part for part in parts], separators=(',', ':'), default=str)
+
+class QueryCache:
+    """
+    LRU of successful API responses, bounded by entry count and body bytes.
+    Only 200 responses are cached; everything else is returned uncached.
+    """
+    
+    def __init__(self, name, ttl_seconds=None, max_entries=None, max_bytes=None, endpoint=None):
+        self.name = name
+        self.ttl_seconds = QUERY_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or QUERY_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or QUERY_CACHE_MAX_BYTES
+        self.entries = OrderedDict()  # key -> (expires_at, size, response), least recently used first
+        self.size = 0
+        self.lock = threading.Lock()
+        endpoint = QUERY_CACHE_ENDPOINT if endpoint is None else endpoint
+        self.shared = MemcachedClient(endpoint) if endpoint else None
+        self.reset_counts()
+        
+    def reset_counts(self):
+        self.counts = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+        
+    def get_or_load(self, key, loader, ttl_seconds=None):
+        """Cached response for key, calling loader() on a miss"""
+        
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl_seconds <= 0:
+            return loader()
+            
+        response = self.get(key)
+        if response is not None:
+            self.counts['hits'] += 1
+            return response
+            
+        shared_key = None
+        if self.shared is not None:
+            shared_key = self.shared_key(key)
+            response = self.shared.get(shared_key)
+            if response is not None:
+                self.counts['shared_hits'] += 1
+                self.put(key, response, ttl_seconds)
+                return response
+                
+        self.counts['misses'] += 1
+        response = loader()
+        if response.get('statusCode') == 200:
+            self.put(key, response, ttl_seconds)
+            if shared_key is not None:
+                self.shared.set(shared_key, response, ttl_seconds)
+        return response
+        
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+            
+    def put(self, key, response, ttl_seconds):
+        size = len(response.get('body') or '')
+        if size > self.max_bytes:
+            return
+            
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.time() + ttl_seconds, size, response)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.counts['evictions'] += 1
+                
+    def remove(self, key):
+        # Caller holds the lock
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+        
+    def clear(self):
+        """Drop local entries, e.g. after a write this container made"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            
+    def shared_key(self, key):
+        # memcached keys are limited to 250 bytes without spaces
+        return f"qc:{self.name}:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+        
+    def emit_metrics(self):
+        """Report this invocation's hits and misses and reset the counts"""
+        
+        lookups = self.counts['hits'] + self.counts['shared_hits'] + self.counts['misses']
+        if lookups:
+            emit_metrics({
+                'QueryCacheHits': (self.counts['hits'], 'Count'),
+                'QueryCacheSharedHits': (self.counts['shared_hits'], 'Count'),
+                'QueryCacheMisses': (self.counts['misses'], 'Count'),
+                'QueryCacheHitRate': ((self.counts['hits'] + self.counts['shared_hits']) * 100.0 / lookups, 'Percent'),
+                'QueryCacheEvictions': (self.counts['evictions'], 'Count'),
+                'QueryCacheEntries': (len(self.entries), 'Count'),
+                'QueryCacheBytes': (self.size, 'Bytes')
+            }, dimensions={'Cache': self.name})
+        self.reset_counts()
+
+class MemcachedClient:
+    """
+    Minimal memcached text-protocol client (get/set) over one persistent
+    connection. Errors are swallowed: the cache is an optimization, never a
+    dependency of the request.
+    """
+    
+    def __init__(self, endpoint, timeout=None):
+        host, _, port = endpoint.rpartition(':')
+        self.address = (host or endpoint, int(port) if host else 11211)
+        self.timeout = QUERY_CACHE_TIMEOUT_SECONDS if timeout is None else timeout
+        self.sock = None
+        self.reader = None
+        self.disabled_until = 0
+        self.lock = threading.Lock()
+        
+    def get(self, key):
+        with self.lock:
+            try:
+                if not self.connect():
+                    return None
+                self.sock.sendall(f"get {key}\r\n".encode('ascii'))
+                header = self.reader.readline()
+                if header == b'END\r\n':
+                    return None
+                parts = header.split()
+                if len(parts) != 4 or parts[0] != b'VALUE':
+                    raise IOError(f"unexpected reply {header[:40]!r}")
+                data = self.reader.read(int(parts[3]) + 2)[:-2]
+                if self.reader.readline() != b'END\r\n':
+                    raise IOError("unterminated reply")
+                return json.loads(data.decode('utf-8'))
+            except Exception as e:
+                self.fail(e)
+                return None
+                
+    def set(self, key, value, ttl_seconds):
+        data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        if len(data) > SHARED_MAX_VALUE_BYTES:
+            return
+            
+        with self.lock:
+            try:
+                if not self.connect():
+                    return
+                expiry = max(int(round(ttl_seconds)), 1)
+                self.sock.sendall(f"set {key} 0 {expiry} {len(data)} noreply\r\n".encode('ascii') + data + b'\r\n')
+            except Exception as e:
+                self.fail(e)
+                
+    def connect(self):
+        # Caller holds the lock
+        if self.sock is not None:
+            return True
+        if time.time() < self.disabled_until:
+            return False
+        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        self.reader = self.sock.makefile('rb')
+        return True
+        
+    def fail(self, error):
+        # Caller holds the lock
+        print(f"Error using shared query cache {self.address[0]}:{self.address[1]}: {str(error)}")
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.reader = None
+        self.disabled_until = time.time() + SHARED_RETRY_SECONDS
\ No newline at end of file
@@ -0,0 +1,233 @@
+# lambda/shared/vital_blocks.py
+"""
+Columnar encoding for compacted vital signs blocks.
+
+A block holds every reading of one patient for one hour. Timestamps (epoch
+microseconds) and each numeric vital (scaled to integers) are stored as
+zigzag varint deltas; string columns are dictionary encoded. The whole
+payload is zlib compressed.
+
+Layout before compression:
+    4-byte header length | JSON header | column sections (lengths in header)
+"""
+import json
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+BLOCK_ENCODING = 'vb1'
+
+# Column name -> integer scale applied before delta encoding
+NUMERIC_COLUMNS = [
+    ('HeartRate', 1),
+    ('SystolicBP', 1),
+    ('DiastolicBP', 1),
+    ('Temperature', 10),
+    ('OxygenSaturation', 1),
+    ('SensorBatteryLevel', 1),
+    ('SignalStrength', 1)
+]
+
+STRING_COLUMNS = ['DeviceId', 'DataQuality', 'RoomNumber', 'PatientCondition']
+
+EPOCH = datetime(1970, 1, 1)
+
+def hour_key(timestamp):
+    """Block sort key (the UTC hour) for an ISO timestamp, e.g. '2024-05-01T13'"""
+    return (EPOCH + timedelta(microseconds=timestamp_to_micros(timestamp))).strftime('%Y-%m-%dT%H')
+
+def timestamp_to_micros(timestamp):
+    """Parse an ISO timestamp (naive UTC, 'Z' or a +hh:mm / -hh:mm offset) into epoch microseconds"""
+    if timestamp.endswith('Z'):
+        timestamp = timestamp[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = parsed - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def reading_identity(item):
+    """Merge key for a reading: UTC reading time and device"""
+    return (timestamp_to_micros(item['Timestamp']), item.get('DeviceId', 'unknown'))
+
+def micros_to_timestamp(micros):
+    """Format epoch microseconds the way the processor writes Timestamp"""
+    return (EPOCH + timedelta(microseconds=micros)).isoformat() + 'Z'
+
+def encode_block(readings):
+    """Encode raw VitalSigns items (any order) into a compressed block"""
+    readings = sorted(readings, key=lambda item: item['Timestamp'])
+    header = {'v': 1, 'n': len(readings), 'sections': [], 'dicts': {}}
+    sections = []
+    
+    timestamps = [timestamp_to_micros(item['Timestamp']) for item in readings]
+    sections.append(('Timestamp', _encode_deltas(timestamps)))
+    
+    for column, scale in NUMERIC_COLUMNS:
+        present = [column in item and item[column] is not None for item in readings]
+        if not any(present):
+            continue
+            
+        values = []
+        previous = 0
+        for item, has_value in zip(readings, present):
+            if has_value:
+                previous = int((Decimal(str(item[column])) * scale).to_integral_value())
+            values.append(previous)
+            
+        sections.append((column, _encode_deltas(values)))
+        if not all(present):
+            sections.append((column + '?', _encode_presence(present)))
+            
+    for column in STRING_COLUMNS:
+        values = [item.get(column) for item in readings]
+        if all(value is None for value in values):
+            continue
+            
+        dictionary = []
+        positions = {}
+        indexes = []
+        for value in values:
+            if value not in positions:
+                positions[value] = len(dictionary)
+                dictionary.append(value)
+            indexes.append(positions[value])
+            
+        header['dicts'][column] = dictionary
+        sections.append((column, _encode_varints(indexes)))
+        
+    header['sections'] = [[name, len(data)] for name, data in sections]
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    
+    payload = bytearray(struct.pack('>I', len(header_bytes)))
+    payload.extend(header_bytes)
+    for _, data in sections:
+        payload.extend(data)
+        
+    return zlib.compress(bytes(payload), 9)
+
+def decode_block(data, patient_id):
+    """Decode a block back into VitalSigns-shaped items, oldest first"""
+    header, columns = _read_sections(data)
+    count = header['n']
+    
+    timestamps = _decode_deltas(columns['Timestamp'], count)
+    items = [
+        {'PatientId': patient_id, 'Timestamp': micros_to_timestamp(micros)}
+        for micros in timestamps
+    ]
+    
+    for column, scale in NUMERIC_COLUMNS:
+        if column not in columns:
+            continue
+        values = _decode_deltas(columns[column], count)
+        present = _decode_presence(columns[column + '?'], count) if column + '?' in columns else None
+        
+        for index, value in enumerate(values):
+            if present is not None and not present[index]:
+                continue
+            items[index][column] = Decimal(value) / scale if scale != 1 else Decimal(value)
+            
+    for column, dictionary in header['dicts'].items():
+        indexes = _decode_varints(columns[column], count)
+        for item, index in zip(items, indexes):
+            if dictionary[index] is not None:
+                item[column] = dictionary[index]
+                
+    return items
+
+def decode_block_columns(data):
+    """
+    Decode a block into columns without building items, for bulk readers:
+    {'Timestamp': [epoch micros], numeric column: [float or None],
+    string column: [str or None]}. Absent columns are left out.
+    """
+    header, sections = _read_sections(data)
+    count = header['n']
+    columns = {'Timestamp': _decode_deltas(sections['Timestamp'], count)}
+    
+    for column, scale in NUMERIC_COLUMNS:
+        if column not in sections:
+            continue
+        values = [value / scale for value in _decode_deltas(sections[column], count)]
+        if column + '?' in sections:
+            present = _decode_presence(sections[column + '?'], count)
+            values = [value if has_value else None for value, has_value in zip(values, present)]
+        columns[column] = values
+        
+    for column, dictionary in header['dicts'].items():
+        columns[column] = [dictionary[index] for index in _decode_varints(sections[column], count)]
+        
+    return columns
+
+def _read_sections(data):
+    """Decompress a block and split it into its header and raw column sections"""
+    payload = zlib.decompress(bytes(data))
+    header_length = struct.unpack('>I', payload[:4])[0]
+    header = json.loads(payload[4:4 + header_length].decode('utf-8'))
+    
+    sections = {}
+    offset = 4 + header_length
+    for name, length in header['sections']:
+        sections[name] = payload[offset:offset + length]
+        offset += length
+        
+    return header, sections
+
+def _encode_deltas(values):
+    deltas = []
+    previous = 0
+    for value in values:
+        deltas.append(_zigzag(value - previous))
+        previous = value
+    return _encode_varints(deltas)
+
+def _decode_deltas(data, count):
+    values = []
+    previous = 0
+    for encoded in _decode_varints(data, count):
+        previous += _unzigzag(encoded)
+        values.append(previous)
+    return values
+
+def _encode_presence(flags):
+    out = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            out[index // 8] |= 1 << (index % 8)
+    return bytes(out)
+
+def _decode_presence(data, count):
+    return [bool(data[index // 8] & (1 << (index % 8))) for index in range(count)]
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def _unzigzag(value):
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+def _encode_varints(values):
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def _decode_varints(data, count):
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = 0
+        shift = 0
+        if len(values) == count:
+            break
+    return values
\ No newline at end of file
@@ -0,0 +1,364 @@
+# lambda/shared/vital_schema.py
+"""
+Compact item schema (v2) for raw vital signs readings.
+
+v1 items (the original VitalSigns table) spell out every attribute name,
+key on an ISO Timestamp string and repeat ProcessedAt, RoomNumber and
+PatientCondition on every reading. v2 items live in their own table, because
+a sort key's type cannot change in place:
+
+    P   PatientId (partition key)
+    T   reading time in epoch microseconds * DEVICE_SLOTS + the device's
+        slot (sort key), so the key keeps the reading's full precision and
+        devices reporting at the same instant get distinct keys
+    D   DeviceId
+    V   packed vitals "hr,sbp,dbp,temp,spo2[,battery,signal]" or, when
+        VITAL_SIGNS_PACKED is off, numbers HR SB DB TP O2 BL SS
+    Q   DataQuality
+    R   RoomNumber and K PatientCondition, as sent with the reading
+    C   write time, epoch milliseconds (PatientChangeIndex sort key)
+    E   expiry, epoch seconds (TTL), derived from the same clock read as C
+    v   schema version
+
+ProcessedAt is covered by C. Items written before R and K were added get
+room and condition from the patient record in vitals-api.
+
+Readers call expand_item(), which returns v1-shaped items for both
+versions, so response shapes do not change. Migration:
+  1. Deploy the v2 table and set VITAL_SIGNS_COMPACT_TABLE everywhere; the
+     processor writes v2 items, readers read both tables.
+  2. The compactor folds v1 readings older than COMPACTION_AGE_HOURS into
+     blocks and deletes them, so the v1 table drains on its normal schedule.
+  3. Once it is empty, set VITAL_SIGNS_LEGACY_READS=false, then remove it.
+
+Time-bucketed partition keys (VITAL_SIGNS_KEY_BUCKET=day or hour) make P
+'PatientId#2024-05-01' or 'PatientId#2024-05-01T13', so a patient on
+continuous telemetry is spread over one item collection per bucket instead
+of one ever-growing partition. Readers go through query_readings(), which
+queries the buckets of a range in parallel and returns one stream in T
+order. Switching a populated table: set the variable everywhere; readers
+keep reading the unbucketed partition until VITAL_SIGNS_UNBUCKETED_READS is
+turned off, which is safe once the compactor has folded the old readings
+into blocks (COMPACTION_AGE_HOURS after the switch).
+"""
+import heapq
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+import vital_blocks
+
+SCHEMA_VERSION = 2
+VITAL_SIGNS_PACKED = os.environ.get('VITAL_SIGNS_PACKED', 'true').lower() == 'true'
+
+# Partition key scheme: none, day or hour
+VITAL_SIGNS_KEY_BUCKET = os.environ.get('VITAL_SIGNS_KEY_BUCKET', 'none').lower()
+VITAL_SIGNS_UNBUCKETED_READS = os.environ.get('VITAL_SIGNS_UNBUCKETED_READS', 'true').lower() == 'true'
+# Bucket partitions queried at once by query_readings
+VITAL_SIGNS_BUCKET_QUERY_WORKERS = int(os.environ.get('VITAL_SIGNS_BUCKET_QUERY_WORKERS', '8'))
+# How far a reading's timestamp may trail (or lead) the time it was stored;
+# change polls read the buckets of that window
+VITAL_SIGNS_BUCKET_SKEW_MINUTES = int(os.environ.get('VITAL_SIGNS_BUCKET_SKEW_MINUTES', '15'))
+
+KEY_SEPARATOR = '#'
+KEY_BUCKET_MS = {'day': 86400 * 1000, 'hour': 3600 * 1000}
+KEY_BUCKET_FORMATS = {'day': '%Y-%m-%d', 'hour': '%Y-%m-%dT%H'}
+
+# T = reading micros * DEVICE_SLOTS + slot; a device whose slot is taken at that
+# instant by another device tries the next DEVICE_SLOT_PROBES - 1 slots
+DEVICE_SLOTS = 1000
+DEVICE_SLOT_PROBES = 8
+T_PER_MS = 1000 * DEVICE_SLOTS
+
+# Created on first use, only when bucketing is enabled
+_bucket_executor = None
+
+# v1 attribute -> unpacked v2 attribute, in packed order
+VITAL_FIELDS = [
+    ('HeartRate', 'HR'),
+    ('SystolicBP', 'SB'),
+    ('DiastolicBP', 'DB'),
+    ('Temperature', 'TP'),
+    ('OxygenSaturation', 'O2'),
+    ('SensorBatteryLevel', 'BL'),
+    ('SignalStrength', 'SS')
+]
+# Trailing vitals that are left out of V when absent
+OPTIONAL_VITALS = 2
+
+def timestamp_to_ms(timestamp):
+    """ISO timestamp (with or without 'Z') -> epoch milliseconds"""
+    return vital_blocks.timestamp_to_micros(timestamp) // 1000
+
+def ms_to_timestamp(millis):
+    """Epoch milliseconds -> ISO timestamp, formatted like compacted blocks"""
+    return vital_blocks.micros_to_timestamp(int(millis) * 1000)
+
+def is_compact(item):
+    return 'P' in item and 'T' in item
+
+def compact_key(patient_id, timestamp, device_id='unknown'):
+    micros = vital_blocks.timestamp_to_micros(timestamp)
+    return {'P': partition_key(patient_id, micros // 1000), 'T': sort_key(micros, device_id)}
+
+def sort_key(micros, device_id, probe=0):
+    """T for a device's reading at micros; probe picks a later slot after a clash"""
+    
+    slot = (zlib.crc32(str(device_id).encode('utf-8')) + probe) % DEVICE_SLOTS
+    return int(micros) * DEVICE_SLOTS + slot
+
+def reading_micros(sort_key_value):
+    """Reading time in epoch microseconds from T"""
+    return int(sort_key_value) // DEVICE_SLOTS
+
+def bucketing_enabled():
+    return VITAL_SIGNS_KEY_BUCKET in KEY_BUCKET_MS
+
+def partition_key(patient_id, millis):
+    """P for a patient's reading at millis under the configured scheme"""
+    
+    if not bucketing_enabled():
+        return patient_id
+    bucket = datetime.utcfromtimestamp(int(millis) // 1000).strftime(KEY_BUCKET_FORMATS[VITAL_SIGNS_KEY_BUCKET])
+    return f"{patient_id}{KEY_SEPARATOR}{bucket}"
+
+def patient_id_of(partition):
+    return partition.split(KEY_SEPARATOR, 1)[0]
+
+def bucket_partitions(patient_id, start_ms, end_ms):
+    """P values of the buckets covering [start_ms, end_ms], oldest first"""
+    
+    if not bucketing_enabled():
+        return [patient_id]
+    size = KEY_BUCKET_MS[VITAL_SIGNS_KEY_BUCKET]
+    return [partition_key(patient_id, bucket * size)
+            for bucket in range(int(start_ms) // size, int(end_ms) // size + 1)]
+
+def change_partitions(patient_id, since, until):
+    """
+    P values whose PatientChangeIndex partitions can hold a reading stored in
+    (since, until]. Readings that arrive more than VITAL_SIGNS_BUCKET_SKEW_MINUTES
+    late land in a bucket a delta poll does not read; they still show up in
+    range and full reads.
+    """
+    
+    if not bucketing_enabled():
+        return [patient_id]
+    skew = VITAL_SIGNS_BUCKET_SKEW_MINUTES * 60 * 1000
+    partitions = bucket_partitions(patient_id, since - skew, until + skew)
+    if VITAL_SIGNS_UNBUCKETED_READS:
+        partitions.append(patient_id)
+    return partitions
+
+def query_readings(table, patient_id, start_ms, end_ms, newest_first=False, page_size=None, query_pages=None):
+    """
+    Yield one patient's v2 items with start_ms <= T <= end_ms in T order.
+    
+    Bucket partitions hold disjoint time ranges, so they are read in order,
+    in waves of 1, 2, 4 ... up to VITAL_SIGNS_BUCKET_QUERY_WORKERS buckets
+    whose first pages are fetched in parallel. Later waves are only queried
+    once the consumer gets to them, so a caller that stops at a limit (the
+    latest reading, a page of a range) does not read the whole range. While
+    migrating, the unbucketed partition is merged in.
+    
+    page_size sets the query Limit (e.g. the caller's limit); query_pages
+    (table, query_kwargs) -> pages lets a caller meter its reads.
+    """
+    
+    query_pages = query_pages or iter_query_pages
+    
+    def partition_query(partition):
+        return {
+            'KeyConditionExpression': Key('P').eq(partition) & Key('T').between(
+                int(start_ms) * T_PER_MS, int(end_ms) * T_PER_MS + T_PER_MS - 1),
+            'ScanIndexForward': not newest_first,
+            **({'Limit': page_size} if page_size else {})
+        }
+        
+    if not bucketing_enabled():
+        return iter_items(query_pages(table, partition_query(patient_id)))
+        
+    partitions = bucket_partitions(patient_id, start_ms, end_ms)
+    if newest_first:
+        partitions.reverse()
+    streams = [iter_bucket_items(table, partitions, partition_query, query_pages)]
+    if VITAL_SIGNS_UNBUCKETED_READS:
+        streams.append(iter_items(query_pages(table, partition_query(patient_id))))
+        
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda item: int(item['T']), reverse=newest_first)
+
+def iter_bucket_items(table, partitions, partition_query, query_pages):
+    """Items of consecutive bucket partitions, querying a wave of them at a time"""
+    
+    executor = bucket_executor()
+    
+    def first_page(partition):
+        pages = query_pages(table, partition_query(partition))
+        return next(pages, []), pages
+        
+    offset = 0
+    wave_size = 1
+    while offset < len(partitions):
+        wave = partitions[offset:offset + wave_size]
+        if len(wave) > 1:
+            started = list(executor.map(first_page, wave))
+        else:
+            started = [first_page(wave[0])]
+            
+        for page, remaining_pages in started:
+            yield from page
+            yield from iter_items(remaining_pages)
+            
+        offset += len(wave)
+        wave_size = min(wave_size * 2, max(VITAL_SIGNS_BUCKET_QUERY_WORKERS, 1))
+
+def iter_query_pages(table, query_kwargs):
+    """Follow LastEvaluatedKey through a query, one list of items per page"""
+    
+    query_kwargs = dict(query_kwargs)
+    while True:
+        response = table.query(**query_kwargs)
+        yield response.get('Items', [])
+        
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def iter_items(pages):
+    for page in pages:
+        yield from page
+
+def bucket_executor():
+    global _bucket_executor
+    if _bucket_executor is None:
+        _bucket_executor = ThreadPoolExecutor(max_workers=max(VITAL_SIGNS_BUCKET_QUERY_WORKERS, 1))
+    return _bucket_executor
+
+def compact_item(item, packed=None):
+    """v1-shaped reading -> v2 item; ChangedAt (ms) must be set on the input"""
+    
+    changed_at = int(item['ChangedAt'])
+    micros = vital_blocks.timestamp_to_micros(item['Timestamp'])
+    device_id = item.get('DeviceId', 'unknown')
+    compact = {
+        'P': partition_key(item['PatientId'], micros // 1000),
+        'T': sort_key(micros, device_id),
+        'D': device_id,
+        'C': changed_at,
+        'E': int(item['TTL']) if 'TTL' in item else changed_at // 1000 + 30 * 86400,
+        'v': SCHEMA_VERSION
+    }
+    
+    if VITAL_SIGNS_PACKED if packed is None else packed:
+        compact['V'] = pack_vitals(item)
+    else:
+        for name, short_name in VITAL_FIELDS:
+            if item.get(name) is not None:
+                compact[short_name] = item[name]
+                
+    if item.get('DataQuality'):
+        compact['Q'] = item['DataQuality']
+    if item.get('RoomNumber'):
+        compact['R'] = item['RoomNumber']
+    if item.get('PatientCondition'):
+        compact['K'] = item['PatientCondition']
+    return compact
+
+def put_compact_item(table, item):
+    """
+    Write a v2 item unless this device's reading is already stored. Returns
+    False for a reading already stored (a redelivery: same device, same
+    microsecond). A slot held by another device's reading from the same
+    instant moves the item to the next slot.
+    """
+    
+    micros = reading_micros(item['T'])
+    for probe in range(DEVICE_SLOT_PROBES):
+        item['T'] = sort_key(micros, item['D'], probe)
+        try:
+            table.put_item(Item=item, ConditionExpression='attribute_not_exists(P)')
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        
+        holder = table.get_item(
+            Key={'P': item['P'], 'T': item['T']}, ProjectionExpression='D', ConsistentRead=True
+        ).get('Item', {})
+        if holder.get('D') == item['D']:
+            return False
+        
+    raise RuntimeError(f"No free sort key slot for {item['P']} at {micros} after {DEVICE_SLOT_PROBES} probes")
+
+def expand_item(item):
+    """v2 item -> v1-shaped reading; v1 items are returned unchanged"""
+    
+    if not is_compact(item):
+        return item
+        
+    expanded = {
+        'PatientId': patient_id_of(item['P']),
+        'Timestamp': vital_blocks.micros_to_timestamp(reading_micros(item['T'])),
+        'DeviceId': item.get('D', 'unknown')
+    }
+    
+    if 'V' in item:
+        expanded.update(unpack_vitals(item['V']))
+    else:
+        for name, short_name in VITAL_FIELDS:
+            if short_name in item:
+                expanded[name] = item[short_name]
+                
+    if 'Q' in item:
+        expanded['DataQuality'] = item['Q']
+    if 'R' in item:
+        expanded['RoomNumber'] = item['R']
+    if 'K' in item:
+        expanded['PatientCondition'] = item['K']
+    if 'C' in item:
+        expanded['ChangedAt'] = item['C']
+    return expanded
+
+def expand_items(items):
+    return [expand_item(item) for item in items]
+
+def pack_vitals(item):
+    values = [item.get(name) for name, _ in VITAL_FIELDS]
+    while len(values) > len(VITAL_FIELDS) - OPTIONAL_VITALS and values[-1] is None:
+        values.pop()
+    return ','.join('' if value is None else str(value) for value in values)
+
+def unpack_vitals(packed):
+    vitals = {}
+    for (name, _), value in zip(VITAL_FIELDS, packed.split(',')):
+        if value:
+            vitals[name] = Decimal(value)
+    return vitals
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes (names + values), for comparing schemas"""
+    
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode('utf-8'))
+        if isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        elif isinstance(value, bool) or value is None:
+            size += 1
+        elif isinstance(value, (int, float, Decimal)):
+            digits = len(str(abs(Decimal(str(value)))).replace('.', '').lstrip('0')) or 1
+            size += (digits + 1) // 2 + 1
+        elif isinstance(value, dict):
+            size += 3 + item_size(value) + len(value)
+        elif isinstance(value, (list, tuple)):
+            size += 3 + sum(item_size({'': element}) + 1 for element in value)
+    return size
\ No newline at end of file
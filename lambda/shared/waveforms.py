@@ -0,0 +1,150 @@
+# lambda/shared/waveforms.py
+"""
+Waveform segments: fixed-duration runs of evenly spaced samples (ECG leads,
+pleth) carried as one record instead of one reading per sample.
+
+A device sends
+    {'recordType': 'waveform', 'patientId': ..., 'deviceId': ...,
+     'channel': 'ECG-II', 'startTime': ISO timestamp, 'sampleRate': 250,
+     'scale': 0.005, 'units': 'mV', 'samples': base64 int16 little endian}
+where a sample's value in units is sample * scale.
+
+vitals-processor stores each segment as one WaveformSegments item keyed by
+StreamId (PatientId#channel) and StartMs. Data holds the samples as first
+differences (mod 2**16), byte-shuffled so the mostly-zero high bytes sit
+together, then zlib compressed; a segment is never expanded per sample.
+"""
+import base64
+import math
+import sys
+import zlib
+from array import array
+from decimal import Decimal
+
+import vital_blocks
+
+RECORD_TYPE = 'waveform'
+SEGMENT_ENCODING = 'wd16'
+
+# Bounds on one segment; readers look back MAX_SEGMENT_SECONDS for segments overlapping a range
+MAX_SEGMENT_SECONDS = 60
+MAX_SAMPLE_RATE = 1000
+MAX_SEGMENT_SAMPLES = MAX_SEGMENT_SECONDS * MAX_SAMPLE_RATE
+
+def is_waveform(data):
+    return data.get('recordType') == RECORD_TYPE
+
+def stream_id(patient_id, channel):
+    return f"{patient_id}#{channel}"
+
+def pack_samples(values):
+    """Base64 payload for integer samples (clamped to int16), as devices send them"""
+    
+    samples = array('h', (max(-32768, min(32767, int(value))) for value in values))
+    if sys.byteorder != 'little':
+        samples.byteswap()
+    return base64.b64encode(samples.tobytes()).decode('ascii')
+
+def unpack_samples(payload):
+    """array('h') from a base64 device payload"""
+    
+    raw = base64.b64decode(payload)
+    if len(raw) % 2:
+        raise ValueError("Waveform payload is not a whole number of int16 samples")
+    samples = array('h', raw)
+    if sys.byteorder != 'little':
+        samples.byteswap()
+    return samples
+
+def encode_samples(samples):
+    """Compress int16 samples into a segment's Data"""
+    
+    deltas = array('H', bytes(2 * len(samples)))
+    previous = 0
+    for index, value in enumerate(samples):
+        deltas[index] = (value - previous) & 0xFFFF
+        previous = value
+    if sys.byteorder != 'little':
+        deltas.byteswap()
+        
+    raw = deltas.tobytes()
+    return zlib.compress(raw[0::2] + raw[1::2], 6)
+
+def decode_samples(data, count):
+    """array('h') of a segment's samples from its Data"""
+    
+    shuffled = zlib.decompress(bytes(data))
+    raw = bytearray(2 * count)
+    raw[0::2] = shuffled[:count]
+    raw[1::2] = shuffled[count:]
+    deltas = array('H', bytes(raw))
+    if sys.byteorder != 'little':
+        deltas.byteswap()
+        
+    samples = array('h', bytes(2 * count))
+    value = 0
+    for index, delta in enumerate(deltas):
+        value = (value + delta) & 0xFFFF
+        samples[index] = value - 0x10000 if value & 0x8000 else value
+    return samples
+
+def segment_item(patient_id, data, changed_at, retention_days):
+    """WaveformSegments item for a decoded device record; raises ValueError for malformed segments"""
+    
+    channel = data.get('channel')
+    if not channel or not data.get('startTime'):
+        raise ValueError("Waveform segment needs a channel and a startTime")
+        
+    sample_rate = Decimal(str(data.get('sampleRate', 0)))
+    if not 0 < sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f"Unsupported waveform sample rate: {data.get('sampleRate')}")
+        
+    samples = unpack_samples(data.get('samples', ''))
+    if not samples or len(samples) > MAX_SEGMENT_SAMPLES or len(samples) / float(sample_rate) > MAX_SEGMENT_SECONDS:
+        raise ValueError(f"Waveform segment of {len(samples)} samples is outside the supported length")
+        
+    start_ms = vital_blocks.timestamp_to_micros(data['startTime']) // 1000
+    return {
+        'StreamId': stream_id(patient_id, channel),
+        'StartMs': start_ms,
+        'EndMs': start_ms + math.ceil(len(samples) * 1000 / float(sample_rate)),
+        'PatientId': patient_id,
+        'Channel': channel,
+        'DeviceId': data.get('deviceId', 'unknown'),
+        'SampleRate': sample_rate,
+        'SampleCount': len(samples),
+        'Scale': Decimal(str(data.get('scale', 1))),
+        'Units': data.get('units', ''),
+        'Encoding': SEGMENT_ENCODING,
+        'Data': encode_samples(samples),
+        'ChangedAt': changed_at,
+        'TTL': changed_at // 1000 + retention_days * 86400
+    }
+
+def decimation_factor(count, max_points):
+    """Samples per min/max pair needed to return at most max_points points"""
+    
+    if not max_points or count <= max_points:
+        return 1
+    return math.ceil(count / max(max_points // 2, 1))
+
+def decimate(samples, factor):
+    """
+    Reduce samples to the minimum and maximum of each run of factor samples,
+    in the order they occur, so QRS spikes survive the reduction. Returns
+    (values, source indexes).
+    """
+    
+    if factor <= 1:
+        return list(samples), list(range(len(samples)))
+        
+    values = []
+    indexes = []
+    for start in range(0, len(samples), factor):
+        run = samples[start:start + factor]
+        low = min(range(len(run)), key=run.__getitem__)
+        high = max(range(len(run)), key=run.__getitem__)
+        for offset in sorted({low, high}):
+            values.append(run[offset])
+            indexes.append(start + offset)
+    return values, indexes
\ No newline at end of file
@@ -0,0 +1,304 @@
+# lambda/vitals-analytics/cohort_analytics.py
+"""
+Vectorized cohort statistics over vital signs readings.
+
+Readings are gathered column by column (CohortColumns) and frozen into NumPy
+arrays, one element per reading. Every statistic is then computed for all
+groups of a dimension at once with bincount / lexsort over group codes, so
+cost grows with the number of readings, not readings x groups.
+
+Dimensions:
+    all        every reading
+    roomType   RoomNumber prefix (ICU-101 -> ICU)
+    condition  PatientCondition
+    ageBand    patient age at report time, in AGE_BAND_EDGES bands
+
+Time-weighted figures (time in status, time in range) weight each reading by
+the time until the patient's next reading, capped at max_gap_seconds so a
+device outage is not counted as time in the last status.
+"""
+from array import array
+
+import numpy as np
+
+import alert_thresholds
+
+# Report field -> reading column, in alert_thresholds.READING_FIELDS order
+VITALS = [
+    ('heartRate', 'HeartRate'),
+    ('systolicBP', 'SystolicBP'),
+    ('diastolicBP', 'DiastolicBP'),
+    ('temperature', 'Temperature'),
+    ('oxygenSaturation', 'OxygenSaturation')
+]
+
+DIMENSIONS = ['all', 'roomType', 'condition', 'ageBand']
+STATUSES = ['Normal', 'Warning', 'Critical']
+PERCENTILES = [5, 25, 50, 75, 95]
+
+AGE_BAND_EDGES = [18, 40, 65, 80]
+AGE_BAND_LABELS = ['0-17', '18-39', '40-64', '65-79', '80+']
+UNKNOWN = 'Unknown'
+
+# Fixed histogram bins per vital: (first edge, last edge, width); values
+# outside the range are counted in the first or last bin
+HISTOGRAM_BINS = {
+    'heartRate': (30, 200, 5),
+    'systolicBP': (60, 220, 10),
+    'diastolicBP': (30, 140, 5),
+    'temperature': (94, 106, 0.5),
+    'oxygenSaturation': (70, 100, 1)
+}
+
+# Default alert bands, as arrays for vectorized classification
+CRITICAL_MIN = np.array(alert_thresholds.DEFAULT_MIN)
+CRITICAL_MAX = np.array(alert_thresholds.DEFAULT_MAX)
+WARNING_MIN = np.array(alert_thresholds.WARNING_MIN)
+WARNING_MAX = np.array(alert_thresholds.WARNING_MAX)
+
+def room_type(room_number):
+    if not room_number:
+        return UNKNOWN
+    return room_number.split('-', 1)[0].upper() if '-' in room_number else room_number.upper()
+
+class Labels:
+    """Dense integer codes for string labels"""
+    
+    def __init__(self):
+        self.codes = {}
+        self.labels = []
+        
+    def code(self, label):
+        code = self.codes.get(label)
+        if code is None:
+            code = self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+class CohortColumns:
+    """
+    Readings gathered into typed column buffers. Room and condition come
+    from the reading when it carries them, else from the patient record;
+    age always comes from the patient record.
+    """
+    
+    def __init__(self, patients):
+        self.patients = patients  # PatientId -> {'age', 'roomNumber', 'condition'}
+        self.patient_labels = Labels()
+        self.room_labels = Labels()
+        self.condition_labels = Labels()
+        self.patient = array('q')
+        self.time = array('q')
+        self.room = array('q')
+        self.condition = array('q')
+        self.age = array('d')
+        self.vitals = [array('d') for _ in VITALS]
+        
+    def __len__(self):
+        return len(self.time)
+        
+    def add_columns(self, patient_id, columns):
+        """Append a decoded block (see vital_blocks.decode_block_columns)"""
+        
+        count = len(columns['Timestamp'])
+        if not count:
+            return
+        info = self.patients.get(patient_id, {})
+        
+        self.patient.extend([self.patient_labels.code(patient_id)] * count)
+        self.time.extend(columns['Timestamp'])
+        self.age.extend([info.get('age', float('nan'))] * count)
+        
+        rooms = columns.get('RoomNumber') or [None] * count
+        conditions = columns.get('PatientCondition') or [None] * count
+        self.room.extend(self.room_labels.code(room_type(room or info.get('roomNumber'))) for room in rooms)
+        self.condition.extend(self.condition_labels.code(condition or info.get('condition') or UNKNOWN)
+                              for condition in conditions)
+                              
+        for buffer, (_, column) in zip(self.vitals, VITALS):
+            values = columns.get(column)
+            if values is None:
+                buffer.extend([float('nan')] * count)
+            else:
+                buffer.extend(float('nan') if value is None else value for value in values)
+                
+    def add_rows(self, patient_id, rows, timestamp_to_micros):
+        """Append v1-shaped rows (e.g. from an export file) for one patient"""
+        
+        columns = {'Timestamp': [timestamp_to_micros(row['Timestamp']) for row in rows]}
+        for column in ['RoomNumber', 'PatientCondition']:
+            columns[column] = [row.get(column) or None for row in rows]
+        for _, column in VITALS:
+            columns[column] = [float(row[column]) if row.get(column) not in (None, '') else None for row in rows]
+        self.add_columns(patient_id, columns)
+        
+    def arrays(self):
+        """Freeze the buffers into NumPy arrays sorted by patient, then time"""
+        
+        patient = np.frombuffer(self.patient, dtype=np.int64)
+        time = np.frombuffer(self.time, dtype=np.int64)
+        order = np.lexsort((time, patient))
+        
+        age = np.frombuffer(self.age, dtype=np.float64)[order]
+        age_band = np.digitize(np.nan_to_num(age, nan=-1.0), AGE_BAND_EDGES)
+        age_band[np.isnan(age)] = len(AGE_BAND_LABELS)
+        
+        return {
+            'patient': patient[order],
+            'time': time[order],
+            'vitals': np.column_stack([np.frombuffer(buffer, dtype=np.float64)[order] for buffer in self.vitals])
+                      if len(self) else np.empty((0, len(VITALS))),
+            'groups': {
+                'all': (np.zeros(len(self), dtype=np.int64), ['all']),
+                'roomType': (np.frombuffer(self.room, dtype=np.int64)[order], list(self.room_labels.labels)),
+                'condition': (np.frombuffer(self.condition, dtype=np.int64)[order], list(self.condition_labels.labels)),
+                'ageBand': (age_band, AGE_BAND_LABELS + [UNKNOWN])
+            }
+        }
+
+def classify(vitals):
+    """Status code per reading (index into STATUSES) under the default alert bands; NaN is ignored"""
+    
+    with np.errstate(invalid='ignore'):
+        critical = ((vitals < CRITICAL_MIN) | (vitals > CRITICAL_MAX)).any(axis=1)
+        warning = ((vitals < WARNING_MIN) | (vitals > WARNING_MAX)).any(axis=1)
+    return np.where(critical, 2, np.where(warning, 1, 0))
+
+def reading_durations(patient, time, max_gap_seconds):
+    """
+    Seconds each reading stands for: the gap to the patient's next reading,
+    capped at max_gap_seconds. A patient's last reading gets the median gap.
+    """
+    
+    durations = np.zeros(len(time))
+    if len(time) < 2:
+        durations[:] = max_gap_seconds
+        return durations
+        
+    gaps = np.diff(time) / 1e6
+    same_patient = patient[1:] == patient[:-1]
+    durations[:-1] = np.where(same_patient, np.minimum(gaps, max_gap_seconds), np.nan)
+    durations[-1] = np.nan
+    
+    known = ~np.isnan(durations)
+    fill = float(np.median(durations[known])) if known.any() else float(max_gap_seconds)
+    durations[~known] = fill
+    return durations
+
+def group_percentiles(codes, values, group_count, percentiles):
+    """Nearest-rank percentiles of values per group code, NaN for empty groups"""
+    
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    
+    fractions = np.array(percentiles) / 100.0
+    positions = starts[:, None] + np.floor(fractions[None, :] * np.maximum(counts - 1, 0)[:, None]).astype(np.int64)
+    result = np.full((group_count, len(percentiles)), np.nan)
+    has_values = counts > 0
+    result[has_values] = sorted_values[positions[has_values]]
+    return result
+
+def build_report(arrays, max_gap_seconds):
+    """Grouped aggregates, time in status and in range, and histograms for every dimension"""
+    
+    patient = arrays['patient']
+    vitals = arrays['vitals']
+    status = classify(vitals)
+    durations = reading_durations(patient, arrays['time'], max_gap_seconds)
+    patient_count = int(patient.max()) + 1 if len(patient) else 0
+    
+    with np.errstate(invalid='ignore'):
+        in_range = (vitals >= WARNING_MIN) & (vitals <= WARNING_MAX)
+    valid = ~np.isnan(vitals)
+    
+    histogram_bins = {}
+    for index, (name, _) in enumerate(VITALS):
+        first, last, width = HISTOGRAM_BINS[name]
+        edges = np.arange(first, last + width / 2, width)
+        bins = np.clip(np.floor((vitals[:, index] - first) / width), 0, len(edges) - 2)
+        histogram_bins[name] = (edges, np.nan_to_num(bins).astype(np.int64))
+        
+    dimensions = {}
+    for dimension in DIMENSIONS:
+        codes, labels = arrays['groups'][dimension]
+        group_count = len(labels)
+        codes = codes.astype(np.int64)
+        
+        readings = np.bincount(codes, minlength=group_count)
+        patients = np.bincount(np.unique(codes * max(patient_count, 1) + patient) // max(patient_count, 1),
+                               minlength=group_count)
+        status_seconds = np.bincount(codes * len(STATUSES) + status, weights=durations,
+                                     minlength=group_count * len(STATUSES)).reshape(group_count, len(STATUSES))
+        total_seconds = status_seconds.sum(axis=1)
+        
+        groups = {}
+        for code, label in enumerate(labels):
+            if not readings[code]:
+                continue
+            groups[label] = {
+                'readings': int(readings[code]),
+                'patients': int(patients[code]),
+                'hours': round(float(total_seconds[code]) / 3600, 2),
+                'timeInStatus': {
+                    name: round(float(status_seconds[code, index] * 100 / total_seconds[code]), 2)
+                    if total_seconds[code] else 0.0
+                    for index, name in enumerate(STATUSES)
+                },
+                'vitals': {}
+            }
+            
+        for index, (name, _) in enumerate(VITALS):
+            mask = valid[:, index]
+            vital_codes = codes[mask]
+            values = vitals[mask, index]
+            weights = durations[mask]
+            
+            counts = np.bincount(vital_codes, minlength=group_count)
+            sums = np.bincount(vital_codes, weights=values, minlength=group_count)
+            squares = np.bincount(vital_codes, weights=values * values, minlength=group_count)
+            minimums = np.full(group_count, np.inf)
+            maximums = np.full(group_count, -np.inf)
+            np.minimum.at(minimums, vital_codes, values)
+            np.maximum.at(maximums, vital_codes, values)
+            percentiles = group_percentiles(vital_codes, values, group_count, PERCENTILES)
+            range_seconds = np.bincount(vital_codes, weights=weights * in_range[mask, index], minlength=group_count)
+            measured_seconds = np.bincount(vital_codes, weights=weights, minlength=group_count)
+            edges, bins = histogram_bins[name]
+            histogram = np.bincount(vital_codes * (len(edges) - 1) + bins[mask],
+                                    minlength=group_count * (len(edges) - 1)).reshape(group_count, len(edges) - 1)
+                                    
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts
+                deviations = np.sqrt(np.maximum(squares / counts - means * means, 0))
+                
+            for code, label in enumerate(labels):
+                if label not in groups or not counts[code]:
+                    continue
+                groups[label]['vitals'][name] = {
+                    'count': int(counts[code]),
+                    'mean': round(float(means[code]), 2),
+                    'std': round(float(deviations[code]), 2),
+                    'min': float(minimums[code]),
+                    'max': float(maximums[code]),
+                    'percentiles': {f"p{p}": float(value) for p, value in zip(PERCENTILES, percentiles[code])},
+                    'timeInRange': round(float(range_seconds[code] * 100 / measured_seconds[code]), 2)
+                                   if measured_seconds[code] else 0.0,
+                    'histogram': histogram[code].tolist()
+                }
+                
+        dimensions[dimension] = groups
+        
+    return {
+        'readings': int(len(patient)),
+        'patients': int(len(np.unique(patient))),
+        'statuses': STATUSES,
+        'maxReadingGapSeconds': max_gap_seconds,
+        'normalRanges': {
+            name: [float(WARNING_MIN[index]), float(WARNING_MAX[index]) if np.isfinite(WARNING_MAX[index]) else None]
+            for index, (name, _) in enumerate(VITALS)
+        },
+        'histogramEdges': {name: [float(edge) for edge in edges] for name, (edges, _) in histogram_bins.items()},
+        'dimensions': dimensions
+    }
\ No newline at end of file
@@ -0,0 +1,216 @@
+# lambda/vitals-analytics/lambda_function.py
+import json
+import boto3
+import csv
+import gzip
+import io
+import time
+from datetime import datetime, timedelta
+import os
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+
+import vital_blocks
+import cohort_analytics
+from emf import emit_metrics
+from profiling import profiled
+
+# Environment variables
+VITAL_BLOCKS_TABLE = os.environ['VITAL_BLOCKS_TABLE']
+VITAL_BLOCKS_BUCKET = os.environ.get('VITAL_BLOCKS_BUCKET', '')
+PATIENT_RECORDS_TABLE = os.environ['PATIENT_RECORDS_TABLE']
+ANALYTICS_BUCKET = os.environ['ANALYTICS_BUCKET']
+ANALYTICS_PREFIX = os.environ.get('ANALYTICS_PREFIX', 'analytics/ward-cohorts').rstrip('/')
+ANALYTICS_WINDOW_DAYS = int(os.environ.get('ANALYTICS_WINDOW_DAYS', '7'))
+ANALYTICS_QUERY_WORKERS = int(os.environ.get('ANALYTICS_QUERY_WORKERS', '8'))
+# Longest gap between readings that still counts as time in the earlier reading's status
+MAX_READING_GAP_SECONDS = int(os.environ.get('MAX_READING_GAP_SECONDS', '600'))
+COMPACTION_AGE_HOURS = int(os.environ.get('COMPACTION_AGE_HOURS', '6'))
+
+# Initialize AWS clients; block queries run concurrently over one connection pool
+dynamodb = boto3.resource('dynamodb', config=Config(max_pool_connections=max(ANALYTICS_QUERY_WORKERS, 10)))
+s3 = boto3.client('s3')
+
+# Get DynamoDB tables
+vital_blocks_table = dynamodb.Table(VITAL_BLOCKS_TABLE)
+patient_table = dynamodb.Table(PATIENT_RECORDS_TABLE)
+
+@profiled
+def lambda_handler(event, context):
+    """
+    Build the ward cohort report. Scheduled runs read the compacted hourly
+    blocks for the last ANALYTICS_WINDOW_DAYS up to the compaction cutoff, so
+    the live VitalSigns tables are never scanned. Invoked with
+    {'exportKeys': [...], 'reportName': ...}, the report is built from
+    vitals-export files in ANALYTICS_BUCKET instead.
+    """
+    
+    started = time.perf_counter()
+    event = event or {}
+    
+    try:
+        patients = load_patients()
+        columns = cohort_analytics.CohortColumns(patients)
+        
+        if event.get('exportKeys'):
+            source = 'export'
+            report_name = event.get('reportName') or f"export-{datetime.utcnow():%Y-%m-%dT%H%M%S}"
+            window = load_export_files(event['exportKeys'], columns)
+        else:
+            source = 'blocks'
+            report_name = None
+            window = report_window()
+            load_blocks(list(patients), window, columns)
+            
+        load_ms = (time.perf_counter() - started) * 1000
+        stage_started = time.perf_counter()
+        report = cohort_analytics.build_report(columns.arrays(), MAX_READING_GAP_SECONDS)
+        compute_ms = (time.perf_counter() - stage_started) * 1000
+        
+        report.update({
+            'generatedAt': datetime.utcnow().isoformat() + 'Z',
+            'source': source,
+            'window': {'start': window[0], 'end': window[1]}
+        })
+        keys = write_report(report, report_name)
+        
+        print(f"Cohort report over {report['readings']} readings from {report['patients']} patients "
+              f"written to {', '.join(keys)} (load {load_ms:.0f} ms, compute {compute_ms:.0f} ms)")
+        emit_metrics({
+            'AnalyticsReadings': (report['readings'], 'Count'),
+            'AnalyticsLoadLatency': (load_ms, 'Milliseconds'),
+            'AnalyticsComputeLatency': (compute_ms, 'Milliseconds')
+        })
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'readings': report['readings'],
+                'patients': report['patients'],
+                'window': report['window'],
+                'keys': keys
+            })
+        }
+        
+    except Exception as e:
+        print(f"Error building cohort report: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+
+def report_window():
+    """(start hour, end hour) of the scheduled report; the end is the compaction cutoff"""
+    
+    end = datetime.utcnow() - timedelta(hours=COMPACTION_AGE_HOURS)
+    start = end - timedelta(days=ANALYTICS_WINDOW_DAYS)
+    return start.strftime('%Y-%m-%dT%H'), end.strftime('%Y-%m-%dT%H')
+
+def load_patients():
+    """PatientId -> age, room and condition, from one scan of the patient records"""
+    
+    patients = {}
+    scan_kwargs = {
+        'ProjectionExpression': 'PatientId, Age, RoomNumber, #condition',
+        'ExpressionAttributeNames': {'#condition': 'Condition'}
+    }
+    while True:
+        response = patient_table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            patients[item['PatientId']] = {
+                'age': float(item['Age']) if item.get('Age') is not None else float('nan'),
+                'roomNumber': item.get('RoomNumber'),
+                'condition': item.get('Condition')
+            }
+            
+        if 'LastEvaluatedKey' not in response:
+            return patients
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def load_blocks(patient_ids, window, columns):
+    """
+    Decode every patient's blocks in [start hour, end hour) into columns.
+    Queries and decoding run on worker threads; columns are appended on this
+    thread as each patient finishes.
+    """
+    
+    def fetch(patient_id):
+        return patient_id, [vital_blocks.decode_block_columns(load_block_data(block))
+                            for block in query_blocks(patient_id, window)]
+                            
+    with ThreadPoolExecutor(max_workers=ANALYTICS_QUERY_WORKERS) as executor:
+        for patient_id, blocks in executor.map(fetch, patient_ids):
+            for block in blocks:
+                columns.add_columns(patient_id, block)
+
+def query_blocks(patient_id, window):
+    """Yield one patient's block items for hours in [start, end)"""
+    
+    query_kwargs = {
+        # HourStart is 'YYYY-MM-DDTHH'; the end hour itself is excluded below
+        'KeyConditionExpression': Key('PatientId').eq(patient_id) & Key('HourStart').between(window[0], window[1])
+    }
+    while True:
+        response = vital_blocks_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            if item['HourStart'] < window[1]:
+                yield item
+                
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def load_block_data(block_item):
+    """Compressed block bytes, fetched from S3 when the block was spilled"""
+    
+    if 'BlockKey' in block_item:
+        return s3.get_object(Bucket=VITAL_BLOCKS_BUCKET, Key=block_item['BlockKey'])['Body'].read()
+    return block_item['Data'].value
+
+def load_export_files(keys, columns):
+    """
+    Load vitals-export files (ndjson.gz or csv.gz, vitals dataset) into
+    columns; returns the (first, last) reading timestamps.
+    """
+    
+    first = last = None
+    for key in keys:
+        body = s3.get_object(Bucket=ANALYTICS_BUCKET, Key=key)['Body'].read()
+        text = io.TextIOWrapper(gzip.GzipFile(fileobj=io.BytesIO(body)), encoding='utf-8')
+        rows = csv.DictReader(text) if key.endswith('.csv.gz') else (json.loads(line) for line in text if line.strip())
+        
+        # Exports write rows in per-patient pages, so rows arrive in runs; each run is added at once
+        patient_id = None
+        patient_rows = []
+        for row in rows:
+            if 'Timestamp' not in row or 'PatientId' not in row:
+                continue
+            if row['PatientId'] != patient_id and patient_rows:
+                columns.add_rows(patient_id, patient_rows, vital_blocks.timestamp_to_micros)
+                patient_rows = []
+            patient_id = row['PatientId']
+            patient_rows.append(row)
+            first = row['Timestamp'] if first is None or row['Timestamp'] < first else first
+            last = row['Timestamp'] if last is None or row['Timestamp'] > last else last
+        if patient_rows:
+            columns.add_rows(patient_id, patient_rows, vital_blocks.timestamp_to_micros)
+            
+    return first, last
+
+def write_report(report, report_name=None):
+    """
+    Write the report to S3. Scheduled reports replace latest.json and keep a
+    dated copy; named (export) reports are written under their name only.
+    """
+    
+    body = json.dumps(report, separators=(',', ':')).encode('utf-8')
+    if report_name:
+        names = [report_name]
+    else:
+        names = ['latest', datetime.utcnow().strftime('%Y-%m-%d')]
+        
+    keys = [f"{ANALYTICS_PREFIX}/{name}.json" for name in names]
+    for key in keys:
+        s3.put_object(Bucket=ANALYTICS_BUCKET, Key=key, Body=body, ContentType='application/json')
+    return keys
\ No newline at end of file
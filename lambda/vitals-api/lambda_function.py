@@ -1,22 +1,69 @@
 # lambda/vitals-api/lambda_function.py
 import json
+import math
 import boto3
 from decimal import Decimal
 from datetime import datetime, timedelta
 import os
-from boto3.dynamodb.conditions import Key, Attr
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
+import vital_blocks
+import vital_schema
+import waveforms
+import device_registry
+import patient_roster
+from change_feed import current_cursor, now_ms, parse_cursor, query_changes, CHANGE_FEED_SETTLE_MS
+from query_cache import QueryCache, bucket_end, cache_key
+from profiling import profiled
 
 # Environment variables
 VITAL_SIGNS_TABLE = os.environ['VITAL_SIGNS_TABLE']
+VITAL_SIGNS_COMPACT_TABLE = os.environ.get('VITAL_SIGNS_COMPACT_TABLE', '')
+# Keep reading the v1 table while it still holds readings (see vital_schema)
+VITAL_SIGNS_LEGACY_READS = os.environ.get('VITAL_SIGNS_LEGACY_READS', 'true').lower() == 'true'
 PATIENT_RECORDS_TABLE = os.environ['PATIENT_RECORDS_TABLE']
+VITAL_BLOCKS_TABLE = os.environ.get('VITAL_BLOCKS_TABLE', '')
+VITAL_BLOCKS_BUCKET = os.environ.get('VITAL_BLOCKS_BUCKET', '')
+COMPACTION_AGE_HOURS = int(os.environ.get('COMPACTION_AGE_HOURS', '6'))
+BATCH_QUERY_WORKERS = int(os.environ.get('BATCH_QUERY_WORKERS', '8'))
+# With bucketed keys, how far back the latest raw reading is looked for before falling back to blocks
+LATEST_READING_LOOKBACK_HOURS = int(os.environ.get('LATEST_READING_LOOKBACK_HOURS', str(COMPACTION_AGE_HOURS + 24)))
+WAVEFORM_TABLE = os.environ.get('WAVEFORM_TABLE', '')
+DEVICE_REGISTRY_TABLE = os.environ.get('DEVICE_REGISTRY_TABLE', '')
+# Precomputed reports written by vitals-analytics
+ANALYTICS_BUCKET = os.environ.get('ANALYTICS_BUCKET', '')
+ANALYTICS_PREFIX = os.environ.get('ANALYTICS_PREFIX', 'analytics/ward-cohorts').rstrip('/')
+
+# BatchGetItem reads at most 100 keys, which also bounds patientIds= requests
+MAX_BATCH_PATIENTS = 100
+# report= values served from ANALYTICS_PREFIX; reports change daily, so cache them longer
+ANALYTICS_REPORTS = {'cohorts'}
+ANALYTICS_REPORT_CACHE_SECONDS = 300
+# waveform= requests: default window, longest window, and the point budget before decimation kicks in
+WAVEFORM_DEFAULT_SECONDS = 30
+WAVEFORM_MAX_RANGE_SECONDS = 3600
+WAVEFORM_MAX_POINTS = 20000
+
+# Initialize AWS clients; batch requests query patients concurrently over one connection pool
+dynamodb = boto3.resource('dynamodb', config=Config(max_pool_connections=max(BATCH_QUERY_WORKERS, 10)))
+s3 = boto3.client('s3')
 
 # Get DynamoDB tables
 vital_signs_table = dynamodb.Table(VITAL_SIGNS_TABLE)
+vital_signs_compact_table = dynamodb.Table(VITAL_SIGNS_COMPACT_TABLE) if VITAL_SIGNS_COMPACT_TABLE else None
+read_legacy_vital_signs = vital_signs_compact_table is None or VITAL_SIGNS_LEGACY_READS
 patient_table = dynamodb.Table(PATIENT_RECORDS_TABLE)
+vital_blocks_table = dynamodb.Table(VITAL_BLOCKS_TABLE) if VITAL_BLOCKS_TABLE else None
+waveform_table = dynamodb.Table(WAVEFORM_TABLE) if WAVEFORM_TABLE else None
+device_registry_table = dynamodb.Table(DEVICE_REGISTRY_TABLE) if DEVICE_REGISTRY_TABLE else None
+
+# Dashboard queries over relative ranges, shared by refreshes within a time bucket
+query_cache = QueryCache('vitals-api')
 
+@profiled
 def lambda_handler(event, context):
     """
     Handle vital signs API requests for historical and real-time data
@@ -29,7 +76,9 @@ def lambda_handler(event, context):
         
         # Route based on HTTP method and parameters
         if http_method == 'GET':
-            return handle_get_vital_signs(query_params)
+            response = handle_get_vital_signs(query_params)
+            query_cache.emit_metrics()
+            return response
         else:
             return create_error_response(405, f"Method {http_method} not allowed")
             
@@ -41,14 +90,30 @@ def handle_get_vital_signs(query_params):
     """Handle GET requests for vital signs data"""
     
     patient_id = query_params.get('patientId')
+    patient_ids = query_params.get('patientIds')
     time_range = query_params.get('timeRange', '1h')
     latest = query_params.get('latest', 'false').lower() == 'true'
     start_time = query_params.get('startTime')
     end_time = query_params.get('endTime')
     limit = int(query_params.get('limit', '100'))
+    since = query_params.get('since')
+    report = query_params.get('report')
+    waveform = query_params.get('waveform')
+    fleet = query_params.get('fleet', 'false').lower() == 'true'
     
     try:
-        if patient_id:
+        if report:
+            return get_analytics_report(report, query_params.get('date'))
+        elif fleet:
+            return get_fleet_health(query_params.get('status'))
+        elif waveform:
+            return get_waveform(patient_id, waveform, start_time, end_time,
+                                query_params.get('maxPoints'), query_params.get('decimate'))
+        elif since:
+            return get_vital_signs_changes(patient_id, patient_ids, since, limit)
+        elif patient_ids:
+            return get_vital_signs_for_patients(patient_ids, latest, time_range, start_time, end_time, limit)
+        elif patient_id:
             if latest:
                 return get_latest_vital_signs(patient_id)
             elif start_time and end_time:
@@ -56,30 +121,238 @@ def handle_get_vital_signs(query_params):
             else:
                 return get_vital_signs_by_time_range(patient_id, time_range, limit)
         else:
-            return get_all_recent_vital_signs(time_range, limit)
+            return get_all_recent_vital_signs(time_range)
             
     except Exception as e:
         print(f"Error in handle_get_vital_signs: {str(e)}")
         return create_error_response(500, f"Error retrieving vital signs: {str(e)}")
 
+def get_analytics_report(report, date):
+    """Serve a precomputed vitals-analytics report: the latest, or one day's with date=YYYY-MM-DD"""
+    
+    if report not in ANALYTICS_REPORTS:
+        return create_error_response(400, f"Unknown report {report}; expected one of: {', '.join(sorted(ANALYTICS_REPORTS))}")
+    if not ANALYTICS_BUCKET:
+        return create_error_response(404, "Analytics reports are not configured")
+    if date:
+        try:
+            date = datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            return create_error_response(400, "date must be YYYY-MM-DD")
+            
+    key = f"{ANALYTICS_PREFIX}/{date or 'latest'}.json"
+    return query_cache.get_or_load(
+        cache_key('report', key),
+        lambda: fetch_analytics_report(key),
+        ttl_seconds=ANALYTICS_REPORT_CACHE_SECONDS
+    )
+
+def fetch_analytics_report(key):
+    try:
+        body = s3.get_object(Bucket=ANALYTICS_BUCKET, Key=key)['Body'].read()
+    except s3.exceptions.NoSuchKey:
+        return create_error_response(404, f"Report {key} has not been built yet")
+    return create_success_response(json.loads(body))
+
+def get_fleet_health(status):
+    """
+    Every registered device with its rolling battery, signal and quality
+    health, worst first (fleet=true). status=attention keeps only devices
+    with issues, including those offline for DEVICE_OFFLINE_MINUTES.
+    """
+    
+    if device_registry_table is None:
+        return create_error_response(404, "Device registry is not configured")
+    if status and status.lower() not in ('attention', 'ok'):
+        return create_error_response(400, "status must be attention or ok")
+        
+    return query_cache.get_or_load(
+        cache_key('fleet', (status or 'all').lower()),
+        lambda: fetch_fleet_health((status or '').lower())
+    )
+
+def fetch_fleet_health(status):
+    try:
+        now = now_ms()
+        devices = []
+        for item in query_fleet_devices():
+            device = device_registry.DeviceHealth.from_item(item['DeviceId'], item)
+            issues = device.issues(now)
+            if (status == 'attention' and not issues) or (status == 'ok' and issues):
+                continue
+            devices.append({
+                'deviceId': item['DeviceId'],
+                'patientId': item.get('PatientId'),
+                'roomNumber': item.get('RoomNumber'),
+                'lastSeen': item.get('LastSeen'),
+                'battery': item.get('Battery'),
+                'signal': item.get('Signal'),
+                'quality': item.get('Quality', {}),
+                'lastBattery': item.get('LastBattery'),
+                'lastSignal': item.get('LastSignal'),
+                'lastQuality': item.get('LastQuality'),
+                'readingCount': item.get('ReadingCount'),
+                'issues': issues,
+                'status': 'ATTENTION' if issues else 'OK'
+            })
+            
+        # Devices with the most issues first, then the emptiest batteries
+        devices.sort(key=lambda device: (-len(device['issues']), float(device['battery']) if device['battery'] is not None else 101.0))
+        
+        summary = {'devices': len(devices), 'attention': sum(1 for device in devices if device['issues'])}
+        for issue, name in (('LOW_BATTERY', 'lowBattery'), ('WEAK_SIGNAL', 'weakSignal'),
+                            ('POOR_QUALITY', 'poorQuality'), ('OFFLINE', 'offline')):
+            summary[name] = sum(1 for device in devices if issue in device['issues'])
+            
+        return create_success_response({
+            'summary': summary,
+            'devices': convert_decimals(devices),
+            'thresholds': {
+                'lowBatteryPercent': device_registry.DEVICE_LOW_BATTERY_PERCENT,
+                'weakSignalPercent': device_registry.DEVICE_WEAK_SIGNAL_PERCENT,
+                'poorQualityShare': device_registry.DEVICE_POOR_QUALITY_SHARE,
+                'offlineMinutes': device_registry.DEVICE_OFFLINE_MINUTES
+            },
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        })
+        
+    except Exception as e:
+        print(f"Error getting fleet health: {str(e)}")
+        return create_error_response(500, f"Error retrieving fleet health: {str(e)}")
+
+def query_fleet_devices():
+    """Yield every registry item from the single FleetIndex partition"""
+    
+    query_kwargs = {
+        'IndexName': device_registry.FLEET_INDEX,
+        'KeyConditionExpression': Key('Fleet').eq(device_registry.FLEET)
+    }
+    while True:
+        response = device_registry_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            yield item
+            
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def get_waveform(patient_id, channel, start_time, end_time, max_points, decimate):
+    """
+    Samples of one waveform channel (e.g. waveform=ECG-II) between startTime
+    and endTime, by default the last WAVEFORM_DEFAULT_SECONDS. Ranges over
+    maxPoints samples (WAVEFORM_MAX_POINTS by default), or any range with
+    decimate=N, are reduced to the min and max of every N samples; each
+    segment then carries offsetsMs for its unevenly spaced points.
+    """
+    
+    if not patient_id:
+        return create_error_response(400, "waveform requires patientId")
+    if waveform_table is None:
+        return create_error_response(404, "Waveforms are not configured")
+        
+    try:
+        if start_time and end_time:
+            start_ms = vital_schema.timestamp_to_ms(start_time)
+            end_ms = vital_schema.timestamp_to_ms(end_time)
+        else:
+            end_ms = now_ms()
+            start_ms = end_ms - WAVEFORM_DEFAULT_SECONDS * 1000
+        max_points = int(max_points) if max_points else WAVEFORM_MAX_POINTS
+        factor = int(decimate) if decimate else None
+    except ValueError as e:
+        return create_error_response(400, f"Invalid waveform request: {str(e)}")
+        
+    if end_ms <= start_ms or end_ms - start_ms > WAVEFORM_MAX_RANGE_SECONDS * 1000:
+        return create_error_response(400, f"Waveform ranges must be positive and at most {WAVEFORM_MAX_RANGE_SECONDS} seconds")
+    if max_points < 2 or (factor is not None and factor < 1):
+        return create_error_response(400, "maxPoints must be at least 2 and decimate at least 1")
+        
+    try:
+        segments = [segment for segment in (trim_waveform_segment(item, start_ms, end_ms)
+                                            for item in query_waveform_segments(patient_id, channel, start_ms, end_ms))
+                    if segment['samples']]
+        if factor is None:
+            factor = waveforms.decimation_factor(sum(len(segment['samples']) for segment in segments), max_points)
+            
+        result = {
+            'patientId': patient_id,
+            'channel': channel,
+            'units': segments[0]['units'] if segments else None,
+            'timeRange': {
+                'startTime': vital_schema.ms_to_timestamp(start_ms),
+                'endTime': vital_schema.ms_to_timestamp(end_ms)
+            },
+            'decimation': factor,
+            'segments': [format_waveform_segment(segment, factor) for segment in segments]
+        }
+        result['count'] = sum(len(segment['values']) for segment in result['segments'])
+        return create_success_response(result)
+        
+    except Exception as e:
+        print(f"Error getting waveform {channel} for {patient_id}: {str(e)}")
+        return create_error_response(500, f"Error retrieving waveform: {str(e)}")
+
+def query_waveform_segments(patient_id, channel, start_ms, end_ms):
+    """Yield the segment items of one channel overlapping [start_ms, end_ms], oldest first"""
+    
+    query_kwargs = {
+        # A segment starts at most MAX_SEGMENT_SECONDS before the first sample it holds
+        'KeyConditionExpression': Key('StreamId').eq(waveforms.stream_id(patient_id, channel)) &
+                                  Key('StartMs').between(start_ms - waveforms.MAX_SEGMENT_SECONDS * 1000, end_ms)
+    }
+    while True:
+        response = waveform_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            if int(item['EndMs']) > start_ms:
+                yield item
+                
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def trim_waveform_segment(item, start_ms, end_ms):
+    """Decode a segment item and keep the samples within [start_ms, end_ms]"""
+    
+    rate = float(item['SampleRate'])
+    segment_start = int(item['StartMs'])
+    count = int(item['SampleCount'])
+    first = min(max(math.ceil((start_ms - segment_start) * rate / 1000), 0), count)
+    last = min(max(math.floor((end_ms - segment_start) * rate / 1000) + 1, first), count)
+    
+    samples = waveforms.decode_samples(item['Data'].value, count)[first:last] if last > first else []
+    return {
+        'startMs': segment_start + first * 1000 / rate,
+        'sampleRate': rate,
+        'scale': float(item['Scale']),
+        'units': item.get('Units'),
+        'deviceId': item.get('DeviceId'),
+        'samples': samples
+    }
+
+def format_waveform_segment(segment, factor):
+    values, indexes = waveforms.decimate(segment['samples'], factor)
+    formatted = {
+        'startTime': vital_schema.ms_to_timestamp(round(segment['startMs'])),
+        'sampleRate': segment['sampleRate'],
+        'deviceId': segment['deviceId'],
+        'values': [round(value * segment['scale'], 4) for value in values]
+    }
+    if factor > 1:
+        formatted['offsetsMs'] = [round(index * 1000 / segment['sampleRate'], 1) for index in indexes]
+    return formatted
+
 def get_latest_vital_signs(patient_id):
     """Get the most recent vital signs for a specific patient"""
     
     try:
-        # Query vital signs for patient, ordered by timestamp descending
-        response = vital_signs_table.query(
-            KeyConditionExpression=Key('PatientId').eq(patient_id),
-            ScanIndexForward=False,  # Descending order
-            Limit=1
-        )
-        
-        vital_signs = response.get('Items', [])
+        vital_signs = fetch_latest_vital_signs(patient_id)
         
         if not vital_signs:
             return create_error_response(404, f"No vital signs found for patient {patient_id}")
         
         # Get patient information
         patient_info = get_patient_info(patient_id)
+        add_patient_fields(vital_signs, patient_info)
         
         result = {
             'patientId': patient_id,
@@ -98,24 +371,13 @@ def get_vital_signs_by_time_range(patient_id, time_range, limit):
     """Get vital signs for a patient within a specific time range"""
     
     try:
-        # Calculate start time based on time range
-        end_time = datetime.utcnow()
-        
-        if time_range == '1h':
-            start_time = end_time - timedelta(hours=1)
-        elif time_range == '6h':
-            start_time = end_time - timedelta(hours=6)
-        elif time_range == '24h':
-            start_time = end_time - timedelta(hours=24)
-        elif time_range == '7d':
-            start_time = end_time - timedelta(days=7)
-        else:
-            start_time = end_time - timedelta(hours=1)  # Default to 1 hour
-        
-        start_time_str = start_time.isoformat() + 'Z'
-        end_time_str = end_time.isoformat() + 'Z'
+        start_time_str, end_time_str = time_range_bounds(time_range)
         
-        return get_vital_signs_range(patient_id, start_time_str, end_time_str, limit)
+        # Snapped bounds double as the normalized cache key
+        return query_cache.get_or_load(
+            cache_key('range', patient_id, start_time_str, end_time_str, limit),
+            lambda: get_vital_signs_range(patient_id, start_time_str, end_time_str, limit)
+        )
         
     except Exception as e:
         print(f"Error getting vital signs by time range: {str(e)}")
@@ -125,18 +387,12 @@ def get_vital_signs_range(patient_id, start_time, end_time, limit):
     """Get vital signs for a patient within a specific timestamp range"""
     
     try:
-        # Query vital signs within time range
-        response = vital_signs_table.query(
-            KeyConditionExpression=Key('PatientId').eq(patient_id) & 
-                                 Key('Timestamp').between(start_time, end_time),
-            ScanIndexForward=False,  # Most recent first
-            Limit=limit
-        )
-        
-        vital_signs = response.get('Items', [])
+        cursor = current_cursor()
+        vital_signs = fetch_vital_signs_range(patient_id, start_time, end_time, limit)
         
         # Get patient information
         patient_info = get_patient_info(patient_id)
+        add_patient_fields(vital_signs, patient_info)
         
         # Calculate statistics
         stats = calculate_vital_signs_stats(vital_signs)
@@ -150,7 +406,8 @@ def get_vital_signs_range(patient_id, start_time, end_time, limit):
                 'endTime': end_time
             },
             'statistics': stats,
-            'count': len(vital_signs)
+            'count': len(vital_signs),
+            'cursor': cursor
         }
         
         return create_success_response(result)
@@ -159,63 +416,316 @@ def get_vital_signs_range(patient_id, start_time, end_time, limit):
         print(f"Error getting vital signs range: {str(e)}")
         return create_error_response(500, f"Error retrieving vital signs: {str(e)}")
 
-def get_all_recent_vital_signs(time_range, limit):
-    """Get recent vital signs for all patients"""
+def time_range_bounds(time_range):
+    """(start, end) ISO timestamps for a relative timeRange value, snapped to the cache bucket"""
     
-    try:
-        # Calculate time threshold
-        end_time = datetime.utcnow()
-        
-        if time_range == '1h':
-            start_time = end_time - timedelta(hours=1)
-        elif time_range == '6h':
-            start_time = end_time - timedelta(hours=6)
-        elif time_range == '24h':
-            start_time = end_time - timedelta(hours=24)
+    end_time = bucket_end()
+    
+    if time_range == '1h':
+        start_time = end_time - timedelta(hours=1)
+    elif time_range == '6h':
+        start_time = end_time - timedelta(hours=6)
+    elif time_range == '24h':
+        start_time = end_time - timedelta(hours=24)
+    elif time_range == '7d':
+        start_time = end_time - timedelta(days=7)
+    else:
+        start_time = end_time - timedelta(hours=1)  # Default to 1 hour
+    
+    return start_time.isoformat() + 'Z', end_time.isoformat() + 'Z'
+
+def fetch_latest_vital_signs(patient_id):
+    """Most recent reading for a patient as a 0 or 1 item list"""
+    
+    vital_signs = query_raw_vital_signs(patient_id, None, None, 1)
+    
+    if not vital_signs:
+        # Patient may only have compacted history left
+        vital_signs = get_latest_compacted_vital_signs(patient_id)
+    
+    return vital_signs
+
+def fetch_vital_signs_range(patient_id, start_time, end_time, limit):
+    """Readings for a patient within a timestamp range, most recent first"""
+    
+    vital_signs = query_raw_vital_signs(patient_id, start_time, end_time, limit)
+    
+    # Older parts of the range may have been folded into hourly blocks
+    compacted = get_compacted_vital_signs(patient_id, start_time, end_time, limit)
+    if compacted:
+        vital_signs = merge_vital_signs(vital_signs, compacted, limit)
+    
+    return vital_signs
+
+def query_raw_vital_signs(patient_id, start_time, end_time, limit):
+    """
+    Raw (not yet compacted) readings, most recent first, as v1-shaped items.
+    Reads the compact table and, while migrating, the v1 table.
+    """
+    
+    vital_signs = []
+    
+    if vital_signs_compact_table is not None:
+        if start_time:
+            start_ms = vital_schema.timestamp_to_ms(start_time)
+            end_ms = vital_schema.timestamp_to_ms(end_time)
         else:
-            start_time = end_time - timedelta(hours=1)
-        
-        start_time_str = start_time.isoformat() + 'Z'
-        
-        # Use GSI to query by timestamp
+            start_ms, end_ms = latest_reading_bounds()
+        items = vital_schema.query_readings(vital_signs_compact_table, patient_id, start_ms, end_ms,
+                                            newest_first=True, page_size=limit)
+        vital_signs = vital_schema.expand_items(list(islice(items, limit)))
+        
+    if read_legacy_vital_signs:
+        key_condition = Key('PatientId').eq(patient_id)
+        if start_time:
+            key_condition = key_condition & Key('Timestamp').between(start_time, end_time)
         response = vital_signs_table.query(
-            IndexName='TimestampIndex',
-            KeyConditionExpression=Key('Timestamp').gte(start_time_str),
-            ScanIndexForward=False,
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=False,  # Most recent first
             Limit=limit
         )
+        legacy = response.get('Items', [])
+        vital_signs = merge_vital_signs(legacy, vital_signs, limit) if vital_signs else legacy
         
-        vital_signs = response.get('Items', [])
-        
-        # Group by patient ID and get latest for each
-        patients_vital_signs = {}
-        for record in vital_signs:
-            patient_id = record['PatientId']
-            if patient_id not in patients_vital_signs:
-                patients_vital_signs[patient_id] = []
-            patients_vital_signs[patient_id].append(record)
-        
-        # Get latest vital signs for each patient
-        result_data = []
-        for patient_id, records in patients_vital_signs.items():
-            # Sort by timestamp and get latest
-            latest_record = max(records, key=lambda x: x['Timestamp'])
+    return vital_signs
+
+def latest_reading_bounds():
+    """T range searched for a patient's latest raw reading"""
+    
+    now = now_ms()
+    if not vital_schema.bucketing_enabled():
+        # One partition per patient: the newest item is the first one read
+        return 0, now + 3600 * 1000
+    return now - LATEST_READING_LOOKBACK_HOURS * 3600 * 1000, now + 3600 * 1000
+
+def add_patient_fields(vital_signs, patient_info):
+    """Room and condition for compact readings written without them, from the patient record"""
+    
+    for item in vital_signs:
+        item.setdefault('RoomNumber', patient_info['roomNumber'])
+        item.setdefault('PatientCondition', patient_info['condition'])
+
+def get_vital_signs_for_patients(patient_ids_param, latest, time_range, start_time, end_time, limit):
+    """
+    Batch mode (patientIds=P1,P2,...): query every patient concurrently and
+    read all patient records with one BatchGetItem. A failure for one patient
+    is reported in that patient's entry instead of failing the request.
+    """
+    
+    patient_ids = list(dict.fromkeys(pid.strip() for pid in patient_ids_param.split(',') if pid.strip()))
+    if not patient_ids:
+        return create_error_response(400, "patientIds must list at least one patient ID")
+    if len(patient_ids) > MAX_BATCH_PATIENTS:
+        return create_error_response(400, f"patientIds is limited to {MAX_BATCH_PATIENTS} patients")
+    
+    if not latest and not (start_time and end_time):
+        start_time, end_time = time_range_bounds(time_range)
+    cursor = current_cursor()
+    
+    def fetch(patient_id):
+        if latest:
+            return fetch_latest_vital_signs(patient_id)
+        return fetch_vital_signs_range(patient_id, start_time, end_time, limit)
+    
+    with ThreadPoolExecutor(max_workers=min(BATCH_QUERY_WORKERS, len(patient_ids))) as executor:
+        futures = [(patient_id, executor.submit(fetch, patient_id)) for patient_id in patient_ids]
+        # Runs alongside the per-patient queries
+        patient_infos = get_patient_infos(patient_ids)
+        
+        patients = []
+        for patient_id, future in futures:
+            entry = {'patientId': patient_id, 'patientInfo': patient_infos[patient_id]}
+            try:
+                vital_signs = future.result()
+            except Exception as e:
+                print(f"Error getting vital signs for {patient_id}: {str(e)}")
+                entry.update({'status': 'error', 'error': str(e)})
+                patients.append(entry)
+                continue
+            add_patient_fields(vital_signs, entry['patientInfo'])
             
-            # Get patient info
-            patient_info = get_patient_info(patient_id)
+            if latest:
+                if vital_signs:
+                    entry.update({
+                        'status': 'ok',
+                        'latestVitalSigns': convert_decimals(vital_signs[0]),
+                        'timestamp': vital_signs[0]['Timestamp']
+                    })
+                else:
+                    entry['status'] = 'notFound'
+            else:
+                entry.update({
+                    'status': 'ok' if vital_signs else 'notFound',
+                    'vitalSigns': convert_decimals(vital_signs),
+                    'statistics': calculate_vital_signs_stats(vital_signs),
+                    'count': len(vital_signs)
+                })
+            patients.append(entry)
+    
+    result = {
+        'patients': patients,
+        'requested': len(patient_ids),
+        'found': sum(1 for entry in patients if entry['status'] == 'ok'),
+        'failed': sum(1 for entry in patients if entry['status'] == 'error'),
+        'cursor': cursor
+    }
+    if not latest:
+        result['timeRange'] = {'startTime': start_time, 'endTime': end_time}
+    
+    return create_success_response(result)
+
+def get_vital_signs_changes(patient_id, patient_ids_param, since_param, limit):
+    """
+    Delta poll (since=<cursor>): readings stored after the cursor, oldest
+    first, from PatientChangeIndex. Works for patientId or patientIds; the
+    returned cursor is safe for every patient in the request.
+    """
+    
+    if patient_ids_param:
+        patient_ids = list(dict.fromkeys(pid.strip() for pid in patient_ids_param.split(',') if pid.strip()))
+    else:
+        patient_ids = [patient_id] if patient_id else []
+    if not patient_ids:
+        return create_error_response(400, "since requires patientId or patientIds")
+    if len(patient_ids) > MAX_BATCH_PATIENTS:
+        return create_error_response(400, f"patientIds is limited to {MAX_BATCH_PATIENTS} patients")
+    
+    try:
+        since = parse_cursor(since_param)
+    except ValueError as e:
+        return create_error_response(400, str(e))
+    
+    until = now_ms() - CHANGE_FEED_SETTLE_MS
+    
+    def fetch(pid):
+        return fetch_vital_signs_changes(pid, since, until, limit)
+    
+    try:
+        if len(patient_ids) == 1:
+            changes = [fetch(patient_ids[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(BATCH_QUERY_WORKERS, len(patient_ids))) as executor:
+                changes = list(executor.map(fetch, patient_ids))
+    except Exception as e:
+        print(f"Error getting vital signs changes: {str(e)}")
+        return create_error_response(500, f"Error retrieving vital signs changes: {str(e)}")
+    
+    # A truncated patient holds the shared cursor back; the others' readings
+    # past it are simply returned again next poll
+    cursor = min(int(patient_cursor) for _, patient_cursor, _ in changes)
+    has_more = any(patient_has_more for _, _, patient_has_more in changes)
+    
+    if not patient_ids_param:
+        vital_signs = changes[0][0]
+        return create_success_response({
+            'patientId': patient_ids[0],
+            'vitalSigns': convert_decimals(vital_signs),
+            'count': len(vital_signs),
+            'since': str(since),
+            'cursor': str(cursor),
+            'hasMore': has_more
+        })
+    
+    patients = [
+        {'patientId': pid, 'vitalSigns': convert_decimals(vital_signs), 'count': len(vital_signs)}
+        for pid, (vital_signs, _, _) in zip(patient_ids, changes) if vital_signs
+    ]
+    return create_success_response({
+        'patients': patients,
+        'requested': len(patient_ids),
+        'count': sum(entry['count'] for entry in patients),
+        'since': str(since),
+        'cursor': str(cursor),
+        'hasMore': has_more
+    })
+
+def fetch_vital_signs_changes(patient_id, since, until, limit):
+    """(readings, cursor, has_more) for one patient's readings stored in (since, until]"""
+    
+    results = []
+    
+    if vital_signs_compact_table is not None:
+        # One partition per patient, or the time buckets the changed readings can be in
+        for partition in vital_schema.change_partitions(patient_id, since, until):
+            def compact_key_condition(lower, upper, partition=partition):
+                return Key('P').eq(partition) & Key('C').between(lower, upper)
+                
+            items, cursor, has_more = query_changes(vital_signs_compact_table, 'PatientChangeIndex', compact_key_condition,
+                                                    since, until, limit, changed_attribute='C')
+            results.append((vital_schema.expand_items(items), cursor, has_more))
+        
+    if read_legacy_vital_signs:
+        def key_condition(lower, upper):
+            return Key('PatientId').eq(patient_id) & Key('ChangedAt').between(lower, upper)
             
-            result_data.append({
-                'patientId': patient_id,
-                'latestVitalSigns': convert_decimals(latest_record),
-                'patientInfo': patient_info,
-                'recordCount': len(records)
-            })
+        results.append(query_changes(vital_signs_table, 'PatientChangeIndex', key_condition, since, until, limit))
+        
+    if len(results) == 1:
+        return results[0]
         
+    # Same rule as for several patients: the lower cursor wins and the rest is read next poll
+    cursor = min(int(table_cursor) for _, table_cursor, _ in results)
+    items = sorted((item for table_items, _, _ in results for item in table_items if int(item['ChangedAt']) <= cursor),
+                   key=lambda item: int(item['ChangedAt']))
+    return items, str(cursor), any(table_has_more for _, _, table_has_more in results)
+
+def get_all_recent_vital_signs(time_range):
+    """Get the latest vital signs for all active patients"""
+    
+    start_time_str, end_time_str = time_range_bounds(time_range)
+    
+    return query_cache.get_or_load(
+        cache_key('recent', time_range, start_time_str),
+        lambda: query_all_recent_vital_signs(time_range, start_time_str, end_time_str)
+    )
+
+def query_all_recent_vital_signs(time_range, start_time_str, end_time_str):
+    """
+    Latest reading in the range per active patient. Each patient is read like
+    a per-patient range query (compact table, plus the v1 table while
+    migrating) limited to the newest reading, concurrently. The roster index
+    only projects some patient fields, so patient info is read with BatchGetItem.
+    """
+    
+    try:
+        patient_ids = [patient['PatientId'] for patient in patient_roster.query_active_patients(patient_table)
+                       if patient.get('Status') == patient_roster.ACTIVE_STATUS]
+        patient_infos = {}
+        for start in range(0, len(patient_ids), 100):
+            patient_infos.update(get_patient_infos(patient_ids[start:start + 100]))
+        
+        result_data = []
+        total_records = 0
+        if patient_infos:
+            with ThreadPoolExecutor(max_workers=min(BATCH_QUERY_WORKERS, len(patient_infos))) as executor:
+                futures = [
+                    (patient_id, executor.submit(query_raw_vital_signs, patient_id, start_time_str, end_time_str, 1))
+                    for patient_id in patient_infos
+                ]
+                for patient_id, future in futures:
+                    try:
+                        vital_signs = future.result()
+                    except Exception as e:
+                        print(f"Error getting recent vital signs for {patient_id}: {str(e)}")
+                        continue
+                    if not vital_signs:
+                        continue
+                    
+                    add_patient_fields(vital_signs, patient_infos[patient_id])
+                    total_records += len(vital_signs)
+                    result_data.append({
+                        'patientId': patient_id,
+                        'latestVitalSigns': convert_decimals(vital_signs[0]),
+                        'patientInfo': patient_infos[patient_id],
+                        'recordCount': len(vital_signs)
+                    })
+        
+        result_data.sort(key=lambda entry: entry['latestVitalSigns']['Timestamp'], reverse=True)
         result = {
             'timeRange': time_range,
             'patients': result_data,
-            'totalRecords': len(vital_signs),
-            'totalPatients': len(patients_vital_signs)
+            'totalRecords': total_records,
+            'totalPatients': len(result_data)
         }
         
         return create_success_response(result)
@@ -224,6 +734,75 @@ def get_all_recent_vital_signs(time_range, limit):
         print(f"Error getting all recent vital signs: {str(e)}")
         return create_error_response(500, f"Error retrieving vital signs: {str(e)}")
 
+def get_compacted_vital_signs(patient_id, start_time, end_time, limit):
+    """Read compacted hourly blocks overlapping a timestamp range, most recent first"""
+    
+    if vital_blocks_table is None:
+        return []
+    
+    # Nothing newer than the compaction horizon is ever compacted
+    horizon = (datetime.utcnow() - timedelta(hours=COMPACTION_AGE_HOURS)).isoformat()
+    if start_time >= horizon:
+        return []
+    
+    query_kwargs = {
+        'KeyConditionExpression': Key('PatientId').eq(patient_id) &
+                                  Key('HourStart').between(vital_blocks.hour_key(start_time),
+                                                           vital_blocks.hour_key(end_time)),
+        'ScanIndexForward': False
+    }
+    
+    readings = []
+    while True:
+        response = vital_blocks_table.query(**query_kwargs)
+        
+        for block in response.get('Items', []):
+            for item in reversed(load_block_readings(block)):
+                if start_time <= item['Timestamp'] <= end_time:
+                    readings.append(item)
+            
+            if len(readings) >= limit:
+                return readings[:limit]
+        
+        if 'LastEvaluatedKey' not in response:
+            return readings
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def get_latest_compacted_vital_signs(patient_id):
+    """Get the most recent reading from the newest compacted block"""
+    
+    if vital_blocks_table is None:
+        return []
+    
+    response = vital_blocks_table.query(
+        KeyConditionExpression=Key('PatientId').eq(patient_id),
+        ScanIndexForward=False,
+        Limit=1
+    )
+    
+    blocks = response.get('Items', [])
+    if not blocks:
+        return []
+    return load_block_readings(blocks[0])[-1:]
+
+def load_block_readings(block):
+    """Decode a block item into reading items, fetching spilled blocks from S3"""
+    
+    if 'BlockKey' in block:
+        data = s3.get_object(Bucket=VITAL_BLOCKS_BUCKET, Key=block['BlockKey'])['Body'].read()
+    else:
+        data = block['Data'].value
+    return vital_blocks.decode_block(data, block['PatientId'])
+
+def merge_vital_signs(raw_items, compacted_items, limit):
+    """Merge raw and compacted readings, newest first; raw items win on duplicates"""
+    
+    merged = {vital_blocks.reading_identity(item): item for item in compacted_items}
+    for item in raw_items:
+        merged[vital_blocks.reading_identity(item)] = item
+    
+    return sorted(merged.values(), key=lambda item: item['Timestamp'], reverse=True)[:limit]
+
 def get_patient_info(patient_id):
     """Get basic patient information"""
     
@@ -232,36 +811,54 @@ def get_patient_info(patient_id):
             Key={'PatientId': patient_id}
         )
         
-        if 'Item' in response:
-            patient = response['Item']
-            return {
-                'name': patient.get('Name', 'Unknown'),
-                'age': int(patient.get('Age', 0)),
-                'gender': patient.get('Gender', 'Unknown'),
-                'roomNumber': patient.get('RoomNumber', 'Unknown'),
-                'condition': patient.get('Condition', 'Unknown'),
-                'status': patient.get('Status', 'Unknown')
-            }
-        else:
-            return {
-                'name': 'Unknown Patient',
-                'age': 0,
-                'gender': 'Unknown',
-                'roomNumber': 'Unknown',
-                'condition': 'Unknown',
-                'status': 'Unknown'
-            }
+        return format_patient_info(response.get('Item'))
             
     except Exception as e:
         print(f"Error getting patient info for {patient_id}: {str(e)}")
+        return format_patient_info(None)
+
+def get_patient_infos(patient_ids):
+    """Basic patient information for up to 100 patients with BatchGetItem"""
+    
+    patients = {}
+    try:
+        request = {PATIENT_RECORDS_TABLE: {
+            'Keys': [{'PatientId': patient_id} for patient_id in patient_ids],
+            'ProjectionExpression': 'PatientId, #name, Age, Gender, RoomNumber, #condition, #status',
+            'ExpressionAttributeNames': {'#name': 'Name', '#condition': 'Condition', '#status': 'Status'}
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(PATIENT_RECORDS_TABLE, []):
+                patients[item['PatientId']] = item
+            request = response.get('UnprocessedKeys') or None
+            
+    except Exception as e:
+        print(f"Error getting patient info batch: {str(e)}")
+    
+    return {patient_id: format_patient_info(patients.get(patient_id)) for patient_id in patient_ids}
+
+def format_patient_info(patient):
+    """Shape a patient record for API responses (placeholder when missing)"""
+    
+    if patient:
         return {
-            'name': 'Unknown Patient',
-            'age': 0,
-            'gender': 'Unknown',
-            'roomNumber': 'Unknown',
-            'condition': 'Unknown',
-            'status': 'Unknown'
+            'name': patient.get('Name', 'Unknown'),
+            'age': int(patient.get('Age', 0)),
+            'gender': patient.get('Gender', 'Unknown'),
+            'roomNumber': patient.get('RoomNumber', 'Unknown'),
+            'condition': patient.get('Condition', 'Unknown'),
+            'status': patient.get('Status', 'Unknown')
         }
+    
+    return {
+        'name': 'Unknown Patient',
+        'age': 0,
+        'gender': 'Unknown',
+        'roomNumber': 'Unknown',
+        'condition': 'Unknown',
+        'status': 'Unknown'
+    }
 
 def calculate_vital_signs_stats(vital_signs):
     """Calculate statistics for vital signs data"""
@@ -0,0 +1,234 @@
+# lambda/vitals-compactor/lambda_function.py
+import json
+import boto3
+import heapq
+from datetime import datetime, timedelta
+import os
+from boto3.dynamodb.conditions import Key
+
+import vital_blocks
+import vital_schema
+from profiling import profiled
+
+# Initialize AWS clients
+dynamodb = boto3.resource('dynamodb')
+s3 = boto3.client('s3')
+
+# Environment variables
+VITAL_SIGNS_TABLE = os.environ['VITAL_SIGNS_TABLE']
+VITAL_SIGNS_COMPACT_TABLE = os.environ.get('VITAL_SIGNS_COMPACT_TABLE', '')
+VITAL_SIGNS_LEGACY_READS = os.environ.get('VITAL_SIGNS_LEGACY_READS', 'true').lower() == 'true'
+VITAL_BLOCKS_TABLE = os.environ['VITAL_BLOCKS_TABLE']
+PATIENT_RECORDS_TABLE = os.environ['PATIENT_RECORDS_TABLE']
+VITAL_BLOCKS_BUCKET = os.environ.get('VITAL_BLOCKS_BUCKET', '')
+COMPACTION_AGE_HOURS = int(os.environ.get('COMPACTION_AGE_HOURS', '6'))
+# With bucketed keys, how far before the cutoff raw readings are looked for
+COMPACTION_LOOKBACK_HOURS = int(os.environ.get('COMPACTION_LOOKBACK_HOURS', '48'))
+
+# Get DynamoDB tables
+vital_signs_table = dynamodb.Table(VITAL_SIGNS_TABLE)
+vital_signs_compact_table = dynamodb.Table(VITAL_SIGNS_COMPACT_TABLE) if VITAL_SIGNS_COMPACT_TABLE else None
+vital_blocks_table = dynamodb.Table(VITAL_BLOCKS_TABLE)
+patient_table = dynamodb.Table(PATIENT_RECORDS_TABLE)
+
+# Blocks larger than this are written to S3 instead of inline (item limit is 400 KB)
+BLOCK_INLINE_LIMIT_BYTES = 300 * 1024
+# Stop picking up new patients when less than this much time is left
+TIME_BUDGET_RESERVE_MS = 30000
+# Same retention as raw readings
+BLOCK_RETENTION_DAYS = 30
+
+@profiled
+def lambda_handler(event, context):
+    """
+    Fold raw vital signs older than COMPACTION_AGE_HOURS into per-patient,
+    per-hour columnar blocks and delete the raw items they replace.
+    Runs on a schedule; patients not reached in one run are picked up next time.
+    """
+    
+    cutoff = compaction_cutoff()
+    patients_scanned = 0
+    blocks_written = 0
+    readings_compacted = 0
+    
+    try:
+        print(f"Compacting vital signs older than {cutoff}")
+        
+        for patient_id in iter_patient_ids():
+            if context and context.get_remaining_time_in_millis() < TIME_BUDGET_RESERVE_MS:
+                print("Time budget reached, remaining patients deferred to next run")
+                break
+                
+            result = compact_patient(patient_id, cutoff)
+            patients_scanned += 1
+            blocks_written += result['blocks']
+            readings_compacted += result['readings']
+            
+        print(f"Compacted {readings_compacted} readings into {blocks_written} blocks for {patients_scanned} patients")
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'cutoff': cutoff,
+                'patients_scanned': patients_scanned,
+                'blocks_written': blocks_written,
+                'readings_compacted': readings_compacted
+            })
+        }
+        
+    except Exception as e:
+        print(f"Error compacting vital signs: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e),
+                'blocks_written': blocks_written,
+                'readings_compacted': readings_compacted
+            })
+        }
+
+def compaction_cutoff():
+    """Hour-aligned timestamp before which readings are compacted"""
+    
+    cutoff = datetime.utcnow() - timedelta(hours=COMPACTION_AGE_HOURS)
+    return cutoff.strftime('%Y-%m-%dT%H:00:00')
+
+def iter_patient_ids():
+    """Yield every patient ID, including inactive patients with remaining readings"""
+    
+    scan_kwargs = {'ProjectionExpression': 'PatientId'}
+    while True:
+        response = patient_table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            yield item['PatientId']
+            
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def compact_patient(patient_id, cutoff):
+    """Compact one patient's raw readings before cutoff, one hour at a time"""
+    
+    blocks = 0
+    readings = 0
+    current_hour = None
+    hour_readings = []
+    
+    for item in query_raw_readings(patient_id, cutoff):
+        item_hour = vital_blocks.hour_key(item['Timestamp'])
+        
+        if current_hour is not None and item_hour != current_hour:
+            write_block(patient_id, current_hour, hour_readings)
+            blocks += 1
+            readings += len(hour_readings)
+            hour_readings = []
+            
+        current_hour = item_hour
+        hour_readings.append(item)
+        
+    if hour_readings:
+        write_block(patient_id, current_hour, hour_readings)
+        blocks += 1
+        readings += len(hour_readings)
+        
+    return {'blocks': blocks, 'readings': readings}
+
+def query_raw_readings(patient_id, cutoff):
+    """
+    Yield raw readings for a patient older than cutoff, oldest first, as
+    v1-shaped items. During the compact schema migration both tables are
+    read, which is what drains the v1 table.
+    """
+    
+    sources = []
+    if vital_signs_compact_table is not None:
+        cutoff_ms = vital_schema.timestamp_to_ms(cutoff)
+        # Bucketed keys need a lower bound; earlier readings were compacted by earlier runs
+        start_ms = cutoff_ms - COMPACTION_LOOKBACK_HOURS * 3600 * 1000 if vital_schema.bucketing_enabled() else 0
+        compact_items = vital_schema.query_readings(vital_signs_compact_table, patient_id, start_ms, cutoff_ms - 1)
+        # SourceKey tells write_block which table and partition to delete the reading from
+        sources.append(dict(vital_schema.expand_item(item), SourceKey={'P': item['P'], 'T': item['T']})
+                       for item in compact_items)
+    if vital_signs_compact_table is None or VITAL_SIGNS_LEGACY_READS:
+        sources.append(query_table(
+            vital_signs_table,
+            Key('PatientId').eq(patient_id) & Key('Timestamp').lt(cutoff)
+        ))
+        
+    return heapq.merge(*sources, key=lambda item: item['Timestamp'])
+
+def query_table(table, key_condition):
+    """Yield every item matching a key condition, oldest first"""
+    
+    query_kwargs = {
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': True
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            yield item
+            
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def write_block(patient_id, hour, readings):
+    """Write (or extend) the block for one patient-hour, then delete the raw items"""
+    
+    # Late readings for an hour that was already compacted are merged in
+    existing = vital_blocks_table.get_item(
+        Key={'PatientId': patient_id, 'HourStart': hour}
+    ).get('Item')
+    
+    merged = {vital_blocks.reading_identity(item): item for item in load_block_readings(existing)} if existing else {}
+    for item in readings:
+        merged[vital_blocks.reading_identity(item)] = item
+        
+    data = vital_blocks.encode_block(list(merged.values()))
+    timestamps = [merged[identity]['Timestamp'] for identity in sorted(merged)]
+    
+    block_item = {
+        'PatientId': patient_id,
+        'HourStart': hour,
+        'Encoding': vital_blocks.BLOCK_ENCODING,
+        'Count': len(merged),
+        'FirstTimestamp': timestamps[0],
+        'LastTimestamp': timestamps[-1],
+        'SizeBytes': len(data),
+        'CompactedAt': datetime.utcnow().isoformat() + 'Z',
+        'TTL': int((datetime.strptime(hour, '%Y-%m-%dT%H') + timedelta(days=BLOCK_RETENTION_DAYS)).timestamp())
+    }
+    
+    if len(data) > BLOCK_INLINE_LIMIT_BYTES and VITAL_BLOCKS_BUCKET:
+        block_key = f"vital-blocks/{patient_id}/{hour}.{vital_blocks.BLOCK_ENCODING}"
+        s3.put_object(Bucket=VITAL_BLOCKS_BUCKET, Key=block_key, Body=data)
+        block_item['BlockKey'] = block_key
+    else:
+        block_item['Data'] = data
+        
+    # The block is durable before any raw reading is removed; a crash in
+    # between leaves duplicates that readers and the next run de-duplicate
+    vital_blocks_table.put_item(Item=block_item)
+    
+    compact_keys = [item['SourceKey'] for item in readings if 'SourceKey' in item]
+    legacy_timestamps = [item['Timestamp'] for item in readings if 'SourceKey' not in item]
+    
+    if legacy_timestamps:
+        with vital_signs_table.batch_writer() as batch:
+            for timestamp in legacy_timestamps:
+                batch.delete_item(Key={'PatientId': patient_id, 'Timestamp': timestamp})
+                
+    if compact_keys:
+        with vital_signs_compact_table.batch_writer() as batch:
+            for key in compact_keys:
+                batch.delete_item(Key=key)
+
+def load_block_readings(block_item):
+    """Decode an existing block item, fetching spilled blocks from S3"""
+    
+    if 'BlockKey' in block_item:
+        data = s3.get_object(Bucket=VITAL_BLOCKS_BUCKET, Key=block_item['BlockKey'])['Body'].read()
+    else:
+        data = block_item['Data'].value
+    return vital_blocks.decode_block(data, block_item['PatientId'])
\ No newline at end of file
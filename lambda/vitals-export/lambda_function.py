@@ -0,0 +1,716 @@
+# lambda/vitals-export/lambda_function.py
+import json
+import boto3
+import csv
+import heapq
+import io
+import queue
+import threading
+import time
+import uuid
+import zlib
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+import os
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+
+import vital_blocks
+import vital_schema
+from emf import emit_metrics
+from profiling import profiled
+
+# Environment variables
+EXPORT_JOBS_TABLE = os.environ['EXPORT_JOBS_TABLE']
+VITAL_SIGNS_TABLE = os.environ['VITAL_SIGNS_TABLE']
+VITAL_SIGNS_COMPACT_TABLE = os.environ.get('VITAL_SIGNS_COMPACT_TABLE', '')
+VITAL_SIGNS_LEGACY_READS = os.environ.get('VITAL_SIGNS_LEGACY_READS', 'true').lower() == 'true'
+ALERT_HISTORY_TABLE = os.environ['ALERT_HISTORY_TABLE']
+PATIENT_RECORDS_TABLE = os.environ['PATIENT_RECORDS_TABLE']
+VITAL_BLOCKS_TABLE = os.environ.get('VITAL_BLOCKS_TABLE', '')
+VITAL_BLOCKS_BUCKET = os.environ.get('VITAL_BLOCKS_BUCKET', '')
+EXPORT_BUCKET = os.environ['EXPORT_BUCKET']
+EXPORT_QUERY_WORKERS = int(os.environ.get('EXPORT_QUERY_WORKERS', '4'))
+# Read units per second the export may consume across all workers (0 = unlimited)
+EXPORT_MAX_READ_UNITS = float(os.environ.get('EXPORT_MAX_READ_UNITS', '200'))
+# Multipart part size (S3 minimum is 5 MiB) and compressed size at which a new file is started
+EXPORT_PART_BYTES = max(int(os.environ.get('EXPORT_PART_BYTES', str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+EXPORT_FILE_BYTES = int(os.environ.get('EXPORT_FILE_BYTES', str(256 * 1024 * 1024)))
+
+# Initialize AWS clients; export workers query concurrently over one connection pool
+dynamodb = boto3.resource('dynamodb', config=Config(max_pool_connections=max(EXPORT_QUERY_WORKERS, 10)))
+s3 = boto3.client('s3')
+lambda_client = boto3.client('lambda')
+
+# Get DynamoDB tables
+export_jobs_table = dynamodb.Table(EXPORT_JOBS_TABLE)
+vital_signs_table = dynamodb.Table(VITAL_SIGNS_TABLE)
+vital_signs_compact_table = dynamodb.Table(VITAL_SIGNS_COMPACT_TABLE) if VITAL_SIGNS_COMPACT_TABLE else None
+alert_history_table = dynamodb.Table(ALERT_HISTORY_TABLE)
+patient_table = dynamodb.Table(PATIENT_RECORDS_TABLE)
+vital_blocks_table = dynamodb.Table(VITAL_BLOCKS_TABLE) if VITAL_BLOCKS_TABLE else None
+
+# Export request limits
+MAX_EXPORT_PATIENTS = 5000
+MAX_EXPORT_DAYS = 31
+DATASETS = ['vitals', 'alerts']
+FORMATS = {'ndjson': 'ndjson.gz', 'csv': 'csv.gz'}
+# Rows handed from a query worker to the writer at a time
+EXPORT_PAGE_ROWS = 500
+# Pages buffered between workers and the writer; bounds memory regardless of export size
+PAGE_QUEUE_SIZE = EXPORT_QUERY_WORKERS * 2
+# Stop starting patients when less than this much time is left; the job continues in a new invocation
+TIME_BUDGET_RESERVE_MS = 120000
+DOWNLOAD_URL_EXPIRY_SECONDS = 3600
+JOB_RETENTION_DAYS = 7
+
+# Bookkeeping attributes that are not part of the exported data
+INTERNAL_ATTRIBUTES = {'TTL', 'ChangedAt', 'ChangeBucket', 'ProcessedAt', 'NotificationSent'}
+
+CSV_COLUMNS = {
+    'vitals': ['PatientId', 'Timestamp', 'DeviceId', 'HeartRate', 'SystolicBP', 'DiastolicBP',
+               'Temperature', 'OxygenSaturation', 'SensorBatteryLevel', 'SignalStrength',
+               'DataQuality', 'RoomNumber', 'PatientCondition'],
+    'alerts': ['AlertId', 'PatientId', 'Timestamp', 'AlertType', 'Status', 'Message', 'RoomNumber',
+               'HeartRate', 'SystolicBP', 'DiastolicBP', 'Temperature', 'OxygenSaturation',
+               'Rules', 'AcknowledgedAt']
+}
+
+@profiled
+def lambda_handler(event, context):
+    """
+    Handle export API requests, and run export jobs when invoked
+    asynchronously with {'exportJobId': ...}
+    """
+    
+    if 'exportJobId' in event:
+        return run_export_job(event['exportJobId'], context)
+        
+    try:
+        # Parse the API Gateway event
+        http_method = event['httpMethod']
+        
+        if http_method == 'POST':
+            return create_export_job(event, context)
+        elif http_method == 'GET':
+            query_params = event.get('queryStringParameters') or {}
+            return get_export_job(query_params.get('jobId'))
+        else:
+            return create_error_response(405, f"Method {http_method} not allowed")
+            
+    except Exception as e:
+        print(f"Error handling export request: {str(e)}")
+        return create_error_response(500, f"Internal server error: {str(e)}")
+
+def create_export_job(event, context):
+    """Validate an export request, record the job and start it in the background"""
+    
+    try:
+        request = parse_export_request(json.loads(event.get('body') or '{}'))
+    except ValueError as e:
+        return create_error_response(400, f"Invalid export request: {str(e)}")
+        
+    now = datetime.utcnow()
+    job_id = uuid.uuid4().hex
+    job = {
+        'JobId': job_id,
+        'Status': 'QUEUED',
+        'StartTime': request['startTime'],
+        'EndTime': request['endTime'],
+        'Datasets': request['datasets'],
+        'Format': request['format'],
+        'AllPatients': request['all'],
+        'PatientIds': request['patientIds'],
+        # Checkpoint: dataset and patient position the next invocation resumes from
+        'NextDataset': 0,
+        'NextPatient': 0,
+        'Files': [],
+        'Rows': {dataset: 0 for dataset in request['datasets']},
+        'Invocations': 0,
+        'CreatedAt': now.isoformat() + 'Z',
+        'UpdatedAt': now.isoformat() + 'Z',
+        'TTL': int((now + timedelta(days=JOB_RETENTION_DAYS)).timestamp())
+    }
+    
+    try:
+        export_jobs_table.put_item(Item=job)
+        start_job_invocation(job_id, context)
+    except Exception as e:
+        print(f"Error creating export job: {str(e)}")
+        return create_error_response(500, f"Error creating export job: {str(e)}")
+        
+    return create_success_response({
+        'jobId': job_id,
+        'status': 'QUEUED',
+        'message': 'Export started; poll GET /exports?jobId=' + job_id
+    }, 202)
+
+def parse_export_request(body):
+    """Normalise an export request body; raises ValueError"""
+    
+    if not isinstance(body, dict):
+        raise ValueError("expected a JSON object")
+        
+    patient_ids = body.get('patientIds') or []
+    if isinstance(patient_ids, str):
+        patient_ids = patient_ids.split(',')
+    patient_ids = list(dict.fromkeys(pid.strip() for pid in patient_ids if pid and pid.strip()))
+    export_all = bool(body.get('all'))
+    
+    if not patient_ids and not export_all:
+        raise ValueError("patientIds or all=true is required")
+    if len(patient_ids) > MAX_EXPORT_PATIENTS:
+        raise ValueError(f"at most {MAX_EXPORT_PATIENTS} patients per export")
+        
+    start_time = body.get('startTime')
+    end_time = body.get('endTime')
+    if not start_time or not end_time:
+        raise ValueError("startTime and endTime are required")
+    try:
+        start = parse_utc(start_time)
+        end = parse_utc(end_time)
+    except (AttributeError, ValueError):
+        raise ValueError("startTime and endTime must be ISO timestamps")
+    if end <= start:
+        raise ValueError("endTime must be after startTime")
+    if end - start > timedelta(days=MAX_EXPORT_DAYS):
+        raise ValueError(f"time range is limited to {MAX_EXPORT_DAYS} days")
+        
+    datasets = body.get('datasets') or DATASETS
+    if isinstance(datasets, str):
+        datasets = datasets.split(',')
+    unknown = [dataset for dataset in datasets if dataset not in DATASETS]
+    if unknown:
+        raise ValueError(f"unknown datasets: {', '.join(unknown)}")
+        
+    export_format = body.get('format', 'ndjson')
+    if export_format not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+        
+    return {
+        'patientIds': patient_ids,
+        'all': export_all and not patient_ids,
+        'startTime': start.replace(tzinfo=None).isoformat(),
+        'endTime': end.replace(tzinfo=None).isoformat(),
+        'datasets': [dataset for dataset in DATASETS if dataset in datasets],
+        'format': export_format
+    }
+
+def parse_utc(timestamp):
+    """Aware UTC datetime for an ISO timestamp; one without an offset is taken as UTC"""
+    
+    parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def start_job_invocation(job_id, context):
+    """Run (or continue) a job in a separate asynchronous invocation of this function"""
+    
+    lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps({'exportJobId': job_id}).encode('utf-8')
+    )
+
+def get_export_job(job_id):
+    """Report job progress; completed jobs include short-lived download URLs"""
+    
+    if not job_id:
+        return create_error_response(400, "jobId is required")
+        
+    try:
+        job = export_jobs_table.get_item(Key={'JobId': job_id}, ConsistentRead=True).get('Item')
+        if not job:
+            return create_error_response(404, f"Export job {job_id} not found")
+            
+        files = []
+        for file_info in job.get('Files', []):
+            entry = convert_decimals(file_info)
+            if job['Status'] == 'COMPLETED':
+                entry['url'] = s3.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': EXPORT_BUCKET, 'Key': file_info['key']},
+                    ExpiresIn=DOWNLOAD_URL_EXPIRY_SECONDS
+                )
+            files.append(entry)
+            
+        datasets = job.get('Datasets', [])
+        next_dataset = int(job.get('NextDataset', 0))
+        result = {
+            'jobId': job_id,
+            'status': job['Status'],
+            'startTime': job['StartTime'],
+            'endTime': job['EndTime'],
+            'datasets': datasets,
+            'format': job['Format'],
+            'progress': {
+                'dataset': datasets[next_dataset] if next_dataset < len(datasets) else None,
+                'patientsDone': len(job.get('PatientIds', [])) if job['Status'] == 'COMPLETED' else int(job.get('NextPatient', 0)),
+                'patientsTotal': len(job.get('PatientIds', []))
+            },
+            'rows': convert_decimals(job.get('Rows', {})),
+            'files': files,
+            'createdAt': job.get('CreatedAt'),
+            'updatedAt': job.get('UpdatedAt')
+        }
+        if job.get('Error'):
+            result['error'] = job['Error']
+            
+        return create_success_response(result)
+        
+    except Exception as e:
+        print(f"Error getting export job {job_id}: {str(e)}")
+        return create_error_response(500, f"Error retrieving export job: {str(e)}")
+
+def run_export_job(job_id, context):
+    """
+    Export as much of a job as fits in this invocation. Each invocation ends
+    on a file boundary, saves its checkpoint and re-invokes itself, so no
+    upload state outlives the invocation that started it.
+    """
+    
+    job = export_jobs_table.get_item(Key={'JobId': job_id}, ConsistentRead=True).get('Item')
+    if not job or job['Status'] in ('COMPLETED', 'FAILED'):
+        print(f"Export job {job_id} not runnable: {job.get('Status') if job else 'missing'}")
+        return {'statusCode': 200}
+        
+    started = time.time()
+    
+    def out_of_time():
+        return context is not None and context.get_remaining_time_in_millis() < TIME_BUDGET_RESERVE_MS
+        
+    writer = None
+    try:
+        if job.get('AllPatients') and not job.get('PatientIds'):
+            job['PatientIds'] = list_patient_ids()
+        patient_ids = job['PatientIds']
+        
+        job['Status'] = 'RUNNING'
+        job['Invocations'] = int(job.get('Invocations', 0)) + 1
+        limiter = ReadCapacityLimiter(EXPORT_MAX_READ_UNITS)
+        
+        while int(job['NextDataset']) < len(job['Datasets']):
+            dataset = job['Datasets'][int(job['NextDataset'])]
+            
+            while int(job['NextPatient']) < len(patient_ids) and not out_of_time():
+                writer = ExportFileWriter(EXPORT_BUCKET, next_file_key(job, dataset), job['Format'], dataset)
+                job['NextPatient'] = export_patients(
+                    dataset, patient_ids, int(job['NextPatient']),
+                    job['StartTime'], job['EndTime'], writer, limiter, out_of_time
+                )
+                file_info = writer.close()
+                writer = None
+                if file_info['rows']:
+                    job['Files'].append(file_info)
+                    job['Rows'][dataset] = int(job['Rows'].get(dataset, 0)) + file_info['rows']
+                save_job_checkpoint(job)
+                
+            if int(job['NextPatient']) < len(patient_ids):
+                # Out of time: the checkpoint is saved, continue in a fresh invocation
+                print(f"Export job {job_id} continuing at {dataset} patient {job['NextPatient']}")
+                start_job_invocation(job_id, context)
+                emit_export_metrics(job, started)
+                return {'statusCode': 202}
+                
+            job['NextDataset'] = int(job['NextDataset']) + 1
+            job['NextPatient'] = 0
+            
+        job['Status'] = 'COMPLETED'
+        save_job_checkpoint(job)
+        print(f"Export job {job_id} completed: {convert_decimals(job['Rows'])} rows in {len(job['Files'])} files")
+        emit_export_metrics(job, started)
+        return {'statusCode': 200}
+        
+    except Exception as e:
+        print(f"Error running export job {job_id}: {str(e)}")
+        if writer is not None:
+            writer.abort()
+        # Not re-raised: a failed job is reported through its status, not retried blindly
+        job['Status'] = 'FAILED'
+        job['Error'] = str(e)
+        save_job_checkpoint(job)
+        return {'statusCode': 500}
+
+def export_patients(dataset, patient_ids, start_index, start_time, end_time, writer, limiter, out_of_time):
+    """
+    Stream patients from start_index into writer until the file is full or
+    time runs low. Workers query patients in parallel and hand pages to this
+    thread through a bounded queue. Returns the index of the first patient not
+    exported; every patient before it is complete in this file.
+    """
+    
+    pages = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+    stop = threading.Event()
+    reader = DATASET_READERS[dataset]
+    next_index = start_index
+    in_flight = 0
+    error = None
+    
+    def produce(patient_id):
+        try:
+            for page in reader(patient_id, start_time, end_time, limiter):
+                while not stop.is_set():
+                    try:
+                        pages.put(('page', page), timeout=1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+        except Exception as e:
+            pages.put(('error', e))
+        finally:
+            pages.put(('done', patient_id))
+            
+    with ThreadPoolExecutor(max_workers=EXPORT_QUERY_WORKERS) as executor:
+        while True:
+            while (in_flight < EXPORT_QUERY_WORKERS and next_index < len(patient_ids) and
+                   not stop.is_set() and not writer.full() and not out_of_time()):
+                executor.submit(produce, patient_ids[next_index])
+                next_index += 1
+                in_flight += 1
+                
+            if not in_flight:
+                break
+                
+            kind, payload = pages.get()
+            if kind == 'page':
+                if error is None:
+                    writer.write_rows(payload)
+            elif kind == 'error':
+                # Drain the remaining workers, then fail the job
+                error = error or payload
+                stop.set()
+            else:
+                in_flight -= 1
+                
+    if error is not None:
+        raise error
+    return next_index
+
+def read_vital_signs(patient_id, start_time, end_time, limiter):
+    """Pages of one patient's readings in the range, raw and compacted, oldest first"""
+    
+    rows = []
+    for item in iter_vital_signs(patient_id, start_time, end_time, limiter):
+        rows.append(item)
+        if len(rows) == EXPORT_PAGE_ROWS:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+def iter_vital_signs(patient_id, start_time, end_time, limiter):
+    """
+    Merge raw readings with compacted hourly blocks in timestamp order.
+    Only one block is decoded at a time; raw items in a compacted hour
+    (late readings, or a compaction interrupted before its deletes) replace
+    their compacted copies, as in vitals-api.
+    """
+    
+    raw_items = iter_raw_vital_signs(patient_id, start_time, end_time, limiter)
+    pending = next(raw_items, None)
+    
+    if vital_blocks_table is not None:
+        blocks = iter_query_items(vital_blocks_table, {
+            'KeyConditionExpression': Key('PatientId').eq(patient_id) &
+                                      Key('HourStart').between(vital_blocks.hour_key(start_time),
+                                                               vital_blocks.hour_key(end_time))
+        }, limiter)
+        
+        for block in blocks:
+            hour = block['HourStart']
+            while pending is not None and vital_blocks.hour_key(pending['Timestamp']) < hour:
+                yield pending
+                pending = next(raw_items, None)
+                
+            merged = {vital_blocks.reading_identity(item): item for item in load_block_readings(block)
+                      if start_time <= item['Timestamp'] <= end_time}
+            while pending is not None and vital_blocks.hour_key(pending['Timestamp']) == hour:
+                merged[vital_blocks.reading_identity(pending)] = pending
+                pending = next(raw_items, None)
+                
+            for identity in sorted(merged):
+                yield merged[identity]
+                
+    while pending is not None:
+        yield pending
+        pending = next(raw_items, None)
+
+def iter_raw_vital_signs(patient_id, start_time, end_time, limiter):
+    """Raw readings as v1-shaped items, oldest first, from both schemas while migrating"""
+    
+    sources = []
+    if vital_signs_compact_table is not None:
+        compact_items = vital_schema.query_readings(
+            vital_signs_compact_table, patient_id,
+            vital_schema.timestamp_to_ms(start_time), vital_schema.timestamp_to_ms(end_time),
+            query_pages=lambda table, query_kwargs: iter_query_pages(table, query_kwargs, limiter)
+        )
+        sources.append(vital_schema.expand_item(item) for item in compact_items)
+    if vital_signs_compact_table is None or VITAL_SIGNS_LEGACY_READS:
+        sources.append(iter_query_items(vital_signs_table, {
+            'KeyConditionExpression': Key('PatientId').eq(patient_id) & Key('Timestamp').between(start_time, end_time)
+        }, limiter))
+        
+    return heapq.merge(*sources, key=lambda item: item['Timestamp'])
+
+def read_alerts(patient_id, start_time, end_time, limiter):
+    """Pages of one patient's alerts raised in the range, oldest first"""
+    
+    query_kwargs = {
+        'IndexName': 'PatientAlertIndex',
+        'KeyConditionExpression': Key('PatientId').eq(patient_id) & Key('Timestamp').between(start_time, end_time)
+    }
+    for page in iter_query_pages(alert_history_table, query_kwargs, limiter):
+        if page:
+            yield page
+
+DATASET_READERS = {
+    'vitals': read_vital_signs,
+    'alerts': read_alerts
+}
+
+def iter_query_pages(table, query_kwargs, limiter):
+    """Follow LastEvaluatedKey through a query, charging consumed reads to the limiter"""
+    
+    query_kwargs = dict(query_kwargs, ScanIndexForward=True, ReturnConsumedCapacity='TOTAL')
+    while True:
+        limiter.wait()
+        response = table.query(**query_kwargs)
+        limiter.consume(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+        yield response.get('Items', [])
+        
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def iter_query_items(table, query_kwargs, limiter):
+    for page in iter_query_pages(table, query_kwargs, limiter):
+        for item in page:
+            yield item
+
+def load_block_readings(block):
+    """Decode a block item into reading items, fetching spilled blocks from S3"""
+    
+    if 'BlockKey' in block:
+        data = s3.get_object(Bucket=VITAL_BLOCKS_BUCKET, Key=block['BlockKey'])['Body'].read()
+    else:
+        data = block['Data'].value
+    return vital_blocks.decode_block(data, block['PatientId'])
+
+def list_patient_ids():
+    """Every patient ID, for all=true exports"""
+    
+    patient_ids = []
+    scan_kwargs = {'ProjectionExpression': 'PatientId'}
+    while True:
+        response = patient_table.scan(**scan_kwargs)
+        patient_ids.extend(item['PatientId'] for item in response.get('Items', []))
+        if len(patient_ids) > MAX_EXPORT_PATIENTS:
+            raise ValueError(f"more than {MAX_EXPORT_PATIENTS} patients; export them in batches with patientIds")
+            
+        if 'LastEvaluatedKey' not in response:
+            return sorted(patient_ids)
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def next_file_key(job, dataset):
+    # Empty files are never written, so their numbers are reused
+    part = sum(1 for file_info in job['Files'] if file_info['dataset'] == dataset)
+    return f"exports/{job['JobId']}/{dataset}/part-{part:05d}.{FORMATS[job['Format']]}"
+
+def save_job_checkpoint(job):
+    job['UpdatedAt'] = datetime.utcnow().isoformat() + 'Z'
+    export_jobs_table.put_item(Item=job)
+
+def emit_export_metrics(job, started):
+    emit_metrics({
+        'ExportRows': (sum(int(count) for count in job['Rows'].values()), 'Count'),
+        'ExportFiles': (len(job['Files']), 'Count'),
+        'ExportInvocationTime': ((time.time() - started) * 1000, 'Milliseconds')
+    })
+
+class ReadCapacityLimiter:
+    """
+    Token bucket over consumed read units, shared by the query workers, so an
+    export leaves table throughput to the live APIs. Queries wait while the
+    bucket is in debt and are charged what DynamoDB reports afterwards.
+    """
+    
+    def __init__(self, units_per_second):
+        self.rate = units_per_second
+        self.tokens = units_per_second
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        
+    def wait(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens > 0:
+                    return
+                delay = -self.tokens / self.rate
+            time.sleep(min(delay, 1.0))
+            
+    def consume(self, units):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens -= float(units)
+            
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+class ExportFileWriter:
+    """
+    Gzip-compresses rows into one S3 object as they arrive. Compressed
+    output is uploaded in EXPORT_PART_BYTES multipart parts, so memory holds
+    at most one part; files smaller than a part are written with one PUT.
+    """
+    
+    def __init__(self, bucket, key, export_format, dataset):
+        self.bucket = bucket
+        self.key = key
+        self.export_format = export_format
+        self.dataset = dataset
+        # wbits=31 writes a gzip container
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.rows = 0
+        self.compressed_bytes = 0
+        
+        if export_format == 'csv':
+            self._write_text(','.join(CSV_COLUMNS[dataset]) + '\n')
+            
+    def full(self):
+        return self.compressed_bytes + len(self.buffer) >= EXPORT_FILE_BYTES
+        
+    def write_rows(self, items):
+        if self.export_format == 'csv':
+            out = io.StringIO()
+            writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS[self.dataset], extrasaction='ignore')
+            for item in items:
+                writer.writerow(csv_row(item))
+            text = out.getvalue()
+        else:
+            text = ''.join(json.dumps(export_row(item), separators=(',', ':'), default=str) + '\n'
+                           for item in items)
+        self._write_text(text)
+        self.rows += len(items)
+        
+    def close(self):
+        """Finish the object; returns its file entry for the job"""
+        
+        self.buffer.extend(self.compressor.flush())
+        
+        if self.rows == 0:
+            self.abort()
+        elif self.upload_id is None:
+            s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer),
+                          ContentType=self._content_type(), ContentEncoding='gzip')
+            self.compressed_bytes += len(self.buffer)
+        else:
+            self._upload_part()
+            s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={'Parts': self.parts}
+            )
+            
+        self.buffer = bytearray()
+        return {'dataset': self.dataset, 'key': self.key, 'rows': self.rows, 'bytes': self.compressed_bytes}
+        
+    def abort(self):
+        if self.upload_id is not None:
+            try:
+                s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            except Exception as e:
+                print(f"Error aborting upload of {self.key}: {str(e)}")
+            self.upload_id = None
+            
+    def _write_text(self, text):
+        self.buffer.extend(self.compressor.compress(text.encode('utf-8')))
+        if len(self.buffer) >= EXPORT_PART_BYTES:
+            self._upload_part()
+            
+    def _upload_part(self):
+        if self.upload_id is None:
+            self.upload_id = s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key,
+                ContentType=self._content_type(), ContentEncoding='gzip'
+            )['UploadId']
+            
+        part_number = len(self.parts) + 1
+        response = s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                  PartNumber=part_number, Body=bytes(self.buffer))
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        self.compressed_bytes += len(self.buffer)
+        self.buffer = bytearray()
+        
+    def _content_type(self):
+        return 'text/csv' if self.export_format == 'csv' else 'application/x-ndjson'
+
+def export_row(item):
+    """An item as exported: bookkeeping attributes dropped, numbers as JSON numbers"""
+    
+    return convert_decimals({key: value for key, value in item.items() if key not in INTERNAL_ATTRIBUTES})
+
+def csv_row(item):
+    """Flatten an item onto the CSV columns (alert vitals become columns)"""
+    
+    row = export_row(item)
+    vitals = row.pop('VitalSigns', None)
+    if isinstance(vitals, dict):
+        for name, value in vitals.items():
+            row.setdefault(name, value)
+    if isinstance(row.get('Rules'), list):
+        row['Rules'] = ';'.join(row['Rules'])
+    return row
+
+def convert_decimals(obj):
+    """Convert DynamoDB Decimal objects to int/float for JSON serialization"""
+    if isinstance(obj, list):
+        return [convert_decimals(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: convert_decimals(value) for key, value in obj.items()}
+    elif isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    else:
+        return obj
+
+def create_success_response(data, status_code=200):
+    """Create a successful API response"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+        },
+        'body': json.dumps(data, default=str)
+    }
+
+def create_error_response(status_code, message):
+    """Create an error API response"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+        },
+        'body': json.dumps({
+            'error': message,
+            'statusCode': status_code
+        })
+    }
\ No newline at end of file
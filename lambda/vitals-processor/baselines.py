@@ -0,0 +1,111 @@
+# lambda/vitals-processor/baselines.py
+"""
+Per-patient adaptive baselines for each vital sign.
+
+Mean and variance are exponentially weighted moving averages, so a baseline
+is updated in O(1) from each reading and never grows: it packs into a fixed
+46-byte binary attribute (sample count, deviation flags, five means, five
+variances). Readings far outside the patient's own baseline are reported as
+deviations even when they are inside the population thresholds.
+"""
+import math
+import os
+import struct
+
+BASELINE_ALPHA = float(os.environ.get('BASELINE_ALPHA', '0.05'))
+# Readings needed before deviations are reported
+BASELINE_MIN_SAMPLES = int(os.environ.get('BASELINE_MIN_SAMPLES', '30'))
+BASELINE_DEVIATION_Z = float(os.environ.get('BASELINE_DEVIATION_Z', '3.0'))
+
+# (reading field, display name, unit, smallest standard deviation considered)
+BASELINE_VITALS = [
+    ('heartRate', 'Heart rate', 'bpm', 3.0),
+    ('systolicBP', 'Systolic BP', 'mmHg', 4.0),
+    ('diastolicBP', 'Diastolic BP', 'mmHg', 3.0),
+    ('temperature', 'Temperature', '°F', 0.3),
+    ('oxygenSaturation', 'SpO2', '%', 1.0)
+]
+
+# count, deviation flags, means, variances
+PACKED_FORMAT = '<IH' + 'f' * len(BASELINE_VITALS) * 2
+PACKED_SIZE = struct.calcsize(PACKED_FORMAT)
+
+class PatientBaseline:
+    """EWMA mean/variance of every vital for one patient"""
+    
+    def __init__(self):
+        self.count = 0
+        self.flags = 0
+        self.means = [0.0] * len(BASELINE_VITALS)
+        self.variances = [0.0] * len(BASELINE_VITALS)
+        
+    def add_reading(self, data):
+        """
+        Score a reading against the current baseline, then fold it in.
+        Returns a finding for each vital that has just started deviating.
+        """
+        
+        findings = []
+        warm = self.count >= BASELINE_MIN_SAMPLES
+        # Plain running average until warm, so early baselines are not biased to the first reading
+        alpha = max(BASELINE_ALPHA, 1.0 / (self.count + 1))
+        
+        for index, (field, label, unit, min_std) in enumerate(BASELINE_VITALS):
+            value = data.get(field)
+            if value is None:
+                continue
+                
+            value = float(value)
+            mean = self.means[index]
+            std = max(math.sqrt(self.variances[index]), min_std)
+            z_score = (value - mean) / std
+            bit = 1 << index
+            
+            if warm and abs(z_score) >= BASELINE_DEVIATION_Z:
+                if not self.flags & bit:
+                    self.flags |= bit
+                    direction = 'above' if z_score > 0 else 'below'
+                    findings.append({
+                        'name': f'BaselineDeviation:{field}',
+                        'severity': 'WARNING',
+                        'description': f'{label} {value:g} {unit} is {abs(z_score):.1f}σ {direction} '
+                                       f'patient baseline {mean:.1f} {unit}'
+                    })
+            else:
+                self.flags &= ~bit
+                
+            diff = value - mean
+            increment = alpha * diff
+            self.means[index] = mean + increment
+            self.variances[index] = (1 - alpha) * (self.variances[index] + diff * increment)
+            
+        self.count = min(self.count + 1, 0xFFFFFFFF)
+        return findings
+        
+    def pack(self):
+        return struct.pack(PACKED_FORMAT, self.count, self.flags, *self.means, *self.variances)
+        
+    @classmethod
+    def unpack(cls, data):
+        baseline = cls()
+        values = struct.unpack(PACKED_FORMAT, bytes(data))
+        size = len(BASELINE_VITALS)
+        baseline.count, baseline.flags = values[0], values[1]
+        baseline.means = list(values[2:2 + size])
+        baseline.variances = list(values[2 + size:])
+        return baseline
+        
+    def to_state(self):
+        return {'Packed': self.pack()}
+        
+    @classmethod
+    def from_state(cls, state):
+        packed = (state or {}).get('Packed')
+        if packed is None:
+            return cls()
+        # boto3 returns Binary attributes wrapped; the raw bytes are on .value
+        data = getattr(packed, 'value', packed)
+        if len(data) != PACKED_SIZE:
+            # Layout changed since this baseline was written; start again
+            return cls()
+        return cls.unpack(data)
\ No newline at end of file
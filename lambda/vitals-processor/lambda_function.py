@@ -1,27 +1,131 @@
 # lambda/vitals-processor/lambda_function.py 
 import json
 import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+from botocore.exceptions import ClientError
 import uuid
 from datetime import datetime, timedelta
 from decimal import Decimal
 import os
 import base64
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-sns = boto3.client('sns')
+from emf import emit_metrics
+from change_feed import change_stamp, now_ms
+import window_rules
+import baselines
+import alert_thresholds
+import vital_schema
+import vital_blocks
+import waveforms
+import device_registry
+import config_version
+from profiling import profiled
+
+# Patients in a batch are processed concurrently, one worker per patient at a time
+PROCESSOR_WORKERS = int(os.environ.get('PROCESSOR_WORKERS', '8'))
+# Warning alerts are sent as one digest per ward at most this often
+WARNING_DIGEST_WINDOW_SECONDS = int(os.environ.get('WARNING_DIGEST_WINDOW_SECONDS', '300'))
+WARNING_DIGEST_MAX_ALERTS = int(os.environ.get('WARNING_DIGEST_MAX_ALERTS', '50'))
+# Degraded mode while the stream is behind: entered when the batch's iterator age
+# exceeds the first value, left once it is back under the second (0 disables it)
+DEGRADED_ENTER_LAG_SECONDS = int(os.environ.get('DEGRADED_ENTER_LAG_SECONDS', '120'))
+DEGRADED_EXIT_LAG_SECONDS = int(os.environ.get('DEGRADED_EXIT_LAG_SECONDS', '30'))
+
+# Initialize AWS clients; workers share these clients and their connection pools
+client_config = Config(max_pool_connections=max(PROCESSOR_WORKERS * 2, 10))
+dynamodb = boto3.resource('dynamodb', config=client_config)
+sns = boto3.client('sns', config=client_config)
 
 # Environment variables
 VITAL_SIGNS_TABLE = os.environ['VITAL_SIGNS_TABLE']
+# When set, readings are written as compact v2 items to this table instead (see vital_schema)
+VITAL_SIGNS_COMPACT_TABLE = os.environ.get('VITAL_SIGNS_COMPACT_TABLE', '')
 ALERT_CONFIG_TABLE = os.environ['ALERT_CONFIG_TABLE']
 ALERT_HISTORY_TABLE = os.environ['ALERT_HISTORY_TABLE']
 SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
+PATIENT_STATE_TABLE = os.environ.get('PATIENT_STATE_TABLE', '')
+RULE_STATE_MAX_PATIENTS = int(os.environ.get('RULE_STATE_MAX_PATIENTS', '5000'))
+CONFIG_SYNC_INTERVAL_SECONDS = int(os.environ.get('CONFIG_SYNC_INTERVAL_SECONDS', '10'))
+SEEN_READINGS_TTL_SECONDS = int(os.environ.get('SEEN_READINGS_TTL_SECONDS', '900'))
+SEEN_READINGS_MAX = int(os.environ.get('SEEN_READINGS_MAX', '50000'))
+# Waveform segments (see waveforms.py); without a table they are dropped
+WAVEFORM_TABLE = os.environ.get('WAVEFORM_TABLE', '')
+WAVEFORM_RETENTION_DAYS = int(os.environ.get('WAVEFORM_RETENTION_DAYS', '7'))
+# Device fleet health registry (see device_registry.py); optional
+DEVICE_REGISTRY_TABLE = os.environ.get('DEVICE_REGISTRY_TABLE', '')
+DEVICE_REGISTRY_MAX_DEVICES = int(os.environ.get('DEVICE_REGISTRY_MAX_DEVICES', '20000'))
 
 # Get DynamoDB tables
 vital_signs_table = dynamodb.Table(VITAL_SIGNS_TABLE)
+vital_signs_compact_table = dynamodb.Table(VITAL_SIGNS_COMPACT_TABLE) if VITAL_SIGNS_COMPACT_TABLE else None
 alert_config_table = dynamodb.Table(ALERT_CONFIG_TABLE)
 alert_history_table = dynamodb.Table(ALERT_HISTORY_TABLE)
+# Optional: without it patient state lives only in the warm container
+patient_state_table = dynamodb.Table(PATIENT_STATE_TABLE) if PATIENT_STATE_TABLE else None
+waveform_table = dynamodb.Table(WAVEFORM_TABLE) if WAVEFORM_TABLE else None
+device_registry_table = dynamodb.Table(DEVICE_REGISTRY_TABLE) if DEVICE_REGISTRY_TABLE else None
+
+WINDOW_STATE_KEY = 'WINDOW'
+# Findings with these names come from window rules and may page (baseline findings may not)
+WINDOW_RULE_NAMES = {rule['name'] for rule in window_rules.WINDOW_RULES}
+BASELINE_STATE_KEY = 'BASELINE'
+STATE_RETENTION_DAYS = 7
+
+# StateKey -> builder from a stored item (or None for a new patient)
+STATE_LOADERS = {
+    WINDOW_STATE_KEY: window_rules.PatientWindow.from_state,
+    BASELINE_STATE_KEY: baselines.PatientBaseline.from_state
+}
+
+# Per-patient state cached across warm invocations, least recently used first
+_patient_states = OrderedDict()
+# State changed in this batch, keyed by (PatientId, StateKey) and written back once at the end
+_dirty_states = {}
+
+# Compiled AlertConfig thresholds per patient, invalidated through the config version item
+_patient_thresholds = OrderedDict()
+# Config version this container's cache reflects (None until the first sync)
+_config_version = None
+_config_synced_at = 0
+
+# Fixed namespace so a reading always maps to the same AlertId
+ALERT_ID_NAMESPACE = uuid.UUID('6f1c2b0e-3d4a-5b8c-9e7f-1a2b3c4d5e6f')
+
+# Readings fully processed by this container recently (key -> expiry), oldest first.
+# Kinesis retries whole batches, so the records before a failure are skipped outright.
+_seen_readings = OrderedDict()
 
+# Guards the warm-container caches above, which every worker updates
+_cache_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=PROCESSOR_WORKERS) if PROCESSOR_WORKERS > 1 else None
+
+# SNS PublishBatch accepts at most 10 entries
+SNS_PUBLISH_BATCH_SIZE = 10
+
+# Critical notifications queued during this invocation: (alert key, PublishBatch entry)
+_pending_critical = []
+# Warnings queued during this invocation: (ward, alert key, digest line). Each flush appends
+# them to the ward's open digest, one PatientState item per ward under DIGEST_STATE_ID, so
+# digests survive container recycling and are shared by concurrent containers.
+_pending_warnings = []
+DIGEST_STATE_ID = 'DIGEST'
+_notification_lock = threading.Lock()
+
+# Registry items as last read or written by this container (DeviceId -> item, None if not
+# registered), least recently used first; a stale entry costs one conditional write retry
+_device_items = OrderedDict()
+# Attempts per device and batch before its update is left to the next batch
+DEVICE_REGISTRY_ATTEMPTS = 2
+
+# Whether this container is catching up on a backlog (see update_degraded_mode)
+_degraded = False
+
+@profiled
 def lambda_handler(event, context):
     """
     Process incoming vital signs data from Kinesis stream.
@@ -32,9 +136,24 @@ def lambda_handler(event, context):
     alerts_generated = 0
     
     try:
-        print(f"Received event: {json.dumps(event, default=str)}")
+        if event.get('source') == 'aws.events':
+            # Scheduled flush: sends digests whose window elapsed with no further batch
+            metrics = new_latency_metrics()
+            notification_calls = flush_notifications(metrics, check_open_digests=True)
+            metrics['NotificationCalls'] = (notification_calls, 'Count')
+            emit_metrics(metrics)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'notification_calls': notification_calls})
+            }
+        
+        iterator_age = batch_iterator_age(event)
+        degraded = update_degraded_mode(iterator_age)
+        if not degraded:
+            print(f"Received event: {json.dumps(event, default=str)}")
         
         # Handle different types of invocations
+        # Each entry is (vital signs data, Kinesis arrival epoch seconds, decode ms)
         records = []
         
         if 'Records' in event:
@@ -43,38 +162,81 @@ def lambda_handler(event, context):
                 if 'kinesis' in record:
                     # From Kinesis stream
                     try:
+                        decode_started = time.perf_counter()
                         # Decode base64 data from Kinesis
                         encoded_data = record['kinesis']['data']
                         decoded_data = base64.b64decode(encoded_data).decode('utf-8')
                         vital_signs_data = json.loads(decoded_data)
-                        records.append(vital_signs_data)
-                        print(f"Decoded Kinesis data: {vital_signs_data}")
+                        decode_ms = (time.perf_counter() - decode_started) * 1000
+                        records.append((vital_signs_data,
+                                        record['kinesis'].get('approximateArrivalTimestamp'),
+                                        decode_ms))
+                        if not degraded and not waveforms.is_waveform(vital_signs_data):
+                            print(f"Decoded Kinesis data: {vital_signs_data}")
                     except Exception as e:
                         print(f"Error decoding Kinesis record: {str(e)}")
                         continue
                 else:
                     # Direct invocation - record is the data itself
-                    records.append(record)
+                    records.append((record, None, None))
                     print(f"Direct invocation data: {record}")
         else:
             # Handle single record direct invocation
-            records.append(event)
+            records.append((event, None, None))
             print(f"Single record invocation: {event}")
         
-        # Process each record
-        for vital_signs_data in records:
-            try:
-                result = process_vital_signs_record(vital_signs_data)
-                
-                if result['processed']:
-                    processed_records += 1
-                    
-                if result['alert_generated']:
-                    alerts_generated += 1
-                    
-            except Exception as e:
-                print(f"Error processing record: {str(e)}")
-                continue
+        metrics = new_latency_metrics()
+        
+        # Waveform segments are stored as they are; they carry no spot values to classify
+        waveform_records = [entry for entry in records if waveforms.is_waveform(entry[0])]
+        if waveform_records:
+            records = [entry for entry in records if not waveforms.is_waveform(entry[0])]
+            store_waveform_segments(waveform_records, metrics)
+        
+        # One BatchGetItem per kind of per-patient data that is not already warm
+        batch_patient_ids = {
+            data.get('patientId') or data.get('PatientId') for data, _, _ in records
+        }
+        sync_alert_configs()
+        load_patient_thresholds(batch_patient_ids)
+        load_patient_states(batch_patient_ids)
+        
+        # Readings for one patient stay in arrival order on a single worker;
+        # different patients are processed concurrently
+        patient_groups = OrderedDict()
+        for entry in records:
+            data = entry[0]
+            patient_groups.setdefault(data.get('patientId') or data.get('PatientId'), []).append(entry)
+        
+        if degraded:
+            results = process_records_degraded(patient_groups, metrics)
+        elif _executor and len(patient_groups) > 1:
+            results = list(_executor.map(
+                lambda group: process_patient_records(group, metrics), patient_groups.values()
+            ))
+        else:
+            results = [process_patient_records(group, metrics) for group in patient_groups.values()]
+        
+        processed_records = sum(result['processed'] for result in results)
+        alerts_generated = sum(result['alerts'] for result in results)
+        duplicate_records = sum(result['duplicates'] for result in results)
+        unevaluated_records = sum(result.get('unevaluated', 0) for result in results)
+        
+        devices_updated, device_conflicts = update_device_registry([entry[0] for entry in records])
+        save_patient_states()
+        notification_calls = flush_notifications(metrics)
+        
+        metrics['RecordsProcessed'] = (processed_records, 'Count')
+        metrics['NotificationCalls'] = (notification_calls, 'Count')
+        metrics['AlertsGenerated'] = (alerts_generated, 'Count')
+        metrics['DuplicateRecords'] = (duplicate_records, 'Count')
+        metrics['DegradedMode'] = (1 if degraded else 0, 'Count')
+        metrics['UnevaluatedRecords'] = (unevaluated_records, 'Count')
+        metrics['DevicesUpdated'] = (devices_updated, 'Count')
+        metrics['DeviceRegistryConflicts'] = (device_conflicts, 'Count')
+        if iterator_age is not None:
+            metrics['BatchIteratorAge'] = (iterator_age * 1000, 'Milliseconds')
+        emit_metrics(metrics)
         
         print(f"Processed {processed_records} records, generated {alerts_generated} alerts")
         
@@ -82,6 +244,7 @@ def lambda_handler(event, context):
             'statusCode': 200,
             'body': json.dumps({
                 'records_processed': processed_records,
+                'duplicate_records': duplicate_records,
                 'alerts_generated': alerts_generated
             })
         }
@@ -95,6 +258,213 @@ def lambda_handler(event, context):
             })
         }
 
+def batch_iterator_age(event):
+    """
+    Seconds since the newest record in a Kinesis batch arrived, which is what
+    Lambda reports as IteratorAge; None for direct invocations
+    """
+    
+    arrivals = [
+        float(record['kinesis']['approximateArrivalTimestamp'])
+        for record in event.get('Records', [])
+        if record.get('kinesis', {}).get('approximateArrivalTimestamp')
+    ]
+    if not arrivals:
+        return None
+    return max(time.time() - max(arrivals), 0)
+
+def update_degraded_mode(iterator_age):
+    """Enter or leave degraded mode from the current batch's iterator age, with hysteresis"""
+    
+    global _degraded
+    
+    if iterator_age is None or DEGRADED_ENTER_LAG_SECONDS <= 0:
+        # Direct invocations carry no arrival times and are always processed in full
+        return False
+    
+    if not _degraded and iterator_age >= DEGRADED_ENTER_LAG_SECONDS:
+        _degraded = True
+        print(f"Stream is {iterator_age:.0f}s behind, entering degraded mode")
+    elif _degraded and iterator_age <= DEGRADED_EXIT_LAG_SECONDS:
+        _degraded = False
+        print(f"Stream caught up ({iterator_age:.0f}s behind), leaving degraded mode")
+    return _degraded
+
+def process_records_degraded(patient_groups, metrics):
+    """
+    Degraded mode, used while catching up on a backlog. Every reading is
+    stored with BatchWriteItem and fed to its patient's windows and baseline,
+    but only each patient's newest reading is classified and may alert, so
+    the backlog does not send a page per stale reading. Critical window
+    findings from the older readings are carried onto the newest one.
+    """
+    
+    stage_started = time.perf_counter()
+    stored, duplicates = store_readings_batch(patient_groups)
+    store_ms = (time.perf_counter() - stage_started) * 1000
+    stored_at = time.time()
+    
+    def process(patient_id):
+        try:
+            return process_patient_degraded(patient_id, stored[patient_id], stored_at, metrics)
+        except Exception as e:
+            print(f"Error processing readings for patient {patient_id}: {str(e)}")
+            return {'processed': len(stored[patient_id]), 'alerts': 0, 'duplicates': 0}
+    
+    if _executor and len(stored) > 1:
+        results = list(_executor.map(process, stored))
+    else:
+        results = [process(patient_id) for patient_id in stored]
+    
+    metrics['DegradedStoreLatency'] = (store_ms, 'Milliseconds')
+    return results + [{'processed': 0, 'alerts': 0, 'duplicates': duplicates}]
+
+def store_waveform_segments(entries, metrics):
+    """
+    Write each waveform segment as one compressed item. The item key is the
+    segment's stream and start time, so a redelivered segment is rewritten
+    with identical contents.
+    """
+    
+    stored = samples = rejected = 0
+    stage_started = time.perf_counter()
+    
+    if waveform_table is None:
+        print(f"WAVEFORM_TABLE not set, dropping {len(entries)} waveform segments")
+        rejected = len(entries)
+    else:
+        changed_at = now_ms()
+        with waveform_table.batch_writer(overwrite_by_pkeys=['StreamId', 'StartMs']) as batch:
+            for data, _, _ in entries:
+                patient_id = data.get('patientId') or data.get('PatientId')
+                try:
+                    if not patient_id:
+                        raise ValueError("No patient ID found in waveform segment")
+                    item = waveforms.segment_item(patient_id, data, changed_at, WAVEFORM_RETENTION_DAYS)
+                except (ValueError, TypeError) as e:
+                    print(f"Error decoding waveform segment for patient {patient_id}: {str(e)}")
+                    rejected += 1
+                    continue
+                batch.put_item(Item=item)
+                stored += 1
+                samples += item['SampleCount']
+                
+    metrics['WaveformSegments'] = (stored, 'Count')
+    metrics['WaveformSamples'] = (samples, 'Count')
+    metrics['WaveformSegmentsRejected'] = (rejected, 'Count')
+    metrics['WaveformStoreLatency'] = ((time.perf_counter() - stage_started) * 1000, 'Milliseconds')
+    return stored
+
+def store_readings_batch(patient_groups):
+    """
+    Write a batch's readings with BatchWriteItem, skipping those this container
+    already processed. A reading no newer than the last one the patient's
+    windows absorbed was most likely processed by another container before a
+    redelivery, so it is written with the conditional put instead and
+    skipped if already stored; only new readings go on to windows and
+    baselines. Returns (readings by patient, duplicates).
+    """
+    
+    stored = OrderedDict()
+    duplicates = 0
+    
+    if vital_signs_compact_table is not None:
+        table, key_names = vital_signs_compact_table, ['P', 'T']
+    else:
+        table, key_names = vital_signs_table, ['PatientId', 'Timestamp']
+    
+    # overwrite_by_pkeys drops repeats of a key within one request, which BatchWriteItem rejects
+    with table.batch_writer(overwrite_by_pkeys=key_names) as batch:
+        for patient_id, entries in patient_groups.items():
+            if not patient_id:
+                print("No patient ID found in data")
+                continue
+            watermark = get_patient_state(patient_id, WINDOW_STATE_KEY).last_time
+            for entry in entries:
+                key = reading_key(patient_id, entry[0])
+                if key and already_seen(key):
+                    duplicates += 1
+                    continue
+                item = build_vital_signs_item(patient_id, entry[0])
+                reading_time = parse_reading_timestamp(entry[0].get('timestamp'))
+                if watermark is not None and reading_time is not None and reading_time <= watermark:
+                    if not put_reading(item):
+                        if key:
+                            mark_seen(key)
+                        duplicates += 1
+                        continue
+                elif vital_signs_compact_table is not None:
+                    batch.put_item(Item=vital_schema.compact_item(item))
+                else:
+                    batch.put_item(Item=item)
+                stored.setdefault(patient_id, []).append(entry)
+    
+    return stored, duplicates
+
+def process_patient_degraded(patient_id, entries, stored_at, metrics):
+    """Update one patient's rollups with every stored reading; classify and alert on the newest"""
+    
+    thresholds = get_patient_thresholds(patient_id)
+    carried_findings = {}
+    for data, _, _ in entries[:-1]:
+        reading_status = determine_patient_status(data, thresholds)
+        for finding in evaluate_window_rules(patient_id, data, reading_status) + evaluate_baseline(patient_id, data):
+            if finding['severity'] == 'CRITICAL':
+                carried_findings[finding['name']] = finding
+    
+    newest = entries[-1][0]
+    processing_started = time.time()
+    stage_started = time.perf_counter()
+    newest_status = determine_patient_status(newest, thresholds)
+    rule_findings = evaluate_window_rules(patient_id, newest, newest_status) + evaluate_baseline(patient_id, newest)
+    for finding in rule_findings:
+        carried_findings.pop(finding['name'], None)
+    rule_findings += list(carried_findings.values())
+    patient_status = escalate_patient_status(newest_status, rule_findings)
+    timings = {'stored_at': stored_at, 'classify_ms': (time.perf_counter() - stage_started) * 1000}
+    
+    stage_started = time.perf_counter()
+    alert_generated = check_and_generate_alerts(patient_id, newest, patient_status, rule_findings)
+    if alert_generated:
+        timings['alert_ms'] = (time.perf_counter() - stage_started) * 1000
+    
+    for data, arrival_time, decode_ms in entries:
+        key = reading_key(patient_id, data)
+        if key:
+            mark_seen(key)
+        record_latency_metrics(metrics, data, arrival_time, processing_started, decode_ms,
+                               timings if data is newest else {'stored_at': stored_at})
+    
+    return {'processed': len(entries), 'alerts': 1 if alert_generated else 0, 'duplicates': 0,
+            'unevaluated': len(entries) - 1}
+
+def process_patient_records(patient_records, metrics):
+    """Process one patient's readings from a batch, in order"""
+    
+    counts = {'processed': 0, 'alerts': 0, 'duplicates': 0}
+    
+    for vital_signs_data, arrival_time, decode_ms in patient_records:
+        try:
+            processing_started = time.time()
+            result = process_vital_signs_record(vital_signs_data)
+            
+            if result.get('duplicate'):
+                counts['duplicates'] += 1
+                
+            if result['processed']:
+                counts['processed'] += 1
+                record_latency_metrics(metrics, vital_signs_data, arrival_time,
+                                       processing_started, decode_ms, result['timings'])
+                
+            if result['alert_generated']:
+                counts['alerts'] += 1
+                
+        except Exception as e:
+            print(f"Error processing record: {str(e)}")
+            continue
+    
+    return counts
+
 def process_vital_signs_record(data):
     """Process a single vital signs record"""
     
@@ -105,112 +475,570 @@ def process_vital_signs_record(data):
             print("No patient ID found in data")
             return {'processed': False, 'alert_generated': False}
         
-        print(f"Processing data for patient: {patient_id}")
+        timings = {}
         
-        # Prepare data for DynamoDB storage
-        timestamp = data.get('timestamp') or datetime.utcnow().isoformat() + 'Z'
+        key = reading_key(patient_id, data)
+        if key and already_seen(key):
+            print(f"Skipping reading already processed by this container: {key}")
+            return {'processed': False, 'alert_generated': False, 'duplicate': True}
         
-        # Convert all numeric values to Decimal for DynamoDB
-        vital_signs_item = {
-            'PatientId': patient_id,
-            'Timestamp': timestamp,
-            'DeviceId': data.get('deviceId', 'unknown'),
-            'HeartRate': Decimal(str(data.get('heartRate', 0))),
-            'SystolicBP': Decimal(str(data.get('systolicBP', 0))),
-            'DiastolicBP': Decimal(str(data.get('diastolicBP', 0))),
-            'Temperature': Decimal(str(data.get('temperature', 0))),
-            'OxygenSaturation': Decimal(str(data.get('oxygenSaturation', 0))),
-            'RoomNumber': data.get('roomNumber', 'UNKNOWN'),
-            'PatientCondition': data.get('patientCondition', 'Unknown'),
-            'ProcessedAt': datetime.utcnow().isoformat() + 'Z',
-            # Set TTL for automatic data cleanup (30 days)
-            'TTL': int((datetime.utcnow() + timedelta(days=30)).timestamp())
-        }
+        print(f"Processing data for patient: {patient_id}")
         
-        # Add optional sensor metadata
-        if 'sensorBatteryLevel' in data:
-            vital_signs_item['SensorBatteryLevel'] = Decimal(str(data['sensorBatteryLevel']))
-        if 'signalStrength' in data:
-            vital_signs_item['SignalStrength'] = Decimal(str(data['signalStrength']))
-        if 'dataQuality' in data:
-            vital_signs_item['DataQuality'] = data['dataQuality']
+        vital_signs_item = build_vital_signs_item(patient_id, data)
+        timestamp = vital_signs_item['Timestamp']
         
         print(f"Storing vital signs item: {json.dumps(vital_signs_item, default=str)}")
         
-        # Store in DynamoDB
-        vital_signs_table.put_item(Item=vital_signs_item)
+        # Store in DynamoDB; PatientId + Timestamp is the reading's natural key,
+        # so a redelivered record fails the condition instead of being rewritten
+        stage_started = time.perf_counter()
+        duplicate = not put_reading(vital_signs_item)
+        timings['store_ms'] = (time.perf_counter() - stage_started) * 1000
+        timings['stored_at'] = time.time()
         
-        print(f"✅ Successfully stored vital signs for patient {patient_id}")
+        if duplicate:
+            print(f"Dropping reading for patient {patient_id} from {vital_signs_item['DeviceId']} at {timestamp}: already stored")
+        else:
+            print(f"✅ Successfully stored vital signs for patient {patient_id}")
         
         # Determine patient status based on vital signs
-        patient_status = determine_patient_status(data)
+        stage_started = time.perf_counter()
+        patient_status = determine_patient_status(data, get_patient_thresholds(patient_id))
+        # Windows and baselines already saw a redelivered reading
+        rule_findings = [] if duplicate else evaluate_window_rules(patient_id, data, patient_status) + evaluate_baseline(patient_id, data)
+        patient_status = escalate_patient_status(patient_status, rule_findings)
+        timings['classify_ms'] = (time.perf_counter() - stage_started) * 1000
         vital_signs_item['PatientStatus'] = patient_status
         
         # Log patient status for CloudWatch metrics
         print(f"Patient {patient_id} status: {patient_status}")
         
         # Check for alert conditions
-        alert_generated = check_and_generate_alerts(patient_id, data, patient_status)
+        stage_started = time.perf_counter()
+        alert_generated = check_and_generate_alerts(patient_id, data, patient_status, rule_findings)
+        if alert_generated:
+            timings['alert_ms'] = (time.perf_counter() - stage_started) * 1000
         
-        return {'processed': True, 'alert_generated': alert_generated}
+        if key:
+            mark_seen(key)
+        
+        # A dropped redelivery is reported under DuplicateRecords, not as processed
+        return {'processed': not duplicate, 'alert_generated': alert_generated, 'duplicate': duplicate, 'timings': timings}
         
     except Exception as e:
         print(f"Error processing record for patient {patient_id}: {str(e)}")
         return {'processed': False, 'alert_generated': False}
 
-def determine_patient_status(vital_signs):
-    """Determine patient status based on vital signs thresholds"""
+def put_reading(vital_signs_item):
+    """Conditionally store a reading; False when it is already stored"""
+    
+    if vital_signs_compact_table is not None:
+        return vital_schema.put_compact_item(vital_signs_compact_table, vital_schema.compact_item(vital_signs_item))
     
     try:
-        heart_rate = float(vital_signs.get('heartRate', 0))
-        systolic_bp = float(vital_signs.get('systolicBP', 0))
-        diastolic_bp = float(vital_signs.get('diastolicBP', 0))
-        temperature = float(vital_signs.get('temperature', 0))
-        oxygen_sat = float(vital_signs.get('oxygenSaturation', 0))
-        
-        # Critical conditions (require immediate attention)
-        critical_conditions = [
-            heart_rate > 120 or heart_rate < 50,
-            systolic_bp > 180 or systolic_bp < 90,
-            diastolic_bp > 120 or diastolic_bp < 50,
-            temperature > 101.5 or temperature < 95.0,
-            oxygen_sat < 90
-        ]
-        
-        # Warning conditions (require monitoring)
-        warning_conditions = [
-            heart_rate > 100 or heart_rate < 60,
-            systolic_bp > 140 or systolic_bp < 100,
-            diastolic_bp > 90 or diastolic_bp < 60,
-            temperature > 99.5 or temperature < 97.0,
-            oxygen_sat < 95
-        ]
-        
-        if any(critical_conditions):
-            return 'Critical'
-        elif any(warning_conditions):
-            return 'Warning'
-        else:
-            return 'Normal'
+        vital_signs_table.put_item(
+            Item=vital_signs_item,
+            ConditionExpression='attribute_not_exists(PatientId)'
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+def build_vital_signs_item(patient_id, data):
+    """VitalSigns item (v1 shape) for a decoded reading"""
+    
+    # Prepare data for DynamoDB storage
+    timestamp = data.get('timestamp') or datetime.utcnow().isoformat() + 'Z'
+    changed_at = now_ms()
+    
+    # Convert all numeric values to Decimal for DynamoDB
+    vital_signs_item = {
+        'PatientId': patient_id,
+        'Timestamp': timestamp,
+        'DeviceId': data.get('deviceId', 'unknown'),
+        'HeartRate': Decimal(str(data.get('heartRate', 0))),
+        'SystolicBP': Decimal(str(data.get('systolicBP', 0))),
+        'DiastolicBP': Decimal(str(data.get('diastolicBP', 0))),
+        'Temperature': Decimal(str(data.get('temperature', 0))),
+        'OxygenSaturation': Decimal(str(data.get('oxygenSaturation', 0))),
+        'RoomNumber': data.get('roomNumber', 'UNKNOWN'),
+        'PatientCondition': data.get('patientCondition', 'Unknown'),
+        'ProcessedAt': datetime.utcfromtimestamp(changed_at / 1000).isoformat() + 'Z',
+        # Sort key of PatientChangeIndex, read by vitals-api since= polls
+        'ChangedAt': changed_at,
+        # Set TTL for automatic data cleanup (30 days)
+        'TTL': changed_at // 1000 + 30 * 86400
+    }
+    
+    # Add optional sensor metadata
+    if 'sensorBatteryLevel' in data:
+        vital_signs_item['SensorBatteryLevel'] = Decimal(str(data['sensorBatteryLevel']))
+    if 'signalStrength' in data:
+        vital_signs_item['SignalStrength'] = Decimal(str(data['signalStrength']))
+    if 'dataQuality' in data:
+        vital_signs_item['DataQuality'] = data['dataQuality']
+    
+    return vital_signs_item
+
+def reading_key(patient_id, data):
+    """
+    Identity of a reading for de-duplication, the same one the stored key
+    uses: patient, device and reading time to the microsecond. None when the
+    device sent no timestamp.
+    """
+    
+    timestamp = data.get('timestamp')
+    if not timestamp:
+        return None
+    try:
+        reading_time = vital_blocks.timestamp_to_micros(timestamp)
+    except ValueError:
+        reading_time = timestamp
+    return f"{patient_id}|{data.get('deviceId', 'unknown')}|{reading_time}"
+
+def already_seen(key):
+    now = time.time()
+    with _cache_lock:
+        # Entries are in insertion order, so expired ones are always at the front
+        while _seen_readings:
+            oldest_key, expires_at = next(iter(_seen_readings.items()))
+            if expires_at > now:
+                break
+            del _seen_readings[oldest_key]
+        return key in _seen_readings
+
+def mark_seen(key):
+    with _cache_lock:
+        _seen_readings[key] = time.time() + SEEN_READINGS_TTL_SECONDS
+        while len(_seen_readings) > SEEN_READINGS_MAX:
+            _seen_readings.popitem(last=False)
+
+def alert_id_for(patient_id, vital_signs):
+    """Deterministic AlertId so a redelivered reading maps to the same alert"""
+    
+    timestamp = vital_signs.get('timestamp')
+    if not timestamp:
+        return str(uuid.uuid4())
+    return str(uuid.uuid5(ALERT_ID_NAMESPACE, f"{patient_id}|{vital_signs.get('deviceId', 'unknown')}|{timestamp}"))
+
+def new_latency_metrics():
+    """Empty per-batch latency series, emitted as one EMF record per batch"""
+    
+    return {
+        'DecodeLatency': ([], 'Milliseconds'),
+        'StoreLatency': ([], 'Milliseconds'),
+        'ClassifyLatency': ([], 'Milliseconds'),
+        'AlertLatency': ([], 'Milliseconds'),
+        'StreamWaitLag': ([], 'Milliseconds'),
+        'IngestToStoreLag': ([], 'Milliseconds'),
+        'IngestToAlertLag': ([], 'Milliseconds'),
+        'IngestToDigestLag': ([], 'Milliseconds')
+    }
+
+def record_latency_metrics(metrics, data, arrival_time, processing_started, decode_ms, timings):
+    """Add one record's stage timings and end-to-end lags to the batch metrics"""
+    
+    metrics['DecodeLatency'][0].append(decode_ms)
+    metrics['StoreLatency'][0].append(timings.get('store_ms'))
+    metrics['ClassifyLatency'][0].append(timings.get('classify_ms'))
+    metrics['AlertLatency'][0].append(timings.get('alert_ms'))
+    
+    # Time the record sat in the shard before this invocation picked it up
+    if arrival_time:
+        metrics['StreamWaitLag'][0].append((processing_started - float(arrival_time)) * 1000)
+    
+    reading_time = parse_reading_timestamp(data.get('timestamp'))
+    if reading_time is None:
+        return
+    
+    if 'stored_at' in timings:
+        metrics['IngestToStoreLag'][0].append((timings['stored_at'] - reading_time) * 1000)
+
+def record_publish_lag(metrics, name, alert_keys, published_at):
+    """Add the lag from each published alert's reading to its publish time"""
+    
+    for _, timestamp in alert_keys:
+        reading_time = parse_reading_timestamp(timestamp)
+        if reading_time is not None:
+            metrics[name][0].append((published_at - reading_time) * 1000)
+
+def parse_reading_timestamp(timestamp):
+    """Convert a device ISO timestamp to epoch seconds, or None if unparseable"""
+    
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def determine_patient_status(vital_signs, thresholds=None):
+    """Determine patient status based on the patient's compiled vital signs thresholds"""
+    
+    try:
+        values = [float(vital_signs.get(field, 0)) for field in alert_thresholds.READING_FIELDS]
+        return (thresholds or alert_thresholds.DEFAULT_THRESHOLDS).classify(values)
             
     except Exception as e:
         print(f"Error determining patient status: {str(e)}")
         return 'Unknown'
 
-def check_and_generate_alerts(patient_id, vital_signs, patient_status):
-    """Check for alert conditions and generate alerts if necessary"""
+def get_patient_thresholds(patient_id):
+    """Compiled thresholds for a patient, querying AlertConfig only on a cache miss"""
+    
+    with _cache_lock:
+        thresholds = _patient_thresholds.get(patient_id)
+        if thresholds is not None:
+            _patient_thresholds.move_to_end(patient_id)
+            return thresholds
+    
+    try:
+        items = []
+        query_kwargs = {'KeyConditionExpression': Key('PatientId').eq(patient_id)}
+        while True:
+            response = alert_config_table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except Exception as e:
+        print(f"Error loading alert config for patient {patient_id}: {str(e)}")
+        return alert_thresholds.DEFAULT_THRESHOLDS
+    
+    return cache_patient_thresholds(patient_id, alert_thresholds.compile_thresholds(items))
+
+def cache_patient_thresholds(patient_id, thresholds):
+    with _cache_lock:
+        _patient_thresholds[patient_id] = thresholds
+        _patient_thresholds.move_to_end(patient_id)
+        while len(_patient_thresholds) > RULE_STATE_MAX_PATIENTS:
+            _patient_thresholds.popitem(last=False)
+    return thresholds
+
+def load_patient_thresholds(patient_ids):
+    """Compile thresholds for uncached patients with BatchGetItem on the known vital types"""
+    
+    missing = [pid for pid in patient_ids if pid and pid not in _patient_thresholds]
+    if not missing:
+        return
+    
+    keys = [
+        {'PatientId': pid, 'VitalType': vital_type}
+        for pid in missing for vital_type in alert_thresholds.VITAL_TYPES
+    ]
+    items = {pid: [] for pid in missing}
+    try:
+        for start in range(0, len(keys), 100):
+            request = {ALERT_CONFIG_TABLE: {'Keys': keys[start:start + 100]}}
+            while request:
+                response = dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(ALERT_CONFIG_TABLE, []):
+                    items[item['PatientId']].append(item)
+                request = response.get('UnprocessedKeys') or None
+    except Exception as e:
+        # Patients not compiled here are queried individually on first use
+        print(f"Error loading alert configs: {str(e)}")
+        return
+    
+    for patient_id in missing:
+        cache_patient_thresholds(patient_id, alert_thresholds.compile_thresholds(items[patient_id]))
+
+def sync_alert_configs():
+    """
+    Drop cached thresholds of patients whose AlertConfig changed since the
+    last sync. alert-management follows the table's stream and records the
+    changed patients on a version item (see config_version), so each
+    container makes one GetItem per CONFIG_SYNC_INTERVAL_SECONDS instead of
+    reading the stream itself.
+    """
+    
+    global _config_synced_at, _config_version
+    
+    if not patient_state_table:
+        return
+    
+    now = time.time()
+    if now - _config_synced_at < CONFIG_SYNC_INTERVAL_SECONDS:
+        return
+    _config_synced_at = now
+    
+    try:
+        item = patient_state_table.get_item(Key=config_version.CONFIG_VERSION_KEY).get('Item') or {}
+    except Exception as e:
+        # Throttling or a transient error: keep the cache and try again next interval
+        print(f"Error syncing alert configs, keeping cached thresholds: {str(e)}")
+        return
+    
+    version = int(item.get('Version', 0))
+    with _cache_lock:
+        if _config_version is None:
+            # Anything cached before the first sync may predate this version
+            _patient_thresholds.clear()
+        elif version > _config_version:
+            changed = config_version.changed_since(item, _config_version)
+            if changed is None:
+                print(f"Alert config version moved from {_config_version} to {version}, clearing threshold cache")
+                _patient_thresholds.clear()
+            else:
+                for patient_id in changed:
+                    _patient_thresholds.pop(patient_id, None)
+        else:
+            return
+        _config_version = version
+
+def evaluate_window_rules(patient_id, vital_signs, patient_status):
+    """
+    Feed a reading and its single-reading threshold status into the
+    patient's rule windows; returns newly triggered rules
+    """
+    
+    try:
+        reading_time = parse_reading_timestamp(vital_signs.get('timestamp')) or time.time()
+        window = get_patient_state(patient_id, WINDOW_STATE_KEY)
+        level = window_rules.THRESHOLD_LEVELS.get(patient_status, 0)
+        findings = window.add_reading(reading_time, dict(vital_signs, **{window_rules.THRESHOLD_LEVEL_FIELD: level}))
+        _dirty_states[(patient_id, WINDOW_STATE_KEY)] = window
+        
+        for rule in findings:
+            print(f"Patient {patient_id} window rule triggered: {rule['name']}")
+        return findings
+        
+    except Exception as e:
+        print(f"Error evaluating window rules for patient {patient_id}: {str(e)}")
+        return []
+
+def evaluate_baseline(patient_id, vital_signs):
+    """Score a reading against the patient's own EWMA baseline, then update it"""
+    
+    try:
+        baseline = get_patient_state(patient_id, BASELINE_STATE_KEY)
+        findings = baseline.add_reading(vital_signs)
+        _dirty_states[(patient_id, BASELINE_STATE_KEY)] = baseline
+        
+        for finding in findings:
+            print(f"Patient {patient_id} baseline deviation: {finding['description']}")
+        return findings
+        
+    except Exception as e:
+        print(f"Error evaluating baseline for patient {patient_id}: {str(e)}")
+        return []
+
+def escalate_patient_status(patient_status, rule_findings):
+    """Raise the single-reading status to the most severe window rule or baseline finding"""
+    
+    severities = {rule['severity'] for rule in rule_findings}
+    if 'CRITICAL' in severities:
+        return 'Critical'
+    if 'WARNING' in severities and patient_status in ('Normal', 'Unknown'):
+        return 'Warning'
+    return patient_status
+
+def get_patient_state(patient_id, state_key):
+    """Warm-container state object for a patient, falling back to the state table"""
+    
+    with _cache_lock:
+        states = _patient_states.get(patient_id)
+        if states is not None and state_key in states:
+            _patient_states.move_to_end(patient_id)
+            return states[state_key]
+    
+    item = None
+    if patient_state_table:
+        item = patient_state_table.get_item(
+            Key={'PatientId': patient_id, 'StateKey': state_key}
+        ).get('Item')
+    
+    states = cache_patient_states(patient_id, {state_key: STATE_LOADERS[state_key](item)})
+    return states[state_key]
+
+def cache_patient_states(patient_id, loaded):
+    with _cache_lock:
+        states = _patient_states.setdefault(patient_id, {})
+        states.update(loaded)
+        _patient_states.move_to_end(patient_id)
+        while len(_patient_states) > RULE_STATE_MAX_PATIENTS:
+            _patient_states.popitem(last=False)
+    return states
+
+def load_patient_states(patient_ids):
+    """Warm the state cache for a batch with BatchGetItem (100 keys per call)"""
+    
+    missing = [pid for pid in patient_ids if pid and pid not in _patient_states]
+    if not missing:
+        return
+    
+    keys = [
+        {'PatientId': pid, 'StateKey': state_key}
+        for pid in missing for state_key in STATE_LOADERS
+    ]
+    items = {}
+    if patient_state_table:
+        try:
+            for start in range(0, len(keys), 100):
+                request = {PATIENT_STATE_TABLE: {'Keys': keys[start:start + 100]}}
+                while request:
+                    response = dynamodb.batch_get_item(RequestItems=request)
+                    for item in response.get('Responses', {}).get(PATIENT_STATE_TABLE, []):
+                        items[(item['PatientId'], item['StateKey'])] = item
+                    request = response.get('UnprocessedKeys') or None
+        except Exception as e:
+            # State not loaded here is fetched individually on first use
+            print(f"Error loading patient state: {str(e)}")
+            return
+    
+    for patient_id in missing:
+        cache_patient_states(patient_id, {
+            state_key: loader(items.get((patient_id, state_key)))
+            for state_key, loader in STATE_LOADERS.items()
+        })
+
+def save_patient_states():
+    """Write back every state object touched in this batch, one item per patient and key"""
+    
+    if not patient_state_table or not _dirty_states:
+        _dirty_states.clear()
+        return
+    
+    try:
+        ttl = int((datetime.utcnow() + timedelta(days=STATE_RETENTION_DAYS)).timestamp())
+        with patient_state_table.batch_writer() as batch:
+            for (patient_id, state_key), state in _dirty_states.items():
+                item = {'PatientId': patient_id, 'StateKey': state_key, 'TTL': ttl}
+                item.update(state.to_state())
+                batch.put_item(Item=item)
+    except Exception as e:
+        print(f"Error saving patient state: {str(e)}")
+    finally:
+        _dirty_states.clear()
+
+def update_device_registry(readings):
+    """
+    Fold a batch's readings into the device registry with one conditional
+    write per device, however many readings it sent. Returns (devices
+    written, devices left for the next batch after repeated conflicts).
+    Registry failures never fail the batch.
+    """
+    
+    if device_registry_table is None:
+        return 0, 0
+    
+    by_device = OrderedDict()
+    received_ms = now_ms()
+    for data in readings:
+        device_id = data.get('deviceId')
+        if not device_id:
+            continue
+        reading_time = parse_reading_timestamp(data.get('timestamp'))
+        reading_ms = int(reading_time * 1000) if reading_time is not None else received_ms
+        by_device.setdefault(device_id, []).append((reading_ms, data))
+    
+    if not by_device:
+        return 0, 0
+    load_device_items(list(by_device))
+    
+    def update(device_id):
+        try:
+            return write_device(device_id, by_device[device_id])
+        except Exception as e:
+            print(f"Error updating device registry for {device_id}: {str(e)}")
+            return 'error'
+    
+    if _executor and len(by_device) > 1:
+        results = list(_executor.map(update, by_device))
+    else:
+        results = [update(device_id) for device_id in by_device]
+    return results.count('written'), results.count('conflict')
+
+def write_device(device_id, readings):
+    """Apply one device's readings on top of its registry item, retrying once the item moved on"""
+    
+    with _cache_lock:
+        item = _device_items.get(device_id)
+    
+    for attempt in range(DEVICE_REGISTRY_ATTEMPTS):
+        device = device_registry.DeviceHealth.from_item(device_id, item)
+        if not device.add_readings(readings):
+            # Redelivered or older than what the registry already holds
+            return 'unchanged'
+        
+        new_item = device.to_item(now_ms())
+        if item is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(DeviceId)'}
+        else:
+            condition = {
+                'ConditionExpression': '#version = :version',
+                'ExpressionAttributeNames': {'#version': 'Version'},
+                'ExpressionAttributeValues': {':version': device.version}
+            }
+        
+        try:
+            device_registry_table.put_item(Item=new_item, **condition)
+            cache_device_item(device_id, new_item)
+            return 'written'
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Another container (or an older cache entry) disagrees; start from the stored item
+            item = device_registry_table.get_item(Key={'DeviceId': device_id}, ConsistentRead=True).get('Item')
+            cache_device_item(device_id, item)
+    
+    print(f"Device {device_id} changed concurrently {DEVICE_REGISTRY_ATTEMPTS} times, update deferred")
+    return 'conflict'
+
+def cache_device_item(device_id, item):
+    with _cache_lock:
+        _device_items[device_id] = item
+        _device_items.move_to_end(device_id)
+        while len(_device_items) > DEVICE_REGISTRY_MAX_DEVICES:
+            _device_items.popitem(last=False)
+
+def load_device_items(device_ids):
+    """Warm the registry cache for a batch with BatchGetItem (100 keys per call)"""
+    
+    with _cache_lock:
+        missing = [device_id for device_id in device_ids if device_id not in _device_items]
+    if not missing:
+        return
+    
+    items = {}
+    try:
+        for start in range(0, len(missing), 100):
+            request = {DEVICE_REGISTRY_TABLE: {'Keys': [{'DeviceId': device_id} for device_id in missing[start:start + 100]]}}
+            while request:
+                response = dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(DEVICE_REGISTRY_TABLE, []):
+                    items[item['DeviceId']] = item
+                request = response.get('UnprocessedKeys') or None
+    except Exception as e:
+        # Devices not loaded here start from a new entry and are re-read if the write conflicts
+        print(f"Error loading device registry: {str(e)}")
+    
+    for device_id in missing:
+        cache_device_item(device_id, items.get(device_id))
+
+def check_and_generate_alerts(patient_id, vital_signs, patient_status, rule_findings=None):
+    """
+    Page when a reading is beyond the panic limits or a window rule has just
+    triggered. A reading that only crosses the alert thresholds sets the
+    patient's status but does not page until the breach persists
+    (SustainedCriticalThreshold / SustainedWarningThreshold), so a one-off
+    spike or artefact is stored without an alert. Baseline deviations are
+    included in alerts but do not page on their own.
+    """
     
     try:
-        # Always generate alerts for critical status
-        if patient_status == 'Critical':
-            alert_message = create_critical_alert_message(patient_id, vital_signs)
-            send_alert(patient_id, 'CRITICAL', alert_message, vital_signs)
+        alert_type = alert_type_for(patient_id, vital_signs, rule_findings or [])
+        
+        if alert_type == 'CRITICAL':
+            alert_message = create_critical_alert_message(patient_id, vital_signs, rule_findings)
+            send_alert(patient_id, 'CRITICAL', alert_message, vital_signs, rule_findings)
             return True
         
-        # For demo purposes, also alert on Warning status
-        if patient_status == 'Warning':
-            alert_message = create_warning_alert_message(patient_id, vital_signs)
-            send_alert(patient_id, 'WARNING', alert_message, vital_signs)
+        if alert_type == 'WARNING':
+            alert_message = create_warning_alert_message(patient_id, vital_signs, rule_findings)
+            send_alert(patient_id, 'WARNING', alert_message, vital_signs, rule_findings)
             return True
         
         return False
@@ -219,42 +1047,90 @@ def check_and_generate_alerts(patient_id, vital_signs, patient_status):
         print(f"Error checking alerts for patient {patient_id}: {str(e)}")
         return False
 
-def create_critical_alert_message(patient_id, vital_signs):
-    """Create alert message for critical patient status"""
+def alert_type_for(patient_id, vital_signs, rule_findings):
+    """'CRITICAL', 'WARNING' or None for a reading and the findings it produced"""
+    
+    try:
+        values = [float(vital_signs.get(field, 0)) for field in alert_thresholds.READING_FIELDS]
+        panic = get_patient_thresholds(patient_id).panic(values)
+    except (TypeError, ValueError):
+        panic = False
     
-    message = f"🚨 CRITICAL ALERT - Patient {patient_id}\n\n"
-    message += f"Room: {vital_signs.get('roomNumber', 'Unknown')}\n"
-    message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-    message += "Vital Signs:\n"
-    message += f"• Heart Rate: {vital_signs.get('heartRate', 'N/A')} bpm\n"
-    message += f"• Blood Pressure: {vital_signs.get('systolicBP', 'N/A')}/{vital_signs.get('diastolicBP', 'N/A')} mmHg\n"
-    message += f"• Temperature: {vital_signs.get('temperature', 'N/A')}°F\n"
-    message += f"• Oxygen Saturation: {vital_signs.get('oxygenSaturation', 'N/A')}%\n\n"
-    message += "⚡ IMMEDIATE MEDICAL ATTENTION REQUIRED"
+    window_severities = {rule['severity'] for rule in rule_findings if rule['name'] in WINDOW_RULE_NAMES}
+    if panic or 'CRITICAL' in window_severities:
+        return 'CRITICAL'
+    if 'WARNING' in window_severities:
+        return 'WARNING'
+    return None
+
+def compile_alert_template(header, footer):
+    """Build a notification template once per container; returns its format method"""
     
-    return message
+    return (
+        header + " - Patient {patient_id}\n\n"
+        "Room: {room}\n"
+        "Time: {time}\n\n"
+        "Vital Signs:\n"
+        "• Heart Rate: {heartRate} bpm\n"
+        "• Blood Pressure: {systolicBP}/{diastolicBP} mmHg\n"
+        "• Temperature: {temperature}°F\n"
+        "• Oxygen Saturation: {oxygenSaturation}%\n\n"
+        "{findings}" + footer
+    ).format
 
-def create_warning_alert_message(patient_id, vital_signs):
+render_critical_alert = compile_alert_template("🚨 CRITICAL ALERT", "⚡ IMMEDIATE MEDICAL ATTENTION REQUIRED")
+render_warning_alert = compile_alert_template("⚠️ WARNING ALERT", "📋 Please review patient status")
+render_alert_sms = "ALERT: Patient {patient_id} - {alert_type} condition detected. Check dashboard immediately.".format
+render_alert_subject = "Patient Alert - {patient_id} ({alert_type})".format
+render_digest_header = "⚠️ WARNING DIGEST - {ward}\n\n{count} warning alerts in the last {minutes} minutes:\n\n".format
+render_digest_line = ("• {time} Patient {patient_id} (Room {room}): HR {heartRate} bpm, "
+                      "BP {systolicBP}/{diastolicBP} mmHg, Temp {temperature}°F, "
+                      "SpO2 {oxygenSaturation}%{findings}\n").format
+render_digest_sms = "WARNING: {count} patients in {ward} need review. Check dashboard.".format
+render_digest_subject = "Patient Warning Digest - {ward} ({count})".format
+
+def alert_template_fields(patient_id, vital_signs):
+    return {
+        'patient_id': patient_id,
+        'room': vital_signs.get('roomNumber', 'Unknown'),
+        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'heartRate': vital_signs.get('heartRate', 'N/A'),
+        'systolicBP': vital_signs.get('systolicBP', 'N/A'),
+        'diastolicBP': vital_signs.get('diastolicBP', 'N/A'),
+        'temperature': vital_signs.get('temperature', 'N/A'),
+        'oxygenSaturation': vital_signs.get('oxygenSaturation', 'N/A')
+    }
+
+def create_critical_alert_message(patient_id, vital_signs, rule_findings=None):
+    """Create alert message for critical patient status"""
+    
+    return render_critical_alert(findings=format_rule_findings(rule_findings),
+                                 **alert_template_fields(patient_id, vital_signs))
+
+def create_warning_alert_message(patient_id, vital_signs, rule_findings=None):
     """Create alert message for warning patient status"""
     
-    message = f"⚠️ WARNING ALERT - Patient {patient_id}\n\n"
-    message += f"Room: {vital_signs.get('roomNumber', 'Unknown')}\n"
-    message += f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-    message += "Vital Signs:\n"
-    message += f"• Heart Rate: {vital_signs.get('heartRate', 'N/A')} bpm\n"
-    message += f"• Blood Pressure: {vital_signs.get('systolicBP', 'N/A')}/{vital_signs.get('diastolicBP', 'N/A')} mmHg\n"
-    message += f"• Temperature: {vital_signs.get('temperature', 'N/A')}°F\n"
-    message += f"• Oxygen Saturation: {vital_signs.get('oxygenSaturation', 'N/A')}%\n\n"
-    message += "📋 Please review patient status"
+    return render_warning_alert(findings=format_rule_findings(rule_findings),
+                                **alert_template_fields(patient_id, vital_signs))
+
+def format_rule_findings(rule_findings):
+    """Message section listing sustained-abnormality rules that triggered"""
+    
+    if not rule_findings:
+        return ""
     
-    return message
+    section = "Sustained Conditions:\n"
+    for rule in rule_findings:
+        section += f"• {rule['description']}\n"
+    return section + "\n"
 
-def send_alert(patient_id, alert_type, message, vital_signs):
-    """Send alert via SNS and store in alert history"""
+def send_alert(patient_id, alert_type, message, vital_signs, rule_findings=None):
+    """Store alert in alert history and queue its notification"""
     
     try:
-        alert_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat() + 'Z'
+        alert_id = alert_id_for(patient_id, vital_signs)
+        # The reading's timestamp keeps the item key identical across redeliveries
+        timestamp = vital_signs.get('timestamp') or datetime.utcnow().isoformat() + 'Z'
         
         # Store alert in history table
         alert_item = {
@@ -271,30 +1147,257 @@ def send_alert(patient_id, alert_type, message, vital_signs):
                 'OxygenSaturation': Decimal(str(vital_signs.get('oxygenSaturation', 0)))
             },
             'RoomNumber': vital_signs.get('roomNumber', 'Unknown'),
-            'Status': 'SENT',
+            'Status': 'PENDING',
             # Set TTL for automatic cleanup (90 days for alerts)
             'TTL': int((datetime.utcnow() + timedelta(days=90)).timestamp())
         }
+        alert_item.update(change_stamp())
         
-        alert_history_table.put_item(Item=alert_item)
+        if rule_findings:
+            alert_item['Rules'] = [rule['name'] for rule in rule_findings]
         
-        # Send SNS notification
-        sns_message = {
-            'default': message,
-            'email': message,
-            'sms': f"ALERT: Patient {patient_id} - {alert_type} condition detected. Check dashboard immediately."
-        }
+        # Claim the alert; only a PENDING leftover from an interrupted attempt may be retried
+        try:
+            alert_history_table.put_item(
+                Item=alert_item,
+                ConditionExpression='attribute_not_exists(AlertId) OR #status = :pending',
+                ExpressionAttributeNames={'#status': 'Status'},
+                ExpressionAttributeValues={':pending': 'PENDING'}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            print(f"Alert {alert_id} for patient {patient_id} already sent, not paging again")
+            return False
         
-        response = sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Message=json.dumps(sns_message),
-            MessageStructure='json',
-            Subject=f"Patient Alert - {patient_id} ({alert_type})"
-        )
+        alert_key = (alert_id, timestamp)
+        if alert_type == 'CRITICAL':
+            queue_critical_notification(alert_key, patient_id, message)
+        else:
+            queue_warning_digest(alert_key, patient_id, vital_signs, rule_findings)
         
-        print(f"Alert sent for patient {patient_id}: {alert_type}")
+        print(f"Alert queued for patient {patient_id}: {alert_type}")
         return True
         
     except Exception as e:
         print(f"Error sending alert: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def queue_critical_notification(alert_key, patient_id, message):
+    """Queue a critical page; sent with PublishBatch when the batch finishes"""
+    
+    entry = {
+        'Id': alert_key[0],
+        'Message': json.dumps({
+            'default': message,
+            'email': message,
+            'sms': render_alert_sms(patient_id=patient_id, alert_type='CRITICAL')
+        }),
+        'MessageStructure': 'json',
+        'Subject': render_alert_subject(patient_id=patient_id, alert_type='CRITICAL')
+    }
+    with _notification_lock:
+        _pending_critical.append((alert_key, entry))
+
+def queue_warning_digest(alert_key, patient_id, vital_signs, rule_findings):
+    """Add a warning to its ward's digest (ward = RoomNumber prefix, e.g. ICU or WARD)"""
+    
+    room = vital_signs.get('roomNumber', 'Unknown')
+    ward = room.split('-', 1)[0] if '-' in room else room
+    findings = ''
+    if rule_findings:
+        findings = ' - ' + '; '.join(rule['description'] for rule in rule_findings)
+    line = render_digest_line(findings=findings, **alert_template_fields(patient_id, vital_signs))
+    
+    with _notification_lock:
+        _pending_warnings.append((ward, alert_key, line))
+
+def flush_notifications(metrics, check_open_digests=False):
+    """
+    Publish queued notifications and mark their alerts SENT.
+    Critical alerts go out now, ten per PublishBatch call. Warnings are added
+    to their ward's stored digest, which goes out once its window has elapsed
+    or it is full; check_open_digests also checks wards with no new warnings
+    (the scheduled flush). The lag from reading to publish goes into metrics
+    as IngestToAlertLag (pages) or IngestToDigestLag (digested warnings).
+    Returns SNS calls made.
+    """
+    
+    calls = 0
+    
+    with _notification_lock:
+        critical = list(_pending_critical)
+        _pending_critical.clear()
+        warnings = list(_pending_warnings)
+        _pending_warnings.clear()
+    
+    for start in range(0, len(critical), SNS_PUBLISH_BATCH_SIZE):
+        chunk = critical[start:start + SNS_PUBLISH_BATCH_SIZE]
+        try:
+            response = sns.publish_batch(
+                TopicArn=SNS_TOPIC_ARN,
+                PublishBatchRequestEntries=[entry for _, entry in chunk]
+            )
+            calls += 1
+        except Exception as e:
+            # Alerts stay PENDING, so a redelivered batch pages them again
+            print(f"Error publishing critical alerts: {str(e)}")
+            continue
+        
+        for failure in response.get('Failed', []):
+            print(f"Critical alert {failure['Id']} not published: {failure.get('Message')}")
+        published = {success['Id'] for success in response.get('Successful', [])}
+        published_keys = [key for key, entry in chunk if entry['Id'] in published]
+        record_publish_lag(metrics, 'IngestToAlertLag', published_keys, time.time())
+        mark_alerts_sent(published_keys)
+    
+    if patient_state_table:
+        due_wards = append_warning_digests(warnings)
+        if check_open_digests:
+            due_wards |= open_digests_due()
+        due_digests = take_warning_digests(due_wards)
+    else:
+        # Without a state table there is nowhere to hold a digest, so each batch sends its own
+        by_ward = OrderedDict()
+        for ward, alert_key, line in warnings:
+            by_ward.setdefault(ward, OrderedDict())[alert_key] = line
+        due_digests = list(by_ward.items())
+    
+    for ward, alerts in due_digests:
+        count = len(alerts)
+        message = render_digest_header(ward=ward, count=count,
+                                       minutes=max(1, WARNING_DIGEST_WINDOW_SECONDS // 60))
+        message += ''.join(alerts.values())
+        try:
+            sns.publish(
+                TopicArn=SNS_TOPIC_ARN,
+                Message=json.dumps({
+                    'default': message,
+                    'email': message,
+                    'sms': render_digest_sms(ward=ward, count=count)
+                }),
+                MessageStructure='json',
+                Subject=render_digest_subject(ward=ward, count=count)
+            )
+            calls += 1
+        except Exception as e:
+            # Put the alerts back so a later flush sends them
+            print(f"Error publishing warning digest for {ward}: {str(e)}")
+            if patient_state_table:
+                append_warning_digests([(ward, key, line) for key, line in alerts.items()])
+            continue
+        record_publish_lag(metrics, 'IngestToDigestLag', alerts, time.time())
+        mark_alerts_sent(list(alerts))
+    
+    if calls:
+        print(f"Published {len(critical)} critical alerts and {len(due_digests)} warning digests in {calls} SNS calls")
+    return calls
+
+def digest_due(item, now):
+    return (now - float(item.get('OpenedAt', now)) >= WARNING_DIGEST_WINDOW_SECONDS or
+            len(item.get('Alerts', [])) >= WARNING_DIGEST_MAX_ALERTS)
+
+def append_warning_digests(warnings):
+    """
+    Append queued warnings to their wards' stored digests, opening a digest
+    where none is open. Returns the wards whose digest is now due.
+    """
+    
+    by_ward = OrderedDict()
+    for ward, (alert_id, timestamp), line in warnings:
+        by_ward.setdefault(ward, []).append({'AlertId': alert_id, 'Timestamp': timestamp, 'Line': line})
+    
+    now = time.time()
+    due = set()
+    for ward, entries in by_ward.items():
+        try:
+            item = patient_state_table.update_item(
+                Key={'PatientId': DIGEST_STATE_ID, 'StateKey': ward},
+                UpdateExpression='SET OpenedAt = if_not_exists(OpenedAt, :now), '
+                                 'Alerts = list_append(if_not_exists(Alerts, :empty), :alerts)',
+                ExpressionAttributeValues={
+                    ':now': int(now),
+                    ':empty': [],
+                    ':alerts': entries
+                },
+                ReturnValues='ALL_NEW'
+            )['Attributes']
+        except Exception as e:
+            # The alerts stay PENDING in AlertHistory
+            print(f"Error adding warnings to the {ward} digest: {str(e)}")
+            continue
+        if digest_due(item, now):
+            due.add(ward)
+    return due
+
+def open_digests_due():
+    """Wards whose stored digest is due, with or without new warnings"""
+    
+    now = time.time()
+    due = set()
+    try:
+        query_kwargs = {
+            'KeyConditionExpression': Key('PatientId').eq(DIGEST_STATE_ID),
+            'ProjectionExpression': 'StateKey, OpenedAt'
+        }
+        while True:
+            response = patient_state_table.query(**query_kwargs)
+            due.update(item['StateKey'] for item in response.get('Items', []) if digest_due(item, now))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    except Exception as e:
+        print(f"Error listing open warning digests: {str(e)}")
+    return due
+
+def take_warning_digests(wards):
+    """
+    Close due digests and return [(ward, {alert key: line})]. Deleting the item
+    hands its alerts to exactly one container; warnings appended afterwards
+    open a new digest.
+    """
+    
+    taken = []
+    for ward in sorted(wards):
+        try:
+            item = patient_state_table.delete_item(
+                Key={'PatientId': DIGEST_STATE_ID, 'StateKey': ward},
+                ConditionExpression='attribute_exists(OpenedAt)',
+                ReturnValues='ALL_OLD'
+            ).get('Attributes', {})
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"Error closing the {ward} warning digest: {str(e)}")
+            continue
+        
+        # A retried append may repeat an alert
+        alerts = OrderedDict(
+            ((entry['AlertId'], entry['Timestamp']), entry['Line']) for entry in item.get('Alerts', [])
+        )
+        if alerts:
+            taken.append((ward, alerts))
+    return taken
+
+def mark_alerts_sent(alert_keys):
+    """Move published alerts from PENDING to SENT (skipping any acknowledged meanwhile)"""
+    
+    sent_at = datetime.utcnow().isoformat() + 'Z'
+    for alert_id, timestamp in alert_keys:
+        stamp = change_stamp()
+        try:
+            alert_history_table.update_item(
+                Key={'AlertId': alert_id, 'Timestamp': timestamp},
+                UpdateExpression='SET #status = :sent, SentAt = :sent_at, ChangedAt = :changed_at, ChangeBucket = :change_bucket',
+                ConditionExpression='#status = :pending',
+                ExpressionAttributeNames={'#status': 'Status'},
+                ExpressionAttributeValues={
+                    ':sent': 'SENT',
+                    ':pending': 'PENDING',
+                    ':sent_at': sent_at,
+                    ':changed_at': stamp['ChangedAt'],
+                    ':change_bucket': stamp['ChangeBucket']
+                }
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"Error marking alert {alert_id} sent: {str(e)}")
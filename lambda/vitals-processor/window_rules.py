@@ -0,0 +1,204 @@
+# lambda/vitals-processor/window_rules.py
+"""
+Sustained-abnormality rules evaluated over a short window of each patient's
+most recent readings.
+
+Every rule keeps its own fixed-size ring buffer, so adding a reading costs
+O(1) per rule regardless of history length: count rules keep a running total
+of breaching readings, rate rules compare the newest sample with the oldest
+one still in the window. Rules are edge triggered - a finding is returned
+when a rule becomes active and the rule re-arms once it clears.
+"""
+import os
+from collections import deque
+
+# Readings further apart than this start a fresh window
+MAX_GAP_SECONDS = int(os.environ.get('RULE_WINDOW_MAX_GAP_SECONDS', '900'))
+HEART_RATE_RISE_PER_MINUTE = float(os.environ.get('RULE_HR_RISE_BPM_PER_MIN', '10'))
+
+# Readings are tagged with their single-reading threshold classification under
+# this field (0 normal, 1 warning, 2 critical) so rules can require it to persist
+THRESHOLD_LEVEL_FIELD = 'thresholdLevel'
+THRESHOLD_LEVELS = {'Normal': 0, 'Warning': 1, 'Critical': 2}
+
+WINDOW_RULES = [
+    {
+        'name': 'SustainedCriticalThreshold',
+        'type': 'count',
+        'vital': THRESHOLD_LEVEL_FIELD,
+        'above': 1.5,
+        'count': 3,
+        'window': 5,
+        'severity': 'CRITICAL',
+        'description': 'Outside the critical thresholds in 3 of the last 5 readings'
+    },
+    {
+        'name': 'SustainedWarningThreshold',
+        'type': 'count',
+        'vital': THRESHOLD_LEVEL_FIELD,
+        'above': 0.5,
+        'count': 4,
+        'window': 5,
+        'severity': 'WARNING',
+        'description': 'Outside the warning or critical thresholds in 4 of the last 5 readings'
+    },
+    {
+        'name': 'SustainedHypoxia',
+        'type': 'count',
+        'vital': 'oxygenSaturation',
+        'below': 90,
+        'count': 3,
+        'window': 5,
+        'severity': 'CRITICAL',
+        'description': 'SpO2 below 90% in 3 of the last 5 readings'
+    },
+    {
+        'name': 'SustainedTachycardia',
+        'type': 'count',
+        'vital': 'heartRate',
+        'above': 110,
+        'count': 4,
+        'window': 5,
+        'severity': 'CRITICAL',
+        'description': 'Heart rate above 110 bpm in 4 of the last 5 readings'
+    },
+    {
+        'name': 'SustainedHypotension',
+        'type': 'count',
+        'vital': 'systolicBP',
+        'below': 95,
+        'count': 3,
+        'window': 5,
+        'severity': 'CRITICAL',
+        'description': 'Systolic BP below 95 mmHg in 3 of the last 5 readings'
+    },
+    {
+        'name': 'SustainedFever',
+        'type': 'count',
+        'vital': 'temperature',
+        'above': 100.4,
+        'count': 3,
+        'window': 5,
+        'severity': 'WARNING',
+        'description': 'Temperature above 100.4°F in 3 of the last 5 readings'
+    },
+    {
+        'name': 'RapidHeartRateRise',
+        'type': 'rate',
+        'vital': 'heartRate',
+        'rise_per_minute': HEART_RATE_RISE_PER_MINUTE,
+        'window': 5,
+        'severity': 'WARNING',
+        'description': f'Heart rate rising faster than {HEART_RATE_RISE_PER_MINUTE:g} bpm/min over the last 5 readings'
+    }
+]
+
+class PatientWindow:
+    """Ring buffers and active flags for one patient across all window rules"""
+    
+    def __init__(self, rules=None):
+        self.rules = rules or WINDOW_RULES
+        self.last_time = None
+        self.buffers = {rule['name']: deque(maxlen=rule['window']) for rule in self.rules}
+        self.hits = {rule['name']: 0 for rule in self.rules}
+        self.active = set()
+        
+    def add_reading(self, reading_time, data):
+        """
+        Push one reading through every rule; returns the rules that just became active.
+        Duplicate or out-of-order readings (e.g. Kinesis retries) are ignored.
+        """
+        
+        if self.last_time is not None:
+            if reading_time <= self.last_time:
+                return []
+            if reading_time - self.last_time > MAX_GAP_SECONDS:
+                self.reset()
+        self.last_time = reading_time
+        
+        findings = []
+        for rule in self.rules:
+            value = data.get(rule['vital'])
+            if value is None:
+                continue
+                
+            value = float(value)
+            if rule['type'] == 'count':
+                triggered = self._push_count(rule, value)
+            else:
+                triggered = self._push_rate(rule, reading_time, value)
+                
+            name = rule['name']
+            if triggered and name not in self.active:
+                self.active.add(name)
+                findings.append(rule)
+            elif not triggered:
+                self.active.discard(name)
+                
+        return findings
+        
+    def reset(self):
+        for rule in self.rules:
+            self.buffers[rule['name']].clear()
+            self.hits[rule['name']] = 0
+        self.active.clear()
+        
+    def _push_count(self, rule, value):
+        buffer = self.buffers[rule['name']]
+        breach = int(('below' in rule and value < rule['below']) or
+                     ('above' in rule and value > rule['above']))
+                     
+        # Keep the running total in step with the value the ring buffer evicts
+        if len(buffer) == buffer.maxlen:
+            self.hits[rule['name']] -= buffer[0]
+        buffer.append(breach)
+        self.hits[rule['name']] += breach
+        
+        return self.hits[rule['name']] >= rule['count']
+        
+    def _push_rate(self, rule, reading_time, value):
+        buffer = self.buffers[rule['name']]
+        buffer.append((reading_time, value))
+        if len(buffer) < buffer.maxlen:
+            return False
+            
+        oldest_time, oldest_value = buffer[0]
+        minutes = (reading_time - oldest_time) / 60
+        if minutes <= 0:
+            return False
+        return (value - oldest_value) / minutes > rule['rise_per_minute']
+        
+    def to_state(self):
+        """Compact, DynamoDB-friendly snapshot (values as strings to avoid float types)"""
+        
+        return {
+            'LastTime': str(self.last_time) if self.last_time is not None else None,
+            'Buffers': {
+                name: [list(map(str, entry)) if isinstance(entry, tuple) else entry for entry in buffer]
+                for name, buffer in self.buffers.items() if buffer
+            },
+            'Active': sorted(self.active)
+        }
+        
+    @classmethod
+    def from_state(cls, state, rules=None):
+        window = cls(rules)
+        if not state:
+            return window
+            
+        if state.get('LastTime') is not None:
+            window.last_time = float(state['LastTime'])
+            
+        saved_buffers = state.get('Buffers') or {}
+        for rule in window.rules:
+            name = rule['name']
+            for entry in saved_buffers.get(name, []):
+                if rule['type'] == 'count':
+                    window.buffers[name].append(int(entry))
+                else:
+                    window.buffers[name].append((float(entry[0]), float(entry[1])))
+            if rule['type'] == 'count':
+                window.hits[name] = sum(window.buffers[name])
+                
+        window.active = set(state.get('Active') or []) & set(window.buffers)
+        return window
\ No newline at end of file
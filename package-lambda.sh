@@ -35,10 +35,15 @@ package_lambda() {
     # Copy function code
     cp -r "$source_dir"/* "$func_dir/"
     
+    # Copy shared modules (e.g. vital_blocks.py) next to the handler
+    cp -r lambda/shared/* "$func_dir/"
+    
     # Install dependencies if requirements.txt exists
     if [ -f "$func_dir/requirements.txt" ]; then
         echo "Installing dependencies for $function_name..."
-        pip install -r "$func_dir/requirements.txt" -t "$func_dir/" --quiet
+        # Wheels for the Lambda runtime rather than this machine (numpy is compiled)
+        pip install -r "$func_dir/requirements.txt" -t "$func_dir/" --quiet \
+            --platform manylinux2014_x86_64 --python-version 3.9 --only-binary=:all:
     fi
     
     # Create zip file
@@ -59,6 +64,10 @@ package_lambda "vitals-processor" "lambda/vitals-processor"
 package_lambda "patient-management" "lambda/patient-management"
 package_lambda "vitals-api" "lambda/vitals-api"
 package_lambda "alert-management" "lambda/alert-management"
+package_lambda "vitals-compactor" "lambda/vitals-compactor"
+package_lambda "live-updates" "lambda/live-updates"
+package_lambda "vitals-export" "lambda/vitals-export"
+package_lambda "vitals-analytics" "lambda/vitals-analytics"
 
 # Cleanup
 rm -rf "$TMP_DIR"
@@ -0,0 +1,71 @@
+# tests/conftest.py
+"""
+Fixtures running the real handlers in-process against moto, using the
+benchmark helpers in benchmarks/local_aws.py.
+"""
+import base64
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import boto3
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import local_aws  # noqa: E402
+
+PATIENT_ID = 'PATIENT-00001'
+NORMAL_VITALS = {'heartRate': 75, 'systolicBP': 120, 'diastolicBP': 80, 'temperature': 98.6, 'oxygenSaturation': 98}
+
+
+@pytest.fixture
+def aws():
+    """Tables, stream and topic in a fresh moto account, with one active patient"""
+    local_aws.configure_environment()
+    mock = local_aws.start_moto()
+    local_aws.create_tables()
+    local_aws.create_stream_and_topic(1)
+    boto3.resource('dynamodb').Table(os.environ['PATIENT_RECORDS_TABLE']).put_item(Item=local_aws.with_roster_shard({
+        'PatientId': PATIENT_ID, 'Name': 'Test Patient', 'Gender': 'Female', 'RoomNumber': 'ICU-101',
+        'Status': 'Active', 'Condition': 'Stable', 'UpdatedAt': datetime.utcnow().isoformat()
+    }))
+    yield
+    mock.stop()
+
+
+@pytest.fixture
+def processor(aws):
+    return local_aws.load_handler('vitals-processor')
+
+
+@pytest.fixture
+def send():
+    """
+    Run a processor over one Kinesis batch of readings one second apart,
+    arrived lag seconds ago (enough lag puts the processor in degraded mode)
+    """
+    def send_readings(processor, readings, start=None, lag=0):
+        start = start or datetime.utcnow() - timedelta(minutes=5)
+        records = []
+        for index, vitals in enumerate(readings):
+            payload = dict(NORMAL_VITALS, **vitals)
+            payload.setdefault('patientId', PATIENT_ID)
+            payload.setdefault('deviceId', 'DEVICE-1')
+            payload.setdefault('timestamp', (start + timedelta(seconds=index)).isoformat() + 'Z')
+            records.append({'kinesis': {
+                'data': base64.b64encode(json.dumps(payload).encode('utf-8')).decode('ascii'),
+                'approximateArrivalTimestamp': time.time() - lag
+            }})
+        return processor.lambda_handler({'Records': records}, None)
+    return send_readings
+
+
+@pytest.fixture
+def alerts():
+    """AlertHistory items, oldest first"""
+    def scan_alerts():
+        items = boto3.resource('dynamodb').Table(os.environ['ALERT_HISTORY_TABLE']).scan()['Items']
+        return sorted(items, key=lambda item: item['Timestamp'])
+    return scan_alerts
@@ -0,0 +1,55 @@
+# tests/test_alert_config_sync.py
+"""
+AlertConfig changes reach vitals-processor through the config version item
+that alert-management writes from the table's stream.
+"""
+import os
+
+import boto3
+import local_aws
+from botocore.exceptions import ClientError
+from conftest import PATIENT_ID
+
+
+def config_stream_event(*patient_ids):
+    return {'Records': [
+        {'eventName': 'MODIFY', 'dynamodb': {'Keys': {
+            'PatientId': {'S': patient_id}, 'VitalType': {'S': 'heart_rate'}
+        }}}
+        for patient_id in patient_ids
+    ]}
+
+
+def set_heart_rate_max(patient_id, value):
+    boto3.resource('dynamodb').Table(os.environ['ALERT_CONFIG_TABLE']).put_item(Item={
+        'PatientId': patient_id, 'VitalType': 'heart_rate',
+        'ThresholdMin': 50, 'ThresholdMax': value, 'AlertEnabled': True
+    })
+
+
+def test_changed_patients_are_reloaded(processor):
+    management = local_aws.load_handler('alert-management')
+    processor.sync_alert_configs()
+    processor.load_patient_thresholds([PATIENT_ID, 'PATIENT-00002'])
+    unchanged = processor._patient_thresholds['PATIENT-00002']
+
+    set_heart_rate_max(PATIENT_ID, 110)
+    management.lambda_handler(config_stream_event(PATIENT_ID), None)
+    processor._config_synced_at = 0
+    processor.sync_alert_configs()
+
+    assert processor.get_patient_thresholds(PATIENT_ID).maxs[0] == 110.0
+    assert processor._patient_thresholds['PATIENT-00002'] is unchanged
+
+
+def test_throttled_sync_keeps_cache(processor, monkeypatch):
+    processor.sync_alert_configs()
+    processor.load_patient_thresholds([PATIENT_ID])
+
+    def throttled(**kwargs):
+        raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'GetItem')
+    monkeypatch.setattr(processor.patient_state_table, 'get_item', throttled)
+    processor._config_synced_at = 0
+    processor.sync_alert_configs()
+
+    assert PATIENT_ID in processor._patient_thresholds
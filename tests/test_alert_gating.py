@@ -0,0 +1,25 @@
+# tests/test_alert_gating.py
+"""
+vitals-processor pages on panic limits and sustained window rules, not on a
+single reading that crosses the alert thresholds.
+"""
+from datetime import datetime, timedelta
+
+
+def test_single_spike_does_not_page(processor, send, alerts):
+    send(processor, [{}, {}, {'heartRate': 135}, {}, {}])
+    assert alerts() == []
+
+
+def test_panic_reading_pages_immediately(processor, send, alerts):
+    send(processor, [{}, {'heartRate': 170}])
+    assert [alert['AlertType'] for alert in alerts()] == ['CRITICAL']
+
+
+def test_third_breach_in_five_pages(processor, send, alerts):
+    start = datetime.utcnow() - timedelta(minutes=5)
+    send(processor, [{}, {'heartRate': 135}, {'heartRate': 135}], start)
+    assert alerts() == []
+
+    send(processor, [{'heartRate': 135}], start + timedelta(seconds=3))
+    assert [alert['AlertType'] for alert in alerts()] == ['CRITICAL']
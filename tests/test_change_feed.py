@@ -0,0 +1,64 @@
+# tests/test_change_feed.py
+"""
+Change feed cursors never skip items, even when more than a page of items
+was written in one millisecond.
+"""
+import os
+import sys
+
+import boto3
+import local_aws
+from boto3.dynamodb.conditions import Key
+from conftest import PATIENT_ID
+
+sys.path.insert(0, local_aws.SHARED_ROOT)
+import change_feed  # noqa: E402
+
+LIMIT = 3
+
+
+def key_condition(lower, upper):
+    return Key('PatientId').eq(PATIENT_ID) & Key('ChangedAt').between(lower, upper)
+
+
+def write_changes(changed_ats):
+    table = boto3.resource('dynamodb').Table(os.environ['VITAL_SIGNS_TABLE'])
+    for index, changed_at in enumerate(changed_ats):
+        table.put_item(Item={'PatientId': PATIENT_ID, 'Timestamp': f'2024-05-01T13:00:{index:02d}Z',
+                             'ChangedAt': changed_at})
+    return table
+
+
+def poll_all(table, since, until):
+    seen = []
+    has_more = True
+    while has_more:
+        items, cursor, has_more = change_feed.query_changes(table, 'PatientChangeIndex', key_condition,
+                                                            since, until, LIMIT)
+        seen.extend(item['Timestamp'] for item in items)
+        assert int(cursor) > since or not has_more
+        since = int(cursor)
+    return seen
+
+
+def test_tie_group_just_after_cursor_is_returned_whole(aws):
+    since = 1000
+    table = write_changes([since + 1] * (LIMIT + 1) + [since + 2])
+
+    items, cursor, has_more = change_feed.query_changes(table, 'PatientChangeIndex', key_condition,
+                                                        since, since + 10, LIMIT)
+
+    assert len(items) == LIMIT + 1
+    assert (cursor, has_more) == (str(since + 1), True)
+    assert len(set(poll_all(table, since, since + 10))) == LIMIT + 2
+
+
+def test_tie_group_cut_later_is_read_again_next_poll(aws):
+    since = 1000
+    table = write_changes([since + 1] + [since + 2] * LIMIT)
+
+    items, cursor, has_more = change_feed.query_changes(table, 'PatientChangeIndex', key_condition,
+                                                        since, since + 10, LIMIT)
+
+    assert (len(items), cursor, has_more) == (1, str(since + 1), True)
+    assert len(set(poll_all(table, since, since + 10))) == LIMIT + 1
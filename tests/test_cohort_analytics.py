@@ -0,0 +1,117 @@
+# tests/test_cohort_analytics.py
+"""
+The cohort report groups every reading by room type, condition and age band
+and computes each group's statistics in one pass; vitals-api serves the
+stored report.
+"""
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import boto3
+import local_aws
+import pytest
+from conftest import NORMAL_VITALS, PATIENT_ID
+
+BUCKET = 'bench-analytics'
+VITAL_COLUMNS = ['HeartRate', 'SystolicBP', 'DiastolicBP', 'Temperature', 'OxygenSaturation']
+NORMAL_COLUMNS = dict(zip(VITAL_COLUMNS, NORMAL_VITALS.values()))
+
+
+@pytest.fixture
+def cohort_analytics(aws, monkeypatch):
+    monkeypatch.setenv('ANALYTICS_BUCKET', BUCKET)
+    boto3.client('s3').create_bucket(Bucket=BUCKET)
+    return local_aws.load_handler('vitals-analytics').cohort_analytics
+
+
+def columns(times, heart_rates, **strings):
+    block = {'Timestamp': [int(seconds * 1e6) for seconds in times], 'HeartRate': heart_rates}
+    for column in VITAL_COLUMNS[1:]:
+        block[column] = [NORMAL_COLUMNS[column]] * len(times)
+    block.update(strings)
+    return block
+
+
+def build(cohort_analytics, max_gap_seconds=600):
+    cohort = cohort_analytics.CohortColumns({
+        'PATIENT-A': {'age': 70.0, 'roomNumber': 'icu-101', 'condition': 'Stable'},
+        'PATIENT-B': {'age': float('nan'), 'roomNumber': 'ICU-102', 'condition': None}
+    })
+    # B's second block arrives first; readings are sorted per patient before the report
+    cohort.add_columns('PATIENT-B', columns([60], [None], RoomNumber=['WARD-2']))
+    cohort.add_columns('PATIENT-A', columns([0, 60, 3660], [70.0, 80.0, 170.0]))
+    cohort.add_columns('PATIENT-B', columns([0], [90.0], RoomNumber=['WARD-2']))
+    return cohort_analytics.build_report(cohort.arrays(), max_gap_seconds)
+
+
+def test_groups_take_room_and_condition_from_the_reading_or_patient(cohort_analytics):
+    report = build(cohort_analytics)
+    dimensions = report['dimensions']
+
+    assert (report['readings'], report['patients']) == (5, 2)
+    assert {label: group['readings'] for label, group in dimensions['roomType'].items()} == {'ICU': 3, 'WARD': 2}
+    assert {label: group['patients'] for label, group in dimensions['condition'].items()} == {'Stable': 1, 'Unknown': 1}
+    assert {label: group['readings'] for label, group in dimensions['ageBand'].items()} == {'65-79': 3, 'Unknown': 2}
+
+
+def test_vital_statistics_skip_missing_values(cohort_analytics):
+    report = build(cohort_analytics)
+
+    overall = report['dimensions']['all']['all']['vitals']['heartRate']
+    assert overall['count'] == 4
+    assert (overall['mean'], overall['min'], overall['max']) == (102.5, 70.0, 170.0)
+    # Nearest rank over 70, 80, 90, 170
+    assert (overall['percentiles']['p5'], overall['percentiles']['p50'], overall['percentiles']['p95']) == (70.0, 80.0, 90.0)
+    assert report['dimensions']['roomType']['WARD']['vitals']['heartRate']['count'] == 1
+    assert report['dimensions']['roomType']['WARD']['vitals']['oxygenSaturation']['count'] == 2
+
+    edges = report['histogramEdges']['heartRate']
+    histogram = report['dimensions']['roomType']['ICU']['vitals']['heartRate']['histogram']
+    assert len(histogram) == len(edges) - 1
+    assert [edges[index] for index, count in enumerate(histogram) for _ in range(count)] == [70.0, 80.0, 170.0]
+
+
+def test_time_in_status_weights_readings_by_the_capped_gap(cohort_analytics):
+    report = build(cohort_analytics)
+
+    # A: 60 s then 600 s (the hour-long gap capped) Normal, and its last,
+    # Critical, reading gets the median gap of 60 s
+    icu = report['dimensions']['roomType']['ICU']
+    assert icu['hours'] == round(720 / 3600, 2)
+    assert icu['timeInStatus'] == {'Normal': round(660 * 100 / 720, 2), 'Warning': 0.0,
+                                   'Critical': round(60 * 100 / 720, 2)}
+    assert icu['vitals']['heartRate']['timeInRange'] == round(660 * 100 / 720, 2)
+
+    uncapped = build(cohort_analytics, max_gap_seconds=7200)['dimensions']['roomType']['ICU']
+    assert uncapped['timeInStatus']['Critical'] < icu['timeInStatus']['Critical']
+
+
+def test_scheduled_report_reads_compacted_blocks_and_is_served_by_the_api(cohort_analytics):
+    patients = boto3.resource('dynamodb').Table(local_aws.TABLE_ENV['PATIENT_RECORDS_TABLE'])
+    patients.update_item(Key={'PatientId': PATIENT_ID}, UpdateExpression='SET Age = :age',
+                         ExpressionAttributeValues={':age': 45})
+    compactor = local_aws.load_handler('vitals-compactor')
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=12)
+    readings = [
+        dict({column: Decimal(str(value)) for column, value in NORMAL_COLUMNS.items()},
+             PatientId=PATIENT_ID, DeviceId='DEVICE-1', HeartRate=Decimal(heart_rate),
+             Timestamp=(hour + timedelta(minutes=index)).isoformat() + 'Z')
+        for index, heart_rate in enumerate([70, 75, 80])
+    ]
+    compactor.write_block(PATIENT_ID, hour.strftime('%Y-%m-%dT%H'), readings)
+
+    analytics = local_aws.load_handler('vitals-analytics')
+    response = analytics.lambda_handler({}, None)
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['readings'] == 3
+
+    api = local_aws.load_handler('vitals-api')
+    response = api.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {'report': 'cohorts'}}, None)
+    report = json.loads(response['body'])
+
+    assert response['statusCode'] == 200
+    assert report['source'] == 'blocks'
+    assert report['dimensions']['ageBand']['40-64']['readings'] == 3
+    assert report['dimensions']['roomType']['ICU']['vitals']['heartRate']['mean'] == 75.0
+    assert report['dimensions']['condition']['Stable']['timeInStatus']['Normal'] == 100.0
@@ -0,0 +1,67 @@
+# tests/test_compact_schema.py
+"""
+Compact (v2) readings keep one item per device and reading time, and carry
+the room and condition sent with the reading.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import boto3
+from conftest import PATIENT_ID
+
+
+def stored_readings(processor):
+    table = boto3.resource('dynamodb').Table(os.environ['VITAL_SIGNS_COMPACT_TABLE'])
+    return sorted(processor.vital_schema.expand_items(table.scan()['Items']), key=lambda item: item['DeviceId'])
+
+
+def test_devices_reporting_in_the_same_millisecond_are_both_stored(processor, send):
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    readings = [{'deviceId': 'DEVICE-A', 'timestamp': timestamp}, {'deviceId': 'DEVICE-B', 'timestamp': timestamp}]
+    send(processor, readings)
+
+    assert [item['DeviceId'] for item in stored_readings(processor)] == ['DEVICE-A', 'DEVICE-B']
+
+
+def test_one_devices_readings_in_the_same_millisecond_are_both_stored(processor, send):
+    start = datetime.utcnow() - timedelta(minutes=5)
+    readings = [{'timestamp': (start + timedelta(microseconds=index)).isoformat() + 'Z'} for index in range(2)]
+
+    body = json.loads(send(processor, readings)['body'])
+
+    assert len(stored_readings(processor)) == 2
+    assert (body['records_processed'], body['duplicate_records']) == (2, 0)
+
+
+def test_redelivered_reading_is_not_counted_as_processed(processor, send):
+    readings = [{'timestamp': datetime.utcnow().isoformat() + 'Z'}]
+    send(processor, readings)
+    # A fresh container has no memory of the first delivery
+    processor._seen_readings.clear()
+
+    body = json.loads(send(processor, readings)['body'])
+
+    assert len(stored_readings(processor)) == 1
+    assert (body['records_processed'], body['duplicate_records']) == (0, 1)
+
+
+def test_clashing_slots_probe_past_other_devices(processor):
+    table = processor.vital_signs_compact_table
+    vital_schema = processor.vital_schema
+    first = {'P': PATIENT_ID, 'T': vital_schema.sort_key(1000, 'DEVICE-A'), 'D': 'DEVICE-A'}
+    # Another device that happens to hash to the same slot
+    clash = dict(first, D='DEVICE-B')
+
+    assert vital_schema.put_compact_item(table, dict(first))
+    assert vital_schema.put_compact_item(table, dict(clash))
+    assert not vital_schema.put_compact_item(table, dict(clash))
+    assert not vital_schema.put_compact_item(table, dict(first))
+    assert len(table.scan()['Items']) == 2
+
+
+def test_room_and_condition_come_from_the_reading(processor, send):
+    send(processor, [{'roomNumber': 'ICU-7', 'patientCondition': 'Critical'}])
+
+    [reading] = stored_readings(processor)
+    assert (reading['RoomNumber'], reading['PatientCondition']) == ('ICU-7', 'Critical')
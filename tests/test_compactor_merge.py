@@ -0,0 +1,40 @@
+# tests/test_compactor_merge.py
+"""
+Blocks and merged query results keep one reading per device and reading
+time, so devices reporting at the same instant are never collapsed.
+"""
+from decimal import Decimal
+
+import local_aws
+from conftest import PATIENT_ID
+
+TIMESTAMP = '2024-05-01T13:15:00.250000Z'
+
+
+def reading(device_id, heart_rate, timestamp=TIMESTAMP):
+    return {'PatientId': PATIENT_ID, 'Timestamp': timestamp, 'DeviceId': device_id,
+            'HeartRate': Decimal(heart_rate)}
+
+
+def test_block_keeps_devices_reporting_at_the_same_instant(aws):
+    compactor = local_aws.load_handler('vitals-compactor')
+
+    compactor.write_block(PATIENT_ID, '2024-05-01T13', [reading('DEVICE-A', 70)])
+    # A late reading from another device at the same instant extends the block
+    compactor.write_block(PATIENT_ID, '2024-05-01T13', [reading('DEVICE-B', 90)])
+
+    block = compactor.vital_blocks_table.get_item(Key={'PatientId': PATIENT_ID, 'HourStart': '2024-05-01T13'})['Item']
+    stored = compactor.load_block_readings(block)
+    assert block['Count'] == 2
+    assert sorted((item['DeviceId'], item['HeartRate']) for item in stored) == [('DEVICE-A', 70), ('DEVICE-B', 90)]
+
+
+def test_merged_query_results_keep_both_devices(aws):
+    api = local_aws.load_handler('vitals-api')
+    compacted = [reading('DEVICE-A', 70), reading('DEVICE-B', 90)]
+    # The raw copy of DEVICE-A's reading, written with an offset
+    raw = [reading('DEVICE-A', 71, '2024-05-01T15:15:00.250000+02:00')]
+
+    merged = api.merge_vital_signs(raw, compacted, 10)
+
+    assert sorted((item['DeviceId'], item['HeartRate']) for item in merged) == [('DEVICE-A', 71), ('DEVICE-B', 90)]
@@ -0,0 +1,33 @@
+# tests/test_degraded_redelivery.py
+"""
+A batch redelivered to another container in degraded mode is not rewritten
+and is not fed to the patient's baseline a second time.
+"""
+import os
+from datetime import datetime, timedelta
+
+import boto3
+import local_aws
+from conftest import PATIENT_ID
+
+BACKLOG_LAG_SECONDS = 600
+
+
+def stored_changed_at():
+    table = boto3.resource('dynamodb').Table(os.environ['VITAL_SIGNS_COMPACT_TABLE'])
+    return sorted(int(item['C']) for item in table.scan()['Items'])
+
+
+def test_redelivered_batch_is_skipped(processor, send):
+    start = datetime.utcnow() - timedelta(minutes=15)
+    readings = [{'heartRate': 70 + index} for index in range(5)]
+    send(processor, readings, start, lag=BACKLOG_LAG_SECONDS)
+    changed_at = stored_changed_at()
+
+    # Another container, with no memory of the first delivery
+    other = local_aws.load_handler('vitals-processor')
+    send(other, readings, start, lag=BACKLOG_LAG_SECONDS)
+
+    assert other._degraded
+    assert stored_changed_at() == changed_at
+    assert other.get_patient_state(PATIENT_ID, other.BASELINE_STATE_KEY).count == len(readings)
@@ -0,0 +1,79 @@
+# tests/test_device_registry.py
+"""
+The device registry follows a sensor as it is re-paired between patients,
+ignores redelivered or older readings, and survives a concurrent writer.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import boto3
+import local_aws
+from conftest import PATIENT_ID
+
+OTHER_PATIENT_ID = 'PATIENT-00002'
+
+
+def registry_item(device_id='DEVICE-1'):
+    table = boto3.resource('dynamodb').Table(os.environ['DEVICE_REGISTRY_TABLE'])
+    return table.get_item(Key={'DeviceId': device_id}, ConsistentRead=True)['Item']
+
+
+def test_re_paired_device_follows_its_newest_patient(processor, send):
+    paired_at = datetime.utcnow() - timedelta(minutes=10)
+    first_pairing = [{'roomNumber': 'ICU-101', 'sensorBatteryLevel': 90}] * 3
+    send(processor, first_pairing, start=paired_at)
+    send(processor, [{'patientId': OTHER_PATIENT_ID, 'roomNumber': 'WARD-5', 'sensorBatteryLevel': 80}] * 2,
+         start=paired_at + timedelta(minutes=5))
+
+    item = registry_item()
+    assert (item['PatientId'], item['RoomNumber'], item['ReadingCount'], item['Version']) == (
+        OTHER_PATIENT_ID, 'WARD-5', 5, 2)
+
+    # A redelivered batch from the first pairing does not move the device back
+    send(processor, first_pairing, start=paired_at)
+    assert registry_item() == item
+
+
+def test_late_readings_from_the_old_pairing_are_ignored(processor, send):
+    now = datetime.utcnow()
+    send(processor, [{'patientId': OTHER_PATIENT_ID, 'roomNumber': 'WARD-5'}], start=now - timedelta(minutes=1))
+    # The old patient's reading, sent before the re-pairing, arrives late
+    send(processor, [{'roomNumber': 'ICU-101'}], start=now - timedelta(minutes=3))
+
+    item = registry_item()
+    assert (item['PatientId'], item['ReadingCount']) == (OTHER_PATIENT_ID, 1)
+
+
+def test_stale_container_retries_from_the_stored_item(processor, send):
+    other = local_aws.load_handler('vitals-processor')
+    start = datetime.utcnow() - timedelta(minutes=10)
+
+    send(processor, [{'sensorBatteryLevel': 90}], start=start)
+    send(other, [{'patientId': OTHER_PATIENT_ID, 'sensorBatteryLevel': 70}], start=start + timedelta(minutes=1))
+    # processor still caches version 1; its conditional write fails and is redone on version 2
+    send(processor, [{'patientId': OTHER_PATIENT_ID, 'sensorBatteryLevel': 60}], start=start + timedelta(minutes=2))
+
+    item = registry_item()
+    assert (item['Version'], item['ReadingCount'], item['LastBattery']) == (3, 3, 60)
+    # Running average of the first readings: 90, then 70, then 60 at alpha 1/3
+    assert float(item['Battery']) == round(80 + (60 - 80) / 3, 2)
+
+
+def test_fleet_view_lists_devices_needing_attention_first(processor, send):
+    send(processor, [{'deviceId': 'DEVICE-OK', 'sensorBatteryLevel': 95, 'signalStrength': 90},
+                     {'deviceId': 'DEVICE-LOW', 'patientId': OTHER_PATIENT_ID, 'sensorBatteryLevel': 10,
+                      'signalStrength': 90}])
+    api = local_aws.load_handler('vitals-api')
+
+    response = api.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {'fleet': 'true'}}, None)
+    body = json.loads(response['body'])
+
+    assert response['statusCode'] == 200
+    assert [(device['deviceId'], device['patientId'], device['issues']) for device in body['devices']] == [
+        ('DEVICE-LOW', OTHER_PATIENT_ID, ['LOW_BATTERY']), ('DEVICE-OK', PATIENT_ID, [])]
+    assert (body['summary']['devices'], body['summary']['attention'], body['summary']['lowBattery']) == (2, 1, 1)
+
+    response = api.lambda_handler({'httpMethod': 'GET',
+                                   'queryStringParameters': {'fleet': 'true', 'status': 'attention'}}, None)
+    assert [device['deviceId'] for device in json.loads(response['body'])['devices']] == ['DEVICE-LOW']
@@ -0,0 +1,30 @@
+# tests/test_export_request.py
+"""
+Export requests accept ISO timestamps with or without a UTC offset and
+store the range in UTC.
+"""
+import local_aws
+import pytest
+
+
+@pytest.fixture
+def exporter(aws, monkeypatch):
+    monkeypatch.setenv('EXPORT_BUCKET', 'bench-exports')
+    return local_aws.load_handler('vitals-export')
+
+
+def export_range(exporter, start_time, end_time):
+    request = exporter.parse_export_request({'all': True, 'startTime': start_time, 'endTime': end_time})
+    return request['startTime'], request['endTime']
+
+
+def test_mixed_offsets_are_compared_in_utc(exporter):
+    assert export_range(exporter, '2024-05-01T13:00:00', '2024-05-01T16:00:00+02:00') == \
+        ('2024-05-01T13:00:00', '2024-05-01T14:00:00')
+    assert export_range(exporter, '2024-05-01T13:00:00Z', '2024-05-01T14:00:00.5Z') == \
+        ('2024-05-01T13:00:00', '2024-05-01T14:00:00.500000')
+
+
+def test_end_before_start_after_utc_conversion_is_rejected(exporter):
+    with pytest.raises(ValueError, match='endTime must be after startTime'):
+        export_range(exporter, '2024-05-01T13:00:00Z', '2024-05-01T14:30:00+02:00')
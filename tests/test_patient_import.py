@@ -0,0 +1,59 @@
+# tests/test_patient_import.py
+"""
+Bulk patient import refuses oversized imports and wrongly typed fields
+before writing anything, and reports non-finite ages as invalid rows.
+"""
+import json
+import os
+
+import boto3
+import local_aws
+
+
+def import_event(rows):
+    return {'httpMethod': 'POST', 'path': '/patients/import', 'body': json.dumps(rows)}
+
+
+def patient_row(index, **fields):
+    row = {'PatientId': f'IMPORT-{index:05d}', 'Name': f'Import Patient {index}',
+           'Age': 40, 'Gender': 'Female', 'RoomNumber': 'WARD-200'}
+    row.update(fields)
+    return row
+
+
+def stored_patients():
+    return boto3.resource('dynamodb').Table(os.environ['PATIENT_RECORDS_TABLE']).scan()['Items']
+
+
+def test_oversized_import_writes_nothing(aws):
+    handler = local_aws.load_handler('patient-management')
+    rows = [patient_row(index) for index in range(handler.MAX_IMPORT_ROWS + 1)]
+
+    response = handler.lambda_handler(import_event(rows), None)
+
+    assert response['statusCode'] == 413
+    assert [item['PatientId'] for item in stored_patients()] == ['PATIENT-00001']
+
+
+def test_non_finite_age_is_an_invalid_row(aws):
+    handler = local_aws.load_handler('patient-management')
+    rows = [patient_row(1, Age='NaN'), patient_row(2, Age='Infinity'), patient_row(3)]
+
+    response = handler.lambda_handler(import_event(rows), None)
+    body = json.loads(response['body'])
+
+    assert response['statusCode'] == 200
+    assert [result['status'] for result in body['results']] == ['invalid', 'invalid', 'created']
+
+
+def test_wrongly_typed_field_fails_the_import_before_any_write(aws):
+    handler = local_aws.load_handler('patient-management')
+    # The bad row comes after a full chunk that would otherwise already be written
+    rows = [patient_row(index) for index in range(handler.IMPORT_CHUNK_SIZE)]
+    rows.append(dict(patient_row(handler.IMPORT_CHUNK_SIZE), PatientId=12345))
+
+    response = handler.lambda_handler(import_event(rows), None)
+
+    assert response['statusCode'] == 400
+    assert f"row {handler.IMPORT_CHUNK_SIZE + 1}" in json.loads(response['body'])['error']
+    assert [item['PatientId'] for item in stored_patients()] == ['PATIENT-00001']
@@ -0,0 +1,49 @@
+# tests/test_patient_roster.py
+"""
+The roster index holds active patients only, and a roster refresh never
+keeps a patient whose status is no longer Active.
+"""
+import json
+import os
+from datetime import datetime
+
+import boto3
+import local_aws
+from conftest import PATIENT_ID
+
+
+def roster_index_ids():
+    roster = local_aws.load_handler('iot-simulator').patient_roster
+    table = boto3.resource('dynamodb').Table(os.environ['PATIENT_RECORDS_TABLE'])
+    return [patient['PatientId'] for patient in roster.query_active_patients(table)]
+
+
+def roster_ids(simulator):
+    return [patient['PatientId'] for patient in simulator.get_active_patients()]
+
+
+def test_only_active_patients_are_indexed(aws):
+    management = local_aws.load_handler('patient-management')
+    management.lambda_handler({'httpMethod': 'POST', 'path': '/patients', 'body': json.dumps({
+        'PatientId': 'PATIENT-00002', 'Name': 'Second Patient', 'Age': 50, 'Gender': 'Male', 'RoomNumber': 'WARD-2'
+    })}, None)
+    assert sorted(roster_index_ids()) == [PATIENT_ID, 'PATIENT-00002']
+
+    management.delete_patient(PATIENT_ID)
+    assert roster_index_ids() == ['PATIENT-00002']
+
+    management.update_patient(PATIENT_ID, {'Status': 'Active'})
+    assert sorted(roster_index_ids()) == [PATIENT_ID, 'PATIENT-00002']
+
+
+def test_delta_refresh_drops_patients_no_longer_active(aws):
+    simulator = local_aws.load_handler('iot-simulator')
+    assert roster_ids(simulator) == [PATIENT_ID]
+
+    # A writer that changed Status without removing RosterShard
+    table = boto3.resource('dynamodb').Table(os.environ['PATIENT_RECORDS_TABLE'])
+    table.update_item(Key={'PatientId': PATIENT_ID}, UpdateExpression='SET #status = :status, UpdatedAt = :now',
+                      ExpressionAttributeNames={'#status': 'Status'},
+                      ExpressionAttributeValues={':status': 'Transferred', ':now': datetime.now().isoformat()})
+
+    assert roster_ids(simulator) == []
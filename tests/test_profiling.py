@@ -0,0 +1,74 @@
+# tests/test_profiling.py
+"""
+@profiled leaves handlers untouched unless HANDLER_PROFILING is set, and
+then writes one report per sampled invocation with the requested sections.
+"""
+import importlib.util
+import json
+import os
+
+import boto3
+import local_aws
+import pytest
+from conftest import PATIENT_ID
+
+
+def load_profiling(monkeypatch, modes, output):
+    """A fresh copy of the module, which reads its settings at import"""
+    monkeypatch.setenv('HANDLER_PROFILING', modes)
+    monkeypatch.setenv('PROFILING_SAMPLE_RATE', '1')
+    monkeypatch.setenv('PROFILING_OUTPUT', str(output))
+    spec = importlib.util.spec_from_file_location('profiling_under_test',
+                                                  os.path.join(local_aws.SHARED_ROOT, 'profiling.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_reports(output):
+    return [json.loads(path.read_text()) for path in sorted(output.rglob('*.json'))]
+
+
+def get_patient(event, context):
+    table = boto3.resource('dynamodb').Table(os.environ['PATIENT_RECORDS_TABLE'])
+    return table.get_item(Key={'PatientId': event['patientId']})['Item']['Name']
+
+
+def test_disabled_profiler_returns_the_handler_unchanged(monkeypatch, tmp_path):
+    profiling = load_profiling(monkeypatch, '', tmp_path)
+
+    assert profiling.profiled(get_patient) is get_patient
+
+
+@pytest.mark.parametrize('setting, modes', [
+    ('all', ('cpu', 'memory', 'aws')),
+    ('aws, cpu', ('aws', 'cpu')),
+    ('cpu,disk', ('cpu',)),
+    ('off', ()),
+])
+def test_modes_are_parsed_from_the_setting(monkeypatch, tmp_path, setting, modes):
+    assert load_profiling(monkeypatch, '', tmp_path).enabled_modes(setting) == modes
+
+
+def test_report_covers_cpu_memory_and_aws_calls(aws, monkeypatch, tmp_path):
+    profiling = load_profiling(monkeypatch, 'all', tmp_path)
+
+    assert profiling.profiled(get_patient)({'patientId': PATIENT_ID}, None) == 'Test Patient'
+
+    [report] = read_reports(tmp_path)
+    assert report['status'] == 'ok'
+    assert report['cpu']['totalCalls'] > 0
+    assert report['memory']['peakBytes'] > 0
+    assert [(call['operation'], call['count']) for call in report['awsCalls']] == [('dynamodb.GetItem', 1)]
+    assert list(tmp_path.rglob('*.prof'))
+
+
+def test_failed_invocation_is_reported_and_reraised(aws, monkeypatch, tmp_path):
+    profiling = load_profiling(monkeypatch, 'aws', tmp_path)
+
+    with pytest.raises(KeyError):
+        profiling.profiled(get_patient)({'patientId': 'MISSING'}, None)
+
+    [report] = read_reports(tmp_path)
+    assert report['status'] == 'error'
+    assert 'cpu' not in report and 'memory' not in report
@@ -0,0 +1,96 @@
+# tests/test_query_cache.py
+"""
+Dashboard query results are cached per container: repeated queries are
+served from the cache, failures are never cached, and a write made by the
+container drops what it cached.
+"""
+import json
+import sys
+import time
+
+import local_aws
+
+sys.path.insert(0, local_aws.SHARED_ROOT)
+from query_cache import QueryCache, cache_key  # noqa: E402
+
+ALERTS_QUERY = {'httpMethod': 'GET', 'path': '/alerts', 'queryStringParameters': {'hours': '1'}}
+
+
+def response(body, status_code=200):
+    return {'statusCode': status_code, 'body': json.dumps(body)}
+
+
+class Loader:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_repeated_query_is_loaded_once():
+    cache = QueryCache('test', ttl_seconds=60, endpoint='')
+    loader = Loader(response({'alerts': []}))
+
+    for _ in range(3):
+        assert cache.get_or_load(cache_key('all', 24, None), loader) == loader.result
+
+    assert loader.calls == 1
+    assert (cache.counts['hits'], cache.counts['misses']) == (2, 1)
+
+
+def test_keys_treat_none_and_empty_alike():
+    assert cache_key('all', None, 50) == cache_key('all', '', 50)
+    assert cache_key('all', 'WARNING', 50) != cache_key('all', 'CRITICAL', 50)
+
+
+def test_errors_are_not_cached():
+    cache = QueryCache('test', ttl_seconds=60, endpoint='')
+    loader = Loader(response({'error': 'throttled'}, 500))
+
+    cache.get_or_load('key', loader)
+    cache.get_or_load('key', loader)
+
+    assert loader.calls == 2
+
+
+def test_entries_expire_after_their_ttl():
+    cache = QueryCache('test', ttl_seconds=0.05, endpoint='')
+    loader = Loader(response({'alerts': []}))
+
+    cache.get_or_load('key', loader)
+    time.sleep(0.1)
+    cache.get_or_load('key', loader)
+
+    assert loader.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted_past_the_byte_limit():
+    body = {'alerts': ['x' * 40]}
+    size = len(response(body)['body'])
+    cache = QueryCache('test', ttl_seconds=60, max_bytes=2 * size, endpoint='')
+    cache.get_or_load('first', Loader(response(body)))
+    cache.get_or_load('second', Loader(response(body)))
+    cache.get_or_load('first', Loader(None))  # touch first, so second is the oldest
+
+    cache.get_or_load('third', Loader(response(body)))
+
+    assert list(cache.entries) == ['first', 'third']
+    assert cache.counts['evictions'] == 1
+
+
+def test_acknowledging_an_alert_invalidates_cached_lists(processor, send):
+    send(processor, [{'heartRate': 170}])
+    alerts_api = local_aws.load_handler('alert-management')
+
+    [alert] = json.loads(alerts_api.lambda_handler(ALERTS_QUERY, None)['body'])['alerts']
+    assert alert['Status'] != 'ACKNOWLEDGED'
+
+    acknowledged = alerts_api.lambda_handler(
+        {'httpMethod': 'PUT', 'path': f"/alerts/{alert['AlertId']}/acknowledge"}, None)
+    assert acknowledged['statusCode'] == 200
+
+    [alert] = json.loads(alerts_api.lambda_handler(ALERTS_QUERY, None)['body'])['alerts']
+    assert alert['Status'] == 'ACKNOWLEDGED'
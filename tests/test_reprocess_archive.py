@@ -0,0 +1,99 @@
+# tests/test_reprocess_archive.py
+"""
+The archive reprocessor decodes Firehose objects, replays the readings in
+the requested window through the processor's own code and, in missing
+mode, writes only readings the table does not have yet.
+"""
+import gzip
+import importlib.util
+import json
+import os
+from datetime import datetime
+
+import boto3
+import local_aws
+import pytest
+from conftest import NORMAL_VITALS, PATIENT_ID
+
+BUCKET = 'bench-raw-archive'
+KEY = 'raw-vitals/2026/09/01/13/archive-1.gz'
+
+
+@pytest.fixture
+def reprocess(aws):
+    spec = importlib.util.spec_from_file_location(
+        'reprocess_archive', os.path.join(local_aws.REPO_ROOT, 'tools', 'reprocess_archive.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def worker(reprocess, monkeypatch):
+    """Worker state as init_worker sets it up in each pool process"""
+    options = {
+        'bucket': BUCKET, 'region': os.environ['AWS_DEFAULT_REGION'], 'dynamodb_stack': local_aws.STACK_PREFIX,
+        'schema': 'v2', 'mode': 'missing', 'patients': [], 'workers': 1, 'max_write_units': 0, 'dry_run': False,
+        'start': datetime(2026, 9, 1, 13), 'end': datetime(2026, 9, 1, 14)
+    }
+    # init_worker overwrites these; registering them here restores them afterwards
+    for name, value in reprocess.processor_environment(options).items():
+        monkeypatch.setenv(name, os.environ.get(name, value))
+    reprocess.init_worker(options)
+    boto3.client('s3').create_bucket(Bucket=BUCKET)
+    return reprocess
+
+
+def reading(timestamp, **vitals):
+    return dict(NORMAL_VITALS, patientId=PATIENT_ID, deviceId='DEVICE-1', timestamp=timestamp, **vitals)
+
+
+def archive_body(payloads):
+    # Firehose concatenates payloads with no delimiter
+    return gzip.compress(''.join(json.dumps(payload) for payload in payloads).encode('utf-8'))
+
+
+def test_payloads_are_read_back_to_back_or_by_line(reprocess):
+    payloads = [reading('2026-09-01T13:00:00Z'), reading('2026-09-01T13:00:01Z')]
+
+    assert list(reprocess.iter_payloads(archive_body(payloads))) == payloads
+    assert list(reprocess.iter_payloads('\n'.join(json.dumps(p) for p in payloads).encode('utf-8'))) == payloads
+
+
+def test_listing_includes_the_arrival_hour_either_side(worker):
+    s3 = boto3.client('s3')
+    for hour in ('11', '12', '13', '14', '15'):
+        s3.put_object(Bucket=BUCKET, Key=f'raw-vitals/2026/09/01/{hour}/archive.gz', Body=b'')
+
+    keys = worker.list_archive_keys(s3, BUCKET, 'raw-vitals', datetime(2026, 9, 1, 13), datetime(2026, 9, 1, 14))
+
+    assert [key.split('/')[4] for key in keys] == ['12', '13', '14']
+
+
+def test_missing_mode_writes_only_absent_readings(worker):
+    payloads = [
+        reading('2026-09-01T13:00:00Z'),
+        reading('2026-09-01T13:00:01Z', heartRate=170),
+        reading('2026-09-01T12:59:59Z'),  # outside the window
+        {'recordType': 'waveform', 'patientId': PATIENT_ID, 'timestamp': '2026-09-01T13:00:02Z'},
+    ]
+    boto3.client('s3').put_object(Bucket=BUCKET, Key=KEY, Body=archive_body(payloads))
+
+    key, counts, findings = worker.reprocess_object(KEY)
+
+    assert key == KEY
+    assert (counts['readings'], counts['written'], counts['existing'], counts['skipped']) == (2, 2, 0, 1)
+    assert (counts['Normal'], counts['Critical']) == (1, 1)
+    assert [(finding['timestamp'], finding['status']) for finding in findings] == [('2026-09-01T13:00:01Z', 'Critical')]
+
+    _, counts, _ = worker.reprocess_object(KEY)
+    assert (counts['written'], counts['existing']) == (0, 2)
+
+
+def test_checkpoint_lists_finished_objects_and_sums_their_counts(reprocess, tmp_path):
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    checkpoint.write_text(json.dumps({'key': 'a', 'counts': {'readings': 2, 'written': 1}}) + '\n\n' +
+                          json.dumps({'key': 'b', 'counts': {'readings': 3, 'written': 3}}) + '\n')
+
+    assert reprocess.load_checkpoint(str(checkpoint)) == ({'a', 'b'}, {'readings': 5, 'written': 4})
+    assert reprocess.load_checkpoint(str(tmp_path / 'missing.jsonl')) == (set(), {})
@@ -0,0 +1,37 @@
+# tests/test_vital_blocks.py
+"""Timestamp parsing shared by the block encoder, block keys and the compact schema."""
+import sys
+
+import local_aws
+import pytest
+
+sys.path.insert(0, local_aws.SHARED_ROOT)
+import vital_blocks  # noqa: E402
+
+UTC_MICROS = vital_blocks.timestamp_to_micros('2024-05-01T13:00:00')
+
+
+@pytest.mark.parametrize('timestamp', [
+    '2024-05-01T13:00:00',
+    '2024-05-01T13:00:00Z',
+    '2024-05-01T13:00:00+00:00',
+    '2024-05-01T15:00:00+02:00',
+    '2024-05-01T08:30:00-04:30',
+])
+def test_offsets_are_converted_to_utc(timestamp):
+    assert vital_blocks.timestamp_to_micros(timestamp) == UTC_MICROS
+
+
+def test_round_trip_keeps_microseconds():
+    micros = vital_blocks.timestamp_to_micros('2024-05-01T13:00:00.123456Z')
+    assert vital_blocks.micros_to_timestamp(micros) == '2024-05-01T13:00:00.123456Z'
+
+
+@pytest.mark.parametrize('timestamp, hour', [
+    ('2024-05-01T13:59:59.999999Z', '2024-05-01T13'),
+    ('2024-05-01T14:59:59.999999+01:00', '2024-05-01T13'),
+    ('2024-05-01T00:30:00+02:00', '2024-04-30T22'),
+    ('2024-05-01T13:30:00-00:30', '2024-05-01T14'),
+])
+def test_hour_key_is_the_utc_hour(timestamp, hour):
+    assert vital_blocks.hour_key(timestamp) == hour
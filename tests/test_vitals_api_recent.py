@@ -0,0 +1,25 @@
+# tests/test_vitals_api_recent.py
+"""
+The all-patients recent view reads readings through the same compact / v1
+path as the per-patient queries.
+"""
+import json
+
+import local_aws
+from conftest import PATIENT_ID
+
+
+def test_recent_view_reads_compact_readings(processor, send):
+    send(processor, [{'heartRate': 70}, {'heartRate': 72, 'roomNumber': 'ICU-7'}])
+    api = local_aws.load_handler('vitals-api')
+
+    response = api.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': {'timeRange': '1h'}}, None)
+    body = json.loads(response['body'])
+
+    assert response['statusCode'] == 200
+    [patient] = body['patients']
+    assert patient['patientId'] == PATIENT_ID
+    assert patient['recordCount'] == 1
+    assert patient['latestVitalSigns']['HeartRate'] == 72
+    assert patient['latestVitalSigns']['RoomNumber'] == 'ICU-7'
+    assert (patient['patientInfo']['name'], patient['patientInfo']['gender']) == ('Test Patient', 'Female')
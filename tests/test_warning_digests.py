@@ -0,0 +1,62 @@
+# tests/test_warning_digests.py
+"""
+Warning digests are held in the PatientState table, so a digest opened by one
+container is sent by the scheduled flush even when no further batch arrives.
+"""
+import os
+
+import boto3
+import local_aws
+
+SUSTAINED_WARNING = [{'heartRate': 110}] * 5
+SCHEDULED_EVENT = {'source': 'aws.events', 'detail-type': 'Scheduled Event'}
+
+
+def open_digests(processor):
+    table = boto3.resource('dynamodb').Table(os.environ['PATIENT_STATE_TABLE'])
+    return table.get_item(Key={'PatientId': processor.DIGEST_STATE_ID, 'StateKey': 'Unknown'}).get('Item')
+
+
+def test_digest_waits_for_its_window(processor, send, alerts):
+    send(processor, SUSTAINED_WARNING)
+    processor.lambda_handler(SCHEDULED_EVENT, None)
+
+    assert [alert['Status'] for alert in alerts()] == ['PENDING']
+    assert len(open_digests(processor)['Alerts']) == 1
+
+
+def test_scheduled_flush_sends_digest_without_further_batches(processor, send, alerts):
+    send(processor, SUSTAINED_WARNING)
+
+    # A recycled container, once the digest window has passed
+    recycled = local_aws.load_handler('vitals-processor')
+    recycled.WARNING_DIGEST_WINDOW_SECONDS = 0
+    recycled.lambda_handler(SCHEDULED_EVENT, None)
+
+    assert [(alert['AlertType'], alert['Status']) for alert in alerts()] == [('WARNING', 'SENT')]
+    assert open_digests(recycled) is None
+
+
+def test_due_digest_is_sent_by_next_batch(processor, send, alerts):
+    processor.WARNING_DIGEST_WINDOW_SECONDS = 0
+    send(processor, SUSTAINED_WARNING)
+
+    assert [alert['Status'] for alert in alerts()] == ['SENT']
+    assert open_digests(processor) is None
+
+
+def test_alert_lag_is_measured_when_the_digest_is_published(processor, send):
+    emitted = []
+    processor.emit_metrics = emitted.append
+    send(processor, SUSTAINED_WARNING)
+    # Queued for the digest, not yet published
+    assert not emitted[-1]['IngestToDigestLag'][0]
+
+    recycled = local_aws.load_handler('vitals-processor')
+    recycled.WARNING_DIGEST_WINDOW_SECONDS = 0
+    recycled.emit_metrics = emitted.append
+    recycled.lambda_handler(SCHEDULED_EVENT, None)
+
+    # send() dates the readings about five minutes back
+    [lag] = emitted[-1]['IngestToDigestLag'][0]
+    assert lag > 4 * 60 * 1000
@@ -0,0 +1,107 @@
+# tests/test_waveforms.py
+"""
+Waveform segments are stored compressed, one item per segment, and a range
+query reassembles the samples of every segment overlapping it, trimmed to
+the range and decimated to the point budget.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import boto3
+import local_aws
+import pytest
+from conftest import PATIENT_ID
+
+RATE = 250
+SCALE = 0.005
+START = datetime(2026, 9, 1, 13, 0, 0)
+
+
+@pytest.fixture
+def waveforms(aws):
+    return local_aws.load_handler('vitals-processor').waveforms
+
+
+def segment(waveforms, start, samples, **fields):
+    return dict({
+        'recordType': 'waveform', 'channel': 'ECG-II', 'startTime': start.isoformat() + 'Z',
+        'sampleRate': RATE, 'scale': SCALE, 'units': 'mV', 'samples': waveforms.pack_samples(samples)
+    }, **fields)
+
+
+def stored_segments():
+    return boto3.resource('dynamodb').Table(os.environ['WAVEFORM_TABLE']).scan()['Items']
+
+
+def query(api, start, end, **params):
+    response = api.lambda_handler({'httpMethod': 'GET', 'queryStringParameters': dict(
+        patientId=PATIENT_ID, waveform='ECG-II', startTime=start.isoformat() + 'Z', endTime=end.isoformat() + 'Z',
+        **params)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_samples_survive_the_round_trip_through_deltas(waveforms):
+    # Deltas between the extremes wrap around 16 bits
+    samples = [0, 32767, -32768, 32767, -1, 1, 0] + list(range(-500, 500, 7))
+
+    encoded = waveforms.encode_samples(waveforms.unpack_samples(waveforms.pack_samples(samples)))
+
+    assert list(waveforms.decode_samples(encoded, len(samples))) == samples
+    assert list(waveforms.unpack_samples(waveforms.pack_samples([40000, -40000]))) == [32767, -32768]
+
+
+def test_segments_are_stored_once_and_malformed_ones_rejected(processor, send, waveforms):
+    first = segment(waveforms, START, range(RATE))
+    batch = [first, segment(waveforms, START + timedelta(seconds=1), range(RATE)),
+             segment(waveforms, START, range(RATE), sampleRate=5000),
+             dict(first, samples='AA==')]
+
+    send(processor, batch)
+    # Redelivery rewrites the same item
+    send(processor, batch[:1])
+
+    items = sorted(stored_segments(), key=lambda item: item['StartMs'])
+    assert [(item['StreamId'], item['SampleCount']) for item in items] == [(f'{PATIENT_ID}#ECG-II', RATE)] * 2
+    assert int(items[1]['StartMs']) - int(items[0]['StartMs']) == 1000
+    assert int(items[0]['EndMs']) == int(items[1]['StartMs'])
+    # Segments are not classified or stored as readings
+    assert not boto3.resource('dynamodb').Table(os.environ['VITAL_SIGNS_COMPACT_TABLE']).scan()['Items']
+
+
+def test_range_query_joins_and_trims_overlapping_segments(processor, send, waveforms):
+    send(processor, [segment(waveforms, START, range(RATE)),
+                     segment(waveforms, START + timedelta(seconds=1), range(RATE, 2 * RATE)),
+                     segment(waveforms, START + timedelta(seconds=2), range(2 * RATE, 3 * RATE))])
+    api = local_aws.load_handler('vitals-api')
+
+    status, body = query(api, START + timedelta(milliseconds=500), START + timedelta(milliseconds=1500))
+
+    assert status == 200
+    assert (body['units'], body['decimation']) == ('mV', 1)
+    first, second = body['segments']
+    # Sample n of a segment is at n * 4 ms; the range end is inclusive
+    assert first['startTime'].startswith('2026-09-01T13:00:00.5')
+    assert second['startTime'].startswith('2026-09-01T13:00:01')
+    assert first['values'] + second['values'] == [round(value * SCALE, 4) for value in range(125, 376)]
+    assert body['count'] == 251
+    assert 'offsetsMs' not in first
+
+
+def test_long_ranges_are_decimated_keeping_spikes(processor, send, waveforms):
+    samples = [0] * RATE
+    samples[201] = 2000
+    send(processor, [segment(waveforms, START, samples)])
+    api = local_aws.load_handler('vitals-api')
+
+    status, body = query(api, START, START + timedelta(seconds=1), maxPoints='50')
+
+    [decimated] = body['segments']
+    assert status == 200
+    assert body['decimation'] == 10
+    assert body['count'] <= 50
+    assert max(decimated['values']) == round(2000 * SCALE, 4)
+    assert decimated['offsetsMs'][decimated['values'].index(max(decimated['values']))] == 201 * 4
+
+    status, body = query(api, START, START + timedelta(hours=2))
+    assert status == 400
@@ -0,0 +1,100 @@
+# tools/backfill_roster.py
+"""
+One-off backfill of the roster index attribute on PatientRecords.
+
+RosterIndex (infrastructure/dynamodb.yaml) only holds patients that carry
+RosterShard, which every writer sets while a patient is Active and removes
+otherwise (lambda/shared/patient_roster.py). Patients written before that
+have no RosterShard, so this tool scans the table once and sets or removes
+it to match each patient's Status. Active patients without an UpdatedAt get
+one, since it is the index sort key. Run it with the same ROSTER_SHARDS as
+the functions.
+
+Usage:
+    pip install -r tools/requirements.txt
+    python tools/backfill_roster.py --dynamodb-stack vital-signs-dynamodb
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'lambda', 'shared'))
+import patient_roster  # noqa: E402
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Set RosterShard on existing patient records')
+    parser.add_argument('--dynamodb-stack', default='vital-signs-dynamodb',
+                        help='DynamoDB stack name, the prefix of every table name')
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Count the patients that would change without writing')
+    return parser.parse_args(argv)
+
+
+def roster_update(patient):
+    """update_item arguments bringing one patient's RosterShard in line with its Status, or None"""
+    expected = patient_roster.set_roster_shard(dict(patient)).get('RosterShard')
+    if patient.get('RosterShard') == expected:
+        return None
+
+    # Skip the write if the patient changed since the scan
+    kwargs = {
+        'Key': {'PatientId': patient['PatientId']},
+        'ConditionExpression': '#status = :status',
+        'ExpressionAttributeNames': {'#status': 'Status'},
+        'ExpressionAttributeValues': {':status': patient.get('Status')}
+    }
+    if expected is None:
+        kwargs['UpdateExpression'] = 'REMOVE RosterShard'
+    else:
+        kwargs['UpdateExpression'] = 'SET RosterShard = :shard, UpdatedAt = if_not_exists(UpdatedAt, :now)'
+        kwargs['ExpressionAttributeValues'].update({':shard': expected, ':now': datetime.now().isoformat()})
+    return kwargs
+
+
+def backfill(table, dry_run=False):
+    """Scan the table and fix every patient's RosterShard; returns counts"""
+    counts = {'scanned': 0, 'updated': 0, 'skipped': 0}
+    scan_kwargs = {}
+
+    while True:
+        response = table.scan(**scan_kwargs)
+        for patient in response.get('Items', []):
+            counts['scanned'] += 1
+            kwargs = roster_update(patient)
+            if kwargs is None:
+                continue
+            if dry_run:
+                counts['updated'] += 1
+                continue
+            try:
+                table.update_item(**kwargs)
+                counts['updated'] += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                # Written since the scan, so the writer already set RosterShard
+                counts['skipped'] += 1
+
+        if 'LastEvaluatedKey' not in response:
+            return counts
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    table = boto3.resource('dynamodb', region_name=args.region).Table(f'{args.dynamodb_stack}-patient-records')
+    counts = backfill(table, args.dry_run)
+    print(f"{counts['scanned']} patients scanned, {counts['updated']} "
+          f"{'to update' if args.dry_run else 'updated'}, {counts['skipped']} changed meanwhile")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,356 @@
+# tools/reprocess_archive.py
+"""
+Offline reprocessor for the raw stream archive.
+
+The RawStreamArchive Firehose (infrastructure/kinesis-sns.yaml) writes every
+Kinesis payload to S3, gzipped, under <prefix>/YYYY/MM/DD/HH/. This tool
+replays a time range of that archive through the vitals-processor's own
+decode, classify and store code, so a threshold change or a processor fix
+can be applied to history:
+
+    --mode missing    conditional puts; only readings absent from the table
+                      are written (fills gaps left by a bug or an outage)
+    --mode overwrite  every reading is rewritten with BatchWriteItem
+
+Archive objects are spread over a multiprocessing pool. Writes are limited
+to --max-write-units per second across all workers, and each finished
+object is appended to --checkpoint, so an interrupted run picks up where it
+stopped when started again with the same arguments.
+
+Readings are classified against each patient's current alert thresholds and
+the counts are reported; non-normal readings can be written to --findings.
+No notifications are sent and no alert history is written. Window rules and
+baselines are not replayed, since they need each patient's readings in
+order across the whole range. Waveform segments are counted as skipped.
+
+Usage:
+    pip install -r tools/requirements.txt
+    python tools/reprocess_archive.py --bucket <patient data bucket> \\
+        --start 2026-09-01T00 --end 2026-10-01T00 --workers 16 \\
+        --max-write-units 2000 --checkpoint september.jsonl
+"""
+import argparse
+import gzip
+import importlib.util
+import json
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import boto3
+from botocore.exceptions import ClientError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCESSOR_DIR = os.path.join(REPO_ROOT, 'lambda', 'vitals-processor')
+SHARED_DIR = os.path.join(REPO_ROOT, 'lambda', 'shared')
+
+# Statuses written to --findings
+FINDING_STATUSES = ('Warning', 'Critical')
+
+# Per-worker state, set up by init_worker
+_processor = None
+_s3 = None
+_limiter = None
+_options = None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Replay the raw vital signs archive through the processor')
+    parser.add_argument('--bucket', required=True,
+                        help='Bucket the RawStreamArchive delivers to')
+    parser.add_argument('--prefix', default='raw-vitals',
+                        help='Archive key prefix (RawArchivePrefix)')
+    parser.add_argument('--start', required=True, type=parse_hour,
+                        help='First hour to replay, UTC (e.g. 2026-09-01T00)')
+    parser.add_argument('--end', required=True, type=parse_hour,
+                        help='Hour to stop before, UTC')
+    parser.add_argument('--patients', default='',
+                        help='Comma separated patient IDs to replay (default all)')
+    parser.add_argument('--mode', choices=['missing', 'overwrite'], default='missing',
+                        help='Write only missing readings, or rewrite every reading')
+    parser.add_argument('--schema', choices=['v1', 'v2'], default='v2',
+                        help='Write to the VitalSigns table (v1) or the compact table (v2)')
+    parser.add_argument('--dynamodb-stack', default='vital-signs-dynamodb',
+                        help='DynamoDB stack name, the prefix of every table name')
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='Worker processes')
+    parser.add_argument('--max-write-units', type=float, default=500,
+                        help='Write capacity units per second for the whole run')
+    parser.add_argument('--checkpoint', default='reprocess-checkpoint.jsonl',
+                        help='Finished objects, one JSON line each; reused on restart')
+    parser.add_argument('--findings',
+                        help='Write Warning and Critical readings here as JSON lines')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Decode and classify without writing to DynamoDB')
+    return parser.parse_args(argv)
+
+
+def parse_hour(value):
+    for fmt in ('%Y-%m-%dT%H', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value.rstrip('Z'), fmt)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"expected an ISO hour like 2026-09-01T00, got {value!r}")
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` units per second with one second of burst"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def acquire(self, units=1):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= units:
+                self.tokens -= units
+                return
+            time.sleep((units - self.tokens) / self.rate)
+
+
+def processor_environment(options):
+    """Environment the processor module reads at import"""
+    table = f"{options['dynamodb_stack']}-"
+    return {
+        'AWS_DEFAULT_REGION': options['region'],
+        'VITAL_SIGNS_TABLE': table + 'vital-signs',
+        'VITAL_SIGNS_COMPACT_TABLE': table + 'vital-signs-v2' if options['schema'] == 'v2' else '',
+        'ALERT_CONFIG_TABLE': table + 'alert-config',
+        'ALERT_HISTORY_TABLE': table + 'alert-history',
+        # Alerts are never sent from a replay
+        'SNS_TOPIC_ARN': '',
+        'PATIENT_STATE_TABLE': '',
+        'PROCESSOR_WORKERS': '1',
+        'HANDLER_PROFILING': '',
+        # Back off when the write limit is still above the table's capacity
+        'AWS_RETRY_MODE': 'adaptive',
+        'AWS_MAX_ATTEMPTS': '10'
+    }
+
+
+def load_processor():
+    """Import lambda/vitals-processor/lambda_function.py with the shared modules on the path"""
+    for path in (SHARED_DIR, PROCESSOR_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    spec = importlib.util.spec_from_file_location(
+        'vitals_processor', os.path.join(PROCESSOR_DIR, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['vitals_processor'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def init_worker(options):
+    global _processor, _s3, _limiter, _options
+    os.environ.update(processor_environment(options))
+    _options = options
+    _processor = load_processor()
+    _s3 = boto3.client('s3', region_name=options['region'])
+    _limiter = RateLimiter(options['max_write_units'] / options['workers'])
+
+
+def list_archive_keys(s3, bucket, prefix, start, end):
+    """
+    Archive objects that can hold readings from [start, end). Partitions are
+    by arrival hour, so one hour either side is listed as well and readings
+    are filtered on their own timestamps.
+    """
+    keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    hour = start.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    while hour <= end:
+        hour_prefix = f"{prefix.rstrip('/')}/{hour:%Y/%m/%d/%H}/"
+        for page in paginator.paginate(Bucket=bucket, Prefix=hour_prefix):
+            keys.extend(item['Key'] for item in page.get('Contents', []))
+        hour += timedelta(hours=1)
+    return keys
+
+
+def iter_payloads(body):
+    """
+    Decode one archive object. Firehose concatenates record payloads without
+    a delimiter, so JSON documents are read back to back; newline separated
+    objects decode the same way.
+    """
+    if body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    text = body.decode('utf-8')
+    decoder = json.JSONDecoder()
+    position = 0
+    length = len(text)
+
+    while position < length:
+        while position < length and text[position].isspace():
+            position += 1
+        if position == length:
+            return
+        payload, position = decoder.raw_decode(text, position)
+        yield payload
+
+
+def reprocess_object(key):
+    """Replay one archive object; returns its counts and findings"""
+    started = time.perf_counter()
+    counts = {'readings': 0, 'written': 0, 'existing': 0, 'skipped': 0,
+              'Normal': 0, 'Warning': 0, 'Critical': 0, 'Unknown': 0}
+    findings = []
+    patients = set(_options['patients'])
+    window = (_options['start'].timestamp(), _options['end'].timestamp())
+
+    readings = []
+    body = _s3.get_object(Bucket=_options['bucket'], Key=key)['Body'].read()
+    for data in iter_payloads(body):
+        if data.get('recordType') == 'waveform':
+            # Waveform segments carry no spot values; they are not replayed
+            counts['skipped'] += 1
+            continue
+        patient_id = data.get('patientId') or data.get('PatientId')
+        reading_time = _processor.parse_reading_timestamp(data.get('timestamp'))
+        if not patient_id or reading_time is None:
+            counts['skipped'] += 1
+            continue
+        if patients and patient_id not in patients:
+            continue
+        if not window[0] <= reading_time < window[1]:
+            continue
+        readings.append((patient_id, data))
+
+    _processor.load_patient_thresholds(list({patient_id for patient_id, _ in readings}))
+    items = []
+    for patient_id, data in readings:
+        status = _processor.determine_patient_status(data, _processor.get_patient_thresholds(patient_id))
+        counts[status] = counts.get(status, 0) + 1
+        if status in FINDING_STATUSES:
+            findings.append({'patientId': patient_id, 'timestamp': data['timestamp'],
+                             'status': status, 'reading': data})
+        items.append(_processor.build_vital_signs_item(patient_id, data))
+
+    counts['readings'] = len(items)
+    if not _options['dry_run']:
+        written = store_items(items)
+        counts['written'] = written
+        counts['existing'] = len(items) - written
+
+    counts['seconds'] = round(time.perf_counter() - started, 3)
+    return key, counts, findings
+
+
+def store_items(items):
+    """Write items as the processor would; returns how many were written"""
+    if _processor.vital_signs_compact_table is not None:
+        table, key_names, condition = _processor.vital_signs_compact_table, ['P', 'T'], None
+        items = [_processor.vital_schema.compact_item(item) for item in items]
+    else:
+        table, key_names, condition = _processor.vital_signs_table, ['PatientId', 'Timestamp'], 'attribute_not_exists(PatientId)'
+
+    if _options['mode'] == 'overwrite':
+        with table.batch_writer(overwrite_by_pkeys=key_names) as batch:
+            for item in items:
+                _limiter.acquire()
+                batch.put_item(Item=item)
+        return len(items)
+
+    written = 0
+    for item in items:
+        # A failed condition check still consumes a write unit
+        _limiter.acquire()
+        if _processor.vital_signs_compact_table is not None:
+            written += _processor.vital_schema.put_compact_item(table, item)
+            continue
+        try:
+            table.put_item(Item=item, ConditionExpression=condition)
+            written += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    return written
+
+
+def load_checkpoint(path):
+    """Keys already finished and their summed counts"""
+    done = set()
+    totals = {}
+    if not os.path.exists(path):
+        return done, totals
+
+    with open(path) as checkpoint:
+        for line in checkpoint:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            done.add(entry['key'])
+            add_counts(totals, entry['counts'])
+    return done, totals
+
+
+def add_counts(totals, counts):
+    for name, value in counts.items():
+        totals[name] = totals.get(name, 0) + value
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.end <= args.start:
+        sys.exit('--end must be after --start')
+
+    options = dict(vars(args))
+    options['patients'] = [value for value in args.patients.split(',') if value]
+    options['workers'] = max(args.workers, 1)
+
+    s3 = boto3.client('s3', region_name=args.region)
+    keys = list_archive_keys(s3, args.bucket, args.prefix, args.start, args.end)
+    done, totals = load_checkpoint(args.checkpoint)
+    pending = [key for key in keys if key not in done]
+    print(f"{len(keys)} archive objects, {len(keys) - len(pending)} already done, "
+          f"{len(pending)} to replay with {options['workers']} workers", file=sys.stderr)
+
+    started = time.perf_counter()
+    readings = 0
+    findings_file = open(args.findings, 'a') if args.findings else None
+    # spawn, so no worker inherits the parent's boto3 connections
+    context = multiprocessing.get_context('spawn')
+
+    try:
+        with open(args.checkpoint, 'a') as checkpoint, \
+                context.Pool(options['workers'], initializer=init_worker, initargs=(options,)) as pool:
+            for index, (key, counts, findings) in enumerate(pool.imap_unordered(reprocess_object, pending), 1):
+                if findings_file:
+                    for finding in findings:
+                        findings_file.write(json.dumps(finding, default=str) + '\n')
+                    findings_file.flush()
+                checkpoint.write(json.dumps({'key': key, 'counts': counts}) + '\n')
+                checkpoint.flush()
+
+                add_counts(totals, counts)
+                readings += counts['readings']
+                elapsed = time.perf_counter() - started
+                print(f"{index}/{len(pending)} objects  {readings / elapsed:>9.1f} readings/s  "
+                      f"written={totals.get('written', 0)} existing={totals.get('existing', 0)}",
+                      file=sys.stderr)
+    finally:
+        if findings_file:
+            findings_file.close()
+
+    print(json.dumps({
+        'objects': len(keys),
+        'elapsedSec': round(time.perf_counter() - started, 3),
+        'totals': totals
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -45,12 +45,26 @@ fi
 
 echo "API Gateway URL: $API_URL"
 
+# Live updates WebSocket URL (optional - the dashboard polls without it)
+WEBSOCKET_URL=$(aws cloudformation describe-stacks \
+  --stack-name "${STACK_NAME_PREFIX}-api" \
+  --region "$REGION" \
+  --query "Stacks[0].Outputs[?OutputKey=='LiveUpdatesWebSocketUrl'].OutputValue" \
+  --output text)
+
+if [ -z "$WEBSOCKET_URL" ] || [ "$WEBSOCKET_URL" = "None" ]; then
+    WEBSOCKET_URL=""
+fi
+
+echo "Live updates WebSocket URL: ${WEBSOCKET_URL:-not deployed}"
+
 # Create config.js with API endpoint
 echo -e "${YELLOW}📝 Creating frontend configuration...${NC}"
 cat > frontend/src/js/config.js << EOF
 // Configuration for Patient Vital Signs Monitoring System
 const CONFIG = {
     API_BASE_URL: '$API_URL',
+    WEBSOCKET_URL: '$WEBSOCKET_URL',
     PROJECT_NAME: '$PROJECT_NAME',
     REGION: '$REGION',
     
@@ -58,7 +72,8 @@ const CONFIG = {
     ENDPOINTS: {
         PATIENTS: '/patients',
         VITAL_SIGNS: '/vitalsigns',
-        ALERTS: '/alerts'
+        ALERTS: '/alerts',
+        EXPORTS: '/exports'
     },
     
     // Vital Signs Thresholds